@@ -0,0 +1,629 @@
+from clickhouse_backend.models import ArrayField, TupleField
+from collections import defaultdict
+from copy import deepcopy
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+import json
+import logging
+import math
+import random
+from statistics import median
+import time
+from uuid import uuid4
+
+from clickhouse_search.backend.fields import MaterializedUInt8Field, NestedField
+from clickhouse_search.models import AnnotationsSnvIndel, AnnotationsSv, EntriesSnvIndel, EntriesSv, \
+    KeyLookupSnvIndel, KeyLookupSv, ProjectGtStatsSnvIndel, ProjectGtStatsSv, TranscriptsSnvIndel
+from clickhouse_search.query_profiling import get_search_query_profiles
+from clickhouse_search.search import delete_clickhouse_project
+from reference_data.models import GeneInfo, GENOME_VERSION_GRCh38
+from seqr.models import Project, Family, Individual, Sample, VariantSearch, VariantSearchResults
+from seqr.utils.search.utils import query_variants
+from seqr.utils.xpos_utils import CHROMOSOMES, get_xpos
+from seqr.views.utils.json_to_orm_utils import bulk_create_models_from_json, create_model_from_json
+from settings import DEPLOYMENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+PROJECT_NAME_PREFIX = 'Search benchmark project'
+# Synthetic variants use keys well above those of any loaded callset, so they can be deleted without touching real data
+BENCHMARK_KEY_OFFSET = 3_000_000_000
+INSERT_BATCH_SIZE = 50000
+MAX_QUERIES_PER_SEARCH = 1000
+SAMPLE_TYPE = Sample.SAMPLE_TYPE_WGS
+PRODUCTION_DEPLOYMENT_TYPE = 'prod'
+
+GENIC_FRACTION = 0.7
+GNOMAD_ABSENT_FRACTION = 0.4
+SV_GNOMAD_ABSENT_FRACTION = 0.5
+MIN_LOG_AF = -6
+MAX_AF = 0.5
+DE_NOVO_RATE = 0.02
+FILTERED_RATE = 0.05
+INDEL_RATE = 0.15
+POPULATION_ANS = {'exac': 121412, 'gnomad_exomes': 1461894, 'gnomad_genomes': 152312, 'topmed': 264690}
+CONSEQUENCE_WEIGHTS = {
+    'intron_variant': 0.45,
+    'missense_variant': 0.15,
+    'synonymous_variant': 0.12,
+    '3_prime_UTR_variant': 0.08,
+    'non_coding_transcript_exon_variant': 0.06,
+    '5_prime_UTR_variant': 0.03,
+    'splice_region_variant': 0.03,
+    'stop_gained': 0.02,
+    'frameshift_variant': 0.02,
+    'inframe_deletion': 0.01,
+    'splice_donor_variant': 0.005,
+    'splice_acceptor_variant': 0.005,
+}
+SV_TYPE_WEIGHTS = {'DEL': 0.45, 'INS': 0.25, 'DUP': 0.2, 'INV': 0.05, 'CPX': 0.05}
+SV_GENE_CONSEQUENCES = {
+    'DEL': {'LOF': 0.3, 'INTRONIC': 0.7},
+    'DUP': {'COPY_GAIN': 0.2, 'INTRAGENIC_EXON_DUP': 0.2, 'INTRONIC': 0.6},
+    'INS': {'INTRONIC': 0.9, 'LOF': 0.1},
+    'INV': {'INV_SPAN': 0.5, 'INTRONIC': 0.5},
+    'CPX': {'LOF': 0.5, 'INTRONIC': 0.5},
+}
+
+CODING_ANNOTATIONS = {
+    'frameshift': ['frameshift_variant'],
+    'nonsense': ['stop_gained'],
+    'essential_splice_site': ['splice_donor_variant', 'splice_acceptor_variant'],
+    'missense': ['missense_variant'],
+    'in_frame': ['inframe_insertion', 'inframe_deletion'],
+}
+SEARCHES = {
+    'rare_recessive': {
+        'inheritance': {'mode': 'recessive'},
+        'freqs': {'gnomad_genomes': {'af': 0.01, 'hh': 5}, 'gnomad_exomes': {'af': 0.01, 'hh': 5}},
+        'annotations': CODING_ANNOTATIONS,
+        'annotations_secondary': {**CODING_ANNOTATIONS, 'splice_region': ['splice_region_variant']},
+    },
+    'de_novo': {
+        'inheritance': {'mode': 'de_novo'},
+        'freqs': {'gnomad_genomes': {'af': 0.001}, 'gnomad_exomes': {'af': 0.001}},
+        'annotations': CODING_ANNOTATIONS,
+        'qualityFilter': {'min_gq': 20, 'min_ab': 20},
+    },
+    'comp_het': {
+        'inheritance': {'mode': 'compound_het'},
+        'freqs': {'gnomad_genomes': {'af': 0.01}},
+        'annotations': {**CODING_ANNOTATIONS, 'splice_region': ['splice_region_variant']},
+    },
+    'gene_list': {
+        'inheritance': {'mode': 'any_affected'},
+        'freqs': {'gnomad_genomes': {'af': 0.05}},
+    },
+    'sv': {
+        'inheritance': {'mode': 'any_affected'},
+        'freqs': {'gnomad_svs': {'af': 0.01}},
+        'annotations': {
+            'structural': list(SV_TYPE_WEIGHTS.keys()),
+            'structural_consequence': ['LOF', 'COPY_GAIN', 'INTRAGENIC_EXON_DUP'],
+        },
+    },
+}
+GENE_LIST_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ClickHouse searches against synthetic GRCh38 data, and write the latency and resource usage of ' \
+           'each search to a JSON report which can be compared across commits. Only run this against a local or dev ' \
+           'deployment, as it writes to the configured postgres database and shared ClickHouse tables, and reloads ' \
+           'shared views and dictionaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=2)
+        parser.add_argument('--families-per-project', type=int, default=50)
+        parser.add_argument('--variants', type=int, default=100000, help='Number of SNV/indel variants to generate')
+        parser.add_argument('--svs', type=int, default=5000, help='Number of SVs to generate')
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--search', action='append', dest='searches', choices=SEARCHES.keys(), help='Search to benchmark')
+        parser.add_argument('--user', help='Email of the user to run the searches as. Defaults to the first superuser')
+        parser.add_argument('--label', help='Label for the report, e.g. the commit being benchmarked')
+        parser.add_argument('--output', default='clickhouse_search_benchmark.json', help='Path to write the report to')
+        parser.add_argument('--compare-to', help='Path to a previous report to compare the results to')
+        parser.add_argument('--keep-data', action='store_true', help='Do not delete the synthetic data once done')
+        parser.add_argument(
+            '--allow-database-writes', action='store_true',
+            help='Confirm that synthetic data can be written to the configured postgres and ClickHouse databases',
+        )
+        parser.add_argument(
+            '--allow-production', action='store_true', help='Run even though this is a production deployment',
+        )
+
+    def handle(self, *args, **options):
+        # The ClickHouse search dictionaries read from the configured postgres database, so the synthetic data can not
+        # be isolated in a temporary database and writing to the configured databases must always be opted in to
+        if not options['allow_database_writes']:
+            raise CommandError(
+                'This benchmark writes synthetic data to the configured postgres and ClickHouse databases. Run against '
+                'a local or dev database, and pass --allow-database-writes to confirm'
+            )
+        if DEPLOYMENT_TYPE == PRODUCTION_DEPLOYMENT_TYPE and not options['allow_production']:
+            raise CommandError(
+                'Refusing to write synthetic benchmark data to a production deployment. Run against a local or dev '
+                'database, or pass --allow-production to override'
+            )
+
+        user = User.objects.filter(email=options['user']).first() if options['user'] else \
+            User.objects.filter(is_superuser=True).order_by('id').first()
+        if not user:
+            raise CommandError('No user found to run the searches as')
+
+        existing_projects = list(Project.objects.filter(name__startswith=PROJECT_NAME_PREFIX))
+        if existing_projects:
+            logger.info('Deleting synthetic data from a previous run')
+            delete_synthetic_data(existing_projects, user)
+
+        config = {
+            'projects': options['projects'], 'familiesPerProject': options['families_per_project'],
+            'variants': options['variants'], 'svs': options['svs'], 'iterations': options['iterations'],
+            'seed': options['seed'],
+        }
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+        projects, families, gene_ids = create_synthetic_data(
+            rng, user, options['projects'], options['families_per_project'], options['variants'], options['svs'],
+        )
+        logger.info(
+            f'Created {len(projects)} projects and {len(families)} families with {options["variants"]} variants and '
+            f'{options["svs"]} SVs in {time.perf_counter() - start:.1f}s'
+        )
+
+        report = {
+            'label': options['label'], 'createdAt': timezone.now().isoformat(), 'config': config, 'searches': {},
+        }
+        try:
+            for name, search in get_search_catalog(rng, gene_ids, include_svs=options['svs'] > 0).items():
+                if options['searches'] and name not in options['searches']:
+                    continue
+                summary = run_search_benchmark(name, search, families, user, options['iterations'])
+                report['searches'][name] = summary
+                latency = summary['latencyMs']
+                logger.info(
+                    f'{name}: {summary["numResults"]} results (p50 {latency["p50"]}ms, p90 {latency["p90"]}ms, '
+                    f'max {latency["max"]}ms), {summary["readRows"]} rows read, '
+                    f'{summary["peakMemoryBytes"]} bytes peak memory, {len(summary["errors"])} errors'
+                )
+        finally:
+            if not options['keep_data']:
+                delete_synthetic_data(projects, user)
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        logger.info(f'Wrote report to {options["output"]}')
+
+        if options['compare_to']:
+            with open(options['compare_to']) as f:
+                compare_reports(report, json.load(f))
+
+
+def create_synthetic_data(rng, user, num_projects, families_per_project, num_variants, num_svs):
+    genes = list(GeneInfo.objects.filter(
+        chrom_grch38__in=CHROMOSOMES[:23], start_grch38__isnull=False, end_grch38__isnull=False,
+    ).order_by('id').values('id', 'gene_id', 'chrom_grch38', 'start_grch38', 'end_grch38'))
+    if not genes:
+        raise CommandError('No GRCh38 genes found, reference data must be loaded before benchmarking')
+
+    projects = _create_projects(user, num_projects, families_per_project, include_svs=num_svs > 0)
+    families = Family.objects.filter(project__in=projects).select_related('project').prefetch_related('individual_set')
+    family_samples = [
+        {
+            'project_guid': family.project.guid,
+            'family_guid': family.guid,
+            'samples': [
+                (individual.individual_id, individual.affected)
+                for individual in sorted(family.individual_set.all(), key=lambda i: i.individual_id)
+            ],
+        } for family in families.order_by('id')
+    ]
+
+    # genes are sampled in proportion to their length, so long genes collect more variants as they do in real callsets
+    gene_weights = [gene['end_grch38'] - gene['start_grch38'] + 1 for gene in genes]
+    gene_ids = set()
+    for dataset_type, num, generate_variant, entries_model, gt_stats_model, tables in [
+        (
+            Sample.DATASET_TYPE_VARIANT_CALLS, num_variants, _generate_snv_indel, EntriesSnvIndel,
+            ProjectGtStatsSnvIndel, [AnnotationsSnvIndel, TranscriptsSnvIndel, KeyLookupSnvIndel],
+        ),
+        (
+            Sample.DATASET_TYPE_SV_CALLS, num_svs, _generate_sv, EntriesSv, ProjectGtStatsSv,
+            [AnnotationsSv, KeyLookupSv],
+        ),
+    ]:
+        table_rows = defaultdict(list)
+        entries = []
+        gt_stats = defaultdict(lambda: [0, 0, 0])
+        variant_ids = set()
+        for i, gene in enumerate(rng.choices(genes, weights=gene_weights, k=num)):
+            key = BENCHMARK_KEY_OFFSET + i
+            is_genic = rng.random() < GENIC_FRACTION
+            chrom, pos = _variant_position(rng, gene, is_genic)
+            if not is_genic:
+                gene = None
+            variant_rows, af, generate_call = generate_variant(rng, key, chrom, pos, gene, variant_ids)
+            for model, row in zip(tables, variant_rows):
+                if row:
+                    table_rows[model].append(row)
+            if gene:
+                gene_ids.add(gene['gene_id'])
+            annotation = variant_rows[0]
+            entry = {
+                'key': key, 'xpos': annotation['xpos'], 'sign': 1, 'geneId_ids': [gene['id']] if gene else [],
+            }
+            if dataset_type == Sample.DATASET_TYPE_VARIANT_CALLS:
+                entry.update({
+                    'sample_type': SAMPLE_TYPE,
+                    'is_gnomad_gt_5_percent': annotation['populations']['gnomad_genomes']['af'] > 0.05,
+                    'is_annotated_in_any_gene': bool(gene),
+                })
+            for family in _carrier_families(rng, family_samples, af):
+                genotypes = _family_genotypes(rng, af, is_de_novo=af == 0 and rng.random() < DE_NOVO_RATE)
+                entries.append({
+                    **entry,
+                    'project_guid': family['project_guid'],
+                    'family_guid': family['family_guid'],
+                    'filters': ['VQSRTrancheSNP99.90to99.95'] if rng.random() < FILTERED_RATE else [],
+                    'calls': [
+                        generate_call(rng, sample_id, gt) for (sample_id, _), gt in zip(family['samples'], genotypes)
+                    ],
+                })
+                for (_, affected), gt in zip(family['samples'], genotypes):
+                    gt_stats[(key, family['project_guid'], affected)][gt] += 1
+
+        for model, rows in table_rows.items():
+            _insert_rows(model, rows)
+        _insert_rows(entries_model, entries)
+        _insert_rows(gt_stats_model, [
+            {
+                'key': key, 'project_guid': project_guid, 'affected': affected, 'sample_type': SAMPLE_TYPE,
+                'ref_samples': ref, 'het_samples': het, 'hom_samples': hom,
+            } for (key, project_guid, affected), (ref, het, hom) in gt_stats.items()
+        ])
+        if num:
+            _refresh_gt_stats(gt_stats_model)
+
+    return projects, families, sorted(gene_ids)
+
+
+def _create_projects(user, num_projects, families_per_project, include_svs):
+    # Models are created with the model helpers, so their GUIDs, search tokens, project stats and audit logs are the
+    # same as for real data and are cleaned up by delete_synthetic_data
+    projects = [
+        create_model_from_json(
+            Project, {'name': f'{PROJECT_NAME_PREFIX} {i}', 'genome_version': GENOME_VERSION_GRCh38}, user,
+        ) for i in range(num_projects)
+    ]
+    families = bulk_create_models_from_json(Family, [
+        {'project': project, 'family_id': f'BENCH_{i}'}
+        for project in projects for i in range(families_per_project)
+    ], user)
+    parents = bulk_create_models_from_json(Individual, [
+        {
+            'family': family, 'individual_id': f'BENCH{family.id}_{sex}', 'sex': sex,
+            'affected': Individual.AFFECTED_STATUS_UNAFFECTED,
+        } for family in families for sex in [Individual.SEX_MALE, Individual.SEX_FEMALE]
+    ], user)
+    parents_by_family = defaultdict(dict)
+    for parent in parents:
+        parents_by_family[parent.family_id][parent.sex] = parent
+    probands = bulk_create_models_from_json(Individual, [
+        {
+            'family': family, 'individual_id': f'BENCH{family.id}_P',
+            'sex': Individual.SEX_MALE if i % 2 else Individual.SEX_FEMALE,
+            'affected': Individual.AFFECTED_STATUS_AFFECTED,
+            'father': parents_by_family[family.id][Individual.SEX_MALE],
+            'mother': parents_by_family[family.id][Individual.SEX_FEMALE],
+        } for i, family in enumerate(families)
+    ], user)
+    dataset_types = [Sample.DATASET_TYPE_VARIANT_CALLS]
+    if include_svs:
+        dataset_types.append(Sample.DATASET_TYPE_SV_CALLS)
+    loaded_date = timezone.now()
+    bulk_create_models_from_json(Sample, [
+        {
+            'individual': individual, 'sample_id': individual.individual_id, 'sample_type': SAMPLE_TYPE,
+            'dataset_type': dataset_type, 'is_active': True, 'loaded_date': loaded_date,
+        } for individual in parents + probands for dataset_type in dataset_types
+    ], user)
+
+    # The search dictionaries read from postgres, so need to be reloaded to include the new individuals
+    _reload_individual_dictionaries()
+    return projects
+
+
+def _generate_snv_indel(rng, key, chrom, pos, gene, variant_ids):
+    ref = rng.choice('ACGT')
+    alt = rng.choice([base for base in 'ACGT' if base != ref])
+    if rng.random() < INDEL_RATE:
+        indel = ''.join(rng.choices('ACGT', k=rng.randint(1, 10)))
+        if rng.random() < 0.5:
+            ref += indel
+        else:
+            alt = ref + indel
+    variant_id = f'{chrom}-{pos}-{ref}-{alt}'
+    while variant_id in variant_ids:
+        pos += 1
+        variant_id = f'{chrom}-{pos}-{ref}-{alt}'
+    variant_ids.add(variant_id)
+
+    af = _sample_af(rng, GNOMAD_ABSENT_FRACTION)
+    consequence = rng.choices(list(CONSEQUENCE_WEIGHTS.keys()), weights=CONSEQUENCE_WEIGHTS.values())[0]
+    is_missense = consequence == 'missense_variant'
+    annotation = {
+        'key': key, 'xpos': get_xpos(chrom, pos), 'chrom': chrom, 'pos': pos, 'ref': ref, 'alt': alt,
+        'variant_id': variant_id,
+        'populations': {
+            population: _population_frequencies(af * rng.uniform(0.8, 1.2) if af else 0, an)
+            for population, an in POPULATION_ANS.items()
+        },
+        'predictions': {
+            'cadd': round(rng.uniform(0, 40), 3),
+            'revel': round(rng.random(), 3) if is_missense else None,
+            'splice_ai': round(rng.random() ** 4, 3),
+        },
+        'sorted_transcript_consequences': [{
+            'alphamissensePathogenicity': round(rng.random(), 3) if is_missense else None,
+            'canonical': 1,
+            'consequenceTerms': [consequence],
+            'geneId': gene['gene_id'],
+        }] if gene else [],
+    }
+    # gnomad_genomes is used to set is_gnomad_gt_5_percent, so its af must match the populations field exactly
+    annotation['populations']['gnomad_genomes'] = _population_frequencies(af, POPULATION_ANS['gnomad_genomes'])
+    af = annotation['populations']['gnomad_genomes']['af']
+
+    transcripts = {
+        'key': key,
+        'transcripts': [{
+            'biotype': 'protein_coding',
+            'canonical': 1,
+            'consequenceTerms': [consequence],
+            'geneId': gene['gene_id'],
+            'majorConsequence': consequence,
+            'transcriptId': gene['gene_id'].replace('ENSG', 'ENST'),
+            'transcriptRank': 0,
+        }],
+    } if gene else None
+    return [annotation, transcripts, {'key': key, 'variant_id': variant_id}], af, _snv_indel_call
+
+
+def _snv_indel_call(rng, sample_id, gt):
+    ab = {0: rng.uniform(0, 0.05), 1: rng.uniform(0.3, 0.7), 2: rng.uniform(0.95, 1)}[gt]
+    return {'sampleId': sample_id, 'gt': gt, 'gq': rng.randint(10, 99), 'ab': round(ab, 5), 'dp': rng.randint(10, 60)}
+
+
+def _generate_sv(rng, key, chrom, pos, gene, variant_ids):
+    sv_type = rng.choices(list(SV_TYPE_WEIGHTS.keys()), weights=SV_TYPE_WEIGHTS.values())[0]
+    length = 1 if sv_type == 'INS' else round(10 ** rng.uniform(2, 6))
+    variant_id = f'bench_{sv_type}_chr{chrom}_{key - BENCHMARK_KEY_OFFSET}'
+    variant_ids.add(variant_id)
+
+    af = _sample_af(rng, SV_GNOMAD_ABSENT_FRACTION)
+    gnomad_svs = _population_frequencies(af, POPULATION_ANS['gnomad_genomes'])
+    consequences = SV_GENE_CONSEQUENCES[sv_type]
+    annotation = {
+        'key': key, 'xpos': get_xpos(chrom, pos), 'chrom': chrom, 'pos': pos, 'end': pos + length,
+        'variant_id': variant_id, 'sv_type': sv_type, 'algorithms': 'manta', 'bothsides_support': False,
+        'predictions': {'strvctvre': round(rng.random(), 3)},
+        'populations': {'gnomad_svs': {**gnomad_svs, 'id': f'gnomAD-SV_v3_{variant_id}' if af else ''}},
+        'sorted_gene_consequences': [{
+            'geneId': gene['gene_id'],
+            'majorConsequence': rng.choices(list(consequences.keys()), weights=consequences.values())[0],
+        }] if gene else [],
+    }
+    return [annotation, {'key': key, 'variant_id': variant_id}], gnomad_svs['af'], _sv_call(sv_type)
+
+
+def _sv_call(sv_type):
+    cn_offset = {'DEL': -1, 'DUP': 1}.get(sv_type)
+
+    def _call(rng, sample_id, gt):
+        return {
+            'sampleId': sample_id, 'gt': gt, 'cn': None if cn_offset is None else 2 + cn_offset * gt,
+            'gq': rng.randint(0, 99), 'newCall': False, 'prevCall': True, 'prevNumAlt': None,
+        }
+    return _call
+
+
+
+
+def _variant_position(rng, gene, is_genic):
+    if is_genic:
+        return gene['chrom_grch38'], rng.randint(gene['start_grch38'], gene['end_grch38'])
+    # intergenic variants are placed downstream of a sampled gene, so they follow the same genomic distribution
+    return gene['chrom_grch38'], gene['end_grch38'] + rng.randint(10000, 100000)
+
+
+def _sample_af(rng, absent_fraction):
+    if rng.random() < absent_fraction:
+        return 0
+    # allele frequencies are log-uniform, so most variants seen in the reference population are rare
+    return 10 ** rng.uniform(MIN_LOG_AF, math.log10(MAX_AF))
+
+
+def _population_frequencies(af, an):
+    ac = round(af * an)
+    hom = min(round(af * af * an / 2), ac // 2)
+    af = round(ac / an, 8)
+    return {'ac': ac, 'af': af, 'an': an, 'filter_af': af, 'hemi': 0, 'het': ac - 2 * hom, 'hom': hom}
+
+
+def _carrier_families(rng, families, af):
+    # Every variant is called in at least one family, and each other family carries it with the chance that either
+    # parent has at least one alt allele
+    carrier_indices = {rng.randrange(len(families))}
+    p = 1 - (1 - af) ** 4
+    if p:
+        # skips ahead by geometrically distributed gaps rather than drawing a number for every family
+        i = -1
+        while True:
+            i += 1 if p == 1 else 1 + int(math.log(1 - rng.random()) / math.log(1 - p))
+            if i >= len(families):
+                break
+            carrier_indices.add(i)
+    return [families[i] for i in sorted(carrier_indices)]
+
+
+def _family_genotypes(rng, af, is_de_novo):
+    # Family samples are sorted so the parents are first and the proband is last
+    if is_de_novo:
+        return [0, 0, 1]
+    carrier_gt = 2 if rng.random() < af else 1
+    other_gt = rng.choices([0, 1, 2], weights=[(1 - af) ** 2, 2 * af * (1 - af), af ** 2])[0]
+    parent_gts = [carrier_gt, other_gt]
+    rng.shuffle(parent_gts)
+    return parent_gts + [sum(rng.random() < gt / 2 for gt in parent_gts)]
+
+
+def _insert_rows(model, rows):
+    connection = connections['clickhouse_write']
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, MaterializedUInt8Field)]
+    columns = ', '.join(f'`{field.column}`' for field in fields)
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            # A bare VALUES clause sends the rows to ClickHouse as a native columnar block
+            cursor.execute(f'INSERT INTO `{model._meta.db_table}` ({columns}) VALUES', [
+                [field.get_db_prep_save(_db_value(field, row.get(field.name)), connection) for field in fields]
+                for row in rows[i:i + INSERT_BATCH_SIZE]
+            ])
+
+
+def _db_value(field, value):
+    # Synthetic rows are built as dicts, which are converted to positional tuples in the order of the column's subfields
+    if isinstance(field, NestedField):
+        return [_tuple_value(field.base_fields, item) for item in value or []]
+    if isinstance(field, TupleField):
+        return _tuple_value(field.base_fields, value or {})
+    if isinstance(field, ArrayField):
+        return [_db_value(field.base_field, item) for item in value or []]
+    return value
+
+
+def _tuple_value(base_fields, value):
+    return [_db_value(subfield, value.get(name)) for name, subfield in base_fields]
+
+
+def _refresh_gt_stats(gt_stats_model):
+    table_base = gt_stats_model._meta.db_table.rsplit('/', 1)[0]
+    view_name = f'{table_base}/project_gt_stats_to_gt_stats_mv'
+    with connections['clickhouse_write'].cursor() as cursor:
+        cursor.execute(f'SYSTEM REFRESH VIEW "{view_name}"')
+        cursor.execute(f'SYSTEM WAIT VIEW "{view_name}"')
+        cursor.execute(f'SYSTEM RELOAD DICTIONARY "{table_base}/gt_stats_dict"')
+
+
+def _reload_individual_dictionaries():
+    with connections['clickhouse_write'].cursor() as cursor:
+        for dictionary in ['seqrdb_affected_status_dict', 'seqrdb_sex_dict']:
+            cursor.execute(f'SYSTEM RELOAD DICTIONARY "{dictionary}"')
+
+
+def get_search_catalog(rng, gene_ids, include_svs):
+    searches = deepcopy(SEARCHES)
+    if gene_ids:
+        gene_list = rng.sample(gene_ids, min(GENE_LIST_SIZE, len(gene_ids)))
+        searches['gene_list']['locus'] = {'rawItems': ', '.join(sorted(gene_list))}
+    else:
+        searches.pop('gene_list')
+    if not include_svs:
+        searches.pop('sv')
+    return searches
+
+
+def run_search_benchmark(name, search, families, user, iterations):
+    variant_search = VariantSearch.objects.create(name=f'Benchmark {name}', search=search)
+    latencies = []
+    search_hashes = []
+    errors = []
+    num_results = None
+    try:
+        for _ in range(iterations):
+            # Each iteration is saved as a new search, so results are never loaded from the redis cache
+            results_model = VariantSearchResults.objects.create(
+                variant_search=variant_search, search_hash=f'bench_{uuid4().hex}',
+            )
+            results_model.families.set(families)
+            start = time.perf_counter()
+            try:
+                _, num_results = query_variants(results_model, user=user)
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            search_hashes.append(results_model.search_hash)
+    finally:
+        variant_search.delete()
+
+    runs = [
+        get_search_query_profiles(search_hash=search_hash, limit=MAX_QUERIES_PER_SEARCH, flush_logs=i == 0)
+        for i, search_hash in enumerate(search_hashes)
+    ]
+    return {
+        'numResults': num_results,
+        'latencyMs': _latency_percentiles(latencies),
+        'readRows': _median([sum(profile['readRows'] for profile in profiles) for profiles in runs]),
+        'readBytes': _median([sum(profile['readBytes'] for profile in profiles) for profiles in runs]),
+        'peakMemoryBytes': max((profile['memoryUsage'] for profiles in runs for profile in profiles), default=None),
+        'numQueries': _median([len(profiles) for profiles in runs]),
+        'errors': errors,
+    }
+
+
+def _latency_percentiles(latencies):
+    if not latencies:
+        return {key: None for key in ['min', 'p50', 'p90', 'p99', 'max']}
+    latencies = sorted(latencies)
+    summary = {'min': latencies[0], 'max': latencies[-1]}
+    for percentile in [50, 90, 99]:
+        # nearest-rank percentiles, so each reported value is an actual measured latency
+        summary[f'p{percentile}'] = latencies[math.ceil(percentile / 100 * len(latencies)) - 1]
+    return {key: round(value, 1) for key, value in summary.items()}
+
+
+def _median(values):
+    return int(median(values)) if values else None
+
+
+def compare_reports(report, previous):
+    if report['config'] != previous.get('config'):
+        logger.warning('Benchmark configs differ, so results may not be comparable')
+    logger.info(f'Comparing to {previous.get("label") or previous.get("createdAt")}')
+    for name, summary in report['searches'].items():
+        previous_summary = previous.get('searches', {}).get(name)
+        if not previous_summary:
+            continue
+        logger.info(
+            f'{name}: p50 {_format_change(previous_summary["latencyMs"]["p50"], summary["latencyMs"]["p50"], "ms")}, '
+            f'rows read {_format_change(previous_summary["readRows"], summary["readRows"])}, '
+            f'peak memory {_format_change(previous_summary["peakMemoryBytes"], summary["peakMemoryBytes"], " bytes")}'
+        )
+
+
+def _format_change(previous, current, unit=''):
+    change = f'{previous}{unit} -> {current}{unit}'
+    if previous and current is not None:
+        change += f' ({(current - previous) / previous * 100:+.1f}%)'
+    return change
+
+
+def delete_synthetic_data(projects, user):
+    for project in projects:
+        delete_clickhouse_project(project, Sample.DATASET_TYPE_VARIANT_CALLS)
+        delete_clickhouse_project(project, Sample.DATASET_TYPE_SV_CALLS, Sample.SAMPLE_TYPE_WGS)
+    with connections['clickhouse_write'].cursor() as cursor:
+        for model in [AnnotationsSnvIndel, TranscriptsSnvIndel, KeyLookupSnvIndel, AnnotationsSv, KeyLookupSv]:
+            cursor.execute(f'DELETE FROM `{model._meta.db_table}` WHERE key >= %s', [BENCHMARK_KEY_OFFSET])
+
+    Sample.bulk_delete(user, individual__family__project__in=projects)
+    Individual.bulk_delete(user, family__project__in=projects)
+    Family.bulk_delete(user, project__in=projects)
+    for project in projects:
+        project.delete_model(user, user_can_delete=True)
+        # project deletion removes the permission groups created with the project, but not its subscribers group
+        project.subscribers.delete()
+    _reload_individual_dictionaries()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from clickhouse_search.query_profiling import get_search_query_profiles
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'List the slowest recent ClickHouse search queries with their resource usage and SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search-hash', help='Only list queries for this search')
+        parser.add_argument('--hours', type=int, default=24, help='Only list queries run in the last number of hours')
+        parser.add_argument('--limit', type=int, default=20, help='Number of queries to list')
+        parser.add_argument('--show-sql', action='store_true', help='Include the full SQL for each query')
+
+    def handle(self, *args, **options):
+        profiles = get_search_query_profiles(
+            search_hash=options['search_hash'], lookback_hours=options['hours'], limit=options['limit'],
+            flush_logs=True,
+        )
+        logger.info(f'Found {len(profiles)} search queries')
+        for profile in profiles:
+            tags = ', '.join(f'{k}={v}' for k, v in sorted(profile['tags'].items()))
+            logger.info(
+                f'{profile["durationMs"]} ms: {profile["readRows"]} rows ({profile["readBytes"]} bytes) read, '
+                f'{profile["memoryUsage"]} bytes peak memory, {profile["resultRows"]} results ({tags})'
+            )
+            if options['show_sql']:
+                logger.info(profile['sql'])
@@ -0,0 +1,109 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import json
+import mock
+import os
+import tempfile
+
+from clickhouse_search.models import AnnotationsSnvIndel, EntriesSnvIndel, EntriesSv
+from clickhouse_search.search_tests import ClickhouseSearchTestCase
+from seqr.models import Project, Family, SearchToken, VariantSearch
+
+SEARCHES = ['comp_het', 'de_novo', 'gene_list', 'rare_recessive', 'sv']
+
+
+class BenchmarkClickhouseSearchTest(ClickhouseSearchTestCase):
+    databases = '__all__'
+    fixtures = ['users', '1kg_project', 'reference_data']
+
+    @mock.patch('seqr.utils.redis_utils.redis.StrictRedis')
+    @mock.patch('clickhouse_search.management.commands.benchmark_clickhouse_search.logger')
+    def test_command(self, mock_logger, mock_redis):
+        mock_redis.return_value.get.return_value = None
+        args = [
+            '--allow-database-writes', '--projects', '2', '--families-per-project', '3', '--variants', '500', '--svs', '50', '--iterations', '2',
+        ]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, 'report.json')
+            call_command('benchmark_clickhouse_search', *args, '--label', 'base', '--output', output)
+            with open(output) as f:
+                report = json.load(f)
+
+            logs = [call.args[0] for call in mock_logger.info.call_args_list]
+            self.assertEqual(len(logs), 7)
+            self.assertRegex(
+                logs[0], r'^Created 2 projects and 6 families with 500 variants and 50 SVs in [\d.]+s$',
+            )
+            for log, name in zip(logs[1:6], ['rare_recessive', 'de_novo', 'comp_het', 'gene_list', 'sv']):
+                self.assertRegex(
+                    log, rf'^{name}: \d+ results \(p50 [\d.]+ms, p90 [\d.]+ms, max [\d.]+ms\), \d+ rows read, '
+                         r'\d+ bytes peak memory, 0 errors$',
+                )
+            self.assertEqual(logs[6], f'Wrote report to {output}')
+
+            self.assertEqual(report['label'], 'base')
+            self.assertDictEqual(report['config'], {
+                'projects': 2, 'familiesPerProject': 3, 'variants': 500, 'svs': 50, 'iterations': 2, 'seed': 0,
+            })
+            self.assertListEqual(sorted(report['searches'].keys()), SEARCHES)
+            for summary in report['searches'].values():
+                self.assertListEqual(summary['errors'], [])
+                latency = summary['latencyMs']
+                self.assertListEqual(sorted(latency.keys()), ['max', 'min', 'p50', 'p90', 'p99'])
+                self.assertTrue(latency['min'] <= latency['p50'] <= latency['p90'] <= latency['p99'] <= latency['max'])
+                self.assertGreater(summary['numQueries'], 0)
+                self.assertGreater(summary['readRows'], 0)
+                self.assertGreater(summary['peakMemoryBytes'], 0)
+
+            # synthetic data and searches are deleted
+            self.assertFalse(Project.objects.filter(name__startswith='Search benchmark project').exists())
+            self.assertFalse(Family.objects.filter(family_id__startswith='BENCH_').exists())
+            self.assertFalse(SearchToken.objects.filter(token__startswith='bench').exists())
+            self.assertFalse(EntriesSnvIndel.objects.filter(project_guid__contains='search_benchmark_project').exists())
+            self.assertFalse(EntriesSv.objects.filter(project_guid__contains='search_benchmark_project').exists())
+            self.assertFalse(AnnotationsSnvIndel.objects.filter(key__gte=3000000000).exists())
+            self.assertFalse(VariantSearch.objects.filter(name__startswith='Benchmark').exists())
+
+            # the same seed generates the same data, and results are compared to the previous report
+            mock_logger.reset_mock()
+            compare_output = os.path.join(temp_dir, 'compare_report.json')
+            call_command(
+                'benchmark_clickhouse_search', *args, '--search', 'de_novo', '--output', compare_output,
+                '--compare-to', output,
+            )
+            with open(compare_output) as f:
+                compare_report = json.load(f)
+
+        self.assertListEqual(list(compare_report['searches'].keys()), ['de_novo'])
+        self.assertEqual(
+            compare_report['searches']['de_novo']['numResults'], report['searches']['de_novo']['numResults'],
+        )
+        mock_logger.warning.assert_not_called()
+        logs = [call.args[0] for call in mock_logger.info.call_args_list]
+        self.assertEqual(len(logs), 5)
+        self.assertEqual(logs[3], 'Comparing to base')
+        self.assertRegex(
+            logs[4], r'^de_novo: p50 [\d.]+ms -> [\d.]+ms \([+-][\d.]+%\), rows read \d+ -> \d+ \([+-][\d.]+%\), '
+                     r'peak memory \d+ bytes -> \d+ bytes \([+-][\d.]+%\)$',
+        )
+
+    @mock.patch('clickhouse_search.management.commands.benchmark_clickhouse_search.create_synthetic_data')
+    def test_database_write_guard(self, mock_create_synthetic_data):
+        with self.assertRaises(CommandError) as ce:
+            call_command('benchmark_clickhouse_search')
+        self.assertEqual(
+            str(ce.exception), 'This benchmark writes synthetic data to the configured postgres and ClickHouse '
+                               'databases. Run against a local or dev database, and pass --allow-database-writes to '
+                               'confirm',
+        )
+        mock_create_synthetic_data.assert_not_called()
+
+        with mock.patch('clickhouse_search.management.commands.benchmark_clickhouse_search.DEPLOYMENT_TYPE', 'prod'):
+            with self.assertRaises(CommandError) as ce:
+                call_command('benchmark_clickhouse_search', '--allow-database-writes')
+        self.assertEqual(
+            str(ce.exception), 'Refusing to write synthetic benchmark data to a production deployment. Run against a '
+                               'local or dev database, or pass --allow-production to override',
+        )
+        mock_create_synthetic_data.assert_not_called()
+        self.assertFalse(Project.objects.filter(name__startswith='Search benchmark project').exists())
@@ -0,0 +1,45 @@
+from django.core.management import call_command
+from django.test import TestCase
+import mock
+
+PROFILES = [
+    {
+        'queryId': 'seqr_search:abc123:SNV_INDEL:search:1234', 'durationMs': 1520, 'readRows': 1000000,
+        'readBytes': 52000000, 'resultRows': 12, 'memoryUsage': 250000000, 'sql': 'SELECT * FROM entries',
+        'tags': {'searchHash': 'abc123', 'datasetType': 'SNV_INDEL', 'role': 'search', 'numFamilies': 3},
+        'profileEvents': {'SelectedRows': 1000000},
+    },
+    {
+        'queryId': 'seqr_search:abc123::transcripts:5678', 'durationMs': 30, 'readRows': 120, 'readBytes': 4000,
+        'resultRows': 12, 'memoryUsage': 1000000, 'sql': 'SELECT * FROM transcripts',
+        'tags': {'searchHash': 'abc123', 'role': 'transcripts'}, 'profileEvents': {},
+    },
+]
+
+
+@mock.patch('clickhouse_search.management.commands.profile_search_queries.logger')
+@mock.patch('clickhouse_search.management.commands.profile_search_queries.get_search_query_profiles')
+class ProfileSearchQueriesTest(TestCase):
+
+    def test_command(self, mock_get_profiles, mock_logger):
+        mock_get_profiles.return_value = PROFILES
+        call_command('profile_search_queries')
+        mock_get_profiles.assert_called_with(search_hash=None, lookback_hours=24, limit=20, flush_logs=True)
+        mock_logger.info.assert_has_calls([
+            mock.call('Found 2 search queries'),
+            mock.call('1520 ms: 1000000 rows (52000000 bytes) read, 250000000 bytes peak memory, 12 results '
+                      '(datasetType=SNV_INDEL, numFamilies=3, role=search, searchHash=abc123)'),
+            mock.call('30 ms: 120 rows (4000 bytes) read, 1000000 bytes peak memory, 12 results '
+                      '(role=transcripts, searchHash=abc123)'),
+        ])
+        self.assertEqual(mock_logger.info.call_count, 3)
+
+        mock_logger.reset_mock()
+        mock_get_profiles.return_value = PROFILES[:1]
+        call_command('profile_search_queries', '--search-hash=abc123', '--hours=2', '--limit=1', '--show-sql')
+        mock_get_profiles.assert_called_with(search_hash='abc123', lookback_hours=2, limit=1, flush_logs=True)
+        mock_logger.info.assert_has_calls([
+            mock.call('Found 1 search queries'),
+            mock.call(mock.ANY),
+            mock.call('SELECT * FROM entries'),
+        ])
@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+import json
+from uuid import uuid4
+
+SEARCH_QUERY_ID_PREFIX = 'seqr_search'
+QUERY_ID_TAGS = ['searchHash', 'datasetType', 'role']
+
+QUERY_LOG_FIELDS = {
+    'queryId': 'query_id',
+    'eventTime': 'event_time',
+    'durationMs': 'query_duration_ms',
+    'readRows': 'read_rows',
+    'readBytes': 'read_bytes',
+    'resultRows': 'result_rows',
+    'memoryUsage': 'memory_usage',
+    'logComment': 'log_comment',
+    'sql': 'query',
+    'profileEvents': 'ProfileEvents',
+}
+
+_search_query_tags = ContextVar('search_query_tags', default=None)
+
+
+@contextmanager
+def search_query_tags(**tags):
+    """Tags all search queries run within the block with a structured query_id and log_comment, so their resource
+    usage can be looked up in system.query_log. Nested blocks add to the tags of the enclosing block"""
+    parent_tags = _search_query_tags.get()
+    token = _search_query_tags.set({**(parent_tags or {}), **tags})
+    try:
+        if parent_tags is None:
+            with connections['clickhouse'].execute_wrapper(_tag_search_query):
+                yield
+        else:
+            yield
+    finally:
+        _search_query_tags.reset(token)
+
+
+def _tag_search_query(execute, sql, params, many, context):
+    tags = _search_query_tags.get() or {}
+    query_id = ':'.join([SEARCH_QUERY_ID_PREFIX] + [str(tags.get(tag) or '') for tag in QUERY_ID_TAGS] + [uuid4().hex])
+    cursor = context['cursor'].cursor
+    cursor.set_query_id(query_id)
+    cursor.set_settings({
+        **(getattr(cursor, '_settings', None) or {}),
+        'log_comment': json.dumps({k: v for k, v in tags.items() if v is not None}, sort_keys=True),
+    })
+    return execute(sql, params, many, context)
+
+
+def get_search_query_profiles(search_hash=None, lookback_hours=24, limit=20, flush_logs=False):
+    """Returns the slowest recently completed search queries, with their resource usage from system.query_log"""
+    conditions = [
+        "type = 'QueryFinish'",
+        'event_date >= toDate(now() - toIntervalHour(%s))',
+        'event_time >= now() - toIntervalHour(%s)',
+        'startsWith(query_id, %s)',
+    ]
+    params = [lookback_hours, lookback_hours, f'{SEARCH_QUERY_ID_PREFIX}:']
+    if search_hash:
+        conditions.append("JSONExtractString(log_comment, 'searchHash') = %s")
+        params.append(search_hash)
+    params.append(limit)
+
+    with connections['clickhouse_write'].cursor() as cursor:
+        if flush_logs:
+            # The query log is otherwise only written to the table periodically
+            cursor.execute('SYSTEM FLUSH LOGS')
+        cursor.execute(
+            f'SELECT {", ".join(QUERY_LOG_FIELDS.values())} FROM system.query_log WHERE {" AND ".join(conditions)} '
+            'ORDER BY query_duration_ms DESC LIMIT %s',
+            params,
+        )
+        rows = cursor.fetchall()
+
+    profiles = []
+    for row in rows:
+        profile = dict(zip(QUERY_LOG_FIELDS.keys(), row))
+        profile['tags'] = json.loads(profile.pop('logComment') or '{}')
+        profile['profileEvents'] = dict(profile['profileEvents'] or {})
+        profiles.append(profile)
+    return profiles
@@ -12,6 +12,7 @@ from clickhouse_search.backend.functions import Array, ArrayFilter, ArrayInterse
     ArrayMap
 from clickhouse_search.models import ENTRY_CLASS_MAP, ANNOTATIONS_CLASS_MAP, TRANSCRIPTS_CLASS_MAP, KEY_LOOKUP_CLASS_MAP, \
     BaseClinvar, BaseAnnotationsMitoSnvIndel, BaseAnnotationsGRCh37SnvIndel, BaseAnnotationsSvGcnv
+from clickhouse_search.query_profiling import search_query_tags
 from reference_data.models import GeneConstraint, Omim, GENOME_VERSION_LOOKUP
 from seqr.models import Sample, PhenotypePrioritization, Individual
 from seqr.utils.logging_utils import SeqrLogger
@@ -51,7 +52,8 @@ def get_clickhouse_variants(samples, search, user, previous_search_results, geno
 
         dataset_results = []
         if inheritance_mode != COMPOUND_HET:
-            dataset_results += _get_search_results(genome_version, dataset_type, sample_data, exclude_keys=exclude_keys.get(dataset_type), **search)
+            with search_query_tags(datasetType=dataset_type, role='search', numFamilies=sample_data['num_families']):
+                dataset_results += _get_search_results(genome_version, dataset_type, sample_data, exclude_keys=exclude_keys.get(dataset_type), **search)
 
         run_x_linked_male_search = has_x_linked and not (inheritance_mode == X_LINKED_RECESSIVE and sample_data.get('samples'))
         if run_x_linked_male_search:
@@ -62,17 +64,21 @@ def get_clickhouse_variants(samples, search, user, previous_search_results, geno
                 x_linked_sample_data = _affected_male_families(sample_data, affected_male_family_guids)
                 x_linked_search = {**search, 'inheritance_mode': X_LINKED_RECESSIVE_MALE_AFFECTED}
                 logger.info(f'Loading {dataset_type} X-linked male data for {x_linked_sample_data["num_families"]} families', user)
-                dataset_results += _get_search_results(
-                    genome_version, dataset_type, x_linked_sample_data, exclude_keys=exclude_keys.get(dataset_type),
-                    **x_linked_search,
-                )
+                with search_query_tags(
+                    datasetType=dataset_type, role='x_linked_male', numFamilies=x_linked_sample_data['num_families'],
+                ):
+                    dataset_results += _get_search_results(
+                        genome_version, dataset_type, x_linked_sample_data, exclude_keys=exclude_keys.get(dataset_type),
+                        **x_linked_search,
+                    )
 
         if has_comp_het:
             comp_het_sample_data = sample_data
             if has_x_chrom_comp_het and 'affected_male_family_guids' in sample_data and dataset_type == Sample.DATASET_TYPE_VARIANT_CALLS:
                 comp_het_sample_data = _no_affected_male_families(sample_data, user)
             result_q = get_data_type_comp_het_results_queryset(genome_version, dataset_type, comp_het_sample_data, exclude_key_pairs=exclude_key_pairs.get(dataset_type), **search)
-            dataset_results += _evaluate_results(result_q, is_comp_het=True)
+            with search_query_tags(datasetType=dataset_type, role='comp_het', numFamilies=comp_het_sample_data['num_families']):
+                dataset_results += _evaluate_results(result_q, is_comp_het=True)
 
         if 'samples' not in sample_data:
             add_individual_guids(dataset_results, samples)
@@ -88,7 +94,8 @@ def get_clickhouse_variants(samples, search, user, previous_search_results, geno
 
     logger.info(f'Total results: {cache_results["total_results"]}', user)
 
-    return format_clickhouse_results(cache_results['all_results'][(page-1)*num_results:page*num_results], genome_version)
+    with search_query_tags(role='transcripts'):
+        return format_clickhouse_results(cache_results['all_results'][(page-1)*num_results:page*num_results], genome_version)
 
 def get_search_queryset(genome_version, dataset_type, sample_data, **search_kwargs):
     entry_cls = ENTRY_CLASS_MAP[genome_version][dataset_type]
@@ -155,7 +162,11 @@ def _get_multi_data_type_comp_het_results(genome_version, samples, sample_data_b
             exclude_key_pairs=exclude_key_pairs.get(f'{Sample.DATASET_TYPE_VARIANT_CALLS},{sv_dataset_type}'),
             annotations=annotations, **search_kwargs,
         )
-        dataset_results = _evaluate_results(result_q, is_comp_het=True)
+        with search_query_tags(
+            datasetType=f'{Sample.DATASET_TYPE_VARIANT_CALLS},{sv_dataset_type}', role='multi_data_type_comp_het',
+            numFamilies=len(families),
+        ):
+            dataset_results = _evaluate_results(result_q, is_comp_het=True)
         if not sv_sample_data['samples']:
             add_individual_guids(dataset_results, samples)
         results += dataset_results
@@ -774,15 +785,29 @@ def get_clickhouse_variant_by_id(variant_id, samples, genome_version, dataset_ty
 
 
 def get_clickhouse_genotypes(project_guid, family_guids, genome_version, dataset_type, keys, samples):
+    return {
+        key: _clickhouse_genotypes_json(genotypes) for key, genotypes in _get_genotypes_queryset(
+            project_guid, family_guids, genome_version, dataset_type, keys, samples,
+        ).values_list('key', 'genotypes')
+    }
+
+
+def get_clickhouse_family_genotypes(project_guid, family_guids, genome_version, dataset_type, keys, samples):
+    """Gets the genotypes for multiple families in a single query, keyed by family guid and variant key"""
+    return {
+        (family_guid, key): _clickhouse_genotypes_json(genotypes) for family_guid, key, genotypes in _get_genotypes_queryset(
+            project_guid, family_guids, genome_version, dataset_type, keys, samples,
+        ).values_list('family_guid', 'key', 'genotypes')
+    }
+
+
+def _get_genotypes_queryset(project_guid, family_guids, genome_version, dataset_type, keys, samples):
     sample_data = _get_sample_data(samples.filter(individual__family__guid__in=family_guids))[dataset_type]
     entries = ENTRY_CLASS_MAP[genome_version][dataset_type].objects.filter(
         project_guid=project_guid, family_guid__in=family_guids, key__in=keys,
     )
     gt_field, gt_expr = entries.genotype_expression(sample_data)
-    return {
-        key: _clickhouse_genotypes_json(genotypes) for key, genotypes in
-        entries.annotate(**{gt_field: gt_expr}).values_list('key', 'genotypes')
-    }
+    return entries.annotate(**{gt_field: gt_expr})
 
 
 def _clickhouse_genotypes_json(genotypes):
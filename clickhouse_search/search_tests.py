@@ -6,6 +6,7 @@ from django.urls.base import reverse
 import json
 import mock
 import responses
+from uuid import uuid4
 
 from clickhouse_search.models import EntriesSnvIndel, ProjectGtStatsSnvIndel, AnnotationsSnvIndel
 from clickhouse_search.test_utils import VARIANT1, VARIANT2, VARIANT3, VARIANT4, CACHED_CONSEQUENCES_BY_KEY, \
@@ -24,7 +25,7 @@ from reference_data.models import Omim
 from seqr.models import Project, Family, Sample, VariantSearch, VariantSearchResults
 from seqr.utils.search.search_utils_tests import SearchTestHelper
 from seqr.utils.search.utils import query_variants, variant_lookup, get_variant_query_gene_counts, get_single_variant, InvalidSearchException
-from seqr.views.apis.data_manager_api import trigger_delete_project
+from seqr.views.apis.data_manager_api import trigger_delete_project, search_query_profiles
 from seqr.views.utils.json_utils import DjangoJSONEncoderWithSets
 from seqr.views.utils.test_utils import AnvilAuthenticationTestMixin
 from seqr.views.apis.variant_search_api import gene_variant_lookup
@@ -121,6 +122,43 @@ class ClickhouseSearchTests(SearchTestHelper, ClickhouseSearchTestCase):
 
     def _reset_search_families(self):
         self.results_model.families.set(self.families)
+    def test_search_query_profiles(self):
+        url = reverse(search_query_profiles)
+        self.check_data_manager_login(url)
+
+        # The query log is shared across test runs, so use a unique search hash
+        search_hash = uuid4().hex
+        self.results_model.search_hash = search_hash
+        self.results_model.save()
+        self._set_single_family_search()
+        query_variants(self.results_model, user=self.user)
+
+        with connections['clickhouse_write'].cursor() as cursor:
+            cursor.execute('SYSTEM FLUSH LOGS')
+        response = self.client.get(f'{url}?searchHash={search_hash}&limit=100')
+        self.assertEqual(response.status_code, 200)
+        queries = response.json()['queries']
+        self.assertSetEqual({query['tags']['searchHash'] for query in queries}, {search_hash})
+        self.assertListEqual(
+            [query['durationMs'] for query in queries], sorted([query['durationMs'] for query in queries], reverse=True),
+        )
+
+        search_queries = [query for query in queries if query['tags']['role'] == 'search']
+        self.assertIn('SNV_INDEL', {query['tags']['datasetType'] for query in search_queries})
+        snv_indel_query = next(query for query in search_queries if query['tags']['datasetType'] == 'SNV_INDEL')
+        self.assertDictEqual(snv_indel_query['tags'], {
+            'searchHash': search_hash, 'datasetType': 'SNV_INDEL', 'role': 'search', 'numFamilies': 1,
+        })
+        self.assertTrue(snv_indel_query['queryId'].startswith(f'seqr_search:{search_hash}:SNV_INDEL:search:'))
+        self.assertGreater(snv_indel_query['readRows'], 0)
+        self.assertGreater(snv_indel_query['memoryUsage'], 0)
+        self.assertIn('SELECT', snv_indel_query['sql'])
+        self.assertIn('SelectedRows', snv_indel_query['profileEvents'])
+
+        response = self.client.get(f'{url}?searchHash={uuid4().hex}')
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(response.json()['queries'], [])
+
 
     def _set_grch37_search(self):
         Project.objects.filter(id=1).update(genome_version='37')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+import logging
+from tqdm import tqdm
+
+from matchmaker.matchmaker_utils import update_mme_submission_phenotypes, update_mme_phenotype_frequencies
+from matchmaker.models import MatchmakerSubmission
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the HPO term index used for phenotype matching of Matchmaker submissions'
+
+    def handle(self, *args, **options):
+        submissions = MatchmakerSubmission.objects.filter(deleted_date__isnull=True)
+        logger.info('Reindexing phenotypes for {} submissions'.format(len(submissions)))
+        for submission in tqdm(submissions):
+            update_mme_submission_phenotypes(submission, update_frequencies=False)
+        update_mme_phenotype_frequencies()
+        logger.info('Done')
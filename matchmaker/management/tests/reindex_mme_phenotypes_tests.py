@@ -0,0 +1,36 @@
+from django.core.management import call_command
+from django.test import TestCase
+import mock
+
+from matchmaker.models import MatchmakerSubmission, MatchmakerSubmissionPhenotypes, MatchmakerPhenotypeFrequencies
+
+
+class ReindexMmePhenotypesTest(TestCase):
+    databases = ['default', 'reference_data']
+    fixtures = ['users', '1kg_project', 'reference_data']
+
+    @mock.patch('matchmaker.management.commands.reindex_mme_phenotypes.logger.info')
+    def test_command(self, mock_logger):
+        MatchmakerSubmissionPhenotypes.objects.all().delete()
+        MatchmakerSubmission.objects.filter(id=3).update(features=[
+            {'id': 'HP:0003273', 'observed': 'yes'}, {'id': 'HP:0001631', 'observed': 'no'},
+        ])
+
+        call_command('reindex_mme_phenotypes')
+        mock_logger.assert_has_calls([
+            mock.call('Reindexing phenotypes for 4 submissions'),
+            mock.call('Done'),
+        ])
+
+        self.assertSetEqual(set(MatchmakerSubmissionPhenotypes.objects.values_list(
+            'matchmaker_submission_id', 'hpo_id', 'ancestor_hpo_id')), {
+            (1, 'HP:0001252', 'HP:0001252'), (1, 'HP:0001252', 'HP:0011458'), (1, 'HP:0012469', 'HP:0012469'),
+            (2, 'HP:0001252', 'HP:0001252'), (2, 'HP:0001252', 'HP:0011458'), (2, 'HP:0002017', 'HP:0002017'),
+            (2, 'HP:0002017', 'HP:0011458'), (3, 'HP:0003273', 'HP:0003273'), (3, 'HP:0003273', 'HP:0008800'),
+        })
+
+        frequencies = MatchmakerPhenotypeFrequencies.objects.get()
+        self.assertEqual(frequencies.num_submissions, 3)
+        self.assertDictEqual(frequencies.term_counts, {
+            'HP:0001252': 2, 'HP:0011458': 2, 'HP:0012469': 1, 'HP:0002017': 1, 'HP:0003273': 1, 'HP:0008800': 1,
+        })
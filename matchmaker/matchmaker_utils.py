@@ -1,11 +1,13 @@
 import logging
+import math
 from collections import defaultdict
 from copy import deepcopy
-from datetime import datetime
-from django.db.models import prefetch_related_objects, Q, F
+from django.db.models import Q, F, Count, Prefetch
+from django.utils import timezone
 
 from reference_data.models import HumanPhenotypeOntology, GENOME_VERSION_LOOKUP
-from matchmaker.models import MatchmakerSubmission, MatchmakerIncomingQuery, MatchmakerResult
+from matchmaker.models import MatchmakerSubmission, MatchmakerIncomingQuery, MatchmakerResult, \
+    MatchmakerSubmissionGenes, MatchmakerSubmissionPhenotypes, MatchmakerPhenotypeFrequencies, MatchmakerMetrics
 from seqr.utils.gene_utils import get_genes, get_gene_ids_for_gene_symbols, get_filtered_gene_ids
 from seqr.utils.xpos_utils import get_chrom_pos
 from seqr.views.utils.json_to_orm_utils import create_model_from_json
@@ -13,6 +15,8 @@ from settings import MME_DEFAULT_CONTACT_INSTITUTION
 
 logger = logging.getLogger(__name__)
 
+MIN_PHENOTYPE_SCORE = 0.65
+
 
 def get_mme_genes_phenotypes_for_results(results, additional_genes=None, additional_hpo_ids=None):
     hpo_ids = additional_hpo_ids if additional_hpo_ids else set()
@@ -48,6 +52,40 @@ def get_hpo_terms_by_id(hpo_ids):
     return {hpo.hpo_id: hpo.name for hpo in HumanPhenotypeOntology.objects.filter(hpo_id__in=hpo_ids)}
 
 
+def get_hpo_ancestors(hpo_ids):
+    """Returns a mapping of each of the given HPO terms to the set containing the term and all of its ancestors"""
+    return HumanPhenotypeOntology.get_ancestors(hpo_ids)
+
+
+def update_mme_submission_phenotypes(submission, update_frequencies=True):
+    submission.matchmakersubmissionphenotypes_set.all().delete()
+    observed_hpo_ids = {
+        feature['id'] for feature in (submission.features or [])
+        if feature.get('id') and feature.get('observed', 'yes') == 'yes'
+    }
+    MatchmakerSubmissionPhenotypes.objects.bulk_create([
+        MatchmakerSubmissionPhenotypes(matchmaker_submission=submission, hpo_id=hpo_id, ancestor_hpo_id=ancestor_id)
+        for hpo_id, ancestor_ids in get_hpo_ancestors(observed_hpo_ids).items() for ancestor_id in sorted(ancestor_ids)
+    ])
+    if update_frequencies:
+        update_mme_phenotype_frequencies()
+
+
+def update_mme_phenotype_frequencies():
+    """
+    Precomputes the frequency of each HPO term among all active submissions, where a submission is annotated with a term
+    if it is annotated with the term or any of its descendants. Should be rerun whenever the phenotype index changes
+    """
+    indexed_phenotypes = MatchmakerSubmissionPhenotypes.objects.filter(matchmaker_submission__deleted_date__isnull=True)
+    term_counts = indexed_phenotypes.values('ancestor_hpo_id').annotate(
+        count=Count('matchmaker_submission_id', distinct=True)).values_list('ancestor_hpo_id', 'count')
+    frequencies, _ = MatchmakerPhenotypeFrequencies.objects.update_or_create(id=1, defaults={
+        'num_submissions': indexed_phenotypes.values('matchmaker_submission_id').distinct().count(),
+        'term_counts': dict(term_counts),
+    })
+    return frequencies
+
+
 def _get_patient_features(result):
     return deepcopy(result['patient'].get('features')) or []
 
@@ -174,7 +212,7 @@ def get_submission_json_for_external_match(submission, score=None, genomic_featu
 
 def _submission_genes_to_external_genomic_features(submission):
     individual = submission.individual
-    submission_genes = submission.matchmakersubmissiongenes_set.all().order_by('gene_id').select_related('saved_variant')
+    submission_genes = sorted(submission.matchmakersubmissiongenes_set.all(), key=lambda submission_gene: submission_gene.gene_id)
 
     return [
         _submission_gene_to_external_genomic_features(submission_gene, individual)
@@ -220,6 +258,8 @@ def get_mme_matches(patient_data, origin_request_host=None, user=None, originati
         feature['id'] for feature in _get_patient_features(patient_data) if
         feature.get('observed', 'yes') == 'yes' and feature['id'] in hpo_terms_by_id
     ]
+    feature_ancestors = get_hpo_ancestors(feature_ids)
+    hpo_information_content = _get_hpo_information_content(set().union(*feature_ancestors.values()))
 
     match_q = None
     if genomic_features:
@@ -228,31 +268,42 @@ def get_mme_matches(patient_data, origin_request_host=None, user=None, originati
                 feature['gene_ids'] = get_gene_ids_for_feature(feature, gene_symbols_to_ids)
             match_q = Q(matchmakersubmissiongenes__gene_id__in=genes_by_id.keys())
     elif feature_ids:
-        match_q = Q(features__contains=[{'id': feature_ids[0], 'observed': 'yes'}])
-        for feature_id in feature_ids[1:]:
-            match_q |= Q(features__contains=[{'id': feature_id, 'observed': 'yes'}])
+        match_q = Q(matchmakersubmissionphenotypes__ancestor_hpo_id__in=_get_candidate_hpo_ids(
+            feature_ancestors, hpo_information_content))
 
     if not match_q:
         return [], _create_incoming_query(patient_data, origin_request_host, user)
 
     query_patient_id = patient_data['patient']['id']
     matches = MatchmakerSubmission.objects.filter(
-        match_q, deleted_date__isnull=True).exclude(submission_id=query_patient_id)
+        match_q, deleted_date__isnull=True).exclude(submission_id=query_patient_id).distinct().select_related(
+        'individual__family__project').prefetch_related(Prefetch(
+        'matchmakersubmissiongenes_set', queryset=MatchmakerSubmissionGenes.objects.select_related('saved_variant')))
 
     match_genomic_features = {match: _submission_genes_to_external_genomic_features(match) for match in matches}
+    match_phenotypes = defaultdict(lambda: defaultdict(set))
+    if feature_ids:
+        match_phenotype_q = MatchmakerSubmissionPhenotypes.objects.filter(
+            matchmaker_submission__in=[match.id for match in match_genomic_features])
+        for submission_id, hpo_id, ancestor_id in match_phenotype_q.values_list(
+                'matchmaker_submission_id', 'hpo_id', 'ancestor_hpo_id'):
+            match_phenotypes[submission_id][hpo_id].add(ancestor_id)
 
     scored_matches = _get_matched_submissions(
         matches,
         get_match_genotype_score=lambda match: _get_genotype_score(genomic_features, match_genomic_features[match]) if genomic_features else 0,
-        get_match_phenotype_score=lambda match: _get_phenotype_score(feature_ids, match) if feature_ids else 0,
+        get_match_phenotype_score=lambda match: _get_phenotype_score(
+            feature_ancestors, hpo_information_content, match, match_phenotypes[match.id]) if feature_ids else 0,
     )
 
     incoming_query = _create_incoming_query(
         patient_data, origin_request_host, user, patient_id=query_patient_id if scored_matches else None)
 
-    prefetch_related_objects(list(scored_matches.keys()), 'matchmakerresult_set', 'matchmakersubmissiongenes_set', 'individual')
+    previously_matched_submission_ids = set(MatchmakerResult.objects.filter(
+        submission__in=scored_matches.keys(), result_data__patient__id=query_patient_id,
+    ).values_list('submission_id', flat=True))
     for match_submission in scored_matches.keys():
-        if not match_submission.matchmakerresult_set.filter(result_data__patient__id=query_patient_id):
+        if match_submission.id not in previously_matched_submission_ids:
             create_model_from_json( MatchmakerResult, {
                 'submission': match_submission,
                 'originating_submission': originating_submission,
@@ -269,11 +320,19 @@ def get_mme_matches(patient_data, origin_request_host=None, user=None, originati
 
 
 def _create_incoming_query(patient_data, origin_request_host, user, patient_id=None):
-    return create_model_from_json(MatchmakerIncomingQuery, {
+    is_new_matched_patient = patient_id and not MatchmakerIncomingQuery.objects.filter(patient_id=patient_id).exists()
+    incoming_query = create_model_from_json(MatchmakerIncomingQuery, {
         'institution': patient_data['patient']['contact'].get('institution') or origin_request_host,
         'patient_id': patient_id,
     }, user)
 
+    metrics_update = {'number_of_requests_received': F('number_of_requests_received') + 1}
+    if is_new_matched_patient:
+        metrics_update['number_of_potential_matches_sent'] = F('number_of_potential_matches_sent') + 1
+    MatchmakerMetrics.objects.update(**metrics_update)
+
+    return incoming_query
+
 
 def _get_matched_submissions(matches, get_match_genotype_score, get_match_phenotype_score):
     scored_matches = {}
@@ -281,7 +340,7 @@ def _get_matched_submissions(matches, get_match_genotype_score, get_match_phenot
         genotype_score = get_match_genotype_score(match)
         phenotype_score = get_match_phenotype_score(match)
 
-        if genotype_score > 0 or phenotype_score > 0.65:
+        if genotype_score > 0 or phenotype_score > MIN_PHENOTYPE_SCORE:
             scored_matches[match] = {
                 '_genotypeScore': genotype_score,
                 '_phenotypeScore': phenotype_score,
@@ -321,17 +380,79 @@ def _is_same_variant(var1, var2):
     return True
 
 
-def _get_phenotype_score(hpo_ids, match):
+def _get_hpo_information_content(hpo_ids):
+    """
+    Information content is computed from the precomputed frequency of each term among all active submissions
+    """
+    if not hpo_ids:
+        return {}
+    frequencies = MatchmakerPhenotypeFrequencies.objects.first() or update_mme_phenotype_frequencies()
+    return {
+        hpo_id: math.log((frequencies.num_submissions + 1) / (frequencies.term_counts.get(hpo_id, 0) + 1))
+        for hpo_id in hpo_ids
+    }
+
+
+def _get_candidate_hpo_ids(feature_ancestors, hpo_information_content):
+    # A submission can only pass the phenotype score threshold if at least one term scores above the threshold, so only
+    # ancestors which are informative enough to score above the threshold need to be looked up
+    candidate_hpo_ids = set()
+    for hpo_id, ancestor_ids in feature_ancestors.items():
+        candidate_hpo_ids.add(hpo_id)
+        min_information_content = hpo_information_content[hpo_id] * MIN_PHENOTYPE_SCORE
+        if min_information_content:
+            candidate_hpo_ids.update({
+                ancestor_id for ancestor_id in ancestor_ids
+                if hpo_information_content[ancestor_id] >= min_information_content
+            })
+    return candidate_hpo_ids
+
+
+def _get_phenotype_score(feature_ancestors, hpo_information_content, match, match_phenotypes):
+    """
+    Best-match average of the Resnik similarity for each queried term, normalized by the information content of the
+    queried term so exact matches score 1 and matches to related terms score between 0 and 1
+    """
     if not match.features:
         return 0.5
-    matched_hpo_ids = [
-        hpo_id for hpo_id in hpo_ids
-        if any(feature['id'] == hpo_id and feature.get('observed', 'yes') == 'yes' for feature in match.features)
-    ]
-    return float(len(matched_hpo_ids)) / len(hpo_ids) or 0.1
+    score = sum(
+        _get_term_similarity(hpo_id, ancestor_ids, hpo_information_content, match_phenotypes)
+        for hpo_id, ancestor_ids in feature_ancestors.items()
+    )
+    return float(score) / len(feature_ancestors) or 0.1
+
+
+def _get_term_similarity(hpo_id, ancestor_ids, hpo_information_content, match_phenotypes):
+    if hpo_id in match_phenotypes:
+        return 1
+    information_content = hpo_information_content[hpo_id]
+    if not information_content:
+        return 0
+    shared_information_content = max([
+        hpo_information_content[ancestor_id] for match_ancestor_ids in match_phenotypes.values()
+        for ancestor_id in ancestor_ids.intersection(match_ancestor_ids)
+    ], default=0)
+    return shared_information_content / information_content
+
+
+MME_METRIC_FIELDS = {
+    'numberOfCases': 'number_of_cases',
+    'numberOfSubmitters': 'number_of_submitters',
+    'numberOfUniqueGenes': 'number_of_unique_genes',
+    'numberOfUniqueFeatures': 'number_of_unique_features',
+    'numberOfRequestsReceived': 'number_of_requests_received',
+    'numberOfPotentialMatchesSent': 'number_of_potential_matches_sent',
+}
 
 
 def get_mme_metrics():
+    metrics = MatchmakerMetrics.objects.first() or update_mme_metrics()
+    response = {metric: getattr(metrics, field) for metric, field in MME_METRIC_FIELDS.items()}
+    response['dateGenerated'] = metrics.date_generated.strftime('%Y-%m-%d')
+    return response
+
+
+def compute_mme_metrics():
     submissions = MatchmakerSubmission.objects.filter(deleted_date__isnull=True)
 
     hpo_ids, gene_ids, _ = get_mme_gene_phenotype_ids_for_submissions(submissions)
@@ -345,16 +466,21 @@ def get_mme_metrics():
         patient_id__isnull=False).distinct('patient_id').count()
 
     return {
-        "numberOfCases": submissions.count(),
-        "numberOfSubmitters": len(submitters),
-        "numberOfUniqueGenes": len(gene_ids),
-        "numberOfUniqueFeatures": len(hpo_ids),
-        "numberOfRequestsReceived": incoming_request_count,
-        "numberOfPotentialMatchesSent": matched_incoming_request_count,
-        "dateGenerated": datetime.now().strftime('%Y-%m-%d'),
+        'number_of_cases': submissions.count(),
+        'number_of_submitters': len(submitters),
+        'number_of_unique_genes': len(gene_ids),
+        'number_of_unique_features': len(hpo_ids),
+        'number_of_requests_received': incoming_request_count,
+        'number_of_potential_matches_sent': matched_incoming_request_count,
     }
 
 
+def update_mme_metrics():
+    metrics, _ = MatchmakerMetrics.objects.update_or_create(
+        id=1, defaults={'date_generated': timezone.now(), **compute_mme_metrics()})
+    return metrics
+
+
 MME_DISCLAIMER = """The data in Matchmaker Exchange is provided for research use only. Broad Institute provides the data
 in Matchmaker Exchange 'as is'. Broad Institute makes no representations or warranties of any kind concerning the data,
 express or implied, including without limitation, warranties of merchantability, fitness for a particular purpose,
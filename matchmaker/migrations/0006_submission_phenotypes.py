@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-19 09:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaker', '0005_auto_20220921_1913'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='matchmakersubmissiongenes',
+            name='gene_id',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.CreateModel(
+            name='MatchmakerSubmissionPhenotypes',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hpo_id', models.CharField(max_length=20)),
+                ('ancestor_hpo_id', models.CharField(db_index=True, max_length=20)),
+                ('matchmaker_submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='matchmaker.matchmakersubmission')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.27 on 2026-10-19 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaker', '0006_submission_phenotypes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchmakerMetrics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number_of_cases', models.IntegerField()),
+                ('number_of_submitters', models.IntegerField()),
+                ('number_of_unique_genes', models.IntegerField()),
+                ('number_of_unique_features', models.IntegerField()),
+                ('number_of_requests_received', models.IntegerField()),
+                ('number_of_potential_matches_sent', models.IntegerField()),
+                ('date_generated', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='matchmakerincomingquery',
+            name='patient_id',
+            field=models.CharField(db_index=True, max_length=255, null=True),
+        ),
+    ]
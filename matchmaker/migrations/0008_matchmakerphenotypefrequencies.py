@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaker', '0007_matchmakermetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchmakerPhenotypeFrequencies',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_submissions', models.IntegerField()),
+                ('term_counts', models.JSONField()),
+            ],
+        ),
+    ]
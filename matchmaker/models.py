@@ -28,6 +28,7 @@ class MatchmakerSubmission(ModelWithGUID):
         return '{}_submission_{}'.format(str(self.individual), self.id)
 
     GUID_PREFIX = 'MS'
+    PROJECT_ID_FIELD = 'individual__family__project_id'
 
     class Meta:
         json_fields = [
@@ -38,12 +39,24 @@ class MatchmakerSubmission(ModelWithGUID):
 class MatchmakerSubmissionGenes(models.Model):
     matchmaker_submission = models.ForeignKey(MatchmakerSubmission, on_delete=models.CASCADE)
     saved_variant = models.ForeignKey('seqr.SavedVariant', on_delete=models.PROTECT)
-    gene_id = models.CharField(max_length=20)  # ensembl ID
+    gene_id = models.CharField(max_length=20, db_index=True)  # ensembl ID
+
+
+class MatchmakerSubmissionPhenotypes(models.Model):
+    matchmaker_submission = models.ForeignKey(MatchmakerSubmission, on_delete=models.CASCADE)
+    hpo_id = models.CharField(max_length=20)  # observed HPO term
+    ancestor_hpo_id = models.CharField(max_length=20, db_index=True)  # the observed term itself or any of its ancestors
+
+
+class MatchmakerPhenotypeFrequencies(models.Model):
+    # Precomputed from MatchmakerSubmissionPhenotypes whenever it changes
+    num_submissions = models.IntegerField()  # number of active submissions with any indexed phenotypes
+    term_counts = JSONField()  # HPO term to number of active submissions annotated with the term or its descendants
 
 
 class MatchmakerIncomingQuery(ModelWithGUID):
     institution = models.CharField(max_length=255)
-    patient_id = models.CharField(max_length=255, null=True)
+    patient_id = models.CharField(max_length=255, null=True, db_index=True)
 
     def __unicode__(self):
         return '{}_{}_query'.format(self.patient_id or self.id, self.institution)
@@ -93,3 +106,14 @@ class MatchmakerContactNotes(ModelWithGUID):
     class Meta:
         json_fields = []
         internal_json_fields = ['institution', 'comments']
+
+
+class MatchmakerMetrics(models.Model):
+    number_of_cases = models.IntegerField()
+    number_of_submitters = models.IntegerField()
+    number_of_unique_genes = models.IntegerField()
+    number_of_unique_features = models.IntegerField()
+    number_of_requests_received = models.IntegerField()
+    number_of_potential_matches_sent = models.IntegerField()
+
+    date_generated = models.DateTimeField()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+
+from matchmaker.matchmaker_utils import MME_DISCLAIMER
+from seqr.utils.redis_utils import safe_redis_get_json, safe_redis_set_json
+from settings import MME_ACCEPT_HEADER
+
+MME_NODE_TIMEOUT = 300
+MME_SEARCH_TIMEOUT = 330
+MME_NODE_CACHE_EXPIRE = 300
+MAX_NODE_CONNECTIONS = 10
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+SUCCESS_STATUS = 'success'
+ERROR_STATUS = 'error'
+TIMEOUT_STATUS = 'timeout'
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=MAX_NODE_CONNECTIONS, pool_maxsize=MAX_NODE_CONNECTIONS))
+_session.mount('http://', HTTPAdapter(pool_connections=MAX_NODE_CONNECTIONS, pool_maxsize=MAX_NODE_CONNECTIONS))
+
+
+def search_external_mme_nodes(nodes, patient_data, timeout=MME_SEARCH_TIMEOUT):
+    """
+    Concurrently searches the given external MME nodes for matches for the given patient.
+
+    Each node is given until its own deadline ("timeout" in its node config, or MME_NODE_TIMEOUT) to respond, and no
+    node is waited on past the overall search deadline, so a slow node only delays its own results. Node requests
+    are only given the time left before their deadline, so the search can wait for its workers to stop instead of
+    leaving requests running in the background
+    Returns:
+        A dictionary of node name to a dictionary with the node's status, results, error message and duration
+    """
+    body = {'_disclaimer': MME_DISCLAIMER}
+    body.update(patient_data)
+    body = json.dumps(body)
+
+    start = time.monotonic()
+    search_deadline = start + timeout
+    node_responses = {}
+    executor = ThreadPoolExecutor(max_workers=max(len(nodes), 1))
+    try:
+        pending = {}
+        node_deadlines = {}
+        for node in nodes:
+            node_deadline = min(start + node.get('timeout', MME_NODE_TIMEOUT), search_deadline)
+            future = executor.submit(_search_node, node, body, node_deadline)
+            pending[future] = node
+            node_deadlines[future] = node_deadline
+        while pending:
+            next_deadline = min(node_deadlines[future] for future in pending)
+            done, _ = wait(pending, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                node = pending.pop(future)
+                node_responses[node['name']] = _get_node_response(future, start)
+
+            now = time.monotonic()
+            for future in [future for future in pending if node_deadlines[future] <= now]:
+                node = pending.pop(future)
+                node_responses[node['name']] = _get_timeout_response(now - start)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return node_responses
+
+
+def _get_node_response(future, start):
+    duration = time.monotonic() - start
+    try:
+        results, is_cached = future.result()
+    except requests.exceptions.Timeout:
+        return _get_timeout_response(duration)
+    except Exception as e:
+        return {'status': ERROR_STATUS, 'results': [], 'error': str(e), 'duration': duration}
+    return {'status': SUCCESS_STATUS, 'results': results, 'cached': is_cached, 'duration': duration}
+
+
+def _get_timeout_response(duration):
+    return {
+        'status': TIMEOUT_STATUS,
+        'results': [],
+        'error': 'Request timed out after {} seconds'.format(round(duration)),
+        'duration': duration,
+    }
+
+
+def _search_node(node, body, deadline):
+    cache_key = 'mme_node_results__{}__{}'.format(node['name'], hashlib.md5(body.encode('utf-8')).hexdigest())  # nosec
+    cached_results = safe_redis_get_json(cache_key)
+    if cached_results is not None:
+        return cached_results, True
+
+    headers = {
+        'X-Auth-Token': node['token'],
+        'Accept': MME_ACCEPT_HEADER,
+        'Content-Type': MME_ACCEPT_HEADER,
+        'Content-Language': 'en-US',
+    }
+    response = _session.post(
+        url=node['url'], headers=headers, data=body, timeout=_get_remaining_time(deadline), stream=True,
+    )
+    try:
+        content = b''
+        for chunk in response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE):
+            if time.monotonic() >= deadline:
+                raise requests.exceptions.Timeout('Request exceeded its deadline')
+            content += chunk
+    finally:
+        response.close()
+
+    if response.status_code != 200:
+        try:
+            message = json.loads(content).get('message')
+        except Exception:
+            message = content.decode('utf-8')
+        raise Exception('{} ({})'.format(message or 'Error', response.status_code))
+
+    results = json.loads(content)['results']
+    safe_redis_set_json(cache_key, results, expire=MME_NODE_CACHE_EXPIRE)
+    return results, False
+
+
+def _get_remaining_time(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise requests.exceptions.Timeout('Request exceeded its deadline')
+    return remaining
@@ -0,0 +1,125 @@
+import json
+import mock
+import requests
+import threading
+from unittest import TestCase
+
+from matchmaker.node_search_utils import search_external_mme_nodes
+
+PATIENT_DATA = {'patient': {'id': 'P0001', 'label': 'P1', 'contact': {'href': 'mailto:test@test.com'}}}
+MATCH_JSON = {'patient': {'id': 'P0002', 'contact': {'href': 'mailto:test@node.org'}}}
+
+NODE_TIMEOUT = 0.05
+
+
+class MockResponse(object):
+
+    def __init__(self, status_code, response_json, chunk_delay=None):
+        self.status_code = status_code
+        self._content = json.dumps(response_json).encode('utf-8')
+        self._chunk_delay = chunk_delay
+
+    def iter_content(self, chunk_size=None):
+        for i in range(0, len(self._content), 10):
+            if self._chunk_delay:
+                threading.Event().wait(self._chunk_delay)
+            yield self._content[i:i + 10]
+
+    def close(self):
+        pass
+
+
+class MockNodes(object):
+    """Mocks node responses by url path. Nodes which do not respond block until their request times out"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._never_responds = threading.Event()
+
+    def post(self, url, headers, data, timeout, stream):
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self._get_response(url.split('/')[-1], json.loads(data), timeout)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _get_response(self, path, body, timeout):
+        if path == 'error':
+            return MockResponse(500, {'message': 'Internal server error'})
+        if path == 'unresponsive':
+            self._never_responds.wait(timeout)
+            raise requests.exceptions.ReadTimeout('Read timed out')
+        return MockResponse(
+            200, {'results': [MATCH_JSON] if body['patient']['id'] == 'P0001' else []},
+            chunk_delay=NODE_TIMEOUT if path == 'trickle' else None,
+        )
+
+
+@mock.patch('matchmaker.node_search_utils.safe_redis_set_json')
+@mock.patch('matchmaker.node_search_utils.safe_redis_get_json')
+class NodeSearchUtilsTest(TestCase):
+
+    def setUp(self):
+        self.mock_nodes = MockNodes()
+        patcher = mock.patch('matchmaker.node_search_utils._session')
+        mock_session = patcher.start()
+        mock_session.post.side_effect = self.mock_nodes.post
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _node(name, path, **kwargs):
+        return {'name': name, 'token': 'abc', 'url': 'http://node.org/{}'.format(path), **kwargs}
+
+    def test_search_external_mme_nodes(self, mock_redis_get, mock_redis_set):
+        mock_redis_get.return_value = None
+        nodes = [
+            self._node('Fast Node', 'fast'),
+            self._node('Error Node', 'error'),
+            self._node('Unresponsive Node', 'unresponsive', timeout=NODE_TIMEOUT),
+            self._node('Trickling Node', 'trickle', timeout=NODE_TIMEOUT),
+        ]
+
+        responses = search_external_mme_nodes(nodes, PATIENT_DATA)
+        timeout_response = {
+            'status': 'timeout', 'results': [], 'error': 'Request timed out after 0 seconds', 'duration': mock.ANY,
+        }
+        self.assertDictEqual(responses, {
+            'Fast Node': {'status': 'success', 'results': [MATCH_JSON], 'cached': False, 'duration': mock.ANY},
+            'Error Node': {'status': 'error', 'results': [], 'error': 'Internal server error (500)', 'duration': mock.ANY},
+            'Unresponsive Node': timeout_response,
+            'Trickling Node': timeout_response,
+        })
+        # No node requests are left running once the search returns
+        self.assertEqual(self.mock_nodes.in_flight, 0)
+
+        mock_redis_set.assert_called_once_with(mock.ANY, [MATCH_JSON], expire=300)
+        fast_cache_key = mock_redis_set.call_args.args[0]
+        self.assertTrue(fast_cache_key.startswith('mme_node_results__Fast Node__'))
+
+        # Test global deadline returns partial results
+        responses = search_external_mme_nodes(
+            [self._node('Fast Node', 'fast'), self._node('Unresponsive Node', 'unresponsive')], PATIENT_DATA,
+            timeout=NODE_TIMEOUT,
+        )
+        self.assertDictEqual(responses, {
+            'Fast Node': {'status': 'success', 'results': [MATCH_JSON], 'cached': False, 'duration': mock.ANY},
+            'Unresponsive Node': timeout_response,
+        })
+        self.assertEqual(self.mock_nodes.in_flight, 0)
+
+        # Test cached responses are not re-requested
+        mock_redis_get.side_effect = lambda key: [MATCH_JSON] if key == fast_cache_key else None
+        responses = search_external_mme_nodes([self._node('Fast Node', 'unresponsive')], PATIENT_DATA)
+        self.assertDictEqual(responses, {
+            'Fast Node': {'status': 'success', 'results': [MATCH_JSON], 'cached': True, 'duration': mock.ANY},
+        })
+
+        # Test different submissions are not cached together
+        responses = search_external_mme_nodes(
+            [self._node('Fast Node', 'fast')], {'patient': {**PATIENT_DATA['patient'], 'id': 'P0003'}})
+        self.assertDictEqual(responses, {
+            'Fast Node': {'status': 'success', 'results': [], 'cached': False, 'duration': mock.ANY},
+        })
@@ -1,10 +1,12 @@
+import math
 import mock
 import json
 
 from datetime import datetime
 from django.test import TestCase
 
-from matchmaker.models import MatchmakerIncomingQuery
+from matchmaker.matchmaker_utils import update_mme_submission_phenotypes
+from matchmaker.models import MatchmakerIncomingQuery, MatchmakerResult, MatchmakerSubmission
 
 TEST_ACCESS_TOKEN = 'erjhtg3558324u82'  # nosec
 TEST_MME_NODES = {TEST_ACCESS_TOKEN: {'name': 'Test Node'}}
@@ -33,6 +35,8 @@ class ExternalAPITest(TestCase):
             url, HTTP_ACCEPT='application/vnd.ga4gh.matchmaker.v1.0+json', HTTP_X_AUTH_TOKEN=TEST_ACCESS_TOKEN, **kwargs
         )
 
+    @mock.patch('matchmaker.views.external_api.EmailMessage', mock.MagicMock())
+    @mock.patch('matchmaker.views.external_api.safe_post_to_slack', mock.MagicMock())
     def test_mme_metrics_proxy(self):
         url = '/api/matchmaker/v1/metrics'
 
@@ -52,6 +56,26 @@ class ExternalAPITest(TestCase):
             }
         })
 
+        # Test metrics are incrementally updated for new incoming requests
+        self._make_mme_request('/api/matchmaker/v1/match', 'post', content_type='application/json', data=json.dumps({
+            'patient': {
+                'id': '12345',
+                'contact': {'institution': 'Test Institute', 'href': 'test@test.com', 'name': 'PI'},
+                'features': [{'id': 'HP:0002017'}, {'id': 'HP:0001252'}],
+            }}))
+        self._make_mme_request('/api/matchmaker/v1/match', 'post', content_type='application/json', data=json.dumps({
+            'patient': {
+                'id': '12345',
+                'contact': {'institution': 'Test Institute', 'href': 'test@test.com', 'name': 'PI'},
+                'features': [{'id': 'HP:0002017'}, {'id': 'HP:0001252'}],
+            }}))
+        with self.assertNumQueries(1):
+            response = self._make_mme_request(url, 'get')
+        self.assertEqual(response.status_code, 200)
+        metrics = response.json()['metrics']
+        self.assertEqual(metrics['numberOfRequestsReceived'], 5)
+        self.assertEqual(metrics['numberOfPotentialMatchesSent'], 2)
+
     @mock.patch('matchmaker.views.external_api.logger')
     @mock.patch('matchmaker.views.external_api.EmailMessage')
     @mock.patch('matchmaker.views.external_api.safe_post_to_slack')
@@ -399,6 +423,41 @@ be found found at https://seqr.broadinstitute.org/matchmaker/disclaimer."""
             mock.call().send(),
         ])
 
+    @mock.patch('matchmaker.views.external_api.EmailMessage')
+    @mock.patch('matchmaker.views.external_api.safe_post_to_slack')
+    def test_mme_match_proxy_related_phenotypes(self, mock_post_to_slack, mock_email):
+        submission = MatchmakerSubmission.objects.get(id=3)
+        submission.features = [{'id': 'HP:0003273', 'observed': 'yes'}]
+        submission.save()
+        update_mme_submission_phenotypes(submission)
+
+        url = '/api/matchmaker/v1/match'
+        request_body = {
+            'patient': {
+                'id': '12345',
+                'contact': {'institution': 'Test Institute', 'href': 'test@test.com', 'name': 'PI'},
+                'features': [{'id': 'HP:0012469'}, {'id': 'HP:0002017'}],
+            }}
+
+        response = self._make_mme_request(url, 'post', content_type='application/json', data=json.dumps(request_body))
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+
+        # NA20885 has an exact match to only one term, but NA19675_1 has an exact match to one term and a partial match
+        # to the other via a shared ancestor term
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['patient']['id'], 'NA19675_1_01')
+        self.assertDictEqual(results[0]['score'], {
+            '_genotypeScore': 0,
+            '_phenotypeScore': mock.ANY,
+            'patient': 0.0,
+        })
+        self.assertAlmostEqual(results[0]['score']['_phenotypeScore'], (1 + math.log(4/3) / math.log(2)) / 2)
+
+        self.assertEqual(MatchmakerIncomingQuery.objects.filter(patient_id='12345').count(), 1)
+        self.assertEqual(MatchmakerResult.objects.filter(
+            submission__submission_id='NA19675_1_01', result_data__patient__id='12345').count(), 1)
+
     @mock.patch('seqr.utils.communication_utils.logger')
     @mock.patch('matchmaker.views.external_api.EmailMessage')
     @mock.patch('seqr.utils.communication_utils._post_to_slack')
@@ -1,15 +1,16 @@
 import json
-import requests
 from datetime import datetime
 from django.core.mail.message import EmailMessage
 from django.db.models import prefetch_related_objects, Q, Value, CharField
 from django.db.models.functions import Coalesce
 
 from matchmaker.models import MatchmakerResult, MatchmakerContactNotes, MatchmakerSubmission, MatchmakerSubmissionGenes, \
-    MatchmakerIncomingQuery
+    MatchmakerIncomingQuery, MatchmakerSubmissionPhenotypes
 from matchmaker.matchmaker_utils import get_mme_genes_phenotypes_for_results, parse_mme_patient, \
     get_submission_json_for_external_match, parse_mme_features, get_submission_gene_variants, get_mme_matches, \
-    get_gene_ids_for_feature, validate_patient_data, get_hpo_terms_by_id, MME_DISCLAIMER
+    get_gene_ids_for_feature, validate_patient_data, get_hpo_terms_by_id, update_mme_submission_phenotypes, \
+    update_mme_phenotype_frequencies
+from matchmaker.node_search_utils import search_external_mme_nodes, SUCCESS_STATUS
 from seqr.models import Individual, SavedVariant
 from seqr.utils.communication_utils import safe_post_to_slack
 from seqr.utils.logging_utils import SeqrLogger
@@ -23,7 +24,7 @@ from seqr.views.utils.orm_to_json_utils import _get_json_for_model, get_json_for
 from seqr.views.utils.permissions_utils import check_mme_permissions, check_project_permissions, analyst_required, \
     has_project_permissions, login_and_policies_required, get_project_and_check_permissions
 
-from settings import BASE_URL, MME_ACCEPT_HEADER, MME_NODES, MME_DEFAULT_CONTACT_EMAIL, \
+from settings import BASE_URL, MME_NODES, MME_DEFAULT_CONTACT_EMAIL, \
     MME_SLACK_SEQR_MATCH_NOTIFICATION_CHANNEL, MME_SLACK_ALERT_NOTIFICATION_CHANNEL
 
 logger = SeqrLogger(__name__)
@@ -184,30 +185,17 @@ def finalize_mme_search(request, submission_guid):
 
 
 def _search_external_matches(node, patient_data, user):
-    body = {'_disclaimer': MME_DISCLAIMER}
-    body.update(patient_data)
     external_results = []
     submission_gene_ids = set()
     for feature in patient_data['patient'].get('genomicFeatures', []):
         submission_gene_ids.update(get_gene_ids_for_feature(feature, {}))
 
-    headers = {
-        'X-Auth-Token': node['token'],
-        'Accept': MME_ACCEPT_HEADER,
-        'Content-Type': MME_ACCEPT_HEADER,
-        'Content-Language': 'en-US',
-    }
     try:
-        external_result = requests.post(url=node['url'], headers=headers, data=json.dumps(body), timeout=300)
-        if external_result.status_code != 200:
-            try:
-                message = external_result.json().get('message')
-            except Exception:
-                message = external_result.content.decode('utf-8')
-            error_message = '{} ({})'.format(message or 'Error', external_result.status_code)
-            raise Exception(error_message)
+        node_response = search_external_mme_nodes([node], patient_data)[node['name']]
+        if node_response['status'] != SUCCESS_STATUS:
+            raise Exception(node_response['error'])
 
-        node_results = external_result.json()['results']
+        node_results = node_response['results']
         logger.info('Found {} matches from {}'.format(len(node_results), node['name']), user)
         if node_results:
             _, _, gene_symbols_to_ids = get_mme_genes_phenotypes_for_results(node_results)
@@ -290,6 +278,7 @@ def update_mme_submission(request, submission_guid=None):
         }, request.user)
 
     update_model_from_json(submission, submission_json, user=request.user, allow_unknown_keys=True)
+    update_mme_submission_phenotypes(submission)
 
     new_gene_variants = {(gene_variant['geneId'], gene_variant['variantGuid']) for gene_variant in gene_variants}
     existing_submission_genes = {
@@ -346,6 +335,8 @@ def delete_mme_submission(request, submission_guid):
     update_model_from_json(submission, {'deleted_date': deleted_date, 'deleted_by': request.user}, request.user)
 
     MatchmakerSubmissionGenes.objects.filter(matchmaker_submission=submission).delete()
+    MatchmakerSubmissionPhenotypes.objects.filter(matchmaker_submission=submission).delete()
+    update_mme_phenotype_frequencies()
 
     for saved_result in MatchmakerResult.objects.filter(submission=submission):
         if not (saved_result.we_contacted or saved_result.host_contacted or saved_result.comments):
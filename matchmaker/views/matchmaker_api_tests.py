@@ -6,7 +6,7 @@ from copy import deepcopy
 from datetime import datetime
 from django.urls.base import reverse
 
-from matchmaker.models import MatchmakerResult, MatchmakerContactNotes, MatchmakerSubmission
+from matchmaker.models import MatchmakerResult, MatchmakerContactNotes, MatchmakerSubmission, MatchmakerPhenotypeFrequencies
 from matchmaker.matchmaker_utils import MME_DISCLAIMER
 from matchmaker.views.matchmaker_api import get_individual_mme_matches, search_individual_mme_matches, \
     update_mme_submission, delete_mme_submission, update_mme_result_status, send_mme_contact_email, \
@@ -261,6 +261,8 @@ class MatchmakerAPITest(AuthenticationTestCase):
 
     @mock.patch('seqr.utils.communication_utils.SLACK_TOKEN', MOCK_SLACK_TOKEN)
     @mock.patch('matchmaker.views.matchmaker_api.MME_NODES_BY_NAME', MOCK_NODES_BY_NAME)
+    @mock.patch('matchmaker.node_search_utils.safe_redis_get_json', lambda *args: None)
+    @mock.patch('matchmaker.node_search_utils.safe_redis_set_json', lambda *args, **kwargs: None)
     @mock.patch('seqr.utils.middleware.logger')
     @mock.patch('seqr.utils.communication_utils.logger')
     @mock.patch('seqr.utils.communication_utils.Slacker')
@@ -475,7 +477,7 @@ class MatchmakerAPITest(AuthenticationTestCase):
             'Unable to create notification for new MME match: Email error', self.collaborator_user)
         mock_exception_logger.warning.assert_called_with(
             'Error searching in Node A: Failed request (400)', self.collaborator_user, detail=expected_patient_body,
-            http_request_json=mock.ANY, traceback=mock.ANY, request_body=mock.ANY,
+            http_request_json=mock.ANY, traceback=mock.ANY, request_body=mock.ANY, request_stats=mock.ANY,
         )
         mock_logger.warning.assert_has_calls([
             mock.call('Error searching in Node B: Received invalid results for NA19675_1', self.collaborator_user, detail=invalid_results),
@@ -613,6 +615,10 @@ class MatchmakerAPITest(AuthenticationTestCase):
         self.assertEqual(submission_genes.count(), 2)
         self.assertSetEqual(
             set(submission_genes.values_list('gene_id', flat=True)), {'ENSG00000135953', 'ENSG00000235249'})
+        self.assertSetEqual(
+            set(submission.matchmakersubmissionphenotypes_set.values_list('hpo_id', 'ancestor_hpo_id')),
+            {('HP:0012469', 'HP:0012469')},
+        )
 
         # Test successful update
         url = reverse(update_mme_submission, args=[new_submission_guid])
@@ -667,6 +673,10 @@ class MatchmakerAPITest(AuthenticationTestCase):
         self.assertListEqual(submission.features, update_body['phenotypes'])
         submission_genes = submission.matchmakersubmissiongenes_set.all()
         self.assertEqual(submission_genes.count(), 0)
+        self.assertSetEqual(
+            set(submission.matchmakersubmissionphenotypes_set.values_list('hpo_id', 'ancestor_hpo_id')),
+            {('HP:0002017', 'HP:0002017'), ('HP:0002017', 'HP:0011458')},
+        )
 
     def test_delete_mme_submission(self):
         url = reverse(delete_mme_submission, args=[SUBMISSION_GUID])
@@ -683,6 +693,10 @@ class MatchmakerAPITest(AuthenticationTestCase):
         self.assertEqual(submission.deleted_date.strftime('%Y-%m-%d'), today)
         self.assertEqual(submission.deleted_by, self.collaborator_user)
         self.assertEqual(submission.matchmakersubmissiongenes_set.count(), 0)
+        self.assertEqual(submission.matchmakersubmissionphenotypes_set.count(), 0)
+        frequencies = MatchmakerPhenotypeFrequencies.objects.get()
+        self.assertEqual(frequencies.num_submissions, 1)
+        self.assertDictEqual(frequencies.term_counts, {'HP:0001252': 1, 'HP:0002017': 1, 'HP:0011458': 1})
 
         # Test do not delete if already deleted
         response = self.client.post(url)
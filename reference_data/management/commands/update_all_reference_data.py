@@ -1,8 +1,9 @@
 import logging
 from collections import OrderedDict
+from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
 
-from reference_data.utils.gene_utils import get_genes_by_id_and_symbol
+from reference_data.utils.gene_utils import get_genes_by_id_and_symbol, reset_gene_lookup_index
 from reference_data.models import GeneInfo, TranscriptInfo, HumanPhenotypeOntology, RefseqTranscript, GeneConstraint, \
     GeneCopyNumberSensitivity, GeneShet, Omim, dbNSFPGene, PrimateAI, MGI, GenCC, ClinGen, DataVersions
 from seqr.utils.communication_utils import safe_post_to_slack
@@ -61,6 +62,13 @@ class Command(BaseCommand):
                 logger.error("unable to update {}: {}".format(data_model_name, e))
                 update_failed.append(data_model_name)
 
+        if {GeneInfo.__name__, dbNSFPGene.__name__}.intersection(updated):
+            reset_gene_lookup_index()
+        if HumanPhenotypeOntology.__name__ in updated:
+            # observed features are indexed under all of their HPO ancestors, which may have changed
+            call_command('reindex_individual_phenotypes')
+            call_command('reindex_mme_phenotypes')
+
         logger.info("Done")
         if updated:
             logger.info("Updated: {}".format(', '.join(updated)))
@@ -46,6 +46,12 @@ class BaseUpdateAllReferenceDataTest(ReferenceDataCommandTestCase):
         patcher = mock.patch('seqr.utils.communication_utils._post_to_slack')
         self.mock_slack = patcher.start()
         self.addCleanup(patcher.stop)
+        patcher = mock.patch('reference_data.management.commands.update_all_reference_data.reset_gene_lookup_index')
+        self.mock_reset_gene_index = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('reference_data.management.commands.update_all_reference_data.call_command')
+        self.mock_call_command = patcher.start()
+        self.addCleanup(patcher.stop)
 
 
 class NewDbUpdateAllReferenceDataTest(BaseUpdateAllReferenceDataTest):
@@ -82,6 +88,11 @@ class NewDbUpdateAllReferenceDataTest(BaseUpdateAllReferenceDataTest):
         ])
 
         self.mock_slack.assert_not_called()
+        self.mock_reset_gene_index.assert_called_once()
+        self.mock_call_command.assert_has_calls([
+            mock.call('reindex_individual_phenotypes'), mock.call('reindex_mme_phenotypes'),
+        ])
+        self.assertEqual(self.mock_call_command.call_count, 2)
         calls = [
             mock.call('Done'),
             mock.call('Updated: GeneInfo, Omim, dbNSFPGene, GeneConstraint, GeneCopyNumberSensitivity, GenCC, ClinGen, GeneShet, HumanPhenotypeOntology'),
@@ -118,6 +129,8 @@ class UpdateAllReferenceDataTest(BaseUpdateAllReferenceDataTest):
         self.assertListEqual(self.mock_update_calls, [])
         self.mock_logger.info.assert_called_with("Done")
         self.mock_slack.assert_not_called()
+        self.mock_reset_gene_index.assert_not_called()
+        self.mock_call_command.assert_not_called()
 
     def test_partial_update_reference_data_command(self):
         self.mock_get_file_last_modified.return_value = 'Sat, 22 Mar 2025 09:21:17 GMT'
@@ -143,6 +156,8 @@ class UpdateAllReferenceDataTest(BaseUpdateAllReferenceDataTest):
             mock.call('Updated: Omim, dbNSFPGene, GenCC'),
         ])
         self.mock_logger.error.assert_not_called()
+        self.mock_reset_gene_index.assert_called_once()
+        self.mock_call_command.assert_not_called()
         self.mock_slack.assert_has_calls([mock.call('seqr-data-loading', message) for message in [
             'Updated Omim reference data from version "Thu, 20 Mar 2025 20:52:24 GMT" to version "Sat, 22 Mar 2025 09:21:17 GMT"',
             'Updated dbNSFPGene reference data from version "dbNSFP3.2_gene" to version "dbNSFP4.0_gene"',
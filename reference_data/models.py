@@ -234,6 +234,26 @@ class HumanPhenotypeOntology(LoadableModel):
 
         return hpo_id
 
+    @classmethod
+    def get_ancestors(cls, hpo_ids):
+        """Returns a mapping of each of the given HPO terms to the set containing the term and all of its ancestors"""
+        parent_ids = {}
+        to_fetch = set(hpo_ids)
+        while to_fetch:
+            fetched = dict(cls.objects.filter(hpo_id__in=to_fetch).values_list('hpo_id', 'parent_id'))
+            parent_ids.update({hpo_id: fetched.get(hpo_id) for hpo_id in to_fetch})
+            to_fetch = {parent_id for parent_id in fetched.values() if parent_id and parent_id not in parent_ids}
+
+        ancestors = {}
+        for hpo_id in hpo_ids:
+            term_ancestors = set()
+            term = hpo_id
+            while term and term not in term_ancestors:
+                term_ancestors.add(term)
+                term = parent_ids.get(term)
+            ancestors[hpo_id] = term_ancestors
+        return ancestors
+
 class GeneInfo(LoadableModel):
     """Human gene models from https://www.gencodegenes.org/releases/
     http://www.gencodegenes.org/gencodeformat.html
@@ -1,4 +1,14 @@
-from reference_data.models import GeneInfo
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+import time
+import uuid
+
+from reference_data.models import GeneInfo, dbNSFPGene, DataVersions, GENOME_VERSION_GRCh37, GENOME_VERSION_GRCh38
+from seqr.utils.redis_utils import safe_redis_get_json, safe_redis_set_json
+
+GENE_LOOKUP_INDEX_VERSION_CACHE_KEY = 'gene_lookup_index__version'
+GENE_LOOKUP_INDEX_VERSION_CHECK_SECONDS = 60
 
 
 def get_genes_by_id_and_symbol():
@@ -10,3 +20,139 @@ def get_genes_by_id_and_symbol():
         if gene_id not in gene_id_to_genes:
             gene_id_to_genes[gene_id] = db_id
     return gene_id_to_genes, gene_symbol_to_genes
+
+
+class GeneLookupIndex(object):
+    """In-memory lookup of gene ids by symbol, built from GeneInfo and the previous symbols and aliases in dbNSFPGene"""
+
+    def __init__(self, genes, gene_names):
+        # genes are ordered by most recent gencode release, so the most recent gene for a symbol is always listed first
+        self._genome_versions_by_id = {}
+        self._symbols_by_id = {}
+        self._ids_by_symbol = defaultdict(list)
+        self._ids_by_upper_symbol = defaultdict(list)
+        search_genes = []
+        for gene_id, gene_symbol, has_grch37, has_grch38 in genes:
+            self._genome_versions_by_id[gene_id] = {
+                genome_version for genome_version, has_version in [
+                    (GENOME_VERSION_GRCh37, has_grch37), (GENOME_VERSION_GRCh38, has_grch38),
+                ] if has_version
+            }
+            self._symbols_by_id[gene_id] = gene_symbol
+            if gene_symbol:
+                self._ids_by_symbol[gene_symbol].append(gene_id)
+                self._ids_by_upper_symbol[gene_symbol.upper()].append(gene_id)
+            search_genes.append((gene_id, gene_symbol))
+
+        self._ids_by_upper_alias = defaultdict(list)
+        for gene_id, names in gene_names:
+            if gene_id not in self._genome_versions_by_id:
+                continue
+            for name in names.split(';'):
+                if name and gene_id not in self._ids_by_upper_alias[name.upper()]:
+                    self._ids_by_upper_alias[name.upper()].append(gene_id)
+
+        # matches the database ordering of shortest symbol first, with genes without a symbol last
+        self._search_genes = [
+            (gene_id.upper(), gene_symbol.upper() if gene_symbol else '', gene_id, gene_symbol)
+            for gene_id, gene_symbol in sorted(
+                search_genes, key=lambda gene: (gene[1] is None, len(gene[1] or ''), gene[1] or ''))
+        ]
+        self._upper_symbols = sorted(self._ids_by_upper_symbol.keys())
+
+    def _filter_genome_version(self, gene_ids, genome_version):
+        if not genome_version:
+            return list(gene_ids)
+        return [gene_id for gene_id in gene_ids if genome_version in self._genome_versions_by_id[gene_id]]
+
+    def get_gene_ids(self, gene_symbol, genome_version=None, case_sensitive=True, include_aliases=False):
+        # fallback matches are only used for symbols with no better match, even if that match is in a different build
+        gene_ids = self._ids_by_symbol.get(gene_symbol)
+        if gene_ids:
+            return self._filter_genome_version(gene_ids, genome_version)
+
+        gene_ids = None
+        if not case_sensitive:
+            gene_ids = self._ids_by_upper_symbol.get(gene_symbol.upper())
+        if not gene_ids and include_aliases:
+            gene_ids = self._ids_by_upper_alias.get(gene_symbol.upper())
+        gene_ids = self._filter_genome_version(gene_ids or [], genome_version)
+        # fallback matches for more than one distinct gene, i.e. an alias shared by several genes, are ambiguous
+        if len({self._symbols_by_id[gene_id] for gene_id in gene_ids}) > 1:
+            return []
+        return gene_ids
+
+    def get_gene_ids_for_symbols(self, gene_symbols, **kwargs):
+        """Resolves a batch of gene symbols, falling back to case-insensitive and then alias matches if enabled.
+        Returns a dictionary of each resolved symbol to its gene ids, ordered by most recent gencode release"""
+        symbols_to_ids = defaultdict(list)
+        for gene_symbol in gene_symbols:
+            gene_ids = self.get_gene_ids(gene_symbol, **kwargs)
+            if gene_ids:
+                symbols_to_ids[gene_symbol] = gene_ids
+        return symbols_to_ids
+
+    def get_gene_ids_for_prefix(self, prefix, max_results=None):
+        prefix = prefix.upper()
+        gene_ids = []
+        for upper_symbol in self._upper_symbols[bisect_left(self._upper_symbols, prefix):]:
+            if not upper_symbol.startswith(prefix) or (max_results and len(gene_ids) >= max_results):
+                break
+            gene_ids += [gene_id for gene_id in self._ids_by_upper_symbol[upper_symbol] if gene_id not in gene_ids]
+        return gene_ids[:max_results] if max_results else gene_ids
+
+    def search(self, query, max_results):
+        """Returns the genes whose id or symbol contains the query, ordered by shortest symbol"""
+        query = query.upper()
+        results = []
+        for upper_gene_id, upper_symbol, gene_id, gene_symbol in self._search_genes:
+            if query in upper_gene_id or query in upper_symbol:
+                results.append({'gene_id': gene_id, 'gene_symbol': gene_symbol})
+                if len(results) >= max_results:
+                    break
+        return results
+
+
+_gene_lookup_index = None
+_gene_lookup_index_version = None
+_gene_lookup_index_checked = None
+_gene_lookup_index_lock = Lock()
+
+
+def _get_gene_data_version():
+    # the version stamp is shared across processes in redis, and falls back to the loaded data versions if it is missing
+    version = safe_redis_get_json(GENE_LOOKUP_INDEX_VERSION_CACHE_KEY)
+    if version is None:
+        version = sorted(DataVersions.objects.filter(
+            data_model_name__in=[GeneInfo.__name__, dbNSFPGene.__name__]).values_list('data_model_name', 'version'))
+    return version
+
+
+def get_gene_lookup_index():
+    """Returns the in-memory gene lookup index. The gene data version is checked at most once every
+    GENE_LOOKUP_INDEX_VERSION_CHECK_SECONDS, and the index is only rebuilt if it has changed"""
+    global _gene_lookup_index, _gene_lookup_index_version, _gene_lookup_index_checked
+    with _gene_lookup_index_lock:
+        now = time.monotonic()
+        if _gene_lookup_index is not None and now - _gene_lookup_index_checked < GENE_LOOKUP_INDEX_VERSION_CHECK_SECONDS:
+            return _gene_lookup_index
+        version = _get_gene_data_version()
+        _gene_lookup_index_checked = now
+        if _gene_lookup_index is None or version != _gene_lookup_index_version:
+            genes = GeneInfo.objects.order_by('-gencode_release', 'id').values_list(
+                'gene_id', 'gene_symbol', 'start_grch37', 'start_grch38')
+            _gene_lookup_index = GeneLookupIndex(
+                [(gene_id, symbol, start_37 is not None, start_38 is not None) for gene_id, symbol, start_37, start_38 in genes],
+                dbNSFPGene.objects.values_list('gene__gene_id', 'gene_names'),
+            )
+            _gene_lookup_index_version = version
+        return _gene_lookup_index
+
+
+def reset_gene_lookup_index():
+    """Marks the gene lookup index as stale in every process, once their next version check is due"""
+    global _gene_lookup_index, _gene_lookup_index_version
+    safe_redis_set_json(GENE_LOOKUP_INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex)
+    with _gene_lookup_index_lock:
+        _gene_lookup_index = None
+        _gene_lookup_index_version = None
@@ -0,0 +1,116 @@
+from django.test import TestCase
+import mock
+
+from reference_data.models import GeneInfo, DataVersions
+from reference_data.utils.gene_utils import get_gene_lookup_index, reset_gene_lookup_index, GeneLookupIndex
+
+
+class GeneLookupIndexTest(TestCase):
+    databases = '__all__'
+    fixtures = ['reference_data']
+
+    def setUp(self):
+        reset_gene_lookup_index()
+
+    def test_get_gene_ids_for_symbols(self):
+        index = get_gene_lookup_index()
+        self.assertIs(get_gene_lookup_index(), index)
+
+        self.assertDictEqual(index.get_gene_ids_for_symbols(['DDX11L1', 'AL627309.1', 'ddx11l1', 'TTN', 'foo']), {
+            'DDX11L1': ['ENSG00000223972'],
+            'AL627309.1': ['ENSG00000238009', 'ENSG00000237683'],
+        })
+        self.assertDictEqual(index.get_gene_ids_for_symbols(['AL627309.1', 'DDX11L1'], genome_version='38'), {
+            'AL627309.1': ['ENSG00000238009'],
+            'DDX11L1': ['ENSG00000223972'],
+        })
+        self.assertDictEqual(index.get_gene_ids_for_symbols(['DDX11L1'], genome_version='37'), {})
+
+        self.assertDictEqual(
+            index.get_gene_ids_for_symbols(['ddx11l1', 'ttn', 'OR4F29', 'rnu6', 'foo'], case_sensitive=False), {
+                'ddx11l1': ['ENSG00000223972'],
+                'OR4F29': ['ENSG00000235249'],
+            })
+        self.assertDictEqual(index.get_gene_ids_for_symbols(
+            ['ddx11l1', 'ttn', 'OR4F29', 'rnu6', 'foo'], case_sensitive=False, include_aliases=True), {
+            'ddx11l1': ['ENSG00000223972'],
+            'ttn': ['ENSG00000227232'],
+            'OR4F29': ['ENSG00000235249'],
+            'rnu6': ['ENSG00000186092'],
+        })
+
+    def test_prefix_and_search(self):
+        index = get_gene_lookup_index()
+        self.assertListEqual(index.get_gene_ids_for_prefix('or4f'), [
+            'ENSG00000185097', 'ENSG00000235249', 'ENSG00000186092',
+        ])
+        self.assertListEqual(index.get_gene_ids_for_prefix('al62730', max_results=2), [
+            'ENSG00000238009', 'ENSG00000237683',
+        ])
+
+        self.assertListEqual(index.search('or4f', 5), [
+            {'gene_id': 'ENSG00000186092', 'gene_symbol': 'OR4F5'},
+            {'gene_id': 'ENSG00000185097', 'gene_symbol': 'OR4F16'},
+            {'gene_id': 'ENSG00000235249', 'gene_symbol': 'OR4F29'},
+        ])
+        self.assertListEqual([gene['gene_id'] for gene in index.search('00000186', 5)], ['ENSG00000186092'])
+
+    def test_ambiguous_matches(self):
+        index = GeneLookupIndex([
+            ('ENSG00000000001', 'GENE1', True, True),
+            ('ENSG00000000002', 'GENE2', True, True),
+            ('ENSG00000000003', 'GENE3', False, True),
+            ('ENSG00000000004', 'gene2', True, True),
+        ], [
+            ('ENSG00000000001', 'SHARED;ALIAS1'), ('ENSG00000000002', 'SHARED'), ('ENSG00000000003', 'ALIAS1'),
+        ])
+        kwargs = {'case_sensitive': False, 'include_aliases': True}
+        # symbols which only match several distinct genes case-insensitively or by alias are not resolved
+        self.assertDictEqual(index.get_gene_ids_for_symbols(['GENE2', 'Gene2', 'gene1', 'shared', 'alias1'], **kwargs), {
+            'GENE2': ['ENSG00000000002'], 'gene1': ['ENSG00000000001'],
+        })
+        self.assertDictEqual(index.get_gene_ids_for_symbols(['alias1'], genome_version='37', **kwargs), {
+            'alias1': ['ENSG00000000001'],
+        })
+        self.assertDictEqual(index.get_gene_ids_for_symbols(['Gene3'], **kwargs), {'Gene3': ['ENSG00000000003']})
+
+    @mock.patch('reference_data.utils.gene_utils.time.monotonic')
+    @mock.patch('reference_data.utils.gene_utils.safe_redis_set_json')
+    @mock.patch('reference_data.utils.gene_utils.safe_redis_get_json')
+    def test_index_invalidation(self, mock_redis_get, mock_redis_set, mock_monotonic):
+        mock_redis_get.return_value = 'version_1'
+        mock_monotonic.return_value = 100
+        index = get_gene_lookup_index()
+        mock_redis_get.assert_called_once_with('gene_lookup_index__version')
+
+        # The version is only checked once the check interval has passed
+        GeneInfo.objects.create(gene_id='ENSG00000999999', gene_symbol='NEWGENE', gencode_release=39)
+        mock_redis_get.return_value = 'version_2'
+        mock_monotonic.return_value = 159
+        self.assertIs(get_gene_lookup_index(), index)
+        mock_redis_get.assert_called_once()
+
+        mock_monotonic.return_value = 160
+        new_index = get_gene_lookup_index()
+        self.assertIsNot(new_index, index)
+        self.assertDictEqual(new_index.get_gene_ids_for_symbols(['NEWGENE']), {'NEWGENE': ['ENSG00000999999']})
+
+        mock_monotonic.return_value = 220
+        self.assertIs(get_gene_lookup_index(), new_index)
+        self.assertEqual(mock_redis_get.call_count, 3)
+
+        # Falls back to the loaded data versions if the version is not in redis
+        mock_redis_get.return_value = None
+        mock_monotonic.return_value = 280
+        fallback_index = get_gene_lookup_index()
+        self.assertIsNot(fallback_index, new_index)
+        mock_monotonic.return_value = 340
+        self.assertIs(get_gene_lookup_index(), fallback_index)
+
+        DataVersions.objects.filter(data_model_name='GeneInfo').update(version='40')
+        mock_monotonic.return_value = 400
+        self.assertIsNot(get_gene_lookup_index(), fallback_index)
+
+        # Resetting the index updates the version for all processes
+        reset_gene_lookup_index()
+        mock_redis_set.assert_called_once_with('gene_lookup_index__version', mock.ANY)
@@ -0,0 +1,79 @@
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, teardown_databases
+import logging
+import time
+
+from seqr.models import Project, Family, Individual, AnalysisGroup, SearchToken
+from seqr.views.apis.awesomebar_api import PROJECT_SPECIFIC_CATEGORY_MAP
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERIES = ['1', 'na1', 'fam_12', 'project 4', 'zzz']
+
+
+class Command(BaseCommand):
+    help = 'Report awesomebar lookup times against a synthetic deployment, which is created in a temporary test ' \
+           'database and never in the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=100)
+        parser.add_argument('--families-per-project', type=int, default=100)
+        parser.add_argument('--individuals-per-family', type=int, default=3)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--query', action='append', dest='queries', help='Query to benchmark')
+
+    def handle(self, *args, **options):
+        # creates and migrates a test database, as used by the test runner, and points the connection at it
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            self._run_benchmark(**options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def _run_benchmark(self, queries=None, iterations=None, **options):
+        project_ids = self._create_synthetic_data(**options)
+        for query in queries or DEFAULT_QUERIES:
+            for category, get_matches in PROJECT_SPECIFIC_CATEGORY_MAP.items():
+                durations = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    num_matches = len(get_matches(query, project_ids))
+                    durations.append(time.perf_counter() - start)
+                logger.info(
+                    f'"{query}" {category}: {num_matches} matches (min {min(durations) * 1000:.1f}ms, '
+                    f'max {max(durations) * 1000:.1f}ms)'
+                )
+
+    @staticmethod
+    def _create_synthetic_data(projects=None, families_per_project=None, individuals_per_family=None, **kwargs):
+        start = time.perf_counter()
+        subscribers = Group.objects.create(name='benchmark_awesomebar_subscribers')
+        projects = Project.objects.bulk_create([
+            Project(guid=f'R_bench_{i}', name=f'Benchmark project {i}', subscribers=subscribers)
+            for i in range(projects)
+        ])
+        families = Family.objects.bulk_create([
+            Family(guid=f'F_bench_{project.id}_{i}', project=project, family_id=f'FAM_{i}', display_name=f'fam-{i}')
+            for project in projects for i in range(families_per_project)
+        ])
+        individuals = Individual.objects.bulk_create([
+            Individual(guid=f'I_bench_{family.id}_{i}', family=family, individual_id=f'NA{family.id:06d}_{i}')
+            for family in families for i in range(individuals_per_family)
+        ])
+        analysis_groups = AnalysisGroup.objects.bulk_create([
+            AnalysisGroup(guid=f'AG_bench_{project.id}', project=project, name=f'Benchmark group {project.id}')
+            for project in projects
+        ])
+        num_tokens = 0
+        for model_cls, models in [
+            (Project, projects), (Family, families), (Individual, individuals), (AnalysisGroup, analysis_groups),
+        ]:
+            for i in range(0, len(models), SearchToken.BATCH_SIZE):
+                num_tokens += len(SearchToken.update_tokens(
+                    model_cls, [model.id for model in models[i:i + SearchToken.BATCH_SIZE]]))
+        logger.info(
+            f'Created {len(projects)} projects, {len(families)} families and {len(individuals)} individuals with '
+            f'{num_tokens} search tokens in {time.perf_counter() - start:.1f}s'
+        )
+        return [project.id for project in projects]
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils.text import compress_string
+import json
+import logging
+import os
+import time
+
+from seqr.views.utils.json_utils import create_json_response, JSON_RESPONSE_DUMPS_PARAMS
+
+logger = logging.getLogger(__name__)
+
+
+def _time_min(func, iterations):
+    durations = []
+    result = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+class Command(BaseCommand):
+    help = 'Compare json encoding time and response size across response formats for recorded API responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('response_files', nargs='+', help='Local paths to recorded json API responses')
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for file_path in options['response_files']:
+            with open(file_path, 'r') as f:
+                response_json = json.load(f)
+
+            file_name = os.path.basename(file_path)
+            for json_format in JSON_RESPONSE_DUMPS_PARAMS:
+                encode_time, content = _time_min(
+                    lambda: create_json_response(response_json, json_format=json_format).content, options['iterations'],
+                )
+                compress_time, compressed = _time_min(lambda: compress_string(content), options['iterations'])
+                logger.info(
+                    f'{file_name} ({json_format}): encoded {len(content)} bytes in {encode_time * 1000:.1f}ms, '
+                    f'gzipped to {len(compressed)} bytes in {compress_time * 1000:.1f}ms'
+                )
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from contextlib import ExitStack
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+import logging
+import time
+
+from seqr.models import Project, Family, Individual, Sample, SavedVariant
+from seqr.views.utils.orm_to_json_utils import _get_json_for_individuals, _get_json_for_families, get_json_for_samples, \
+    get_json_for_saved_variants
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Report query counts and serialization time for the core model json serializers for a given project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_guid')
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        project = Project.objects.get(guid=options['project_guid'])
+        serializers = {
+            'individuals': lambda: _get_json_for_individuals(
+                Individual.objects.filter(family__project=project), project_guid=project.guid, is_analyst=True,
+                add_sample_guids_field=True, add_hpo_details=True, has_case_review_perm=True,
+            ),
+            'families': lambda: _get_json_for_families(
+                Family.objects.filter(project=project), project_guid=project.guid, is_analyst=True,
+                add_individual_guids_field=True, has_case_review_perm=True,
+            ),
+            'samples': lambda: get_json_for_samples(
+                Sample.objects.filter(individual__family__project=project), project_guid=project.guid,
+            ),
+            'saved variants': lambda: get_json_for_saved_variants(
+                SavedVariant.objects.filter(family__project=project),
+            ),
+        }
+
+        for name, serialize in serializers.items():
+            durations = []
+            for _ in range(options['iterations']):
+                with ExitStack() as stack:
+                    queries = [stack.enter_context(CaptureQueriesContext(connections[db])) for db in connections
+                        if connections[db].vendor == 'postgresql']
+                    start = time.perf_counter()
+                    num_records = len(list(serialize()))
+                    durations.append(time.perf_counter() - start)
+            num_queries = sum(len(db_queries.captured_queries) for db_queries in queries)
+            logger.info(
+                f'{name}: serialized {num_records} records in {num_queries} queries '
+                f'(min {min(durations) * 1000:.1f}ms, max {max(durations) * 1000:.1f}ms)'
+            )
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import logging
+import time
+
+from seqr.models import Project
+from seqr.utils.logging_utils import QueryStats
+from seqr.views.utils.individual_utils import add_or_update_individuals_and_families
+from seqr.views.utils.pedigree_info_utils import JsonConstants
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Report pedigree upload times for a synthetic pedigree of trios, which is rolled back once the benchmark is done'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark_pedigree_upload', email='benchmark_pedigree_upload@seqr')
+            project = Project.objects.create(name='Benchmark pedigree upload', created_by=user)
+            records = self._get_pedigree_records(options['rows'])
+            # The first upload creates all the families and individuals, the second upload updates them with no changes
+            for upload_type in ['create', 'no-op update']:
+                start = time.perf_counter()
+                with QueryStats() as query_stats:
+                    _, num_families, num_individuals = add_or_update_individuals_and_families(
+                        project, [dict(record) for record in records], user, get_created_counts=True,
+                        skip_gt_stats_rebuild=True,
+                    )
+                logger.info(
+                    f'Uploaded {len(records)} rows ({upload_type}, {num_families} new families and {num_individuals} '
+                    f'new individuals) in {time.perf_counter() - start:.1f}s with {query_stats.num_queries} queries '
+                    f'({query_stats.query_time:.1f}s)'
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _get_pedigree_records(num_rows):
+        records = []
+        for i in range(num_rows):
+            family_id = f'BENCH_{i // 3}'
+            record = {
+                JsonConstants.FAMILY_ID_COLUMN: family_id,
+                JsonConstants.INDIVIDUAL_ID_COLUMN: f'{family_id}_{i % 3}',
+                JsonConstants.SEX_COLUMN: ['M', 'F', 'U'][i % 3],
+                JsonConstants.AFFECTED_COLUMN: 'A' if i % 3 == 2 else 'N',
+            }
+            if i % 3 == 2:
+                record.update({
+                    JsonConstants.PATERNAL_ID_COLUMN: f'{family_id}_0',
+                    JsonConstants.MATERNAL_ID_COLUMN: f'{family_id}_1',
+                    JsonConstants.FAMILY_NOTES_COLUMN: f'Benchmark family {i // 3}',
+                })
+            records.append(record)
+        return records
@@ -6,11 +6,15 @@ import tqdm
 
 from seqr.models import IgvSample
 from seqr.utils import communication_utils
-from seqr.utils.file_utils import does_file_exist
+from seqr.utils.file_utils import do_files_exist
+from seqr.utils.redis_utils import safe_redis_get_json, safe_redis_set_json, safe_redis_delete
 from settings import SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL
 
 logger = logging.getLogger(__name__)
 
+CHECKPOINT_CACHE_KEY = 'check_bam_cram_paths__checkpoint'
+CHECKPOINT_EXPIRE = 60 * 60 * 24 * 7
+
 
 class Command(BaseCommand):
     help = 'Checks all gs:// bam or cram paths and, if a file no longer exists, deletes the path from the database'
@@ -22,6 +26,11 @@ class Command(BaseCommand):
             action="store_true",
             help='Only print missing paths without updating the database',
         )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of paths to check at a time. Progress is saved after each batch, so an interrupted run resumes '
+                 'from the last completed batch',
+        )
         parser.add_argument('args', nargs='*', help='only check paths in these project name(s)')
 
     def handle(self, *args, **options):
@@ -33,24 +42,36 @@ class Command(BaseCommand):
             file_path__startswith='gs://'
         ).order_by('id').prefetch_related('individual', 'individual__family__project')
 
+        checkpoint_args = {'projects': sorted(args), 'dryRun': bool(options.get('dry_run'))}
+        checkpoint = safe_redis_get_json(CHECKPOINT_CACHE_KEY)
+        if checkpoint and checkpoint['args'] == checkpoint_args:
+            logger.info(f'Resuming bam/cram path check after sample {checkpoint["lastSampleId"]}')
+        else:
+            checkpoint = {'args': checkpoint_args, 'lastSampleId': None, 'numChecked': 0, 'missing': []}
+        if checkpoint['lastSampleId']:
+            samples = samples.filter(id__gt=checkpoint['lastSampleId'])
+        samples = list(samples)
+
+        batch_size = options['batch_size']
+        with tqdm.tqdm(total=len(samples), unit=" samples") as progress:
+            for i in range(0, len(samples), batch_size):
+                batch = samples[i:i + batch_size]
+                self._check_samples(batch, checkpoint, dry_run=options.get('dry_run'))
+                checkpoint['lastSampleId'] = batch[-1].id
+                checkpoint['numChecked'] += len(batch)
+                safe_redis_set_json(CHECKPOINT_CACHE_KEY, checkpoint, expire=CHECKPOINT_EXPIRE)
+                progress.update(len(batch))
+
+        safe_redis_delete(CHECKPOINT_CACHE_KEY)
+
         missing_counter = collections.defaultdict(int)
-        guids_of_samples_with_missing_file = set()
         project_name_to_missing_paths = collections.defaultdict(list)
-        for sample in tqdm.tqdm(samples, unit=" samples"):
-            if not does_file_exist(sample.file_path):
-                individual_id = sample.individual.individual_id
-                project_name = sample.individual.family.project.name
-                missing_counter[project_name] += 1
-                project_name_to_missing_paths[project_name].append((individual_id, sample.file_path))
-                logger.info('Individual: {}  file not found: {}'.format(individual_id, sample.file_path))
-                if not options.get('dry_run'):
-                    guids_of_samples_with_missing_file.add(sample.guid)
-
-        if len(guids_of_samples_with_missing_file) > 0:
-            IgvSample.bulk_delete(user=None, guid__in=guids_of_samples_with_missing_file)
+        for project_name, individual_id, path in checkpoint['missing']:
+            missing_counter[project_name] += 1
+            project_name_to_missing_paths[project_name].append((individual_id, path))
 
         logger.info('---- DONE ----')
-        logger.info('Checked {} samples'.format(len(samples)))
+        logger.info('Checked {} samples'.format(checkpoint['numChecked']))
         if missing_counter:
             logger.info('{} files not found:'.format(sum(missing_counter.values())))
             for project_name, c in sorted(missing_counter.items(), key=lambda t: -t[1]):
@@ -65,3 +86,20 @@ class Command(BaseCommand):
                         "  {}   {}".format(individual_id, path) for individual_id, path in missing_paths_list
                     ])
                 communication_utils.safe_post_to_slack(SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL, slack_message)
+
+    @staticmethod
+    def _check_samples(samples, checkpoint, dry_run=False):
+        # Storage errors are raised rather than reported as missing files, so the run stops without deleting anything
+        # and can be resumed from the last checkpointed batch
+        files_exist = do_files_exist([sample.file_path for sample in samples])
+        guids_of_samples_with_missing_file = set()
+        for sample in samples:
+            if not files_exist[sample.file_path]:
+                individual_id = sample.individual.individual_id
+                checkpoint['missing'].append([sample.individual.family.project.name, individual_id, sample.file_path])
+                logger.info('Individual: {}  file not found: {}'.format(individual_id, sample.file_path))
+                if not dry_run:
+                    guids_of_samples_with_missing_file.add(sample.guid)
+
+        if guids_of_samples_with_missing_file:
+            IgvSample.bulk_delete(user=None, guid__in=guids_of_samples_with_missing_file)
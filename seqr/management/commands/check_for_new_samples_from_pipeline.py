@@ -1,18 +1,24 @@
 import os
 from collections import defaultdict
+from contextlib import contextmanager, ExitStack
 
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
 import json
 import logging
 import re
+import time
 
-from clickhouse_search.search import get_clickhouse_genotypes
+from clickhouse_search.search import get_clickhouse_family_genotypes
 from reference_data.models import GENOME_VERSION_LOOKUP
-from seqr.models import Family, Sample, SavedVariant, Project, Individual
+from seqr.models import Family, Sample, SavedVariant, Project, Individual, PipelineRunIngest
 from seqr.utils.communication_utils import safe_post_to_slack, send_project_email
 from seqr.utils.file_utils import file_iter, list_files, is_google_bucket_file_path
+from seqr.utils.redis_utils import get_redis_lock
 from seqr.utils.search.add_data_utils import notify_search_data_loaded, update_airtable_loading_tracking_status
+from seqr.utils.thread_utils import map_in_threads
 from seqr.views.utils.airtable_utils import AirtableSession, LOADABLE_PDO_STATUSES, AVAILABLE_PDO_STATUS
 from seqr.views.utils.dataset_utils import match_and_update_search_samples
 from seqr.views.utils.export_utils import write_multiple_files
@@ -37,6 +43,7 @@ CLICKHOUSE_DATASET_TYPE_MAP = {
     Sample.DATASET_TYPE_SV_CALLS: f'{Sample.DATASET_TYPE_SV_CALLS}_WGS',
 }
 RELATEDNESS_CHECK_NAME = 'relatedness_check'
+GENOTYPE_UPDATE_FAMILY_BATCH_SIZE = 500
 
 PDO_COPY_FIELDS = [
     'PDO', 'PDOStatus', 'SeqrLoadingDate', 'GATKShortReadCallsetPath', 'SeqrProjectURL', 'TerraProjectURL',
@@ -51,6 +58,31 @@ QC_FILTER_FLAG_COL_MAP = {
     'coverage_genome': 'mean_coverage'
 }
 
+PROJECT_LOCK_KEY = 'check_for_new_samples__project_lock'
+PROJECT_LOCK_TIMEOUT = 12 * 60 * 60
+PROJECT_LOCK_BLOCKING_TIMEOUT = 5 * 60
+
+
+class ProjectLockedError(Exception):
+    pass
+
+
+@contextmanager
+def _lock_projects(project_ids):
+    # Locks are shared across processes, and are always acquired in the same order so concurrent runs which share
+    # projects can not deadlock
+    with ExitStack() as stack:
+        for project_id in sorted(project_ids):
+            lock = get_redis_lock(
+                f'{PROJECT_LOCK_KEY}__{project_id}', timeout=PROJECT_LOCK_TIMEOUT,
+                blocking_timeout=PROJECT_LOCK_BLOCKING_TIMEOUT,
+            )
+            if not lock.acquire():
+                raise ProjectLockedError(f'Timed out waiting for another process to release project {project_id}')
+            stack.callback(lock.release)
+        yield
+
+
 class Command(BaseCommand):
     help = 'Check for newly loaded seqr samples'
 
@@ -58,13 +90,24 @@ class Command(BaseCommand):
         parser.add_argument('--genome_version')
         parser.add_argument('--dataset_type')
         parser.add_argument('--run-version')
+        parser.add_argument(
+            '--max-project-workers', type=int, default=1,
+            help='Number of projects to reload saved variant genotypes for concurrently',
+        )
+        parser.add_argument(
+            '--max-run-workers', type=int, default=1,
+            help='Number of runs for different genome versions and dataset types to load concurrently',
+        )
 
     def handle(self, *args, **options):
         runs = self._get_runs(**options)
 
         success_run_dirs = [run_dir for run_dir, run_details in runs.items() if CLICKHOUSE_SUCCESS_FILE_NAME in run_details['files']]
         if success_run_dirs:
-            self._load_success_runs(runs, success_run_dirs)
+            self._load_success_runs(
+                runs, success_run_dirs, max_project_workers=options['max_project_workers'],
+                max_run_workers=options['max_run_workers'],
+            )
         if not success_run_dirs:
             user_args = [f'{k}={options.get(k)}' for k in RUN_PATH_FIELDS if options.get(k)]
             if user_args:
@@ -76,30 +119,74 @@ class Command(BaseCommand):
         logger.info('DONE')
 
 
-    def _load_success_runs(self, runs, success_run_dirs):
+    def _load_success_runs(self, runs, success_run_dirs, max_project_workers=1, max_run_workers=1):
         loaded_runs = set(Sample.objects.filter(data_source__isnull=False).values_list('data_source', flat=True))
-        new_runs = {
-            run_dir: run_details for run_dir, run_details in runs.items()
-            if run_dir in success_run_dirs and run_details['run_version'] not in loaded_runs
+        ingests = {
+            (ingest.genome_version, ingest.dataset_type, ingest.run_version): ingest
+            for ingest in PipelineRunIngest.objects.filter(
+                run_version__in={runs[run_dir]['run_version'] for run_dir in success_run_dirs},
+            )
         }
+        new_runs = []
+        for run_dir, run_details in runs.items():
+            if run_dir not in success_run_dirs:
+                continue
+            ingest = ingests.get((run_details['genome_version'], run_details['dataset_type'], run_details['run_version']))
+            # Runs with loaded samples are only ingested again if a previous ingest was interrupted
+            if run_details['run_version'] in loaded_runs and (ingest is None or ingest.completed_date):
+                continue
+            new_runs.append((run_dir, run_details, ingest))
+
         if not new_runs:
             logger.info(f'Data already loaded for all {len(success_run_dirs)} runs')
             return
 
         logger.info(f'Loading new samples from {len(success_run_dirs)} run(s)')
-        for run_dir, run_details in new_runs.items():
-            try:
-                if CLICKHOUSE_MIGRATION_SENTINEL in run_details["run_version"]:
-                    logging.info(f'Skipping ClickHouse migration {run_details["genome_version"]}/{run_details["dataset_type"]}: {run_details["run_version"]}')
-                    continue
-                metadata_path = os.path.join(run_dir, 'metadata.json')
-                self._load_new_samples(metadata_path, **run_details)
-            except Exception as e:
-                logger.error(f'Error loading {run_details["run_version"]}: {e}')
+        if max_run_workers > 1:
+            # Runs for the same genome version and dataset type are loaded in order, as later runs supersede earlier ones
+            runs_by_dataset = defaultdict(list)
+            for run in new_runs:
+                runs_by_dataset[(run[1]['genome_version'], run[1]['dataset_type'])].append(run)
+
+            def _load_dataset_runs(dataset_runs):
+                for run in dataset_runs:
+                    self._load_run(*run, max_project_workers=max_project_workers)
+
+            list(map_in_threads(_load_dataset_runs, runs_by_dataset.values(), max_workers=max_run_workers))
+        else:
+            for run in new_runs:
+                self._load_run(*run, max_project_workers=max_project_workers)
 
         # Reset cached results for all projects, as seqr AFs will have changed for all projects when new data is added
         reset_cached_search_results(project=None)
 
+    @classmethod
+    def _load_run(cls, run_dir, run_details, ingest, max_project_workers=1):
+        try:
+            if CLICKHOUSE_MIGRATION_SENTINEL in run_details["run_version"]:
+                logging.info(f'Skipping ClickHouse migration {run_details["genome_version"]}/{run_details["dataset_type"]}: {run_details["run_version"]}')
+                return
+            if ingest is None:
+                ingest, _ = PipelineRunIngest.objects.get_or_create(
+                    genome_version=run_details['genome_version'], dataset_type=run_details['dataset_type'],
+                    run_version=run_details['run_version'],
+                )
+            elif ingest.completed_date:
+                # The samples from a previously completed ingest have since been removed, so the run is fully reloaded
+                ingest.restart()
+            elif ingest.completed_steps:
+                logger.info(f'Resuming ingest of {run_details["run_version"]} after {", ".join(ingest.completed_steps)}')
+            metadata_path = os.path.join(run_dir, 'metadata.json')
+            cls._load_new_samples(metadata_path, ingest=ingest, max_project_workers=max_project_workers, **run_details)
+            ingest.complete()
+        except ProjectLockedError as e:
+            # The ingest is left incomplete, so the run is picked up again by the next check for new samples
+            logger.warning(f'Skipping {run_details["run_version"]}: {e}')
+        except Exception as e:
+            logger.error(f'Error loading {run_details["run_version"]}: {e}')
+            if ingest:
+                ingest.set_error(e)
+
     @classmethod
     def _get_runs(cls, **kwargs):
         path = cls._run_path(lambda field: kwargs.get(field, '*') or '*')
@@ -191,7 +278,7 @@ class Command(BaseCommand):
         })
 
     @classmethod
-    def _load_new_samples(cls, metadata_path, genome_version, dataset_type, run_version, **kwargs):
+    def _load_new_samples(cls, metadata_path, genome_version, dataset_type, run_version, ingest, max_project_workers=1, **kwargs):
         clickhouse_dataset_type = CLICKHOUSE_DATASET_TYPE_MAP.get(dataset_type, dataset_type)
         dataset_type = DATASET_TYPE_MAP.get(dataset_type, dataset_type)
 
@@ -227,40 +314,61 @@ class Command(BaseCommand):
             )
 
         sample_type = metadata['sample_type']
-        logger.info(f'Loading {len(sample_project_tuples)} {sample_type} {dataset_type} samples in {len(samples_by_project)} projects')
-        new_samples, updated_samples, *args = match_and_update_search_samples(
-            projects=samples_by_project.keys(),
-            sample_project_tuples=sample_project_tuples,
-            sample_data={'data_source': run_version, 'elasticsearch_index': ';'.join(metadata['callsets'])},
-            sample_type=sample_type,
-            dataset_type=dataset_type,
-            user=None,
-        )
-
-        new_samples_by_project = dict(new_samples.values('individual__family__project').annotate(
-            samples=ArrayAgg('sample_id', distinct=True),
-        ).values_list('individual__family__project', 'samples'))
-
-        split_project_pdos = cls._report_loading_success(
-            dataset_type, sample_type, run_version, samples_by_project, new_samples_by_project,
-        )
-        try:
-            failed_family_guids = cls._report_loading_failures(metadata, split_project_pdos)
-            run_family_guids.update(failed_family_guids)
-        except Exception as e:
-            logger.error(f'Error reporting loading failure for {run_version}: {e}')
+        with _lock_projects([project.id for project in samples_by_project.keys()]):
+            if ingest.is_step_complete(PipelineRunIngest.STEP_SAMPLES):
+                new_samples = Sample.objects.filter(guid__in=ingest.new_sample_guids)
+                updated_samples = Sample.objects.filter(guid__in=ingest.updated_sample_guids)
+            else:
+                logger.info(f'Loading {len(sample_project_tuples)} {sample_type} {dataset_type} samples in {len(samples_by_project)} projects')
+                # Samples are only new the first time they are activated, so they are checkpointed in the same
+                # transaction to ensure an interrupted ingest still sends notifications for them when resumed
+                with transaction.atomic():
+                    new_samples, updated_samples, *args = match_and_update_search_samples(
+                        projects=samples_by_project.keys(),
+                        sample_project_tuples=sample_project_tuples,
+                        sample_data={'data_source': run_version, 'elasticsearch_index': ';'.join(metadata['callsets'])},
+                        sample_type=sample_type,
+                        dataset_type=dataset_type,
+                        user=None,
+                    )
+                    ingest.complete_step(
+                        PipelineRunIngest.STEP_SAMPLES,
+                        new_sample_guids=list(new_samples.values_list('guid', flat=True)),
+                        updated_sample_guids=list(updated_samples.values_list('guid', flat=True)),
+                    )
 
-        # Update sample qc
-        if 'sample_qc' in metadata:
-            try:
-                cls._update_individuals_sample_qc(sample_type, run_family_guids, metadata['sample_qc'])
-            except Exception as e:
-                logger.error(f'Error updating individuals sample qc {run_version}: {e}')
+            failed_families_by_guid = cls._get_failed_families(metadata)
+            run_family_guids.update(failed_families_by_guid.keys())
+            if not ingest.is_step_complete(PipelineRunIngest.STEP_NOTIFICATIONS):
+                new_samples_by_project = dict(new_samples.values('individual__family__project').annotate(
+                    samples=ArrayAgg('sample_id', distinct=True),
+                ).values_list('individual__family__project', 'samples'))
 
-        # Reload saved variant JSON
-        update_projects_saved_variant_json([
-            (project.id, project.guid, project.name, project.genome_version, families) for project, families in families_by_project.items()
-        ], dataset_type=dataset_type, update_function=cls._update_project_saved_variant_genotypes, samples=updated_samples, clickhouse_dataset_type=clickhouse_dataset_type)
+                split_project_pdos = cls._report_loading_success(
+                    dataset_type, sample_type, run_version, samples_by_project, new_samples_by_project,
+                )
+                try:
+                    cls._report_loading_failures(metadata, split_project_pdos, failed_families_by_guid)
+                except Exception as e:
+                    logger.error(f'Error reporting loading failure for {run_version}: {e}')
+                ingest.complete_step(PipelineRunIngest.STEP_NOTIFICATIONS)
+
+            # Update sample qc
+            if not ingest.is_step_complete(PipelineRunIngest.STEP_SAMPLE_QC):
+                if 'sample_qc' in metadata:
+                    try:
+                        cls._update_individuals_sample_qc(sample_type, run_family_guids, metadata['sample_qc'])
+                    except Exception as e:
+                        logger.error(f'Error updating individuals sample qc {run_version}: {e}')
+                ingest.complete_step(PipelineRunIngest.STEP_SAMPLE_QC)
+
+            # Reload saved variant JSON
+            if not ingest.is_step_complete(PipelineRunIngest.STEP_SAVED_VARIANTS):
+                update_projects_saved_variant_json([
+                    (project.id, project.guid, project.name, project.genome_version, families) for project, families in families_by_project.items()
+                ], dataset_type=dataset_type, update_function=cls._update_project_saved_variant_genotypes, samples=updated_samples,
+                    clickhouse_dataset_type=clickhouse_dataset_type, max_workers=max_project_workers)
+                ingest.complete_step(PipelineRunIngest.STEP_SAVED_VARIANTS)
 
     @classmethod
     def _is_internal_project(cls, project):
@@ -284,14 +392,18 @@ class Command(BaseCommand):
 
         return split_project_pdos
 
+    @staticmethod
+    def _get_failed_families(metadata):
+        failed_family_samples = metadata.get('failed_family_samples', {})
+        return {f['guid']: f for f in Family.objects.filter(
+            guid__in={family for families in failed_family_samples.values() for family in families}
+        ).values('guid', 'family_id', 'project__name')}
+
     @classmethod
-    def _report_loading_failures(cls, metadata, split_project_pdos):
+    def _report_loading_failures(cls, metadata, split_project_pdos, failed_families_by_guid):
         # Send failure notifications
         relatedness_check_file_path = metadata.get('relatedness_check_file_path')
         failed_family_samples = metadata.get('failed_family_samples', {})
-        failed_families_by_guid = {f['guid']: f for f in Family.objects.filter(
-            guid__in={family for families in failed_family_samples.values() for family in families}
-        ).values('guid', 'family_id', 'project__name')}
         if failed_families_by_guid:
             Family.bulk_update(
                 user=None, update_json={'analysis_status': Family.ANALYSIS_STATUS_LOADING_FAILED},
@@ -319,7 +431,6 @@ class Command(BaseCommand):
             safe_post_to_slack(
                 SEQR_SLACK_LOADING_NOTIFICATION_CHANNEL, '\n\n'.join(messages),
             )
-        return set(failed_families_by_guid.keys())
 
     @staticmethod
     def _update_pdos(session, project_guid, sample_ids):
@@ -396,25 +507,39 @@ class Command(BaseCommand):
 
     @classmethod
     def _update_project_saved_variant_genotypes(cls, project_id, genome_version, family_guids, project_guid, samples=None, clickhouse_dataset_type=None, **kwargs):
-        updates = {}
-        for family_guid in family_guids:
-            variant_models_by_key = {
-                v.key: v for v in get_saved_variants(genome_version, project_id, [family_guid], clickhouse_dataset_type=clickhouse_dataset_type)
-            }
-            if not variant_models_by_key:
-                continue
-            variants = []
-            genotypes_by_key = get_clickhouse_genotypes(
-                project_guid, [family_guid], genome_version, clickhouse_dataset_type, variant_models_by_key.keys(), samples,
+        start = time.perf_counter()
+        saved_variants = get_saved_variants(
+            genome_version, project_id, family_guids, clickhouse_dataset_type=clickhouse_dataset_type,
+        ).annotate(family_guid=F('family__guid'))
+        variants_by_family_key = {(v.family_guid, v.key): v for v in saved_variants}
+        if not variants_by_family_key:
+            return {}
+
+        keys_by_family = defaultdict(set)
+        for family_guid, key in variants_by_family_key.keys():
+            keys_by_family[family_guid].add(key)
+        variant_families = sorted(keys_by_family.keys())
+
+        variants = []
+        for i in range(0, len(variant_families), GENOTYPE_UPDATE_FAMILY_BATCH_SIZE):
+            batch_family_guids = variant_families[i:i + GENOTYPE_UPDATE_FAMILY_BATCH_SIZE]
+            keys = {key for family_guid in batch_family_guids for key in keys_by_family[family_guid]}
+            genotypes_by_family_key = get_clickhouse_family_genotypes(
+                project_guid, batch_family_guids, genome_version, clickhouse_dataset_type, keys, samples,
             )
-            for key, genotypes in genotypes_by_key.items():
-                variant = variant_models_by_key[key]
-                variant.genotypes = genotypes
-                variants.append(variant)
-            logger.info(f'Reloading genotypes for {len(variants)} {clickhouse_dataset_type} variants in family {family_guid}')
+            for family_key, genotypes in genotypes_by_family_key.items():
+                variant = variants_by_family_key.get(family_key)
+                if variant:
+                    variant.genotypes = genotypes
+                    variants.append(variant)
+
+        if variants:
             SavedVariant.bulk_update_models(None, variants, ['genotypes'])
-            updates.update({v.id: v for v in variants})
-        return updates
+        logger.info(
+            f'Reloading genotypes for {len(variants)} {clickhouse_dataset_type} variants in {len(variant_families)} families',
+            extra={'detail': {'projectGuid': project_guid, 'durationSeconds': round(time.perf_counter() - start, 3)}},
+        )
+        return {v.id: v for v in variants}
 
 
 update_individuals_sample_qc = Command._update_individuals_sample_qc
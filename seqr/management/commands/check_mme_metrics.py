@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+import logging
+
+from matchmaker.matchmaker_utils import compute_mme_metrics, update_mme_metrics, MME_METRIC_FIELDS
+from matchmaker.models import MatchmakerMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Check that the precomputed Matchmaker metrics are consistent with the current submissions and queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild the metrics if they are inconsistent')
+
+    def handle(self, *args, **options):
+        metrics = MatchmakerMetrics.objects.first()
+        if not metrics:
+            raise CommandError('No precomputed MME metrics found')
+
+        expected = compute_mme_metrics()
+        mismatches = [
+            '{}: expected {}, found {}'.format(metric, expected[field], getattr(metrics, field))
+            for metric, field in MME_METRIC_FIELDS.items() if expected[field] != getattr(metrics, field)
+        ]
+        if not mismatches:
+            logger.info('MME metrics are consistent')
+            return
+
+        for mismatch in mismatches:
+            logger.warning(mismatch)
+        if options['fix']:
+            update_mme_metrics()
+            logger.info('Rebuilt MME metrics')
+        else:
+            raise CommandError('Found {} inconsistent MME metrics'.format(len(mismatches)))
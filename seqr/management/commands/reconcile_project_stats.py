@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from seqr.models import Project, ProjectStats
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed project summary stats and fix any that are missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', action='append', dest='projects', help='Project guid(s) to reconcile')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['projects']:
+            projects = projects.filter(guid__in=options['projects'])
+        project_guids = dict(projects.values_list('id', 'guid'))
+
+        stored_stats = {
+            stats['project_id']: stats for stats in
+            ProjectStats.objects.filter(project_id__in=project_guids).values('project_id', *ProjectStats.STATS_FIELDS)
+        }
+        expected_stats = ProjectStats.compute_stats(list(project_guids.keys()))
+
+        to_update = []
+        for project_id, expected in sorted(expected_stats.items()):
+            stored = stored_stats.get(project_id)
+            if not stored:
+                logger.warning(f'{project_guids[project_id]}: missing stats')
+                to_update.append(project_id)
+                continue
+            mismatches = [
+                f'{field}: expected {value}, found {stored[field]}' for field, value in expected.items() if stored[field] != value
+            ]
+            if mismatches:
+                logger.warning(f'{project_guids[project_id]}: {"; ".join(mismatches)}')
+                to_update.append(project_id)
+
+        ProjectStats.update_stats(to_update)
+        logger.info(f'Reconciled stats for {len(to_update)} of {len(project_guids)} projects')
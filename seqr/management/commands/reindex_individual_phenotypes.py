@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+import logging
+from tqdm import tqdm
+
+from seqr.models import Individual, IndividualHpoTerm
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the HPO term index used for looking up individuals by phenotype'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        individual_ids = list(Individual.objects.filter(
+            Q(features__isnull=False) | Q(absent_features__isnull=False)).order_by('id').values_list('id', flat=True))
+        logger.info('Reindexing phenotypes for {} individuals'.format(len(individual_ids)))
+        IndividualHpoTerm.objects.exclude(individual_id__in=individual_ids).delete()
+        batch_size = options['batch_size']
+        num_terms = 0
+        for i in tqdm(range(0, len(individual_ids), batch_size), unit=' batches'):
+            num_terms += len(IndividualHpoTerm.update_terms(individual_ids[i:i + batch_size]))
+        logger.info('Indexed {} HPO terms'.format(num_terms))
+        logger.info('Done')
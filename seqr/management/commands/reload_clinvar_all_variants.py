@@ -1,22 +1,29 @@
 import gzip
 import logging
+import os
 import requests
 import xml
 import defusedxml.ElementTree as ET
+import django
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from django.db import connections
 from django.core.management.base import BaseCommand, CommandError
-from collections import defaultdict
+from collections import defaultdict, deque
 from settings import SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL
 import re
 import shutil
 from string import Template
 import tempfile
+import time
+from tqdm import tqdm
 from typing import Optional, Union
 
 from clickhouse_backend import models
 from clickhouse_search.models import ClinvarAllVariantsGRCh37SnvIndel, ClinvarAllVariantsSnvIndel, ClinvarAllVariantsMito
 from reference_data.models import DataVersions
 from seqr.utils.communication_utils import safe_post_to_slack
+from seqr.utils.redis_utils import safe_redis_get_json, safe_redis_set_json, safe_redis_delete
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +43,14 @@ def replace_spaces_with_underscores(value: Union[str, list[str], list[tuple[str,
         return [s.replace(' ', '_') for s in value]
     raise TypeError("Expected str or list[str]")
 
-BATCH_SIZE = 1000
+# Number of VariationArchive records parsed per chunk. Each chunk is inserted as a single native block per table
+BATCH_SIZE = 10000
+READ_SIZE = 16 * 1024 * 1024
+CHECKPOINT_CACHE_KEY = 'reload_clinvar_all_variants__checkpoint'
+CHECKPOINT_EXPIRE = 60 * 60 * 24 * 7
+RELEASE_TAG = b'<ClinVarVariationRelease'
+RELEASE_END_TAG = b'</ClinVarVariationRelease>'
+VARIATION_ARCHIVE_END_TAG = b'</VariationArchive>'
 CLINVAR_ASSERTIONS = replace_underscores_with_spaces(ClinvarAllVariantsSnvIndel.CLINVAR_ASSERTIONS)
 CLINVAR_CONFLICTING_CLASSICATIONS_OF_PATHOGENICITY = replace_underscores_with_spaces(ClinvarAllVariantsSnvIndel.CLINVAR_CONFLICTING_CLASSICATIONS_OF_PATHOGENICITY)
 CLINVAR_CONFLICTING_DATA_FROM_SUBMITTERS = 'conflicting data from submitters'
@@ -241,61 +255,110 @@ def extract_variant_info(elem: xml.etree.ElementTree.Element, new_version: str)
             **props,
         )
 
+def read_release_tag(gzipped_file) -> tuple[bytes, bytearray]:
+    buffer = bytearray()
+    while True:
+        block = gzipped_file.read(READ_SIZE)
+        buffer += block
+        start = buffer.find(RELEASE_TAG)
+        end = buffer.find(b'>', start) if start != -1 else -1
+        if end != -1:
+            return bytes(buffer[start:end + 1]), buffer[end + 1:]
+        if not block:
+            raise CommandError('Failed to find the ClinVarVariationRelease node')
+
+def split_variation_archives(gzipped_file, buffer: bytearray, batch_size: int):
+    # Splits the decompressed stream on VariationArchive boundaries so chunks can be parsed independently
+    search_position = 0
+    num_records = 0
+    while True:
+        end = buffer.find(VARIATION_ARCHIVE_END_TAG, search_position)
+        if end != -1:
+            search_position = end + len(VARIATION_ARCHIVE_END_TAG)
+            num_records += 1
+            if num_records == batch_size:
+                yield bytes(buffer[:search_position]), num_records
+                del buffer[:search_position]
+                search_position = 0
+                num_records = 0
+            continue
+        block = gzipped_file.read(READ_SIZE)
+        if not block:
+            break
+        buffer += block
+    if num_records:
+        yield bytes(buffer[:search_position]), num_records
+
+def parse_variation_archives(release_tag: bytes, chunk: bytes, new_version: str, db_tables: list[str]) -> dict[str, list[list]]:
+    # Runs in a worker process, so returns plain insert rows rather than model instances
+    connection = connections['clickhouse_write']
+    root = ET.fromstring(release_tag + chunk + RELEASE_END_TAG)
+    table_rows = {db_table: [] for db_table in db_tables}
+    for elem in root.iterfind('VariationArchive'):
+        for obj in extract_variant_info(elem, new_version):
+            rows = table_rows.get(obj._meta.db_table)
+            if rows is not None:
+                rows.append([
+                    field.get_db_prep_save(getattr(obj, field.attname), connection)
+                    for field in obj._meta.concrete_fields
+                ])
+    return table_rows
+
+def insert_rows(model: type[models.ClickhouseModel], rows: list[list]):
+    columns = ', '.join(f'`{field.column}`' for field in model._meta.concrete_fields)
+    with connections['clickhouse_write'].cursor() as cursor:
+        # A bare VALUES clause sends the rows to ClickHouse as a native columnar block
+        cursor.execute(f'INSERT INTO `{model._meta.db_table}` ({columns}) VALUES', rows)
+
 class Command(BaseCommand):
     help = 'Reload all clinvar variants from weekly NCBI xml release'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Number of parallel parsing processes')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Number of VariationArchive records per chunk')
+
     def handle(self, *args, **options):
-        model_to_batch = {
-            ClinvarAllVariantsGRCh37SnvIndel: [],
-            ClinvarAllVariantsSnvIndel: [],
-            ClinvarAllVariantsMito: [],
-        }
-        new_version = None
+        all_models = [ClinvarAllVariantsGRCh37SnvIndel, ClinvarAllVariantsSnvIndel, ClinvarAllVariantsMito]
         with tempfile.TemporaryDirectory() as tmpdir:
             with requests.get(WEEKLY_XML_RELEASE, stream=True, timeout=10) as r, \
                  tempfile.NamedTemporaryFile(dir=tmpdir, delete=False) as tmpfile:
                 r.raise_for_status()
                 shutil.copyfileobj(r.raw, tmpfile)
             with gzip.open(tmpfile.name, 'rb') as gzipped_file:
-                for event, elem in ET.iterparse(gzipped_file, events=('start', 'end')):
-                    # Handle parsing the current date.
-                    if event == 'start' and elem.tag == 'ClinVarVariationRelease':
-                        new_version = elem.attrib['ReleaseDate']
-                        existing_version_obj = DataVersions.objects.filter(data_model_name='Clinvar').first()
-                        if existing_version_obj:
-                            if existing_version_obj.version == new_version:
-                                logger.info(f'Clinvar ClickHouse tables already successfully updated to {new_version}, gracefully exiting.')
-                                return
-                        logger.info(f'Updating Clinvar ClickHouse tables to {new_version} from {existing_version_obj and existing_version_obj.version}.')
-                        # Drop any currently existing variants in the table that may exist due to a
-                        # previously failed partial run.  Note that we validate that the Postgresql existing version
-                        # is present in ClickHouse to account for the situation where Postgresql has an incorrect
-                        # version.
-                        if existing_version_obj and ClinvarAllVariantsSnvIndel.objects.filter(version=existing_version_obj.version).exists():
-                            for model in model_to_batch.keys():
-                                with connections['clickhouse_write'].cursor() as cursor:
-                                    cursor.execute(
-                                        f"ALTER TABLE `{model._meta.db_table}` DROP PARTITION '{new_version}';"
-                                    )
-                    # Handle parsing variants
-                    if event == 'end' and elem.tag == 'VariationArchive' and new_version:
-                        for obj in extract_variant_info(elem, new_version):
-                            for model, batch in model_to_batch.items():
-                                if isinstance(obj, model):
-                                    batch.append(obj)
-                                    if len(batch) == BATCH_SIZE:
-                                        model.objects.using('clickhouse_write').bulk_create(batch)
-                                        batch.clear()
-                        elem.clear()
-
-        for model, batch in model_to_batch.items():
-            if batch:
-                model.objects.using('clickhouse_write').bulk_create(batch)
+                release_tag, buffer = read_release_tag(gzipped_file)
+                new_version = ET.fromstring(release_tag + RELEASE_END_TAG).attrib['ReleaseDate']
+                existing_version_obj = DataVersions.objects.filter(data_model_name='Clinvar').first()
+                if existing_version_obj:
+                    if existing_version_obj.version == new_version:
+                        logger.info(f'Clinvar ClickHouse tables already successfully updated to {new_version}, gracefully exiting.')
+                        return
+                logger.info(f'Updating Clinvar ClickHouse tables to {new_version} from {existing_version_obj and existing_version_obj.version}.')
+
+                checkpoint = safe_redis_get_json(CHECKPOINT_CACHE_KEY)
+                if checkpoint and checkpoint['version'] == new_version and checkpoint['batch_size'] == options['batch_size']:
+                    logger.info(f'Resuming Clinvar ClickHouse update to {new_version} from the last completed chunk.')
+                else:
+                    checkpoint = {'version': new_version, 'batch_size': options['batch_size'], 'completed_chunks': {}}
+                    # Drop any currently existing variants in the table that may exist due to a
+                    # previously failed partial run.  Note that we validate that the Postgresql existing version
+                    # is present in ClickHouse to account for the situation where Postgresql has an incorrect
+                    # version.
+                    if existing_version_obj and ClinvarAllVariantsSnvIndel.objects.filter(version=existing_version_obj.version).exists():
+                        for model in all_models:
+                            with connections['clickhouse_write'].cursor() as cursor:
+                                cursor.execute(
+                                    f"ALTER TABLE `{model._meta.db_table}` DROP PARTITION '{new_version}';"
+                                )
+
+                start = time.monotonic()
+                num_records = self._load_variants(gzipped_file, buffer, release_tag, new_version, all_models, checkpoint, options)
+                duration = time.monotonic() - start
+                logger.info(f'Loaded {num_records} Clinvar records in {duration:.0f}s ({num_records / duration:.0f} records/sec).')
 
         # Delete previous version & refresh the view.
         if existing_version_obj:
             with connections['clickhouse_write'].cursor() as cursor:
-                for model in model_to_batch.keys():
+                for model in all_models:
                     cursor.execute(
                         f"ALTER TABLE `{model._meta.db_table}` DROP PARTITION '{existing_version_obj.version}';"
                     )
@@ -315,5 +378,49 @@ class Command(BaseCommand):
                 data_model_name='Clinvar',
                 version=new_version
             )
+        safe_redis_delete(CHECKPOINT_CACHE_KEY)
         slack_message = f'Successfully updated Clinvar ClickHouse tables to {new_version}.'
         safe_post_to_slack(SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL, slack_message)
+
+    @staticmethod
+    def _load_variants(gzipped_file, buffer, release_tag, new_version, all_models, checkpoint, options):
+        # Chunks are parsed in parallel but inserted in order, so the checkpoint always marks a completed prefix of the
+        # file. Completion is tracked per table so a partially inserted chunk is never inserted twice.
+        completed_chunks = checkpoint['completed_chunks']
+        pending = deque()
+        num_records = 0
+        # Workers are spawned rather than forked so they never share this process's open database connections
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['processes'], mp_context=mp_context, initializer=django.setup) as executor, \
+             tqdm(unit=' records', unit_scale=True) as progress:
+
+            def _insert_next_chunk():
+                chunk_index, chunk_size, chunk_models, future = pending.popleft()
+                table_rows = future.result()
+                for model in chunk_models:
+                    rows = table_rows[model._meta.db_table]
+                    if rows:
+                        insert_rows(model, rows)
+                    completed_chunks[model._meta.db_table] = chunk_index
+                    safe_redis_set_json(CHECKPOINT_CACHE_KEY, checkpoint, expire=CHECKPOINT_EXPIRE)
+                progress.update(chunk_size)
+                return chunk_size
+
+            for chunk_index, (chunk, chunk_size) in enumerate(split_variation_archives(gzipped_file, buffer, options['batch_size'])):
+                chunk_models = [
+                    model for model in all_models if completed_chunks.get(model._meta.db_table, -1) < chunk_index
+                ]
+                if not chunk_models:
+                    progress.update(chunk_size)
+                    continue
+                future = executor.submit(
+                    parse_variation_archives, release_tag, chunk, new_version,
+                    [model._meta.db_table for model in chunk_models],
+                )
+                pending.append((chunk_index, chunk_size, chunk_models, future))
+                # Bound the number of in-flight chunks so the decompressed file is never fully held in memory
+                if len(pending) >= options['processes'] * 2:
+                    num_records += _insert_next_chunk()
+            while pending:
+                num_records += _insert_next_chunk()
+        return num_records
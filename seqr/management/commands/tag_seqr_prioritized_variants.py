@@ -2,8 +2,11 @@ from collections import defaultdict
 from datetime import datetime
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Q, F
+from django.db.models import Q, F, Value
 from django.db.models.functions import JSONObject
+from django.utils import timezone
+import hashlib
+import json
 
 from clickhouse_backend.models import ArrayField, StringField
 
@@ -12,12 +15,13 @@ from clickhouse_search.backend.functions import ArrayFilter, ArrayMap
 from clickhouse_search.search import get_search_queryset, get_transcripts_queryset, add_individual_guids, \
     get_data_type_comp_het_results_queryset, get_multi_data_type_comp_het_results_queryset, SELECTED_GENE_FIELD
 from panelapp.models import PaLocusListGene
-from reference_data.models import GENOME_VERSION_GRCh38
-from seqr.models import Project, Family, Individual, Sample, LocusList
+from reference_data.models import GENOME_VERSION_GRCh38, DataVersions
+from seqr.models import Project, Family, Individual, Sample, LocusList, PrioritizedVariantTaggingRun
 from seqr.utils.communication_utils import send_project_notification
 from seqr.utils.gene_utils import get_genes
 from seqr.utils.search.constants import ANY_AFFECTED, HOMOZYGOUS_RECESSIVE, X_LINKED_RECESSIVE_MALE_AFFECTED
 from seqr.utils.search.utils import clickhouse_only, get_search_samples, COMPOUND_HET
+from seqr.utils.thread_utils import map_in_threads
 from seqr.views.utils.orm_to_json_utils import SEQR_TAG_TYPE
 from seqr.views.utils.variant_utils import bulk_create_tagged_variants, gene_ids_annotated_queryset
 from settings import SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL
@@ -550,41 +554,83 @@ MULTI_DATA_TYPE_SEARCHES = {
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
-        parser.add_argument('project')
+        parser.add_argument('projects', nargs='+')
+        parser.add_argument('--max-workers', type=int, default=1, help='Number of projects to tag concurrently')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only search families with loaded data or pedigree changes since the last tagging run for the project. '
+                 'All families are searched if the ClinVar version, gene lists or search criteria have changed',
+        )
 
     @clickhouse_only
     def handle(self, *args, **options):
+        projects = [Project.objects.get(guid=project_guid) for project_guid in options['projects']]
+
+        exclude_genes = get_genes(EXCLUDE_GENE_IDS, genome_version=GENOME_VERSION_GRCh38)
+        gene_by_moi = defaultdict(dict)
+        for gene_list in GENE_LISTS:
+            self._get_gene_list_genes(gene_list['name'], gene_list['confidences'], gene_by_moi, exclude_genes.keys())
+        data_version = self._get_data_version(gene_by_moi) if options['incremental'] else None
+
+        if len(projects) == 1:
+            self._tag_project(projects[0], exclude_genes, gene_by_moi, data_version)
+            return
+
+        errors = {}
+
+        def _tag_project(project):
+            try:
+                self._tag_project(project, exclude_genes, gene_by_moi, data_version)
+            except Exception as e:
+                logger.error(f'Error tagging prioritized variants in project {project.name}: {e}')
+                errors[project.guid] = e
+
+        list(map_in_threads(_tag_project, projects, max_workers=options['max_workers']))
+
+        if errors:
+            raise CommandError(f'Failed to tag prioritized variants in {len(errors)} projects: {", ".join(sorted(errors))}')
+
+    @classmethod
+    def _tag_project(cls, project, exclude_genes, gene_by_moi, data_version=None):
+        start_time = timezone.now()
         family_guid_map = {}
         family_name_map = {}
-        project = Project.objects.get(guid=options['project'])
         for db_id, guid, family_id in Family.objects.filter(project=project).values_list('id', 'guid', 'family_id'):
             family_guid_map[guid] = db_id
             family_name_map[db_id] = family_id
 
-        exclude_genes = get_genes(EXCLUDE_GENE_IDS, genome_version=GENOME_VERSION_GRCh38)
-        gene_by_moi = defaultdict(dict)
-        for gene_list in GENE_LISTS:
-            self._get_gene_list_genes(gene_list['name'], gene_list['confidences'], gene_by_moi, exclude_genes.keys())
+        sample_qs = get_search_samples([project])
+        if data_version:
+            changed_family_guids = cls._get_changed_family_guids(project, sample_qs, data_version)
+            if changed_family_guids is not None:
+                if not changed_family_guids:
+                    logger.info(f'No families changed since the last tagging run in project {project.name}')
+                    return
+                logger.info(f'Searching {len(changed_family_guids)} changed families in project {project.name}')
+                sample_qs = sample_qs.filter(individual__family__guid__in=changed_family_guids)
 
         family_variant_data = defaultdict(lambda: {'matched_searches': set(), 'matched_comp_het_searches': set(), 'support_vars': set()})
         search_counts = {}
         samples_by_dataset_type = {}
-        sample_qs = get_search_samples([project])
         for dataset_type, searches in SEARCHES.items():
-            self._run_dataset_type_searches(
+            cls._run_dataset_type_searches(
                 dataset_type, searches, sample_qs, family_variant_data, search_counts, samples_by_dataset_type, family_guid_map,
                 project, exclude_genes, gene_by_moi,
             )
 
-        self._run_multi_data_type_comp_het_search(
+        cls._run_multi_data_type_comp_het_search(
             family_variant_data, search_counts, samples_by_dataset_type, family_guid_map, project, sample_qs, genes=gene_by_moi['R'],
         )
 
         today = datetime.now().strftime('%Y-%m-%d')
         new_tag_keys, num_updated, num_skipped = bulk_create_tagged_variants(
-            family_variant_data, tag_name=SEQR_TAG_TYPE, get_metadata=self._get_metadata(today, 'matched_searches'),
-            get_comp_het_metadata=self._get_metadata(today, 'matched_comp_het_searches'), user=None, remove_missing_metadata=False,
+            family_variant_data, tag_name=SEQR_TAG_TYPE, get_metadata=cls._get_metadata(today, 'matched_searches'),
+            get_comp_het_metadata=cls._get_metadata(today, 'matched_comp_het_searches'), user=None, remove_missing_metadata=False,
         )
+        if data_version:
+            PrioritizedVariantTaggingRun.objects.update_or_create(
+                project=project, defaults={'data_version': data_version, 'started_date': start_time},
+            )
 
         family_variants = defaultdict(list)
         for family_id, variant_id in family_variant_data.keys():
@@ -610,6 +656,32 @@ class Command(BaseCommand):
             ])),
         )
 
+    @staticmethod
+    def _get_data_version(gene_by_moi):
+        clinvar_version = DataVersions.objects.filter(data_model_name='Clinvar').values_list('version', flat=True).first()
+        search_config = json.dumps([
+            SEARCHES, MULTI_DATA_TYPE_SEARCHES, ALL_SEARCHES_CRITERIA,
+            {moi: sorted(genes.keys()) for moi, genes in gene_by_moi.items()},
+        ], sort_keys=True)
+        return f'{clinvar_version}__{hashlib.md5(search_config.encode()).hexdigest()}'  # nosec
+
+    @staticmethod
+    def _get_changed_family_guids(project, sample_qs, data_version):
+        """Returns the families with changes since the project was last tagged, or None if all families need searching"""
+        last_run = PrioritizedVariantTaggingRun.objects.filter(project=project).first()
+        if not last_run or last_run.data_version != data_version:
+            return None
+
+        # Tags are never removed, so only families whose genotypes or affected status may have changed can gain new tags
+        since = last_run.started_date
+        changed_family_guids = set(sample_qs.filter(
+            Q(loaded_date__gt=since) | Q(last_modified_date__gt=since)
+        ).values_list('individual__family__guid', flat=True))
+        changed_family_guids.update(Individual.objects.filter(
+            family__project=project, last_modified_date__gt=since,
+        ).values_list('family__guid', flat=True))
+        return changed_family_guids
+
     @classmethod
     def _run_dataset_type_searches(cls, dataset_type, searches, sample_qs, family_variant_data, search_counts, samples_by_dataset_type, family_guid_map, project, exclude_genes, gene_by_moi):
         is_sv = dataset_type == Sample.DATASET_TYPE_SV_CALLS
@@ -621,6 +693,8 @@ class Command(BaseCommand):
         sample_types = list(sample_qs.values_list('sample_type', flat=True).distinct())
         if len(sample_types) > 1:
             raise CommandError('Variant prioritization not supported for projects with multiple sample types')
+        if not sample_types:
+            return
         sample_type = sample_types[0]
         if is_sv:
             dataset_type = f'{dataset_type}_{sample_type}'
@@ -636,17 +710,33 @@ class Command(BaseCommand):
         samples_by_dataset_type[dataset_type] = samples_by_family
 
         logger.info(f'Searching for prioritized {dataset_type} variants in {len(samples_by_family)} families in project {project.name}')
+        search_kwargs = {}
         for search_name, config_search in searches.items():
             exclude_locations = not config_search.get('gene_list_moi')
             search_genes = exclude_genes if exclude_locations else gene_by_moi[config_search['gene_list_moi']]
             sample_data = cls._get_valid_family_sample_data(
                 project, sample_type, samples_by_family, config_search.get('family_filter'),
             )
-            run_search_func = cls._run_comp_het_search if config_search['inheritance_mode'] == COMPOUND_HET else cls._run_search
-            num_results = run_search_func(
-                search_name, config_search, family_variant_data, family_guid_map, dataset_type, sample_data, sample_qs,
-                exclude_locations=exclude_locations, genes=search_genes, **config_search, **ALL_SEARCHES_CRITERIA,
-            )
+            search_kwargs[search_name] = {
+                'sample_data': sample_data, 'exclude_locations': exclude_locations, 'genes': search_genes,
+                **config_search, **ALL_SEARCHES_CRITERIA,
+            }
+
+        # Searches which are not compound het are all evaluated in a single ClickHouse query
+        results_by_search = cls._run_searches(dataset_type, sample_qs, {
+            search_name: kwargs for search_name, kwargs in search_kwargs.items()
+            if kwargs['inheritance_mode'] != COMPOUND_HET
+        })
+        for search_name, config_search in searches.items():
+            if search_name in results_by_search:
+                num_results = cls._add_search_results(
+                    results_by_search[search_name], search_name, family_variant_data, family_guid_map,
+                )
+            else:
+                num_results = cls._run_comp_het_search(
+                    search_name, config_search, family_variant_data, family_guid_map, dataset_type, samples=sample_qs,
+                    **search_kwargs[search_name],
+                )
             logger.info(f'Found {num_results} variants for criteria: {search_name}')
             search_counts[search_name] = num_results
 
@@ -687,28 +777,59 @@ class Command(BaseCommand):
         return wrapped
 
     @classmethod
-    def _run_search(cls, search_name, config_search, family_variant_data, family_guid_map, dataset_type, sample_data, samples, **kwargs):
+    def _run_searches(cls, dataset_type, samples, search_kwargs):
+        if not search_kwargs:
+            return {}
+
+        results = list(cls._get_searches_queryset(dataset_type, search_kwargs))
+        add_individual_guids(results, samples, encode_genotypes_json=True)
+
+        results_by_search = {search_name: [] for search_name in search_kwargs}
+        for result in results:
+            results_by_search[result.pop('searchName')].append(result)
+
+        # MANE transcripts are looked up once for all the searches which require specific MANE consequences
+        mane_consequence_searches = {
+            search_name: kwargs['annotations']['vep_consequences'] for search_name, kwargs in search_kwargs.items()
+            if kwargs.get('annotations', {}).get('vep_consequences') and results_by_search[search_name]
+        }
+        if mane_consequence_searches:
+            mane_transcripts_by_key = cls._get_mane_transcripts({
+                r['key'] for search_name in mane_consequence_searches for r in results_by_search[search_name]
+            })
+            for search_name, consequences in mane_consequence_searches.items():
+                allowed_key_genes = cls._valid_mane_keys(mane_transcripts_by_key, consequences)
+                results_by_search[search_name] = [r for r in results_by_search[search_name] if r['key'] in allowed_key_genes]
+
+        return results_by_search
+
+    @staticmethod
+    def _get_searches_queryset(dataset_type, search_kwargs):
+        """Combines the searches into a single UNION ALL query, with the name of the matched search in each result"""
         variant_fields = ['pos', 'end'] if dataset_type.startswith('SV') else ['ref', 'alt']
         variant_values = {'endChrom': F('end_chrom')} if dataset_type == 'SV_WGS' else {}
+        search_querysets = []
+        for search_name, kwargs in search_kwargs.items():
+            results_qs = get_search_queryset(GENOME_VERSION_GRCh38, dataset_type, **kwargs)
+            search_values = {**variant_values, 'searchName': Value(search_name, output_field=StringField())}
+            search_fields = list(variant_fields)
+            genotype_overrides_expressions = results_qs.genotype_override_values(results_qs)
+            if genotype_overrides_expressions:
+                search_values.update({k: genotype_overrides_expressions[k] for k in ['familyGenotypes', 'transcripts']})
+            else:
+                results_qs = gene_ids_annotated_queryset(results_qs)
+                search_fields += ['familyGenotypes', 'gene_ids']
+            search_querysets.append(results_qs.values(
+                *search_fields, 'key', 'xpos', 'variant_id', 'familyGuids', **search_values,
+            ))
 
-        results_qs = get_search_queryset(GENOME_VERSION_GRCh38, dataset_type, sample_data, **kwargs)
-        genotype_overrides_expressions = results_qs.genotype_override_values(results_qs)
-        if genotype_overrides_expressions:
-            variant_values.update({k: genotype_overrides_expressions[k] for k in ['familyGenotypes', 'transcripts']})
-        else:
-            results_qs = gene_ids_annotated_queryset(results_qs)
-            variant_fields += ['familyGenotypes', 'gene_ids']
-
-        results = results_qs.values(
-            *variant_fields, 'key', 'xpos', 'variant_id', 'familyGuids', **variant_values,
-        )
-        add_individual_guids(results, samples, encode_genotypes_json=True)
-        require_mane_consequences = config_search.get('annotations', {}).get('vep_consequences')
-        if results and require_mane_consequences:
-            allowed_key_genes = cls._valid_mane_keys([v['key'] for v in results], require_mane_consequences)
-            results = [r for r in results if r['key'] in allowed_key_genes]
+        # ClickHouse set operations are always UNION ALL, so results matching multiple searches are returned once per search
+        return search_querysets[0].union(*search_querysets[1:]) if len(search_querysets) > 1 else search_querysets[0]
 
+    @staticmethod
+    def _add_search_results(results, search_name, family_variant_data, family_guid_map):
         for variant in results:
+            variant = {**variant}
             for family_guid in variant.pop('familyGuids'):
                 variant_data = family_variant_data[(family_guid_map[family_guid], variant['variant_id'])]
                 variant_data.update(variant)
@@ -728,7 +849,9 @@ class Command(BaseCommand):
 
     @classmethod
     def _run_multi_data_type_comp_het_search(cls, family_variant_data, search_counts, samples_by_dataset_type, family_guid_map, project, samples, genes):
-        sv_dataset_type = next(dt for dt in samples_by_dataset_type.keys() if dt.startswith('SV'))
+        sv_dataset_type = next((dt for dt in samples_by_dataset_type.keys() if dt.startswith('SV')), None)
+        if not (sv_dataset_type and Sample.DATASET_TYPE_VARIANT_CALLS in samples_by_dataset_type):
+            return
         sample_type = sv_dataset_type.split('_')[-1]
         families = set(samples_by_dataset_type[sv_dataset_type].keys()).intersection(samples_by_dataset_type[Sample.DATASET_TYPE_VARIANT_CALLS].keys())
         sv_sample_data = cls._get_valid_family_sample_data(project, sample_type, {
@@ -754,10 +877,10 @@ class Command(BaseCommand):
         primary_consequences = config_search.get('annotations', {}).get('vep_consequences')
         secondary_consequences = config_search.get('annotations_secondary', {}).get('vep_consequences')
         if results and (primary_consequences or secondary_consequences):
-            keys = [v['key'] for pair in results for v in pair]
-            allowed_key_genes = cls._valid_mane_keys(keys, primary_consequences)
+            mane_transcripts_by_key = cls._get_mane_transcripts({v['key'] for pair in results for v in pair})
+            allowed_key_genes = cls._valid_mane_keys(mane_transcripts_by_key, primary_consequences)
             if secondary_consequences:
-                allowed_secondary_key_genes = cls._valid_mane_keys(keys, secondary_consequences)
+                allowed_secondary_key_genes = cls._valid_mane_keys(mane_transcripts_by_key, secondary_consequences)
             else:
                 allowed_secondary_key_genes = None if no_secondary_annotations else allowed_key_genes
             results = [
@@ -782,17 +905,20 @@ class Command(BaseCommand):
         return len(results)
 
     @staticmethod
-    def _valid_mane_keys(keys, allowed_consequences):
-        mane_transcripts_by_key = get_transcripts_queryset(GENOME_VERSION_GRCh38, keys).values_list(
+    def _get_mane_transcripts(keys):
+        return dict(get_transcripts_queryset(GENOME_VERSION_GRCh38, list(keys)).values_list(
             'key', ArrayMap(
                 ArrayFilter('transcripts', conditions=[{'maneSelect': (None, 'isNotNull({field})')}]),
                 mapped_expression='tuple(x.consequenceTerms, x.geneId)',
                 output_field=ArrayField(NamedTupleField([('consequenceTerms', ArrayField(StringField())), ('geneId', StringField())])),
             )
-        )
+        ))
+
+    @staticmethod
+    def _valid_mane_keys(mane_transcripts_by_key, allowed_consequences):
         mane_transcript_genes = {
             key: {t['geneId'] for t in mane_transcripts if set(allowed_consequences).intersection(t['consequenceTerms'])}
-            for key, mane_transcripts in mane_transcripts_by_key
+            for key, mane_transcripts in mane_transcripts_by_key.items()
         }
         return {key: genes for key, genes in mane_transcript_genes.items() if genes}
 
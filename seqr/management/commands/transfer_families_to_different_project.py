@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from seqr.models import Project, Family, VariantTag, VariantTagType
+from seqr.models import Project, ProjectStats, Family, Individual, VariantTag, VariantTagType, SearchToken
 from seqr.utils.search.utils import backend_specific_call
 from seqr.utils.search.add_data_utils import trigger_delete_families_search
 
@@ -53,6 +53,11 @@ class Command(BaseCommand):
                 variant_tags.update(variant_tag_type=to_tag_type)
 
         logger.info("Updating families")
+        family_db_ids = list(families.values_list('id', flat=True))
         families.update(project=to_project)
+        ProjectStats.update_stats([from_project.id, to_project.id])
+        ProjectStats.update_context_version([from_project.id, to_project.id])
+        SearchToken.update_tokens(Family, family_db_ids)
+        SearchToken.update_tokens(Individual, Individual.objects.filter(family_id__in=family_db_ids).values_list('id', flat=True))
 
         logger.info("Done.")
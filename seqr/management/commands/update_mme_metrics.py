@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from matchmaker.matchmaker_utils import update_mme_metrics, MME_METRIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed Matchmaker metrics. Intended to be run periodically'
+
+    def handle(self, *args, **options):
+        metrics = update_mme_metrics()
+        logger.info('Updated MME metrics: {}'.format(
+            ', '.join(['{}={}'.format(metric, getattr(metrics, field)) for metric, field in MME_METRIC_FIELDS.items()])
+        ))
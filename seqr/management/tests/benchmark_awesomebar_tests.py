@@ -0,0 +1,48 @@
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+import mock
+
+from seqr.models import Project, SearchToken
+
+
+class BenchmarkAwesomebarTest(TestCase):
+    databases = '__all__'
+    fixtures = ['users', '1kg_project']
+
+    @mock.patch('seqr.management.commands.benchmark_awesomebar.teardown_databases')
+    @mock.patch('seqr.management.commands.benchmark_awesomebar.setup_databases')
+    @mock.patch('seqr.management.commands.benchmark_awesomebar.logger')
+    def test_command(self, mock_logger, mock_setup_databases, mock_teardown_databases):
+        # the test runner has already set up a test database
+        mock_setup_databases.return_value = [(mock.MagicMock(), 'test_seqrdb', True)]
+        call_command(
+            'benchmark_awesomebar', '--projects', '2', '--families-per-project', '3', '--individuals-per-family', '2',
+            '--iterations', '2', '--query', 'fam-1', '--query', 'benchmark',
+        )
+
+        logs = [call.args[0] for call in mock_logger.info.call_args_list]
+        self.assertEqual(len(logs), 11)
+        self.assertRegex(
+            logs[0], r'^Created 2 projects, 6 families and 12 individuals with \d+ search tokens in [\d.]+s$',
+        )
+        self.assertRegex(logs[1], r'^"fam-1" projects: 0 matches \(min [\d.]+ms, max [\d.]+ms\)$')
+        self.assertRegex(logs[2], r'^"fam-1" families: 2 matches \(min [\d.]+ms, max [\d.]+ms\)$')
+        self.assertRegex(logs[3], r'^"fam-1" analysis_groups: 0 matches')
+        self.assertRegex(logs[4], r'^"fam-1" individuals: 0 matches')
+        self.assertRegex(logs[5], r'^"fam-1" project_groups: 0 matches')
+        self.assertRegex(logs[6], r'^"benchmark" projects: 2 matches')
+        self.assertRegex(logs[7], r'^"benchmark" families: 0 matches')
+        self.assertRegex(logs[8], r'^"benchmark" analysis_groups: 2 matches')
+
+        # synthetic data is only created in a temporary test database
+        mock_setup_databases.assert_called_once_with(verbosity=0, interactive=False, aliases={'default'})
+        mock_teardown_databases.assert_called_once_with(mock_setup_databases.return_value, verbosity=0)
+        self.assertEqual(Project.objects.filter(guid__startswith='R_bench_').count(), 2)
+        self.assertEqual(SearchToken.objects.filter(model_name='individual').values('object_id').distinct().count(), 12)
+
+        # the temporary database is torn down if the benchmark fails, i.e. if the synthetic data already exists
+        mock_teardown_databases.reset_mock()
+        with self.assertRaises(IntegrityError):
+            call_command('benchmark_awesomebar', '--projects', '1', '--families-per-project', '1')
+        mock_teardown_databases.assert_called_once_with(mock_setup_databases.return_value, verbosity=0)
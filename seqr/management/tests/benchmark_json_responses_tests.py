@@ -0,0 +1,27 @@
+from django.core.management import call_command
+from django.test import TestCase
+import json
+import mock
+import os
+import tempfile
+
+
+class BenchmarkJsonResponsesTest(TestCase):
+
+    @mock.patch('seqr.management.commands.benchmark_json_responses.logger')
+    def test_command(self, mock_logger):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'saved_variants.json')
+            with open(file_path, 'w') as f:
+                json.dump({'savedVariantsByGuid': {f'SV{i}': {'variantId': f'1-{i}-A-G', 'tagGuids': []} for i in range(100)}}, f)
+
+            call_command('benchmark_json_responses', file_path, '--iterations', '2')
+
+        self.assertEqual(mock_logger.info.call_count, 2)
+        pretty_log, compact_log = [call.args[0] for call in mock_logger.info.call_args_list]
+        self.assertRegex(
+            pretty_log, r'^saved_variants.json \(pretty\): encoded 9317 bytes in [\d.]+ms, gzipped to \d+ bytes in [\d.]+ms$',
+        )
+        self.assertRegex(
+            compact_log, r'^saved_variants.json \(compact\): encoded 4605 bytes in [\d.]+ms, gzipped to \d+ bytes in [\d.]+ms$',
+        )
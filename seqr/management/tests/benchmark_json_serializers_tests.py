@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.test import TestCase
+import mock
+
+
+class BenchmarkJsonSerializersTest(TestCase):
+    databases = '__all__'
+    fixtures = ['users', '1kg_project', 'reference_data']
+
+    @mock.patch('seqr.management.commands.benchmark_json_serializers.logger')
+    def test_command(self, mock_logger):
+        call_command('benchmark_json_serializers', 'R0001_1kg', '--iterations', '2')
+
+        logs = [call.args[0] for call in mock_logger.info.call_args_list]
+        self.assertEqual(len(logs), 4)
+        self.assertRegex(logs[0], r'^individuals: serialized 14 records in 2 queries \(min [\d.]+ms, max [\d.]+ms\)$')
+        self.assertRegex(logs[1], r'^families: serialized 11 records in 1 queries \(min [\d.]+ms, max [\d.]+ms\)$')
+        self.assertRegex(logs[2], r'^samples: serialized \d+ records in 1 queries \(min [\d.]+ms, max [\d.]+ms\)$')
+        self.assertRegex(logs[3], r'^saved variants: serialized \d+ records in 1 queries \(min [\d.]+ms, max [\d.]+ms\)$')
@@ -0,0 +1,28 @@
+from django.core.management import call_command
+from django.test import TestCase
+import mock
+
+from seqr.models import Project, Individual
+
+
+@mock.patch('seqr.utils.search.elasticsearch.es_utils.ELASTICSEARCH_SERVICE_HOSTNAME', 'testhost')
+class BenchmarkPedigreeUploadTest(TestCase):
+    databases = '__all__'
+    fixtures = ['users', '1kg_project']
+
+    @mock.patch('seqr.management.commands.benchmark_pedigree_upload.logger')
+    def test_command(self, mock_logger):
+        call_command('benchmark_pedigree_upload', '--rows', '7')
+
+        logs = [call.args[0] for call in mock_logger.info.call_args_list]
+        self.assertEqual(len(logs), 2)
+        self.assertRegex(
+            logs[0], r'^Uploaded 7 rows \(create, 3 new families and 7 new individuals\) in [\d.]+s with \d+ queries',
+        )
+        self.assertRegex(
+            logs[1], r'^Uploaded 7 rows \(no-op update, 0 new families and 0 new individuals\) in [\d.]+s with \d+ queries',
+        )
+
+        # synthetic data is rolled back
+        self.assertFalse(Project.objects.filter(name='Benchmark pedigree upload').exists())
+        self.assertFalse(Individual.objects.filter(individual_id__startswith='BENCH_').exists())
@@ -6,19 +6,22 @@ from seqr.models import IgvSample
 from settings import SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL
 
 
+@mock.patch('seqr.management.commands.check_bam_cram_paths.safe_redis_delete')
+@mock.patch('seqr.management.commands.check_bam_cram_paths.safe_redis_set_json')
+@mock.patch('seqr.management.commands.check_bam_cram_paths.safe_redis_get_json', lambda *args: None)
 @mock.patch('seqr.utils.file_utils.subprocess.Popen')
 @mock.patch('seqr.utils.communication_utils.safe_post_to_slack')
 @mock.patch('seqr.management.commands.check_bam_cram_paths.logger')
 class CheckBamCramPathsTest(TestCase):
     fixtures = ['users', '1kg_project']
 
-    def test_command_with_project(self, mock_logger, mock_safe_post_to_slack, mock_subprocess):
-        mock_subprocess.return_value.wait.side_effect = [-1, 0]
+    def test_command_with_project(self, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
+        self._set_existing_files(mock_subprocess)
         call_command('check_bam_cram_paths', '1kg project n\u00e5me with uni\u00e7\u00f8de')
-        self._check_results(True, mock_logger, mock_safe_post_to_slack, mock_subprocess)
+        self._check_results(True, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete)
 
-    def test_command_with_other_project(self, mock_logger, mock_safe_post_to_slack, mock_subprocess):
-        mock_subprocess.return_value.wait.side_effect = [-1, 0]
+    def test_command_with_other_project(self, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
+        self._set_existing_files(mock_subprocess)
         call_command('check_bam_cram_paths', '1kg project')
         self.assertEqual(IgvSample.objects.count(), 3)
 
@@ -28,27 +31,74 @@ class CheckBamCramPathsTest(TestCase):
         ]
         mock_logger.info.assert_has_calls(calls)
 
-    def test_command(self, mock_logger, mock_safe_post_to_slack, mock_subprocess):
-        mock_subprocess.return_value.wait.side_effect = [-1, 0]
+    def test_command(self, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
+        self._set_existing_files(mock_subprocess)
         call_command('check_bam_cram_paths')
-        self._check_results(True, mock_logger, mock_safe_post_to_slack, mock_subprocess)
+        self._check_results(True, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete)
 
-    def test_dry_run_arg(self, mock_logger, mock_safe_post_to_slack, mock_subprocess):
-        mock_subprocess.return_value.wait.side_effect = [-1, 0]
+    def test_dry_run_arg(self, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
+        self._set_existing_files(mock_subprocess)
         call_command('check_bam_cram_paths', '--dry-run')
-        self._check_results(False, mock_logger, mock_safe_post_to_slack, mock_subprocess)
+        self._check_results(False, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete)
 
-    def _check_results(self, did_delete, mock_logger, mock_safe_post_to_slack, mock_subprocess):
+    def test_resume_from_checkpoint(self, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
+        self._set_existing_files(mock_subprocess)
+        checkpoint = {
+            'args': {'projects': [], 'dryRun': False}, 'lastSampleId': 146, 'numChecked': 1,
+            'missing': [['1kg project nåme with uniçøde', 'NA20870', 'gs://readviz/NA20870.cram']],
+        }
+        with mock.patch('seqr.management.commands.check_bam_cram_paths.safe_redis_get_json') as mock_redis_get:
+            mock_redis_get.return_value = checkpoint
+            call_command('check_bam_cram_paths')
+        mock_redis_get.assert_called_with('check_bam_cram_paths__checkpoint')
+
+        # the sample checked before the run was interrupted is not checked again, but is still reported
+        mock_subprocess.assert_called_once_with(
+            'gsutil ls gs://datasets-gcnv/NA20870.bed.gz', stdout=-1, stderr=-1, shell=True)  # nosec
+        self.assertEqual(IgvSample.objects.count(), 3)
+        mock_logger.info.assert_has_calls([
+            mock.call('Resuming bam/cram path check after sample 146'),
+            mock.call('---- DONE ----'),
+            mock.call('Checked 2 samples'),
+            mock.call('1 files not found:'),
+            mock.call('   1 in 1kg project nåme with uniçøde'),
+        ])
+        mock_safe_post_to_slack.assert_called_once_with(
+            SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL,
+            "Found and removed 1 broken bam/cram path(s)\n\nIn project 1kg project nåme with uniçøde:\n  NA20870   gs://readviz/NA20870.cram")
+        mock_redis_set.assert_called_once_with('check_bam_cram_paths__checkpoint', mock.ANY, expire=604800)
+        mock_redis_delete.assert_called_once_with('check_bam_cram_paths__checkpoint')
+
+    def test_storage_error(self, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
+        mock_subprocess.return_value.communicate.return_value = (
+            b'gs://datasets-gcnv/NA20870.bed.gz\n', b'AccessDeniedException: 403 Forbidden',
+        )
+        with self.assertRaises(Exception) as ce:
+            call_command('check_bam_cram_paths')
+        self.assertEqual(str(ce.exception), 'Run command failed: AccessDeniedException: 403 Forbidden')
+
+        # files which could not be checked are not reported or deleted, and the checkpoint is kept
+        self.assertEqual(IgvSample.objects.count(), 3)
+        mock_logger.info.assert_called_once_with('checking bam/cram paths')
+        mock_safe_post_to_slack.assert_not_called()
+        mock_redis_set.assert_not_called()
+        mock_redis_delete.assert_not_called()
+
+    @staticmethod
+    def _set_existing_files(mock_subprocess):
+        mock_subprocess.return_value.communicate.return_value = (
+            b'gs://datasets-gcnv/NA20870.bed.gz\n', b'CommandException: One or more URLs matched no objects.',
+        )
+
+    def _check_results(self, did_delete, mock_logger, mock_safe_post_to_slack, mock_subprocess, mock_redis_set, mock_redis_delete):
         igv_file_paths = IgvSample.objects.values_list('file_path', flat=True)
         expected_remaining_files = ['/readviz/NA19675.cram', 'gs://datasets-gcnv/NA20870.bed.gz']
         if not did_delete:
             expected_remaining_files.append('gs://readviz/NA20870.cram')
         self.assertListEqual(sorted(igv_file_paths), expected_remaining_files)
 
-        mock_subprocess.assert_has_calls([
-            mock.call('gsutil ls gs://readviz/NA20870.cram', stdout=-1, stderr=-2, shell=True), # nosec
-            mock.call('gsutil ls gs://datasets-gcnv/NA20870.bed.gz', stdout=-1, stderr=-2, shell=True), # nosec
-        ], any_order=True)
+        mock_subprocess.assert_called_once_with(
+            'gsutil ls gs://readviz/NA20870.cram gs://datasets-gcnv/NA20870.bed.gz', stdout=-1, stderr=-1, shell=True)  # nosec
 
         calls = [
             mock.call('Individual: NA20870  file not found: gs://readviz/NA20870.cram'),
@@ -58,6 +108,11 @@ class CheckBamCramPathsTest(TestCase):
             mock.call('   1 in 1kg project nåme with uniçøde'),
         ]
         mock_logger.info.assert_has_calls(calls)
+        mock_redis_set.assert_called_once_with('check_bam_cram_paths__checkpoint', {
+            'args': {'projects': mock.ANY, 'dryRun': not did_delete}, 'lastSampleId': mock.ANY, 'numChecked': 2,
+            'missing': [['1kg project nåme with uniçøde', 'NA20870', 'gs://readviz/NA20870.cram']],
+        }, expire=604800)
+        mock_redis_delete.assert_called_once_with('check_bam_cram_paths__checkpoint')
 
         if not did_delete:
             mock_safe_post_to_slack.assert_not_called()
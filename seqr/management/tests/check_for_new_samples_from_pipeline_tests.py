@@ -5,9 +5,10 @@ from django.core.management.base import CommandError
 import json
 import mock
 import responses
+from threading import get_ident
 
 from seqr.views.utils.test_utils import AnvilAuthenticationTestCase, AuthenticationTestCase, DifferentDbTransactionSupportMixin
-from seqr.models import Project, Family, Individual, Sample, SavedVariant
+from seqr.models import Project, Family, Individual, Sample, SavedVariant, PipelineRunIngest
 
 SEQR_URL = 'https://seqr.broadinstitute.org/'
 PROJECT_GUID = 'R0003_test'
@@ -361,9 +362,13 @@ class CheckNewSamplesTest(object):
             'updateType': 'bulk_update'}}
          ),
         ('Reloading saved variants in 2 projects', None),
-        ('Reloading genotypes for 0 SNV_INDEL variants in family F000012_12', None),
+        ('Reloading genotypes for 0 SNV_INDEL variants in 1 families', {'detail': {
+            'projectGuid': 'R0003_test', 'durationSeconds': mock.ANY,
+        }}),
         ('Updated 0 variants in 2 families for project Test Reprocessed Project', None),
-        ('Reloading genotypes for 1 SNV_INDEL variants in family F000014_14', None),
+        ('Reloading genotypes for 1 SNV_INDEL variants in 1 families', {'detail': {
+            'projectGuid': 'R0004_non_analyst_project', 'durationSeconds': mock.ANY,
+        }}),
         ('update 1 SavedVariants', {'dbUpdate': mock.ANY}),
         ('Updated 1 variants in 1 families for project Non-Analyst Project', None),
         ('Reload Summary: ', None),
@@ -794,6 +799,113 @@ class LocalCheckNewSamplesTest(DifferentDbTransactionSupportMixin, Authenticatio
     def _assert_expected_airtable_calls(self, *args, **kwargs):
         return 0
 
+    @mock.patch('seqr.utils.file_utils.os.path.isfile', lambda *args: True)
+    @mock.patch('seqr.management.commands.check_for_new_samples_from_pipeline.update_projects_saved_variant_json')
+    def test_resume_interrupted_ingest(self, mock_update_saved_variants):
+        Project.objects.filter(id__in=[1, 3]).update(genome_version=38)
+        self.mock_glob.return_value = [LOCAL_RUN_PATHS[3]]
+        self.mock_open.return_value.__enter__.return_value.__iter__.side_effect = lambda: iter(
+            [json.dumps(OPENED_RUN_JSON_FILES[0])])
+
+        # Test ingest interrupted while reloading saved variants
+        mock_update_saved_variants.side_effect = Exception('Connection lost')
+        call_command('check_for_new_samples_from_pipeline')
+        ingest = PipelineRunIngest.objects.get(genome_version='GRCh38', dataset_type='SNV_INDEL', run_version='auto__2023-08-09')
+        self.assertListEqual(ingest.completed_steps, ['samples', 'notifications', 'sample_qc'])
+        self.assertSetEqual(set(ingest.updated_sample_guids), set(SAMPLE_GUIDS))
+        self.assertSetEqual(set(ingest.new_sample_guids), {NEW_SAMPLE_GUID_P3, ACTIVE_SAMPLE_GUID, NEW_SAMPLE_GUID_P4})
+        self.assertEqual(ingest.error, 'Connection lost')
+        self.assertIsNone(ingest.completed_date)
+        self.mock_send_slack.assert_called()
+        self.mock_email.assert_called()
+
+        # Test run is skipped if its projects stay locked by another process
+        project_ids = sorted(set(Family.objects.filter(
+            guid__in=OPENED_RUN_JSON_FILES[0]['family_samples'].keys()).values_list('project_id', flat=True)))
+        mock_lock = self.mock_redis.return_value.lock.return_value
+        self.assertEqual(mock_lock.release.call_count, len(project_ids))
+        mock_lock.release.reset_mock()
+        mock_lock.acquire.return_value = False
+        self.reset_logs()
+        call_command('check_for_new_samples_from_pipeline')
+        self.assert_json_logs(user=None, expected=[
+            ('Loading new samples from 1 run(s)', None),
+            ('Resuming ingest of auto__2023-08-09 after samples, notifications, sample_qc', None),
+            ('Loading new samples from GRCh38/SNV_INDEL: auto__2023-08-09', None),
+            (f'Skipping auto__2023-08-09: Timed out waiting for another process to release project {project_ids[0]}',
+             {'severity': 'WARNING'}),
+        ])
+        ingest.refresh_from_db()
+        self.assertListEqual(ingest.completed_steps, ['samples', 'notifications', 'sample_qc'])
+        self.assertEqual(ingest.error, 'Connection lost')
+        self.assertIsNone(ingest.completed_date)
+        mock_lock.release.assert_not_called()
+        mock_lock.acquire.return_value = True
+
+        # Test resuming only runs the incomplete steps
+        mock_update_saved_variants.side_effect = None
+        self.mock_send_slack.reset_mock()
+        self.mock_email.reset_mock()
+        self.reset_logs()
+        sample_last_modified = Sample.objects.filter(
+            last_modified_date__isnull=False).values_list('last_modified_date', flat=True).order_by('-last_modified_date')[0]
+
+        call_command('check_for_new_samples_from_pipeline')
+        self.assert_json_logs(user=None, expected=[
+            ('Loading new samples from 1 run(s)', None),
+            ('Resuming ingest of auto__2023-08-09 after samples, notifications, sample_qc', None),
+            ('Loading new samples from GRCh38/SNV_INDEL: auto__2023-08-09', None),
+            ('Reset 2 cached results', None),
+            ('DONE', None),
+        ])
+        self.mock_send_slack.assert_not_called()
+        self.mock_email.assert_not_called()
+        self.assertFalse(Sample.objects.filter(last_modified_date__gt=sample_last_modified).exists())
+        self.assertSetEqual(
+            set(mock_update_saved_variants.call_args.kwargs['samples'].values_list('guid', flat=True)), set(SAMPLE_GUIDS),
+        )
+        ingest.refresh_from_db()
+        self.assertListEqual(ingest.completed_steps, ['samples', 'notifications', 'sample_qc', 'saved_variants'])
+        self.assertIsNotNone(ingest.completed_date)
+        self.assertIsNone(ingest.error)
+
+        # Test projects are locked across processes while loading, in a consistent order
+        lock_calls = [
+            mock.call(f'check_for_new_samples__project_lock__{project_id}', timeout=43200, blocking_timeout=300)
+            for project_id in project_ids
+        ]
+        self.assertListEqual(self.mock_redis.return_value.lock.call_args_list, lock_calls + lock_calls[:1] + lock_calls)
+        self.assertEqual(mock_lock.release.call_count, len(project_ids))
+
+        # Test completed ingest is not reloaded
+        self.reset_logs()
+        call_command('check_for_new_samples_from_pipeline')
+        self.assert_json_logs(user=None, expected=[('Data already loaded for all 1 runs', None), ('DONE', None)])
+
+    @mock.patch('seqr.management.commands.check_for_new_samples_from_pipeline.Command._load_run')
+    def test_concurrent_runs(self, mock_load_run):
+        self.mock_glob.return_value = [path for path in LOCAL_RUN_PATHS if path.endswith('_CLICKHOUSE_LOAD_SUCCESS')]
+        runs_by_thread = defaultdict(list)
+        mock_load_run.side_effect = lambda run_dir, run_details, ingest, **kwargs: runs_by_thread[get_ident()].append(
+            run_details['run_version'])
+
+        call_command('check_for_new_samples_from_pipeline', '--max-run-workers=3', '--max-project-workers=2')
+
+        self.assertEqual(mock_load_run.call_count, 5)
+        for call in mock_load_run.call_args_list:
+            self.assertIsNone(call.args[2])
+            self.assertDictEqual(call.kwargs, {'max_project_workers': 2})
+        self.assertNotIn(get_ident(), runs_by_thread)
+        self.assertSetEqual({run for runs in runs_by_thread.values() for run in runs}, {
+            'auto__2023-08-09', 'manual__2023-11-02', 'auto__2024-08-12', 'auto__2024-09-14',
+            'hail_search_to_clickhouse_migration_WGS_R0877_neptune',
+        })
+        # runs for the same genome version and dataset type are loaded in order in a single thread
+        snv_indel_runs = next(runs for runs in runs_by_thread.values() if 'auto__2023-08-09' in runs)
+        run_index = snv_indel_runs.index('auto__2023-08-09')
+        self.assertEqual(snv_indel_runs[run_index + 1], 'hail_search_to_clickhouse_migration_WGS_R0877_neptune')
+        self.mock_redis.return_value.delete.assert_called_with('search_results__*', 'variant_lookup_results__*')
+
 
 class AirtableCheckNewSamplesTest(AnvilAuthenticationTestCase, CheckNewSamplesTest):
     fixtures = ['users', '1kg_project', 'clickhouse_saved_variants']
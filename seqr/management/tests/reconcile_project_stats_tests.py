@@ -0,0 +1,101 @@
+from django.core.management import call_command
+from django.test import TestCase
+import mock
+
+from seqr.models import Family, Individual, Project, ProjectStats, SavedVariant
+
+
+class ReconcileProjectStatsTest(TestCase):
+    fixtures = ['users', '1kg_project']
+
+    @mock.patch('seqr.management.commands.reconcile_project_stats.logger')
+    def test_command(self, mock_logger):
+        call_command('reconcile_project_stats')
+        mock_logger.warning.assert_has_calls([
+            mock.call('R0001_1kg: missing stats'),
+            mock.call('R0002_empty: missing stats'),
+            mock.call('R0003_test: missing stats'),
+            mock.call('R0004_non_analyst_project: missing stats'),
+        ])
+        mock_logger.info.assert_called_with('Reconciled stats for 4 of 4 projects')
+
+        stats = ProjectStats.objects.get(project__guid='R0001_1kg')
+        self.assertEqual(stats.num_families, 11)
+        self.assertEqual(stats.num_individuals, 14)
+        self.assertEqual(stats.num_variant_tags, 4)
+        self.assertDictEqual(stats.analysis_status_counts, {'ES': 1, 'Q': 9, 'S_ng': 1})
+        self.assertDictEqual(stats.sample_type_counts, {'RNA': 1, 'WES': 13})
+
+        mock_logger.reset_mock()
+        call_command('reconcile_project_stats')
+        mock_logger.warning.assert_not_called()
+        mock_logger.info.assert_called_with('Reconciled stats for 0 of 4 projects')
+
+        # Updates through model helpers keep stats up to date
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Family.bulk_update(user=None, update_json={'analysis_status': 'I'}, guid='F000002_2')
+            SavedVariant.bulk_delete(
+                user=None, guid__in=['SV0059956_11560662_f019313_1', 'SV0059957_11562437_f019313_1'])
+            stats.refresh_from_db()
+            # stats are only updated once the transaction is committed
+            self.assertEqual(stats.num_variant_tags, 4)
+        self.assertEqual(len(callbacks), 2)
+        stats.refresh_from_db()
+        self.assertEqual(stats.num_variant_tags, 2)
+        self.assertEqual(stats.context_version, 1)
+        self.assertDictEqual(stats.analysis_status_counts, {'ES': 1, 'I': 1, 'Q': 8, 'S_ng': 1})
+
+        mock_logger.reset_mock()
+        call_command('reconcile_project_stats')
+        mock_logger.warning.assert_not_called()
+
+        # Direct updates are caught by reconciliation
+        Family.objects.filter(guid='F000003_3').update(analysis_status='I')
+        mock_logger.reset_mock()
+        call_command('reconcile_project_stats', '--project', 'R0001_1kg', '--project', 'R0003_test')
+        mock_logger.warning.assert_called_once()
+        self.assertRegex(
+            mock_logger.warning.call_args.args[0], r'^R0001_1kg: analysis_status_counts: expected {.*}, found {.*}$',
+        )
+        mock_logger.info.assert_called_with('Reconciled stats for 1 of 2 projects')
+        stats.refresh_from_db()
+        self.assertDictEqual(stats.analysis_status_counts, {'ES': 1, 'I': 2, 'Q': 7, 'S_ng': 1})
+
+        # Saving a model only recomputes stats when a counted field changes
+        Family.objects.filter(guid='F000003_3').update(analysis_status='Q')
+        family = Family.objects.get(guid='F000003_3')
+        family.analysis_status = 'Q'
+        family.description = 'updated'
+        with self.captureOnCommitCallbacks(execute=True):
+            family.save()
+        stats.refresh_from_db()
+        self.assertDictEqual(stats.analysis_status_counts, {'ES': 1, 'I': 2, 'Q': 7, 'S_ng': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            family.analysis_status = 'I'
+            family.save()
+            family.analysis_status = 'ES'
+            family.save()
+        stats.refresh_from_db()
+        self.assertDictEqual(stats.analysis_status_counts, {'ES': 2, 'I': 1, 'Q': 7, 'S_ng': 1})
+
+        # Created models are counted without recomputing the other stats
+        with self.captureOnCommitCallbacks(execute=True):
+            Individual.objects.create(family=family, individual_id='new_individual')
+        stats.refresh_from_db()
+        self.assertEqual(stats.num_individuals, 15)
+
+        # Projects without stats are computed in full when a model is created
+        ProjectStats.objects.filter(project__guid='R0003_test').delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Individual.objects.create(family=Family.objects.get(guid='F000011_11'), individual_id='new_individual')
+        self.assertEqual(ProjectStats.objects.get(project__guid='R0003_test').num_individuals, 5)
+
+        # Models moved to another project update the stats for both projects
+        family.project = Project.objects.get(guid='R0003_test')
+        with self.captureOnCommitCallbacks(execute=True):
+            family.save()
+        stats.refresh_from_db()
+        self.assertEqual(stats.num_families, 10)
+        self.assertDictEqual(stats.analysis_status_counts, {'ES': 1, 'I': 1, 'Q': 7, 'S_ng': 1})
+        self.assertEqual(ProjectStats.objects.get(project__guid='R0003_test').num_families, 3)
@@ -0,0 +1,52 @@
+from django.core.management import call_command
+from django.test import TestCase
+import mock
+
+from seqr.models import Individual, IndividualHpoTerm
+
+
+class ReindexIndividualPhenotypesTest(TestCase):
+    databases = ['default', 'reference_data']
+    fixtures = ['users', '1kg_project', 'reference_data']
+
+    @mock.patch('seqr.management.commands.reindex_individual_phenotypes.logger.info')
+    def test_command(self, mock_logger):
+        Individual.objects.filter(id=4).update(features=[{'id': 'HP:0003273'}], absent_features=None)
+
+        call_command('reindex_individual_phenotypes', '--batch-size=2')
+        mock_logger.assert_has_calls([
+            mock.call('Reindexing phenotypes for 5 individuals'),
+            mock.call('Indexed 20 HPO terms'),
+            mock.call('Done'),
+        ])
+
+        self.assertSetEqual(set(IndividualHpoTerm.objects.filter(individual_id__in=[1, 4]).values_list(
+            'individual_id', 'hpo_id', 'ancestor_hpo_id', 'observed')), {
+            (1, 'HP:0001631', 'HP:0001631', True), (1, 'HP:0001631', 'HP:0008800', True),
+            (1, 'HP:0002011', 'HP:0002011', True), (1, 'HP:0002011', 'HP:0008800', True),
+            (1, 'HP:0001636', 'HP:0001636', True), (1, 'HP:0001636', 'HP:0008800', True),
+            (1, 'HP:0011675', 'HP:0011675', False), (1, 'HP:0001674', 'HP:0001674', False),
+            (1, 'HP:0001508', 'HP:0001508', False),
+            (4, 'HP:0003273', 'HP:0003273', True), (4, 'HP:0003273', 'HP:0008800', True),
+        })
+
+        # Individuals without phenotypes are no longer indexed
+        Individual.objects.filter(id=4).update(features=None)
+        call_command('reindex_individual_phenotypes')
+        self.assertFalse(IndividualHpoTerm.objects.filter(individual_id=4).exists())
+
+        # Saving an individual only reindexes its phenotypes if they changed
+        individual = Individual.objects.get(id=1)
+        term_ids = set(IndividualHpoTerm.objects.filter(individual=individual).values_list('id', flat=True))
+        individual.notes = 'Updated notes'
+        individual.save()
+        self.assertSetEqual(set(IndividualHpoTerm.objects.filter(individual=individual).values_list('id', flat=True)), term_ids)
+
+        individual.absent_features = None
+        individual.save()
+        self.assertSetEqual(set(IndividualHpoTerm.objects.filter(individual=individual).values_list(
+            'hpo_id', 'ancestor_hpo_id', 'observed')), {
+            ('HP:0001631', 'HP:0001631', True), ('HP:0001631', 'HP:0008800', True),
+            ('HP:0002011', 'HP:0002011', True), ('HP:0002011', 'HP:0008800', True),
+            ('HP:0001636', 'HP:0001636', True), ('HP:0001636', 'HP:0008800', True),
+        })
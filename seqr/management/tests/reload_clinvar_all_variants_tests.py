@@ -13,7 +13,7 @@ from clickhouse_search.models import (
     ClinvarAllVariantsGRCh37SnvIndel, ClinvarAllVariantsMito,
 )
 from reference_data.models import DataVersions
-from seqr.management.commands.reload_clinvar_all_variants import BATCH_SIZE, WEEKLY_XML_RELEASE
+from seqr.management.commands.reload_clinvar_all_variants import WEEKLY_XML_RELEASE
 
 WEEKLY_XML_RELEASE_HEADER = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?><ClinVarVariationRelease xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://ftp.ncbi.nlm.nih.gov/pub/clinvar/xsd_public/ClinVar_VCV_2.4.xsd" ReleaseDate="2025-06-30">'''
 WEEKLY_XML_RELEASE_DATA = WEEKLY_XML_RELEASE_HEADER + '''
@@ -80,6 +80,9 @@ WEEKLY_XML_RELEASE_DATA = WEEKLY_XML_RELEASE_HEADER + '''
 '''
 
 
+BATCH_SIZE = 1000
+
+
 @mock.patch('seqr.management.commands.reload_clinvar_all_variants.safe_post_to_slack')
 @mock.patch('seqr.management.commands.reload_clinvar_all_variants.logger.info')
 class ReloadClinvarAllVariantsTest(TestCase):
@@ -92,7 +95,7 @@ class ReloadClinvarAllVariantsTest(TestCase):
         ClinvarAllVariantsSnvIndel.objects.using('clickhouse_write').all().delete()
         responses.add(responses.GET, WEEKLY_XML_RELEASE, status=200, body=gzip.compress(WEEKLY_XML_RELEASE_DATA.encode()), stream=True)
         call_command('reload_clinvar_all_variants')
-        mock_logger.assert_called_with('Updating Clinvar ClickHouse tables to 2025-06-30 from None.')
+        mock_logger.assert_any_call('Updating Clinvar ClickHouse tables to 2025-06-30 from None.')
         self.assertEqual(ClinvarAllVariantsSnvIndel.objects.count(), 1)
 
     @responses.activate
@@ -108,7 +111,7 @@ class ReloadClinvarAllVariantsTest(TestCase):
     def test_parse_variants_all_types(self, mock_logger, mock_safe_post_to_slack):
         responses.add(responses.GET, WEEKLY_XML_RELEASE, status=200, body=gzip.compress(WEEKLY_XML_RELEASE_DATA.encode()), stream=True)
         call_command('reload_clinvar_all_variants')
-        mock_logger.assert_called_with('Updating Clinvar ClickHouse tables to 2025-06-30 from 2025-06-23.')
+        mock_logger.assert_any_call('Updating Clinvar ClickHouse tables to 2025-06-30 from 2025-06-23.')
         seqr_clinvar_snv_indel_models = ClinvarSnvIndel.objects.all()
         self.assertEqual(seqr_clinvar_snv_indel_models.count(), 1)
         self.assertDictEqual(
@@ -170,6 +173,7 @@ class ReloadClinvarAllVariantsTest(TestCase):
 
 
     @responses.activate
+    @mock.patch('seqr.management.commands.reload_clinvar_all_variants.BATCH_SIZE', BATCH_SIZE)
     def test_batching(self, mock_logger, mock_safe_post_to_slack):
         # Dynamically build many variants
         data = WEEKLY_XML_RELEASE_HEADER
@@ -193,11 +197,42 @@ class ReloadClinvarAllVariantsTest(TestCase):
         data += '</ClinVarVariationRelease>'
         responses.add(responses.GET, WEEKLY_XML_RELEASE, status=200, body=gzip.compress(data.encode()), stream=True)
         call_command('reload_clinvar_all_variants')
-        mock_logger.assert_called_with('Updating Clinvar ClickHouse tables to 2025-06-30 from 2025-06-23.')
+        mock_logger.assert_any_call('Updating Clinvar ClickHouse tables to 2025-06-30 from 2025-06-23.')
+        mock_logger.assert_called_with(mock.ANY)
+        self.assertRegex(mock_logger.call_args.args[0], rf'^Loaded {BATCH_SIZE * 2 + 10} Clinvar records in \d+s \(\d+ records/sec\)\.$')
         self.assertEqual(ClinvarAllVariantsSnvIndel.objects.all().count(), BATCH_SIZE * 2 + 10)
         self.assertEqual(ClinvarAllVariantsSnvIndel.objects.first().pathogenicity, ClinvarAllVariantsSnvIndel.CLINVAR_DEFAULT_PATHOGENICITY)
         self.assertIsNone(ClinvarAllVariantsSnvIndel.objects.first().gold_stars)
 
+    @responses.activate
+    @mock.patch('seqr.management.commands.reload_clinvar_all_variants.safe_redis_delete')
+    @mock.patch('seqr.management.commands.reload_clinvar_all_variants.safe_redis_set_json')
+    @mock.patch('seqr.management.commands.reload_clinvar_all_variants.safe_redis_get_json')
+    def test_resume_from_checkpoint(self, mock_redis_get, mock_redis_set, mock_redis_delete, mock_logger, mock_safe_post_to_slack):
+        # The first chunk, containing the GRCh37/GRCh38 variant, was already loaded by a previous failed run
+        mock_redis_get.return_value = {'version': '2025-06-30', 'batch_size': 1, 'completed_chunks': {
+            ClinvarAllVariantsGRCh37SnvIndel._meta.db_table: 0,
+            ClinvarAllVariantsSnvIndel._meta.db_table: 0,
+            ClinvarAllVariantsMito._meta.db_table: 0,
+        }}
+        responses.add(responses.GET, WEEKLY_XML_RELEASE, status=200, body=gzip.compress(WEEKLY_XML_RELEASE_DATA.encode()), stream=True)
+        call_command('reload_clinvar_all_variants', '--batch-size', '1', '--processes', '2')
+
+        mock_logger.assert_any_call('Resuming Clinvar ClickHouse update to 2025-06-30 from the last completed chunk.')
+        self.assertEqual(ClinvarAllVariantsSnvIndel.objects.count(), 0)
+        self.assertEqual(ClinvarAllVariantsGRCh37SnvIndel.objects.count(), 0)
+        self.assertEqual(ClinvarAllVariantsMito.objects.count(), 1)
+
+        mock_redis_get.assert_called_with('reload_clinvar_all_variants__checkpoint')
+        mock_redis_set.assert_called_with('reload_clinvar_all_variants__checkpoint', mock.ANY, expire=604800)
+        mock_redis_delete.assert_called_once_with('reload_clinvar_all_variants__checkpoint')
+        self.assertDictEqual(mock_redis_get.return_value['completed_chunks'], {
+            ClinvarAllVariantsGRCh37SnvIndel._meta.db_table: 1,
+            ClinvarAllVariantsSnvIndel._meta.db_table: 1,
+            ClinvarAllVariantsMito._meta.db_table: 1,
+        })
+        self.assertEqual(DataVersions.objects.get(data_model_name='Clinvar').version, '2025-06-30')
+
     @responses.activate
     def test_malformed_variants(self, mock_logger, mock_safe_post_to_slack):
         for description, review_status, conflicting_pathogenicities, error_message in [
@@ -1,13 +1,18 @@
+from collections import defaultdict
 from datetime import datetime
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
 import json
 import mock
+from threading import get_ident
 
 from clickhouse_search.search_tests import ClickhouseSearchTestCase
 from clickhouse_search.test_utils import VARIANT2, VARIANT3, VARIANT4, GCNV_VARIANT3, GCNV_VARIANT4
-from seqr.models import SavedVariant, VariantTag
+from seqr.models import SavedVariant, VariantTag, Individual, PrioritizedVariantTaggingRun
 
 PROJECT_GUID = 'R0001_1kg'
+PROJECT_NAME = '1kg project n\u00e5me with uni\u00e7\u00f8de'
 
 SNV_INDEL_MATCHES = {
     'Clinvar Pathogenic': 0,
@@ -125,9 +130,87 @@ class CheckNewSamplesTest(ClickhouseSearchTestCase):
             for tag in VariantTag.objects.filter(variant_tag_type__name='seqr Prioritized')
         })
 
-    def _assert_expected_logs(self, model_creation_logs):
+    @mock.patch('seqr.utils.communication_utils.EmailMultiAlternatives')
+    @mock.patch('seqr.utils.communication_utils._post_to_slack')
+    @mock.patch('seqr.management.commands.tag_seqr_prioritized_variants.datetime')
+    def test_incremental_command(self, mock_datetime, mock_slack, mock_email):
+        mock_datetime.now.return_value = datetime(2025, 11, 15)
+
+        # Test all families are searched with no previous tagging run
+        call_command('tag_seqr_prioritized_variants', PROJECT_GUID, '--incremental')
+        self.assertEqual(VariantTag.objects.filter(variant_tag_type__name='seqr Prioritized').count(), 5)
+        mock_slack.assert_called_once()
+        last_run = PrioritizedVariantTaggingRun.objects.get(project__guid=PROJECT_GUID)
+        self.assertRegex(last_run.data_version, r'^.+__[0-9a-f]{32}$')
+        self.assertLess(last_run.started_date, timezone.now())
+
+        # Test no families searched if nothing changed
+        mock_slack.reset_mock()
+        self.reset_logs()
+        call_command('tag_seqr_prioritized_variants', PROJECT_GUID, '--incremental')
+        self.assert_json_logs(user=None, expected=[
+            (f'No families changed since the last tagging run in project {PROJECT_NAME}', None),
+        ])
+        self.assertEqual(PrioritizedVariantTaggingRun.objects.get(project__guid=PROJECT_GUID).started_date, last_run.started_date)
+
+        # Test only changed families are searched
+        Individual.objects.filter(guid='I000004_hg00731').update(last_modified_date=timezone.now())
+        self.reset_logs()
+        call_command('tag_seqr_prioritized_variants', PROJECT_GUID, '--incremental')
+        self._assert_expected_logs([
+            ('Tagged 0 new and 0 previously tagged variants in 1 families, found 5 unchanged tags:', None),
+        ], num_snv_indel_families=1, initial_logs=[
+            (f'Searching 1 changed families in project {PROJECT_NAME}', None),
+        ])
+        mock_slack.assert_not_called()
+        self.assertGreater(
+            PrioritizedVariantTaggingRun.objects.get(project__guid=PROJECT_GUID).started_date, last_run.started_date,
+        )
+
+        # Test all families are searched if the search criteria change
+        PrioritizedVariantTaggingRun.objects.filter(project__guid=PROJECT_GUID).update(data_version='previous_version')
+        self.reset_logs()
+        call_command('tag_seqr_prioritized_variants', PROJECT_GUID, '--incremental')
+        self._assert_expected_logs([
+            ('Tagged 0 new and 0 previously tagged variants in 1 families, found 5 unchanged tags:', None),
+        ])
+        self.assertEqual(
+            PrioritizedVariantTaggingRun.objects.get(project__guid=PROJECT_GUID).data_version, last_run.data_version,
+        )
+
+    @mock.patch('seqr.management.commands.tag_seqr_prioritized_variants.Command._tag_project')
+    def test_multiple_projects(self, mock_tag_project):
+        projects_by_thread = defaultdict(list)
+
+        def _tag_project(project, exclude_genes, gene_by_moi, data_version):
+            projects_by_thread[get_ident()].append(project.guid)
+            if project.guid == 'R0003_test':
+                raise ValueError('Invalid sample type')
+        mock_tag_project.side_effect = _tag_project
+
+        with self.assertRaises(CommandError) as ce:
+            call_command('tag_seqr_prioritized_variants', PROJECT_GUID, 'R0003_test', 'R0004_non_analyst_project', '--max-workers=2')
+        self.assertEqual(str(ce.exception), 'Failed to tag prioritized variants in 1 projects: R0003_test')
+        self.assertNotIn(get_ident(), projects_by_thread)
+        self.assertListEqual(
+            sorted(guid for guids in projects_by_thread.values() for guid in guids),
+            [PROJECT_GUID, 'R0003_test', 'R0004_non_analyst_project'],
+        )
         self.assert_json_logs(user=None, expected=[
-            ('Searching for prioritized SNV_INDEL variants in 3 families in project 1kg project n\u00e5me with uni\u00e7\u00f8de', None),
+            ('Error tagging prioritized variants in project Test Reprocessed Project: Invalid sample type', {
+                'severity': 'ERROR',
+                '@type': 'type.googleapis.com/google.devtools.clouderrorreporting.v1beta1.ReportedErrorEvent',
+            }),
+        ])
+
+        # projects are tagged in the calling thread by default
+        projects_by_thread.clear()
+        call_command('tag_seqr_prioritized_variants', PROJECT_GUID, 'R0004_non_analyst_project')
+        self.assertDictEqual(dict(projects_by_thread), {get_ident(): [PROJECT_GUID, 'R0004_non_analyst_project']})
+
+    def _assert_expected_logs(self, model_creation_logs, num_snv_indel_families=3, initial_logs=None):
+        self.assert_json_logs(user=None, expected=(initial_logs or []) + [
+            (f'Searching for prioritized SNV_INDEL variants in {num_snv_indel_families} families in project 1kg project n\u00e5me with uni\u00e7\u00f8de', None),
         ] + [(f'Found {count} variants for criteria: {criteria}', None) for criteria, count in SNV_INDEL_MATCHES.items()] + [
             ('Searching for prioritized SV_WES variants in 1 families in project 1kg project n\u00e5me with uni\u00e7\u00f8de', None),
         ] + [(f'Found {count} variants for criteria: {criteria}', None) for criteria, count in SV_MATCHES.items()] + [
@@ -1,7 +1,7 @@
 from django.core.management import call_command
 import responses
 
-from seqr.models import Family, VariantTagType, VariantTag, Sample
+from seqr.models import Family, VariantTagType, VariantTag, Sample, ProjectStats, Project
 from seqr.views.utils.test_utils import AuthenticationTestCase, AnvilAuthenticationTestCase
 
 
@@ -14,6 +14,7 @@ class TransferFamiliesTest(object):
     def test_command(self):
         responses.add(responses.POST, 'http://pipeline-runner:6000/delete_families_enqueue', status=200)
 
+        ProjectStats.update_stats(Project.objects.values_list('id', flat=True))
         call_command(
             'transfer_families_to_different_project', '--from-project=R0001_1kg', '--to-project=R0003_test', '2', '4', '5', '12',
         )
@@ -50,6 +51,16 @@ class TransferFamiliesTest(object):
         self.assertEqual(family.project.guid, 'R0003_test')
         self.assertEqual(family.individual_set.count(), 1)
 
+        # cached context and project stats are updated for both projects
+        from_stats = ProjectStats.objects.get(project__guid='R0001_1kg')
+        self.assertEqual(from_stats.context_version, 1)
+        self.assertEqual(from_stats.num_families, 9)
+        self.assertEqual(from_stats.num_individuals, 10)
+        to_stats = ProjectStats.objects.get(project__guid='R0003_test')
+        self.assertEqual(to_stats.context_version, 1)
+        self.assertEqual(to_stats.num_families, 4)
+        self.assertEqual(to_stats.num_individuals, 8)
+
 
 class TransferFamiliesLocalTest(TransferFamiliesTest, AuthenticationTestCase):
     fixtures = ['users', '1kg_project']
@@ -62,6 +73,11 @@ class TransferFamiliesClickhouseTest(TransferFamiliesTest, AnvilAuthenticationTe
 
     ES_HOSTNAME = ''
     LOGS = [
+        ('update 7 Samples', {'dbUpdate': {
+            'dbEntity': 'Sample', 'entityIds': [
+                'S000132_hg00731', 'S000133_hg00732', 'S000134_hg00733', 'S000145_hg00731', 'S000146_hg00732',
+                'S000148_hg00733', 'S000149_hg00733',
+            ], 'updateType': 'bulk_update', 'updateFields': ['is_active']}}),
         ('Disabled search for 7 samples in the following 1 families: 2', None),
         ('Triggered Delete Families', {'detail':  {'project_guid': 'R0001_1kg', 'family_guids': ['F000002_2', 'F000004_4']}}),
     ]
@@ -2,7 +2,7 @@ from django.core.management import call_command, CommandError
 from django.test import TestCase
 import mock
 
-from seqr.models import IgvSample
+from seqr.models import IgvSample, ProjectStats
 
 
 class UpdateIgvPathsTest(TestCase):
@@ -14,7 +14,9 @@ class UpdateIgvPathsTest(TestCase):
             call_command('update_igv_location')
         self.assertEqual(str(err.exception), 'Error: the following arguments are required: old_prefix, new_prefix')
 
-        call_command('update_igv_location', '/readviz/', '/seqr/static_media/igv/')
+        ProjectStats.update_stats([1])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('update_igv_location', '/readviz/', '/seqr/static_media/igv/')
         mock_logger.assert_has_calls([
             mock.call('Updating 1 IGV samples'),
             mock.call('Done'),
@@ -22,6 +24,8 @@ class UpdateIgvPathsTest(TestCase):
         self.assertEqual(IgvSample.objects.get(id=145).file_path, '/seqr/static_media/igv/NA19675.cram')
         # Other IGV samples are unchanged
         self.assertEqual(IgvSample.objects.get(id=146).file_path, 'gs://readviz/NA20870.cram')
+        # Cached project context is invalidated
+        self.assertEqual(ProjectStats.objects.get(project__guid='R0001_1kg').context_version, 1)
 
         with self.assertRaises(CommandError) as err:
             call_command('update_igv_location', '/readviz/', '/seqr/static_media/igv/')
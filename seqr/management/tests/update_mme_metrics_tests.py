@@ -0,0 +1,49 @@
+from datetime import datetime
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+import mock
+
+from matchmaker.models import MatchmakerMetrics, MatchmakerSubmission
+
+
+class UpdateMmeMetricsTest(TestCase):
+    fixtures = ['users', '1kg_project']
+
+    @mock.patch('seqr.management.commands.update_mme_metrics.logger')
+    @mock.patch('seqr.management.commands.check_mme_metrics.logger')
+    def test_commands(self, mock_check_logger, mock_update_logger):
+        with self.assertRaises(CommandError) as ce:
+            call_command('check_mme_metrics')
+        self.assertEqual(str(ce.exception), 'No precomputed MME metrics found')
+
+        call_command('update_mme_metrics')
+        mock_update_logger.info.assert_called_with(
+            'Updated MME metrics: numberOfCases=4, numberOfSubmitters=2, numberOfUniqueGenes=3, '
+            'numberOfUniqueFeatures=4, numberOfRequestsReceived=3, numberOfPotentialMatchesSent=1'
+        )
+        metrics = MatchmakerMetrics.objects.get()
+        self.assertEqual(metrics.date_generated.strftime('%Y-%m-%d'), datetime.today().strftime('%Y-%m-%d'))
+
+        call_command('check_mme_metrics')
+        mock_check_logger.info.assert_called_with('MME metrics are consistent')
+        mock_check_logger.warning.assert_not_called()
+
+        MatchmakerSubmission.objects.filter(id=1).update(deleted_date=datetime.now())
+        mock_check_logger.reset_mock()
+        with self.assertRaises(CommandError) as ce:
+            call_command('check_mme_metrics')
+        self.assertEqual(str(ce.exception), 'Found 2 inconsistent MME metrics')
+        mock_check_logger.warning.assert_has_calls([
+            mock.call('numberOfCases: expected 3, found 4'),
+            mock.call('numberOfUniqueFeatures: expected 2, found 4'),
+        ])
+
+        call_command('check_mme_metrics', '--fix')
+        mock_check_logger.info.assert_called_with('Rebuilt MME metrics')
+        metrics = MatchmakerMetrics.objects.get()
+        self.assertEqual(metrics.number_of_cases, 3)
+        self.assertEqual(metrics.number_of_unique_features, 2)
+
+        mock_check_logger.reset_mock()
+        call_command('check_mme_metrics')
+        mock_check_logger.info.assert_called_with('MME metrics are consistent')
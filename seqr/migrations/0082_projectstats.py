@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-19 10:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0081_savedvariant_gene_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='seqr.project')),
+                ('num_families', models.IntegerField()),
+                ('num_individuals', models.IntegerField()),
+                ('num_variant_tags', models.IntegerField()),
+                ('analysis_status_counts', models.JSONField(default=dict)),
+                ('sample_type_counts', models.JSONField(default=dict)),
+                ('last_updated_date', models.DateTimeField()),
+            ],
+        ),
+    ]
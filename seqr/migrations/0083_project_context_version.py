@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0082_projectstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='context_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
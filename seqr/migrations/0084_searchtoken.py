@@ -0,0 +1,58 @@
+# Generated by Django 4.2.27 on 2026-10-19 10:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from seqr.models import SearchToken as CurrentSearchToken
+
+SEARCH_MODELS = [
+    ('Project', 'id', ['name']),
+    ('Family', 'project_id', ['display_name', 'family_id']),
+    ('Individual', 'family__project_id', ['display_name', 'individual_id']),
+    ('AnalysisGroup', 'project_id', ['name']),
+]
+
+
+def populate_search_tokens(apps, schema_editor):
+    SearchToken = apps.get_model('seqr', 'SearchToken')
+    db_alias = schema_editor.connection.alias
+    for model_name, project_id_field, search_fields in SEARCH_MODELS:
+        model_cls = apps.get_model('seqr', model_name)
+        tokens = []
+        num_created = 0
+        for object_id, project_id, *values in model_cls.objects.using(db_alias).values_list(
+                'id', project_id_field, *search_fields).iterator():
+            tokens += [
+                SearchToken(model_name=model_name.lower(), object_id=object_id, project_id=project_id, token=token)
+                for token in CurrentSearchToken.get_tokens(values)
+            ]
+            if len(tokens) >= CurrentSearchToken.BATCH_SIZE:
+                num_created += len(SearchToken.objects.using(db_alias).bulk_create(tokens))
+                tokens = []
+        num_created += len(SearchToken.objects.using(db_alias).bulk_create(tokens))
+        if num_created:
+            print(f'Populated {num_created} search tokens for {model_name} models')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0083_project_context_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('token', models.TextField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='seqr.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_name', 'token'], name='search_token_lookup_idx', opclasses=['varchar_pattern_ops', 'text_pattern_ops']), models.Index(fields=['model_name', 'object_id'], name='search_token_object_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_tokens, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-19 10:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0084_searchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndividualHpoTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hpo_id', models.CharField(max_length=20)),
+                ('ancestor_hpo_id', models.CharField(max_length=20)),
+                ('observed', models.BooleanField()),
+                ('individual', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='seqr.individual')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor_hpo_id', 'observed'], name='individual_hpo_ancestor_idx')],
+            },
+        ),
+    ]
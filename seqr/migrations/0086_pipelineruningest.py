@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:54
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0085_individualhpoterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineRunIngest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genome_version', models.CharField(max_length=10)),
+                ('dataset_type', models.CharField(max_length=20)),
+                ('run_version', models.TextField()),
+                ('completed_steps', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=20), default=list, size=None)),
+                ('new_sample_guids', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=30), default=list, size=None)),
+                ('updated_sample_guids', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=30), default=list, size=None)),
+                ('error', models.TextField(null=True)),
+                ('created_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_modified_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completed_date', models.DateTimeField(null=True)),
+            ],
+            options={
+                'unique_together': {('genome_version', 'dataset_type', 'run_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0086_pipelineruningest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrioritizedVariantTaggingRun',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='prioritized_variant_tagging_run', serialize=False, to='seqr.project')),
+                ('data_version', models.TextField()),
+                ('started_date', models.DateTimeField()),
+            ],
+        ),
+    ]
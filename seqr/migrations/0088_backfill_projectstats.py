@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.utils import timezone
+
+from seqr.models import ProjectStats as CurrentProjectStats
+
+
+def backfill_project_stats(apps, schema_editor):
+    Project = apps.get_model('seqr', 'Project')
+    ProjectStats = apps.get_model('seqr', 'ProjectStats')
+    db_alias = schema_editor.connection.alias
+    project_ids = list(Project.objects.using(db_alias).filter(stats__isnull=True).values_list('id', flat=True))
+    if not project_ids:
+        return
+    last_updated_date = timezone.now()
+    ProjectStats.objects.using(db_alias).bulk_create([
+        ProjectStats(project_id=project_id, last_updated_date=last_updated_date, **project_stats)
+        for project_id, project_stats in CurrentProjectStats.compute_stats(project_ids).items()
+    ])
+    print(f'Computed stats for {len(project_ids)} projects')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0087_prioritizedvarianttaggingrun'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_project_stats, reverse_code=migrations.RunPython.noop),
+    ]
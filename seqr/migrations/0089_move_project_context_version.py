@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seqr', '0088_backfill_projectstats'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='project',
+            name='context_version',
+        ),
+        migrations.AddField(
+            model_name='projectstats',
+            name='context_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
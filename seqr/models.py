@@ -1,11 +1,13 @@
+from collections import defaultdict
 import uuid
 import json
 import random
+import threading
 
 from django.contrib.auth.models import User, Group
 from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import PermissionDenied, ValidationError
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models import base, options, prefetch_related_objects
 from django.utils import timezone
 from django.utils.text import slugify as __slugify
@@ -15,7 +17,7 @@ from guardian.shortcuts import assign_perm
 from seqr.utils.logging_utils import log_model_update, log_model_bulk_update, SeqrLogger
 from seqr.utils.xpos_utils import get_chrom_pos
 from seqr.views.utils.terra_api_utils import anvil_enabled
-from reference_data.models import GENOME_VERSION_GRCh37, GENOME_VERSION_CHOICES
+from reference_data.models import GENOME_VERSION_GRCh37, GENOME_VERSION_CHOICES, HumanPhenotypeOntology
 from settings import MME_DEFAULT_CONTACT_NAME, MME_DEFAULT_CONTACT_HREF, MME_DEFAULT_CONTACT_INSTITUTION, \
     VLM_DEFAULT_CONTACT_EMAIL
 
@@ -45,6 +47,49 @@ def get_audit_field_names(audit_field):
     return list(_get_audit_fields(audit_field).keys())
 
 
+class _PendingProjectUpdates(threading.local):
+    """Precomputed project data updates for the models written in the current transaction. The updates for each project
+    are applied once after the transaction is committed, rather than on every write, so concurrent writes to a project
+    do not queue on its shared rows and a rolled back transaction never updates precomputed data"""
+
+    def __init__(self):
+        super().__init__()
+        self.project_ids = set()
+        self.stats_project_ids = set()
+        self.stats_count_deltas = defaultdict(lambda: defaultdict(int))
+
+    def add(self, project_ids, update_stats=False, stats_count_field=None, stats_count_delta=None):
+        self.project_ids.update(project_ids)
+        if update_stats and stats_count_field:
+            for project_id in project_ids:
+                self.stats_count_deltas[stats_count_field][project_id] += stats_count_delta
+        elif update_stats:
+            self.stats_project_ids.update(project_ids)
+        # callbacks run immediately outside of a transaction, and the first callback to run applies all pending updates
+        transaction.on_commit(self.apply)
+
+    def apply(self):
+        project_ids, self.project_ids = self.project_ids, set()
+        stats_project_ids, self.stats_project_ids = self.stats_project_ids, set()
+        stats_count_deltas, self.stats_count_deltas = self.stats_count_deltas, defaultdict(lambda: defaultdict(int))
+        if not project_ids:
+            return
+
+        ProjectStats.update_stats(stats_project_ids)
+        for stats_field, project_deltas in stats_count_deltas.items():
+            project_ids_by_delta = defaultdict(list)
+            for project_id, delta in project_deltas.items():
+                # recomputed stats already include the counted models
+                if delta and project_id not in stats_project_ids:
+                    project_ids_by_delta[delta].append(project_id)
+            for delta, delta_project_ids in project_ids_by_delta.items():
+                ProjectStats.update_count(delta_project_ids, stats_field, delta)
+        ProjectStats.update_context_version(project_ids)
+
+
+_pending_project_updates = _PendingProjectUpdates()
+
+
 class CustomModelBase(base.ModelBase):
     def __new__(cls, name, bases, attrs, **kwargs):
         audit_fields = getattr(attrs.get('Meta'), 'audit_fields', None)
@@ -67,6 +112,17 @@ class ModelWithGUID(models.Model, metaclass=CustomModelBase):
     # used for optimistic concurrent write protection (to detect concurrent changes)
     last_modified_date = models.DateTimeField(null=True, blank=True,  db_index=True)
 
+    # lookup from the model to its project id, for models which are included in precomputed project data
+    PROJECT_ID_FIELD = None
+    # whether the model is counted in the precomputed ProjectStats, and which of its fields are counted
+    IN_PROJECT_STATS = False
+    PROJECT_STATS_UPDATE_FIELDS = set()
+    # the ProjectStats count, if any, which is the only stat affected by creating a model
+    PROJECT_STATS_COUNT_FIELD = None
+    # name fields indexed in SearchToken for awesomebar lookups, and the lookup from the model to its project id
+    SEARCH_FIELDS = []
+    SEARCH_PROJECT_ID_FIELD = None
+
     class Meta:
         abstract = True
 
@@ -74,8 +130,10 @@ class ModelWithGUID(models.Model, metaclass=CustomModelBase):
         internal_json_fields = []
         audit_fields = set()
 
-    def _format_guid(self, model_id):
-        return f'{self.GUID_PREFIX}{model_id:0{self.GUID_PRECISION}d}_{_slugify(str(self))}'[:self.MAX_GUID_SIZE]
+    def _format_guid(self, model_id, model_str=None):
+        if model_str is None:
+            model_str = str(self)
+        return f'{self.GUID_PREFIX}{model_id:0{self.GUID_PRECISION}d}_{_slugify(model_str)}'[:self.MAX_GUID_SIZE]
 
     def _compute_guid(self):
         return self._format_guid(self.id)
@@ -91,11 +149,45 @@ class ModelWithGUID(models.Model, metaclass=CustomModelBase):
         """Utility method that returns a json {field-name: value-as-string} mapping for all fields."""
         return {k: v for k, v in self.__dict__.items() if not k.startswith('_')}
 
+    @classmethod
+    def _get_tracked_fields(cls):
+        """Fields which precomputed project data and derived models depend on, which are compared to their stored values
+        on save"""
+        tracked_fields = set(cls.PROJECT_STATS_UPDATE_FIELDS) | cls._get_derived_model_fields()
+        if cls.IN_PROJECT_STATS and cls.PROJECT_ID_FIELD and '__' not in cls.PROJECT_ID_FIELD:
+            tracked_fields.add(cls.PROJECT_ID_FIELD)
+        return tracked_fields
+
+    def _get_stored_values(self, update_fields=None):
+        """Returns the stored values of the tracked fields which are being saved, looked up before the save rather than
+        copied when the model is loaded, so loading models has no tracking overhead"""
+        fields = self._get_tracked_fields()
+        if update_fields is not None:
+            fields = fields.intersection(update_fields)
+        if not fields:
+            return {}
+        return type(self).objects.filter(pk=self.pk).values(*fields).first() or {}
+
+    def _get_changed_fields(self, stored_values, update_fields=None):
+        # models which are not yet stored are treated as having changed all their tracked fields
+        fields = self._get_tracked_fields()
+        if update_fields is not None:
+            fields = fields.intersection(update_fields)
+        return {field for field in fields if field not in stored_values or getattr(self, field) != stored_values[field]}
+
     def save(self, *args, **kwargs):
         """Create a GUID at object creation time."""
 
         being_created = not self.pk
         current_time = timezone.now()
+        changed_fields = None
+        project_ids = set()
+        if not being_created:
+            stored_values = self._get_stored_values(kwargs.get('update_fields'))
+            changed_fields = self._get_changed_fields(stored_values, kwargs.get('update_fields'))
+            if self.PROJECT_ID_FIELD in changed_fields:
+                # the model has moved project, so the project it was previously in is also updated
+                project_ids = {stored_values.get(self.PROJECT_ID_FIELD)} - {None}
 
         # allows for overriding last_modified_date during save, but this should only be used for migrations
         self.last_modified_date = kwargs.pop('last_modified_date', current_time)
@@ -115,6 +207,89 @@ class ModelWithGUID(models.Model, metaclass=CustomModelBase):
             self.guid = self._compute_guid()
             super(ModelWithGUID, self).save()
 
+        update_stats = being_created or bool(changed_fields.intersection(self.PROJECT_STATS_UPDATE_FIELDS)) or bool(
+            project_ids)
+        project_ids.update(self._get_project_ids(type(self).objects.filter(pk=self.pk)))
+        self._update_projects(project_ids, update_stats=update_stats, stats_count_delta=1 if being_created else None)
+        self._update_derived_models([self.pk], updated_fields=changed_fields)
+
+    def delete(self, *args, **kwargs):
+        queryset = type(self).objects.filter(pk=self.pk)
+        project_ids = self._get_project_ids(queryset)
+        search_object_ids = self._get_deleted_search_object_ids(queryset)
+        deleted = super(ModelWithGUID, self).delete(*args, **kwargs)
+        self._update_projects(project_ids)
+        self._delete_derived_models(search_object_ids)
+        return deleted
+
+    @classmethod
+    def _get_project_ids(cls, queryset):
+        if not cls.PROJECT_ID_FIELD:
+            return set()
+        return set(queryset.values_list(cls.PROJECT_ID_FIELD, flat=True)) - {None}
+
+    @classmethod
+    def _update_projects(cls, project_ids, update_stats=True, stats_count_delta=None):
+        """Marks cached project context as stale, and updates project stats for changes to counted models, once the
+        current transaction is committed"""
+        if not project_ids:
+            return
+        _pending_project_updates.add(
+            project_ids, update_stats=update_stats and cls.IN_PROJECT_STATS,
+            stats_count_field=cls.PROJECT_STATS_COUNT_FIELD if stats_count_delta else None,
+            stats_count_delta=stats_count_delta,
+        )
+
+    @classmethod
+    def _get_search_token_fields(cls):
+        fields = set(cls.SEARCH_FIELDS)
+        if fields and '__' not in cls.SEARCH_PROJECT_ID_FIELD and cls.SEARCH_PROJECT_ID_FIELD != 'id':
+            # tokens also store the model's project, so are updated when a model moves project
+            fields.add(cls.SEARCH_PROJECT_ID_FIELD)
+        return fields
+
+    @classmethod
+    def _get_derived_model_fields(cls):
+        return cls._get_search_token_fields()
+
+    @classmethod
+    def _has_derived_models(cls, updated_fields=None):
+        return bool(cls.SEARCH_FIELDS) and (
+            updated_fields is None or bool(cls._get_search_token_fields().intersection(updated_fields)))
+
+    @classmethod
+    def _update_derived_models(cls, object_ids, updated_fields=None):
+        """Keeps the tables derived from the model fields (i.e. search tokens) in sync with model changes"""
+        if cls._has_derived_models(updated_fields):
+            SearchToken.update_tokens(cls, object_ids)
+
+    @classmethod
+    def _get_deleted_search_object_ids(cls, queryset):
+        """Returns the ids of the models with search tokens which are deleted with the given models, including models
+        with search tokens deleted by cascade, as search tokens are not linked to their models by a foreign key"""
+        search_object_ids = defaultdict(list)
+        if cls.SEARCH_FIELDS:
+            search_object_ids[cls] += queryset.values_list('id', flat=True)
+        for relation in cls._meta.related_objects:
+            related_model = relation.related_model
+            if getattr(relation, 'on_delete', None) is models.CASCADE and getattr(related_model, 'SEARCH_FIELDS', None):
+                related_queryset = related_model.objects.filter(**{f'{relation.field.name}__in': queryset})
+                for model_cls, object_ids in related_model._get_deleted_search_object_ids(related_queryset).items():
+                    search_object_ids[model_cls] += object_ids
+        return search_object_ids
+
+    @classmethod
+    def _delete_derived_models(cls, search_object_ids):
+        for model_cls, object_ids in search_object_ids.items():
+            SearchToken.delete_tokens(model_cls, object_ids)
+
+    @classmethod
+    def update_project_context_version(cls, models):
+        """Marks precomputed project context as stale for changes made outside of the model helpers, i.e. many-to-many
+        relationship updates"""
+        project_ids = cls._get_project_ids(cls.objects.filter(pk__in=[model.pk for model in models]))
+        cls._update_projects(project_ids, update_stats=False)
+
     def delete_model(self, user, user_can_delete=False):
         """Helper delete method that logs the deletion"""
         if not (user_can_delete or self.created_by == user):
@@ -131,8 +306,40 @@ class ModelWithGUID(models.Model, metaclass=CustomModelBase):
             model.guid = model._format_guid(random.randint(10**(cls.GUID_PRECISION-1), 10**cls.GUID_PRECISION))  # nosec
         models = cls.objects.bulk_create(new_models, **kwargs)
         log_model_bulk_update(logger, models, user, 'create')
+        cls._update_projects(cls._get_project_ids(cls.objects.filter(pk__in=[model.pk for model in models])))
+        cls._update_derived_models([model.pk for model in models])
         return models
 
+    @classmethod
+    def bulk_create_with_guids(cls, user, new_models, update_fields=None):
+        """Helper bulk create method that creates the models with a single insert, with the same GUIDs and audit logs as
+        creating and logging each model individually"""
+        if not new_models:
+            return []
+        current_time = timezone.now()
+        # ids are reserved up front from the table's id sequence, so the GUIDs can be computed before the insert
+        for model, model_id in zip(new_models, cls._reserve_ids(len(new_models))):
+            model.id = model_id
+            model.created_by = user
+            model.created_date = current_time
+            model.last_modified_date = current_time
+            model.guid = model._compute_guid()
+        models = cls.objects.bulk_create(new_models)
+        for model in models:
+            log_model_update(logger, model, user, 'create', update_fields)
+        cls._update_projects(cls._get_project_ids(cls.objects.filter(pk__in=[model.pk for model in models])))
+        cls._update_derived_models([model.pk for model in models])
+        return models
+
+    @classmethod
+    def _reserve_ids(cls, num_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                [cls._meta.db_table, cls._meta.pk.column, num_ids],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
     @classmethod
     def bulk_update(cls, user, update_json, queryset=None, **filter_kwargs):
         """Helper bulk update method that logs the update"""
@@ -142,23 +349,37 @@ class ModelWithGUID(models.Model, metaclass=CustomModelBase):
         if not queryset:
             return []
 
+        project_ids = cls._get_project_ids(queryset)
+        object_ids = list(queryset.values_list('id', flat=True)) if cls._has_derived_models(update_json.keys()) else []
         entity_ids = log_model_bulk_update(logger, queryset, user, 'update', update_fields=update_json.keys())
         queryset.update(**update_json)
+        cls._update_projects(project_ids, update_stats=bool(cls.PROJECT_STATS_UPDATE_FIELDS.intersection(update_json)))
+        cls._update_derived_models(object_ids, updated_fields=update_json.keys())
         return entity_ids
 
     @classmethod
-    def bulk_update_models(cls, user, models, fields):
+    def bulk_update_models(cls, user, models, fields, **kwargs):
         """Helper bulk update method that logs the update and allows different update data for each model"""
         log_model_bulk_update(logger, models, user, 'update', update_fields=fields)
-        cls.objects.bulk_update(models, fields)
+        cls.objects.bulk_update(models, fields, **kwargs)
+        cls._update_projects(
+            cls._get_project_ids(cls.objects.filter(pk__in=[model.pk for model in models])),
+            update_stats=bool(cls.PROJECT_STATS_UPDATE_FIELDS.intersection(fields)),
+        )
+        cls._update_derived_models([model.pk for model in models], updated_fields=fields)
 
     @classmethod
     def bulk_delete(cls, user, queryset=None, **filter_kwargs):
         """Helper bulk delete method that logs the deletion"""
         if queryset is None:
             queryset = cls.objects.filter(**filter_kwargs)
+        project_ids = cls._get_project_ids(queryset)
+        search_object_ids = cls._get_deleted_search_object_ids(queryset)
         log_model_bulk_update(logger, queryset, user, 'delete')
-        return queryset.delete()
+        deleted = queryset.delete()
+        cls._update_projects(project_ids)
+        cls._delete_derived_models(search_object_ids)
+        return deleted
 
 
 class WarningMessage(models.Model):
@@ -214,6 +435,8 @@ class Project(ModelWithGUID):
 
     GUID_PREFIX = 'R'
     GUID_PRECISION = 4
+    SEARCH_FIELDS = ['name']
+    SEARCH_PROJECT_ID_FIELD = 'id'
 
     def save(self, *args, **kwargs):
         """Override the save method and create user permissions groups + add the created_by user.
@@ -245,6 +468,8 @@ class Project(ModelWithGUID):
             user = self.created_by
             user.groups.add(*[getattr(self, group) for group in groups])
 
+            ProjectStats.update_stats([self.pk])
+
     def delete(self, *args, **kwargs):
         """Override the delete method to also delete the project-specific user groups"""
 
@@ -268,6 +493,147 @@ class Project(ModelWithGUID):
         ]
 
 
+class ProjectStats(models.Model):
+    """Precomputed per-project summary counts, kept up to date whenever the models they are computed from are created,
+    deleted or have tracked fields updated through the ModelWithGUID helpers, once the change is committed"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+
+    num_families = models.IntegerField()
+    num_individuals = models.IntegerField()
+    num_variant_tags = models.IntegerField()
+    analysis_status_counts = models.JSONField(default=dict)
+    sample_type_counts = models.JSONField(default=dict)
+
+    last_updated_date = models.DateTimeField()
+
+    # incremented whenever project data changes, used to version cached project context. This is kept with the stats
+    # rather than on the project, so updating it does not lock the project row
+    context_version = models.PositiveIntegerField(default=0)
+
+    STATS_FIELDS = [
+        'num_families', 'num_individuals', 'num_variant_tags', 'analysis_status_counts', 'sample_type_counts',
+    ]
+
+    @classmethod
+    def compute_stats(cls, project_ids):
+        stats = {
+            project_id: {
+                'num_families': 0, 'num_individuals': 0, 'num_variant_tags': 0, 'analysis_status_counts': {},
+                'sample_type_counts': {},
+            } for project_id in project_ids
+        }
+        if not stats:
+            return stats
+
+        for agg in Family.objects.filter(project_id__in=project_ids).values('project_id', 'analysis_status').annotate(
+                count=models.Count('*')):
+            stats[agg['project_id']]['num_families'] += agg['count']
+            stats[agg['project_id']]['analysis_status_counts'][agg['analysis_status']] = agg['count']
+
+        for model_cls, stat in [(Individual, 'num_individuals'), (SavedVariant, 'num_variant_tags')]:
+            for agg in model_cls.objects.filter(family__project_id__in=project_ids).values('family__project_id').annotate(
+                    count=models.Count('*')):
+                stats[agg['family__project_id']][stat] = agg['count']
+
+        sample_type_counts = list(Sample.objects.filter(
+            individual__family__project_id__in=project_ids, dataset_type=Sample.DATASET_TYPE_VARIANT_CALLS,
+        ).values('individual__family__project_id', 'sample_type').annotate(
+            count=models.Count('individual_id', distinct=True))) + list(RnaSample.objects.filter(
+            individual__family__project_id__in=project_ids,
+        ).values('individual__family__project_id').annotate(
+            sample_type=models.Value('RNA'), count=models.Count('individual_id', distinct=True)))
+        for agg in sample_type_counts:
+            stats[agg['individual__family__project_id']]['sample_type_counts'][agg['sample_type']] = agg['count']
+
+        return stats
+
+    @classmethod
+    def update_stats(cls, project_ids):
+        if not project_ids:
+            return []
+        project_ids = list(Project.objects.filter(id__in=project_ids).values_list('id', flat=True))
+        last_updated_date = timezone.now()
+        return cls.objects.bulk_create([
+            cls(project_id=project_id, last_updated_date=last_updated_date, **project_stats)
+            for project_id, project_stats in cls.compute_stats(project_ids).items()
+        ], update_conflicts=True, unique_fields=['project'], update_fields=cls.STATS_FIELDS + ['last_updated_date'])
+
+    @classmethod
+    def update_count(cls, project_ids, stats_field, delta):
+        cls.objects.filter(project_id__in=project_ids).update(
+            **{stats_field: models.F(stats_field) + delta}, last_updated_date=timezone.now(),
+        )
+        # projects without stats are computed in full, so no project is left without stats
+        missing_project_ids = set(project_ids) - set(
+            cls.objects.filter(project_id__in=project_ids).values_list('project_id', flat=True))
+        cls.update_stats(missing_project_ids)
+
+    @classmethod
+    def update_context_version(cls, project_ids):
+        cls.objects.filter(project_id__in=project_ids).update(context_version=models.F('context_version') + 1)
+
+
+
+class SearchToken(models.Model):
+    """Normalized suffixes of the names of project entities, so awesomebar substring matches can be looked up as indexed
+    prefix matches. Kept up to date whenever the models are created, deleted or have name fields updated through the
+    ModelWithGUID helpers"""
+    MAX_TOKEN_LENGTH = 32
+    FUZZY_MATCH_CHARS = ['-', '_', '.']
+    BATCH_SIZE = 10000
+
+    model_name = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    project = models.ForeignKey('Project', on_delete=models.CASCADE, related_name='+')
+    token = models.TextField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['model_name', 'token'], name='search_token_lookup_idx',
+                opclasses=['varchar_pattern_ops', 'text_pattern_ops'],
+            ),
+            models.Index(fields=['model_name', 'object_id'], name='search_token_object_idx'),
+        ]
+
+    @classmethod
+    def normalize(cls, value):
+        for c in cls.FUZZY_MATCH_CHARS:
+            value = value.replace(c, '')
+        return value.upper()
+
+    @classmethod
+    def get_tokens(cls, values):
+        tokens = set()
+        for value in values:
+            normalized = cls.normalize(value or '')
+            tokens.update(normalized[i:i + cls.MAX_TOKEN_LENGTH] for i in range(len(normalized)))
+        return tokens
+
+    @classmethod
+    def delete_tokens(cls, model_cls, object_ids):
+        cls.objects.filter(model_name=model_cls._meta.model_name, object_id__in=object_ids).delete()
+
+    @classmethod
+    def update_tokens(cls, model_cls, object_ids):
+        cls.delete_tokens(model_cls, object_ids)
+        model_name = model_cls._meta.model_name
+        return cls.objects.bulk_create([
+            cls(model_name=model_name, object_id=object_id, project_id=project_id, token=token)
+            for object_id, project_id, *values in model_cls.objects.filter(id__in=object_ids).values_list(
+                'id', model_cls.SEARCH_PROJECT_ID_FIELD, *model_cls.SEARCH_FIELDS)
+            for token in sorted(cls.get_tokens(values))
+        ], batch_size=cls.BATCH_SIZE)
+
+    @classmethod
+    def get_matching_object_ids(cls, model_cls, query, project_ids):
+        """Returns a subquery of the ids of the models in the given projects whose normalized search fields contain the
+        normalized query. This is a superset of case-insensitive matches for both the raw and the normalized query"""
+        return cls.objects.filter(
+            model_name=model_cls._meta.model_name, project_id__in=project_ids,
+            token__startswith=cls.normalize(query)[:cls.MAX_TOKEN_LENGTH],
+        ).values('object_id')
+
 class ProjectCategory(ModelWithGUID):
     projects = models.ManyToManyField('Project')
     name = models.TextField(db_index=True)  # human-readable category name
@@ -380,6 +746,11 @@ class Family(ModelWithGUID):
 
     GUID_PREFIX = 'F'
     GUID_PRECISION = 6
+    PROJECT_ID_FIELD = 'project_id'
+    IN_PROJECT_STATS = True
+    PROJECT_STATS_UPDATE_FIELDS = {'analysis_status'}
+    SEARCH_FIELDS = ['display_name', 'family_id']
+    SEARCH_PROJECT_ID_FIELD = 'project_id'
 
     class Meta:
         unique_together = ('project', 'family_id')
@@ -410,6 +781,7 @@ class FamilyAnalysedBy(ModelWithGUID):
         return '{}_{}_{}'.format(self.family.guid, self.created_by, self.data_type)
 
     GUID_PREFIX = 'FAB'
+    PROJECT_ID_FIELD = 'family__project_id'
     GUID_PRECISION = 6
 
     class Meta:
@@ -431,6 +803,7 @@ class FamilyNote(ModelWithGUID):
         return '{}_{}_{}'.format(self.family.family_id, self.note_type, self.note)[:20]
 
     GUID_PREFIX = 'FAN'
+    PROJECT_ID_FIELD = 'family__project_id'
     GUID_PRECISION = 6
 
     class Meta:
@@ -670,12 +1043,33 @@ class Individual(ModelWithGUID):
         return self.individual_id.strip()
 
     GUID_PREFIX = 'I'
+    PROJECT_ID_FIELD = 'family__project_id'
+    IN_PROJECT_STATS = True
+    PROJECT_STATS_COUNT_FIELD = 'num_individuals'
+    SEARCH_FIELDS = ['display_name', 'individual_id']
+    SEARCH_PROJECT_ID_FIELD = 'family__project_id'
+    HPO_TERM_FIELDS = {'features', 'absent_features'}
 
     def save(self, *args, **kwargs):
         if Individual.objects.filter(individual_id=self.individual_id, family__project_id=self.family.project_id).count() > 1:
             raise ValidationError({'individual_id': 'Individual ID must be unique within a project'})
         super().save(*args, **kwargs)
 
+    @classmethod
+    def _get_derived_model_fields(cls):
+        return super()._get_derived_model_fields() | cls.HPO_TERM_FIELDS
+
+    @classmethod
+    def _has_derived_models(cls, updated_fields=None):
+        return super()._has_derived_models(updated_fields) or (
+            updated_fields is None or bool(cls.HPO_TERM_FIELDS.intersection(updated_fields)))
+
+    @classmethod
+    def _update_derived_models(cls, object_ids, updated_fields=None):
+        super()._update_derived_models(object_ids, updated_fields=updated_fields)
+        if updated_fields is None or cls.HPO_TERM_FIELDS.intersection(updated_fields):
+            IndividualHpoTerm.update_terms(object_ids)
+
     class Meta:
         unique_together = ('family', 'individual_id')
 
@@ -692,6 +1086,42 @@ class Individual(ModelWithGUID):
         audit_fields = {'case_review_status'}
 
 
+class IndividualHpoTerm(models.Model):
+    """Inverted index of the HPO terms for each individual, so individuals can be looked up by phenotype. Observed
+    features are indexed under the term and all of its ancestors, absent features are indexed under the term only"""
+    BATCH_SIZE = 10000
+
+    individual = models.ForeignKey('Individual', on_delete=models.CASCADE)
+    hpo_id = models.CharField(max_length=20)
+    ancestor_hpo_id = models.CharField(max_length=20)
+    observed = models.BooleanField()
+
+    class Meta:
+        indexes = [models.Index(fields=['ancestor_hpo_id', 'observed'], name='individual_hpo_ancestor_idx')]
+
+    @classmethod
+    def update_terms(cls, individual_ids):
+        cls.objects.filter(individual_id__in=individual_ids).delete()
+        individual_features = Individual.objects.filter(id__in=individual_ids).values_list(
+            'id', 'features', 'absent_features')
+        hpo_ids = {feature['id'] for _, features, _ in individual_features for feature in features or []}
+        hpo_ancestors = HumanPhenotypeOntology.get_ancestors(hpo_ids)
+
+        terms = []
+        for individual_id, features, absent_features in individual_features:
+            observed_ids = {feature['id'] for feature in features or []}
+            absent_ids = {feature['id'] for feature in absent_features or []}
+            terms += [
+                cls(individual_id=individual_id, hpo_id=hpo_id, ancestor_hpo_id=ancestor_id, observed=True)
+                for hpo_id in sorted(observed_ids) for ancestor_id in sorted(hpo_ancestors[hpo_id])
+            ]
+            terms += [
+                cls(individual_id=individual_id, hpo_id=hpo_id, ancestor_hpo_id=hpo_id, observed=False)
+                for hpo_id in sorted(absent_ids)
+            ]
+        return cls.objects.bulk_create(terms, batch_size=cls.BATCH_SIZE)
+
+
 class Sample(ModelWithGUID):
     """This model represents a single data type (eg. Variant Calls, or SV Calls) that's generated from a single
     biological sample (eg. WES, WGS).
@@ -738,6 +1168,8 @@ class Sample(ModelWithGUID):
 
     GUID_PREFIX = 'S'
     GUID_PRECISION = 10
+    PROJECT_ID_FIELD = 'individual__family__project_id'
+    IN_PROJECT_STATS = True
 
     class Meta:
        json_fields = [
@@ -745,6 +1177,69 @@ class Sample(ModelWithGUID):
        ]
 
 
+class PipelineRunIngest(models.Model):
+    """Tracks the progress of ingesting a single loading pipeline run into seqr, so an interrupted ingest can resume
+    from the first incomplete step instead of repeating notifications or skipping the remaining updates"""
+    STEP_SAMPLES = 'samples'
+    STEP_NOTIFICATIONS = 'notifications'
+    STEP_SAMPLE_QC = 'sample_qc'
+    STEP_SAVED_VARIANTS = 'saved_variants'
+
+    genome_version = models.CharField(max_length=10)
+    dataset_type = models.CharField(max_length=20)
+    run_version = models.TextField()
+
+    completed_steps = ArrayField(models.CharField(max_length=20), default=list)
+    new_sample_guids = ArrayField(models.CharField(max_length=30), default=list)
+    updated_sample_guids = ArrayField(models.CharField(max_length=30), default=list)
+    error = models.TextField(null=True)
+
+    created_date = models.DateTimeField(default=timezone.now)
+    last_modified_date = models.DateTimeField(default=timezone.now)
+    completed_date = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('genome_version', 'dataset_type', 'run_version')
+
+    def __unicode__(self):
+        return f'{self.genome_version}/{self.dataset_type}: {self.run_version}'
+
+    def __str__(self):
+        return self.__unicode__()
+
+    def is_step_complete(self, step):
+        return step in self.completed_steps
+
+    def complete_step(self, step, **kwargs):
+        self.completed_steps.append(step)
+        self._update(completed_steps=self.completed_steps, **kwargs)
+
+    def complete(self):
+        self._update(completed_date=timezone.now(), error=None)
+
+    def set_error(self, error):
+        self._update(error=str(error))
+
+    def restart(self):
+        self._update(completed_steps=[], new_sample_guids=[], updated_sample_guids=[], error=None, completed_date=None)
+
+    def _update(self, **kwargs):
+        kwargs['last_modified_date'] = timezone.now()
+        for field, value in kwargs.items():
+            setattr(self, field, value)
+        self.save(update_fields=kwargs.keys())
+
+
+class PrioritizedVariantTaggingRun(models.Model):
+    """The last seqr prioritized variant tagging run for a project, so incremental runs only search the families which
+    changed since then"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='prioritized_variant_tagging_run')
+
+    # the ClinVar version and search criteria the project was tagged with
+    data_version = models.TextField()
+    started_date = models.DateTimeField()
+
+
 class RnaSample(ModelWithGUID):
 
     DATA_TYPE_TPM = 'T'
@@ -777,6 +1272,8 @@ class RnaSample(ModelWithGUID):
         return f'{self.data_type}_{self.individual.individual_id}'
 
     GUID_PREFIX = 'RS'
+    PROJECT_ID_FIELD = 'individual__family__project_id'
+    IN_PROJECT_STATS = True
 
     class Meta:
        json_fields = ['guid', 'created_date', 'data_type', 'is_active']
@@ -814,6 +1311,7 @@ class IgvSample(ModelWithGUID):
 
     GUID_PREFIX = 'S'
     GUID_PRECISION = 10
+    PROJECT_ID_FIELD = 'individual__family__project_id'
 
     class Meta:
         unique_together = ('individual', 'sample_type')
@@ -851,6 +1349,9 @@ class SavedVariant(ModelWithGUID):
         return "%s:%s-%s" % (chrom, pos, self.family.guid)
 
     GUID_PREFIX = 'SV'
+    PROJECT_ID_FIELD = 'family__project_id'
+    IN_PROJECT_STATS = True
+    PROJECT_STATS_COUNT_FIELD = 'num_variant_tags'
 
     class Meta:
         unique_together = ('xpos', 'xpos_end', 'variant_id', 'family')
@@ -906,7 +1407,12 @@ class VariantTag(ModelWithGUID):
         saved_variants_ids = "".join(str(saved_variant) for saved_variant in self.saved_variants.all())
         return "%s:%s" % (saved_variants_ids, self.variant_tag_type.name)
 
+    def _compute_guid(self):
+        # GUIDs are only computed for new models, which are not yet linked to any saved variants
+        return self._format_guid(self.id, model_str=f':{self.variant_tag_type.name}')
+
     GUID_PREFIX = 'VT'
+    PROJECT_ID_FIELD = 'saved_variants__family__project_id'
 
     class Meta:
         json_fields = ['guid', 'search_hash', 'metadata', 'last_modified_date', 'created_by']
@@ -924,6 +1430,10 @@ class VariantNote(ModelWithGUID):
         saved_variants_ids = "".join(str(saved_variant) for saved_variant in self.saved_variants.all())
         return "%s:%s" % (saved_variants_ids, (self.note or "")[:20])
 
+    def _compute_guid(self):
+        # GUIDs are only computed for new models, which are not yet linked to any saved variants
+        return self._format_guid(self.id, model_str=f':{(self.note or "")[:20]}')
+
     GUID_PREFIX = 'VN'
 
     class Meta:
@@ -1027,6 +1537,10 @@ class VariantFunctionalData(ModelWithGUID):
         saved_variants_ids = "".join(str(saved_variant) for saved_variant in self.saved_variants.all())
         return "%s:%s" % (saved_variants_ids, self.functional_data_tag)
 
+    def _compute_guid(self):
+        # GUIDs are only computed for new models, which are not yet linked to any saved variants
+        return self._format_guid(self.id, model_str=f':{self.functional_data_tag}')
+
     GUID_PREFIX = 'VFD'
 
     class Meta:
@@ -1111,6 +1625,8 @@ class AnalysisGroup(ModelWithGUID):
         return self.name.strip()
 
     GUID_PREFIX = 'AG'
+    SEARCH_FIELDS = ['name']
+    SEARCH_PROJECT_ID_FIELD = 'project_id'
 
     class Meta:
         unique_together = ('project', 'name')
@@ -1185,6 +1701,32 @@ class BulkOperationBase(models.Model):
         cls.log_model_no_guid_bulk_update(models, user, 'create')
         return models
 
+    @classmethod
+    def bulk_copy(cls, user, parent, rows):
+        """Helper bulk create method that loads data for a single parent using postgres COPY and logs the creation"""
+        parent_field = cls._meta.get_field(cls.PARENT_FIELD)
+        fields = [field for field in cls._meta.concrete_fields if not field.primary_key and field != parent_field]
+        qn = connection.ops.quote_name
+        columns = ', '.join(qn(field.column) for field in [parent_field] + fields)
+        num_rows = 0
+        with connection.cursor() as cursor:
+            with cursor.copy(f'COPY {qn(cls._meta.db_table)} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row([parent.id] + [
+                        field.get_db_prep_save(row[field.name] if field.name in row else field.get_default(), connection)
+                        for field in fields
+                    ])
+                    num_rows += 1
+
+        if num_rows:
+            db_entity = cls.__name__
+            db_update = {
+                'dbEntity': db_entity, 'numEntities': num_rows, 'parentEntityIds': [parent.guid],
+                'updateType': 'bulk_create',
+            }
+            logger.info(f'create {db_entity}s', user, db_update=db_update)
+        return num_rows
+
     @classmethod
     def bulk_delete(cls, user, queryset=None, **filter_kwargs):
         """Helper bulk delete method that logs the deletion"""
@@ -1284,6 +1826,7 @@ class PhenotypePrioritization(ModelWithGUID):
         return "%s:%s:%s" % (self.individual.individual_id, self.gene_id, self.disease_id)
 
     GUID_PREFIX = 'PP'
+    PROJECT_ID_FIELD = 'individual__family__project_id'
 
     class Meta:
         json_fields = ['gene_id', 'tool', 'rank', 'disease_id', 'disease_name', 'scores']
@@ -126,7 +126,7 @@ from seqr.views.apis.users_api import \
 from seqr.views.apis.data_manager_api import elasticsearch_status, delete_index, \
     update_rna_seq, proxy_to_kibana, load_phenotype_prioritization_data, \
     validate_callset, get_loaded_projects, load_data, loading_vcfs, proxy_to_luigi, \
-    trigger_delete_project, trigger_delete_family
+    trigger_delete_project, trigger_delete_family, search_query_profiles
 from seqr.views.apis.report_api import \
     anvil_export, \
     family_metadata, \
@@ -147,7 +147,7 @@ from seqr.views.apis.project_api import create_project_handler, update_project_h
     project_page_data, project_families, project_overview, project_mme_submisssions, project_individuals, \
     project_analysis_groups, update_project_workspace, project_family_notes, project_collaborators, project_locus_lists, \
     project_samples, project_notifications, mark_read_project_notifications, subscribe_project_notifications, \
-    update_project_rna_seq, load_rna_seq_sample_data
+    update_project_rna_seq, load_rna_seq_sample_data, load_rna_seq_samples_data
 from seqr.views.apis.project_categories_api import update_project_categories_handler
 from seqr.views.apis.anvil_workspace_api import anvil_workspace_page, create_project_from_workspace, \
     grant_workspace_access, validate_anvil_vcf, add_workspace_data, get_anvil_vcf_list, get_anvil_igv_options
@@ -192,6 +192,7 @@ api_endpoints = {
     'individual/(?P<individual_guid>[\w.|-]+)/rna_seq_data': get_individual_rna_seq_data,
 
     'load_rna_seq_sample/(?P<sample_guid>[^/]+)': load_rna_seq_sample_data,
+    'load_rna_seq_samples': load_rna_seq_samples_data,
 
     'family/(?P<family_guid>[\w.|-]+)/details': family_page_data,
     'family/(?P<family_guid>[\w.|-]+)/variant_tag_summary': family_variant_tag_summary,
@@ -347,6 +348,7 @@ api_endpoints = {
     'data_management/add_igv': receive_bulk_igv_table_handler,
     'data_management/trigger_delete_project': trigger_delete_project,
     'data_management/trigger_delete_family': trigger_delete_family,
+    'data_management/search_query_profiles': search_query_profiles,
 
     'summary_data/saved_variants/(?P<tag>[^/]+)': saved_variants_page,
     'summary_data/hpo/(?P<hpo_id>[^/]+)': hpo_summary_data,
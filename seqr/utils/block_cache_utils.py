@@ -0,0 +1,101 @@
+import hashlib
+import os
+import tempfile
+from threading import Lock
+
+# once the cache is full, evict down to this fraction of the max size so eviction does not run on every write
+EVICT_TO_RATIO = 0.9
+FILE_SIZE_SUFFIX = '.size'
+
+
+class DiskBlockCache(object):
+    """Caches fixed size blocks of remote files on local disk, evicting the least recently used blocks once the cache
+    exceeds its max size. Recency is tracked with file modification times, so the cache can be shared across processes.
+    Blocks are keyed on the file version as well as its path, so overwritten files are never served from stale blocks"""
+
+    def __init__(self, cache_dir, max_size, block_size):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.block_size = block_size
+        self._cache_size = None
+        self._lock = Lock()
+
+    def _cache_path(self, file_key, version, suffix):
+        file_hash = hashlib.sha256(f'{file_key}#{version}'.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{file_hash}{suffix}')
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            os.utime(path)
+            return content
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path, content):
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix='.tmp_', delete=False) as f:
+            f.write(content)
+        os.replace(f.name, path)
+        self._evict(len(content))
+
+    def _evict(self, added_size):
+        with self._lock:
+            if self._cache_size is not None and self._cache_size + added_size <= self.max_size:
+                self._cache_size += added_size
+                return
+
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.is_file() and not entry.name.startswith('.tmp_'):
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+            cache_size = sum(size for _, _, size in entries)
+            if cache_size > self.max_size:
+                for _, path, size in sorted(entries):
+                    if cache_size <= self.max_size * EVICT_TO_RATIO:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    cache_size -= size
+            self._cache_size = cache_size
+
+    def _get_block(self, file_key, version, block_index, fetch_range):
+        block_path = self._cache_path(file_key, version, f'_{block_index}')
+        size_path = self._cache_path(file_key, version, FILE_SIZE_SUFFIX)
+        content = self._read(block_path)
+        file_size = self._read(size_path)
+        if content is None or file_size is None:
+            block_start = block_index * self.block_size
+            content, file_size = fetch_range(block_start, block_start + self.block_size - 1)
+            self._write(block_path, content)
+            self._write(size_path, str(file_size).encode())
+        return content, int(file_size)
+
+    def get_range(self, file_key, version, start, end, fetch_range):
+        """
+        Gets the given inclusive byte range of a file, loading any uncached blocks with fetch_range(start, end), which
+        should return the content in that range and the total file size. The first block is loaded immediately so the
+        file size is known, and the remaining blocks are loaded as the content is streamed. The version should change
+        whenever the file content does, i.e. the object generation for files in Google Storage
+        Returns:
+            A tuple of the total file size, the last byte in the range bounded by the file size and a content iterator
+        """
+        first_block = start // self.block_size
+        first_content, file_size = self._get_block(file_key, version, first_block, fetch_range)
+        end = file_size - 1 if end is None else min(end, file_size - 1)
+        return file_size, end, self._iter_range(file_key, version, start, end, first_block, first_content, fetch_range)
+
+    def _iter_range(self, file_key, version, start, end, first_block, first_content, fetch_range):
+        for block_index in range(first_block, end // self.block_size + 1):
+            content = first_content if block_index == first_block else self._get_block(
+                file_key, version, block_index, fetch_range)[0]
+            block_start = block_index * self.block_size
+            yield content[max(start - block_start, 0):end - block_start + 1]
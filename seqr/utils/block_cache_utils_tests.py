@@ -0,0 +1,71 @@
+import mock
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from seqr.utils.block_cache_utils import DiskBlockCache
+
+FILE_CONTENT = bytes(range(250))
+
+
+class DiskBlockCacheTest(TestCase):
+
+    def setUp(self):
+        self.fetch_range = mock.MagicMock()
+        self.fetch_range.side_effect = lambda start, end: (FILE_CONTENT[start:end + 1], len(FILE_CONTENT))
+
+    def test_get_range(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = DiskBlockCache(temp_dir, max_size=1000, block_size=100)
+
+            file_size, end, content = cache.get_range('gs://bucket/sample.bam', '1', 50, 120, self.fetch_range)
+            self.assertEqual(file_size, 250)
+            self.assertEqual(end, 120)
+            self.fetch_range.assert_called_once_with(0, 99)
+            self.assertEqual(b''.join(content), FILE_CONTENT[50:121])
+            self.fetch_range.assert_called_with(100, 199)
+
+            self.fetch_range.reset_mock()
+            file_size, end, content = cache.get_range('gs://bucket/sample.bam', '1', 0, None, self.fetch_range)
+            self.assertEqual(end, 249)
+            self.assertEqual(b''.join(content), FILE_CONTENT)
+            self.fetch_range.assert_called_once_with(200, 299)
+
+            self.fetch_range.reset_mock()
+            _, end, content = cache.get_range('gs://bucket/sample.bam', '1', 10, 1000, self.fetch_range)
+            self.assertEqual(end, 249)
+            self.assertEqual(b''.join(content), FILE_CONTENT[10:])
+            self.fetch_range.assert_not_called()
+
+            # a new version of the file does not use the blocks cached for the previous version
+            _, _, content = cache.get_range('gs://bucket/sample.bam', '2', 10, 20, self.fetch_range)
+            self.assertEqual(b''.join(content), FILE_CONTENT[10:21])
+            self.fetch_range.assert_called_once_with(0, 99)
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # each block is stored alongside a 3 byte file size entry
+            cache = DiskBlockCache(temp_dir, max_size=220, block_size=100)
+            _, _, content = cache.get_range('gs://bucket/sample.bam', '1', 0, 199, self.fetch_range)
+            self.assertEqual(b''.join(content), FILE_CONTENT[:200])
+            self.assertEqual(len(os.listdir(temp_dir)), 3)
+
+            # the least recently used block is evicted once the cache is full
+            past = time.time() - 100
+            for file_name in os.listdir(temp_dir):
+                if file_name.endswith('_0'):
+                    os.utime(os.path.join(temp_dir, file_name), (past, past))
+            _, _, content = cache.get_range('gs://bucket/sample.bam', '1', 200, 249, self.fetch_range)
+            self.assertEqual(b''.join(content), FILE_CONTENT[200:])
+            cached_files = os.listdir(temp_dir)
+            self.assertEqual(len(cached_files), 3)
+            self.assertFalse(any(file_name.endswith('_0') for file_name in cached_files))
+
+            self.fetch_range.reset_mock()
+            _, _, content = cache.get_range('gs://bucket/sample.bam', '1', 150, 249, self.fetch_range)
+            self.assertEqual(b''.join(content), FILE_CONTENT[150:])
+            self.fetch_range.assert_not_called()
+            _, _, content = cache.get_range('gs://bucket/sample.bam', '1', 0, 49, self.fetch_range)
+            self.assertEqual(b''.join(content), FILE_CONTENT[:50])
+            self.fetch_range.assert_called_once_with(0, 99)
@@ -1,12 +1,31 @@
 import glob
 import gzip
 import os
+import re
 import subprocess # nosec
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
 from seqr.utils.logging_utils import SeqrLogger
+from settings import GCS_STORAGE_BACKEND
 
 logger = SeqrLogger(__name__)
 
+GSUTIL_STORAGE_BACKEND = 'gsutil'
+CLIENT_STORAGE_BACKEND = 'client'
+MAX_STORAGE_CONNECTIONS = 10
+READ_CHUNK_SIZE = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+GSUTIL_BATCH_SIZE = 100
+FOLDER_LISTING_MIN_FILES = 20
+GS_WILDCARD_CHARS = '*?['
+NO_MATCHING_OBJECTS_ERRORS = ['matched no objects', 'No URLs matched']
+
+
+class StorageAccessError(Exception):
+    pass
+
 
 def run_command(command, user=None, pipe_errors=False):
     logger.info('==> {}'.format(command), user)
@@ -38,77 +57,68 @@ def get_google_project(gs_path):
 
 
 def does_file_exist(file_path, user=None):
-    if is_google_bucket_file_path(file_path):
-        process = _run_gsutil_command('ls', file_path, user=user)
-        success = process.wait() == 0
-        if not success:
-            errors = [line.decode('utf-8').strip() for line in process.stdout]
-            logger.warning(' '.join(errors), user)
-        return success
-    return os.path.isfile(file_path)
+    return _get_storage_backend(file_path).does_file_exist(file_path, user=user)
+
+
+def do_files_exist(file_paths, user=None, min_folder_listing_files=FOLDER_LISTING_MIN_FILES):
+    """Checks whether each of the given files exists. Folders containing many of the files are listed once and matched
+    in memory, and the remaining files are checked in concurrent batches for each storage backend.
+    Returns a dictionary of file path to whether or not the file exists"""
+    paths_by_folder = {}
+    for file_path in file_paths:
+        paths_by_folder.setdefault(os.path.dirname(file_path), []).append(file_path)
+
+    files_exist = {}
+    paths_by_backend = {}
+    for folder, paths in paths_by_folder.items():
+        if len(paths) >= min_folder_listing_files and not any(c in folder for c in GS_WILDCARD_CHARS):
+            folder_files = _list_folder_files(folder, user)
+            files_exist.update({file_path: file_path in folder_files for file_path in paths})
+        else:
+            for file_path in paths:
+                paths_by_backend.setdefault(_get_storage_backend(file_path), []).append(file_path)
+
+    for backend, paths in paths_by_backend.items():
+        files_exist.update(backend.do_files_exist(paths, user=user))
+    return files_exist
+
+
+def _list_folder_files(folder, user):
+    # An empty listing means none of the files exist, so a listing which fails must never be treated as empty
+    try:
+        return set(list_files(f'{folder}/*', user))
+    except StorageAccessError:
+        raise
+    except Exception as e:
+        raise StorageAccessError(f'Unable to list {folder}: {e}') from e
 
 
 def list_files(wildcard_path, user, check_subfolders=False, allow_missing=True):
     if check_subfolders:
         wildcard_path = f'{wildcard_path.rstrip("/")}/**'
-    if is_google_bucket_file_path(wildcard_path):
-        return _get_gs_file_list(wildcard_path, user, check_subfolders, allow_missing)
-    return [file_path for file_path in glob.glob(wildcard_path, recursive=check_subfolders) if os.path.isfile(file_path)]
+    return _get_storage_backend(wildcard_path).list_files(wildcard_path, user, check_subfolders, allow_missing)
 
 
 def file_iter(file_path, byte_range=None, raw_content=False, user=None, **kwargs):
-    if not does_file_exist(file_path, user=user):
-        raise FileNotFoundError(f'Could not access file {file_path}')
-    if is_google_bucket_file_path(file_path):
-        for line in _google_bucket_file_iter(file_path, byte_range=byte_range, raw_content=raw_content, user=user, **kwargs):
-            yield line
-    elif byte_range:
-        command = 'dd skip={offset} count={size} bs=1 if={file_path} status="none"'.format(
-            offset=byte_range[0],
-            size=byte_range[1]-byte_range[0] + 1,
-            file_path=file_path,
-        )
-        if file_path.endswith("gz"):
-            command += " | gunzip -c - "
-        process = run_command(command, user=user)
-        for line in process.stdout:
-            yield line
-    else:
-        mode = 'rb' if raw_content else 'r'
-        open_func = gzip.open if file_path.endswith("gz") else open
-        with open_func(file_path, mode) as f:
-            for line in f:
-                yield line
+    return _get_storage_backend(file_path).file_iter(
+        file_path, byte_range=byte_range, raw_content=raw_content, user=user, **kwargs)
 
 
-def _google_bucket_file_iter(gs_path, byte_range=None, raw_content=False, user=None, **kwargs):
-    """Iterate over lines in the given file"""
-    range_arg = ' -r {}-{}'.format(byte_range[0], byte_range[1]) if byte_range else ''
-    process = _run_gsutil_command(
-        'cat{}'.format(range_arg), gs_path, gunzip=gs_path.endswith("gz") and not raw_content, user=user, **kwargs)
-    for line in process.stdout:
-        if not raw_content:
-            line = line.decode('utf-8')
-        yield line
+def local_file_range_iter(file_path, start, end, chunk_size=STREAM_CHUNK_SIZE):
+    """Streams the raw bytes in the given inclusive byte range of a local file using buffered reads"""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
 
 
 def mv_file_to_gs(local_path, gs_path, user=None):
-    command = 'mv {}'.format(local_path)
-    run_gsutil_with_wait(command, gs_path, user)
-
-
-def _get_gs_file_list(gs_path, user, check_subfolders, allow_missing):
-    gs_path = gs_path.rstrip('/')
-    command = 'ls'
-
-    if check_subfolders:
-        # If a bucket is empty gsutil throws an error when running ls with ** instead of returning an empty list
-        subfolders = _run_gsutil_with_stdout(command, gs_path.replace('/**', ''), user)
-        if not subfolders:
-            return []
-
-    all_lines = _run_gsutil_with_stdout(command, gs_path, user, allow_missing=allow_missing)
-    return [line for line in all_lines if is_google_bucket_file_path(line)]
+    _get_storage_backend(gs_path, default=GsutilStorageBackend).mv_file_to_gs(local_path, gs_path, user=user)
 
 
 def run_gsutil_with_wait(command, gs_path, user=None, **kwargs):
@@ -123,9 +133,295 @@ def _run_gsutil_with_stdout(command, gs_path, user=None, allow_missing=False):
     process = _run_gsutil_command(command, gs_path, user=user, pipe_errors=True)
     output, errs = process.communicate()
     if errs:
-        errors = errs.decode('utf-8').strip().replace('\n', ' ')
-        if allow_missing:
+        error_lines = [line.strip() for line in errs.decode('utf-8').split('\n') if line.strip()]
+        errors = ' '.join(error_lines)
+        # Only missing objects are allowed, any other error (i.e. permissions or server errors) does not mean the
+        # files do not exist
+        if allow_missing and all(
+            any(missing_error in line for missing_error in NO_MATCHING_OBJECTS_ERRORS) for line in error_lines
+        ):
             logger.info(errors, user)
         else:
-            raise Exception(f'Run command failed: {errors}')
+            raise StorageAccessError(f'Run command failed: {errors}')
     return [line for line in output.decode('utf-8').split('\n') if line]
+
+
+class LocalStorageBackend(object):
+
+    @staticmethod
+    def does_file_exist(file_path, user=None):
+        return os.path.isfile(file_path)
+
+    @classmethod
+    def do_files_exist(cls, file_paths, user=None):
+        return {file_path: cls.does_file_exist(file_path) for file_path in file_paths}
+
+    @staticmethod
+    def list_files(wildcard_path, user, check_subfolders, allow_missing):
+        return [file_path for file_path in glob.glob(wildcard_path, recursive=check_subfolders) if os.path.isfile(file_path)]
+
+    @classmethod
+    def file_iter(cls, file_path, byte_range=None, raw_content=False, user=None, **kwargs):
+        if not cls.does_file_exist(file_path):
+            raise FileNotFoundError(f'Could not access file {file_path}')
+        if byte_range:
+            content = local_file_range_iter(file_path, *byte_range)
+            if file_path.endswith("gz"):
+                content = _gunzip_chunks(content)
+            for line in _iter_chunk_lines(content):
+                yield line if raw_content else line.decode('utf-8')
+        else:
+            mode = 'rb' if raw_content else 'r'
+            open_func = gzip.open if file_path.endswith("gz") else open
+            with open_func(file_path, mode) as f:
+                for line in f:
+                    yield line
+
+
+class GsutilStorageBackend(object):
+
+    @staticmethod
+    def does_file_exist(file_path, user=None):
+        process = _run_gsutil_command('ls', file_path, user=user)
+        success = process.wait() == 0
+        if not success:
+            errors = [line.decode('utf-8').strip() for line in process.stdout]
+            logger.warning(' '.join(errors), user)
+        return success
+
+    @staticmethod
+    def do_files_exist(file_paths, user=None):
+        # gsutil lists all the given files that exist in a single call, and reports the missing ones as errors
+        paths_by_project = {}
+        for file_path in file_paths:
+            paths_by_project.setdefault(get_google_project(file_path), []).append(file_path)
+        batches = [
+            paths[i:i + GSUTIL_BATCH_SIZE] for paths in paths_by_project.values()
+            for i in range(0, len(paths), GSUTIL_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=MAX_STORAGE_CONNECTIONS) as executor:
+            existing_paths = {
+                path for batch_paths in executor.map(
+                    lambda batch: _run_gsutil_with_stdout('ls', ' '.join(batch), user=user, allow_missing=True), batches,
+                ) for path in batch_paths
+            }
+        return {file_path: file_path in existing_paths for file_path in file_paths}
+
+    @staticmethod
+    def list_files(gs_path, user, check_subfolders, allow_missing):
+        gs_path = gs_path.rstrip('/')
+        command = 'ls'
+
+        if check_subfolders:
+            # If a bucket is empty gsutil throws an error when running ls with ** instead of returning an empty list
+            subfolders = _run_gsutil_with_stdout(command, gs_path.replace('/**', ''), user)
+            if not subfolders:
+                return []
+
+        all_lines = _run_gsutil_with_stdout(command, gs_path, user, allow_missing=allow_missing)
+        return [line for line in all_lines if is_google_bucket_file_path(line)]
+
+    @classmethod
+    def file_iter(cls, gs_path, byte_range=None, raw_content=False, user=None, **kwargs):
+        """Iterate over lines in the given file"""
+        if not cls.does_file_exist(gs_path, user=user):
+            raise FileNotFoundError(f'Could not access file {gs_path}')
+        range_arg = ' -r {}-{}'.format(byte_range[0], byte_range[1]) if byte_range else ''
+        process = _run_gsutil_command(
+            'cat{}'.format(range_arg), gs_path, gunzip=gs_path.endswith("gz") and not raw_content, user=user, **kwargs)
+        for line in process.stdout:
+            if not raw_content:
+                line = line.decode('utf-8')
+            yield line
+
+    @staticmethod
+    def mv_file_to_gs(local_path, gs_path, user=None):
+        command = 'mv {}'.format(local_path)
+        run_gsutil_with_wait(command, gs_path, user)
+
+
+class GcsClientStorageBackend(object):
+    """Accesses Google Storage in-process through a single shared client, which reuses its pooled connections across
+    calls instead of starting a new gsutil process for every operation"""
+
+    def __init__(self, client):
+        self._client = client
+
+    @staticmethod
+    def _parse_gs_path(gs_path):
+        if not is_google_bucket_file_path(gs_path):
+            raise Exception('A Google Storage path is expected.')
+        bucket_name, _, blob_name = gs_path[len('gs://'):].partition('/')
+        return bucket_name, blob_name
+
+    def _get_bucket(self, gs_path, no_project=False):
+        bucket_name, blob_name = self._parse_gs_path(gs_path)
+        #  Anvil buckets are requester-pays and we bill them to the anvil project
+        google_project = get_google_project(gs_path) if not no_project else None
+        return self._client.bucket(bucket_name, user_project=google_project), blob_name
+
+    def _get_blob(self, gs_path, **kwargs):
+        bucket, blob_name = self._get_bucket(gs_path, **kwargs)
+        return bucket.blob(blob_name)
+
+    def does_file_exist(self, file_path, user=None):
+        from google.api_core.exceptions import GoogleAPIError
+        try:
+            return self._get_blob(file_path).exists()
+        except GoogleAPIError as e:
+            logger.warning(str(e), user)
+            return False
+
+    def _blob_exists(self, file_path):
+        from google.api_core.exceptions import GoogleAPIError
+        try:
+            # missing objects return False, so any raised error is a failure to access the file
+            return self._get_blob(file_path).exists()
+        except GoogleAPIError as e:
+            raise StorageAccessError(f'Unable to access {file_path}: {e}')
+
+    def do_files_exist(self, file_paths, user=None):
+        with ThreadPoolExecutor(max_workers=MAX_STORAGE_CONNECTIONS) as executor:
+            files_exist = executor.map(self._blob_exists, file_paths)
+            return dict(zip(file_paths, files_exist))
+
+    def _list_blob_names(self, bucket, prefix, delimiter=None):
+        blobs = self._client.list_blobs(bucket, prefix=prefix, delimiter=delimiter)
+        names = [blob.name for blob in blobs]
+        # folder prefixes are only populated once the listing has been fully iterated
+        return names + sorted(blobs.prefixes)
+
+    def list_files(self, gs_path, user, check_subfolders, allow_missing):
+        bucket, pattern = self._get_bucket(gs_path.rstrip('/'))
+        wildcard_index = next((i for i, c in enumerate(pattern) if c in GS_WILDCARD_CHARS), None)
+        if wildcard_index is None:
+            # matches gsutil, which lists the contents of a folder if the given path is not itself a file
+            folder = f'{pattern}/' if pattern else ''
+            names = [pattern] if pattern and bucket.blob(pattern).exists() else self._list_blob_names(
+                bucket, folder, delimiter='/')
+        else:
+            prefix = pattern[:wildcard_index]
+            prefix_dir, _, wildcard_segment = prefix.rpartition('/')
+            prefix_dir = f'{prefix_dir}/' if prefix_dir else ''
+            wildcard_segment += pattern[wildcard_index:].split('/')[0]
+            if '/' in pattern[wildcard_index:] and '**' not in wildcard_segment:
+                # list each folder matching the first wildcard segment in parallel
+                segment_regex = re.compile(_gs_wildcard_regex(f'{prefix_dir}{wildcard_segment}/'))
+                folders = [
+                    folder for folder in self._list_blob_names(bucket, prefix, delimiter='/')
+                    if segment_regex.fullmatch(folder)
+                ]
+                with ThreadPoolExecutor(max_workers=MAX_STORAGE_CONNECTIONS) as executor:
+                    names = [
+                        name for folder_names in executor.map(lambda folder: self._list_blob_names(bucket, folder), folders)
+                        for name in folder_names
+                    ]
+            else:
+                names = self._list_blob_names(bucket, prefix)
+            pattern_regex = re.compile(_gs_wildcard_regex(pattern))
+            names = [name for name in names if pattern_regex.fullmatch(name) and not name.endswith('/')]
+
+        if not names and not (allow_missing or check_subfolders):
+            raise Exception(f'Run command failed: One or more URLs matched no objects: {gs_path}')
+        return [f'gs://{bucket.name}/{name}' for name in names]
+
+    def file_iter(self, gs_path, byte_range=None, raw_content=False, user=None, no_project=False, **kwargs):
+        from google.api_core.exceptions import NotFound
+        blob = self._get_blob(gs_path, no_project=no_project)
+        try:
+            blob.reload()
+        except NotFound:
+            raise FileNotFoundError(f'Could not access file {gs_path}')
+
+        start, end = byte_range or (0, blob.size - 1)
+        content = self._iter_blob_chunks(blob, start, min(end, blob.size - 1))
+        if gs_path.endswith('gz') and not raw_content:
+            content = _gunzip_chunks(content)
+        for line in _iter_chunk_lines(content):
+            yield line if raw_content else line.decode('utf-8')
+
+    @staticmethod
+    def _iter_blob_chunks(blob, start, end):
+        while start <= end:
+            chunk_end = min(start + READ_CHUNK_SIZE - 1, end)
+            yield blob.download_as_bytes(start=start, end=chunk_end, checksum=None)
+            start = chunk_end + 1
+
+    def mv_file_to_gs(self, local_path, gs_path, user=None):
+        local_files = [file_path for file_path in glob.glob(local_path) if os.path.isfile(file_path)]
+        if not local_files:
+            raise Exception(f'Run command failed: No URLs matched: {local_path}')
+        logger.info(f'==> Moving {local_path} to {gs_path}', user)
+        for file_path in local_files:
+            dest_path = f'{gs_path}{os.path.basename(file_path)}' if gs_path.endswith('/') else gs_path
+            self._get_blob(dest_path).upload_from_filename(file_path)
+            os.remove(file_path)
+
+
+def _gs_wildcard_regex(pattern):
+    regex = ''
+    for part in re.split(r'(\*\*|\*|\?|\[[^\]]+\])', pattern):
+        if part == '**':
+            regex += '.*'
+        elif part == '*':
+            regex += '[^/]*'
+        elif part == '?':
+            regex += '[^/]'
+        elif part.startswith('[') and part.endswith(']'):
+            regex += f'[^{part[2:]}' if part.startswith('[!') else part
+        else:
+            regex += re.escape(part)
+    return regex
+
+
+def _gunzip_chunks(chunks):
+    # handles multi-member (bgzipped) files, and stops cleanly if the requested byte range ends mid-member like gunzip
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        while chunk:
+            yield decompressor.decompress(chunk)
+            if not decompressor.eof:
+                break
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+
+def _iter_chunk_lines(chunks):
+    remainder = b''
+    for chunk in chunks:
+        lines = (remainder + chunk).split(b'\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if remainder:
+        yield remainder
+
+
+_gcs_storage_backend = None
+_gcs_storage_backend_lock = Lock()
+
+
+def _get_gcs_storage_backend():
+    global _gcs_storage_backend
+    with _gcs_storage_backend_lock:
+        if _gcs_storage_backend is None:
+            try:
+                from google.cloud import storage
+                from requests.adapters import HTTPAdapter
+                client = storage.Client(project=None)
+                adapter = HTTPAdapter(pool_connections=MAX_STORAGE_CONNECTIONS, pool_maxsize=MAX_STORAGE_CONNECTIONS)
+                client._http.mount('https://', adapter)
+                client._http.mount('http://', adapter)
+                _gcs_storage_backend = GcsClientStorageBackend(client)
+            except Exception as e:
+                logger.warning(f'Unable to initialize the Google Storage client, falling back to gsutil: {e}', user=None)
+                _gcs_storage_backend = GsutilStorageBackend
+        return _gcs_storage_backend
+
+
+def _get_storage_backend(file_path, default=LocalStorageBackend):
+    if not is_google_bucket_file_path(file_path):
+        return default
+    if GCS_STORAGE_BACKEND == CLIENT_STORAGE_BACKEND:
+        return _get_gcs_storage_backend()
+    return GsutilStorageBackend
@@ -1,7 +1,15 @@
+import gzip
+import json
 import mock
+import os
+import re
+import responses
+import tempfile
+from urllib.parse import parse_qs, unquote, urlparse
 
 from unittest import TestCase
-from seqr.utils.file_utils import mv_file_to_gs
+from seqr.utils.file_utils import mv_file_to_gs, does_file_exist, do_files_exist, list_files, file_iter, \
+    local_file_range_iter, StorageAccessError
 
 
 class FileUtilsTest(TestCase):
@@ -30,3 +38,254 @@ class FileUtilsTest(TestCase):
         mock_subproc.Popen.assert_called_with('gsutil mv /temp_path gs://bucket/target_path', stdout=mock_subproc.PIPE, stderr=mock_subproc.STDOUT, shell=True)  # nosec
         mock_logger.info.assert_called_with('==> gsutil mv /temp_path gs://bucket/target_path', None)
         process.wait.assert_called_with()
+
+    @mock.patch('seqr.utils.file_utils.logger')
+    @mock.patch('seqr.utils.file_utils.subprocess')
+    def test_gsutil_do_files_exist(self, mock_subproc, mock_logger):
+        process = mock_subproc.Popen.return_value
+        process.communicate.return_value = (
+            b'gs://bucket/sample_1.cram\n', b'CommandException: One or more URLs matched no objects.\n',
+        )
+        self.assertDictEqual(do_files_exist(['gs://bucket/sample_1.cram', 'gs://bucket/sample_2.cram']), {
+            'gs://bucket/sample_1.cram': True, 'gs://bucket/sample_2.cram': False,
+        })
+        mock_subproc.Popen.assert_called_with(
+            'gsutil ls gs://bucket/sample_1.cram gs://bucket/sample_2.cram', stdout=mock_subproc.PIPE,
+            stderr=mock_subproc.PIPE, shell=True)  # nosec
+        mock_logger.info.assert_called_with('CommandException: One or more URLs matched no objects.', None)
+
+        # any other error is raised rather than treating the files as missing
+        process.communicate.return_value = (
+            b'gs://bucket/sample_1.cram\n',
+            b'AccessDeniedException: 403 does not have storage.objects.list access\n'
+            b'CommandException: One or more URLs matched no objects.\n',
+        )
+        with self.assertRaises(StorageAccessError) as ee:
+            do_files_exist(['gs://bucket/sample_1.cram', 'gs://bucket/sample_2.cram'])
+        self.assertEqual(
+            str(ee.exception),
+            'Run command failed: AccessDeniedException: 403 does not have storage.objects.list access '
+            'CommandException: One or more URLs matched no objects.',
+        )
+
+    @mock.patch('seqr.utils.file_utils.subprocess')
+    def test_local_file_iter(self, mock_subproc):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'sample.txt')
+            with open(file_path, 'wb') as f:
+                f.write(b'header\nread1\nread2\n')
+            gz_file_path = os.path.join(temp_dir, 'test.vcf.gz')
+            with open(gz_file_path, 'wb') as f:
+                f.write(gzip.compress(b'##fileformat=VCFv4.2\n') + gzip.compress(b'#CHROM\tPOS\n1\t100\n'))
+
+            self.assertListEqual(list(file_iter(file_path)), ['header\n', 'read1\n', 'read2\n'])
+            self.assertListEqual(list(file_iter(file_path, byte_range=(7, 17), raw_content=True)), [b'read1\n', b'read2'])
+            self.assertListEqual(list(file_iter(file_path, byte_range=(13, 100))), ['read2\n'])
+            self.assertListEqual(list(local_file_range_iter(file_path, 2, 17, chunk_size=5)), [
+                b'ader\n', b'read1', b'\nread', b'2',
+            ])
+            self.assertListEqual(
+                list(file_iter(gz_file_path, byte_range=(0, 1000))), ['##fileformat=VCFv4.2\n', '#CHROM\tPOS\n', '1\t100\n'])
+
+            with self.assertRaises(FileNotFoundError):
+                list(file_iter(os.path.join(temp_dir, 'missing.txt'), byte_range=(0, 10)))
+
+        mock_subproc.Popen.assert_not_called()
+
+
+FAKE_STORAGE_HOST = 'http://localhost:9023'
+FORBIDDEN_BUCKET = 'forbidden-bucket'
+
+
+class FakeGcsBucketServer(object):
+    """Serves the subset of the Google Storage JSON API used by the storage client from in-memory buckets"""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.uploaded = {}
+        self.user_projects = set()
+        bucket_url = rf'{FAKE_STORAGE_HOST}(/download)?/storage/v1/b/(?P<bucket>[^/]+)/o'
+        responses.add_callback(responses.GET, re.compile(rf'{bucket_url}/(?P<name>[^?]+).*'), callback=self._get_blob)
+        responses.add_callback(responses.GET, re.compile(rf'{bucket_url}(\?.*)?$'), callback=self._list_blobs)
+        responses.add_callback(
+            responses.POST, re.compile(rf'{FAKE_STORAGE_HOST}/upload/storage/v1/b/(?P<bucket>[^/]+)/o.*'),
+            callback=self._upload_blob)
+
+    def _parse_request(self, request):
+        parsed = urlparse(request.url)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        if params.get('userProject'):
+            self.user_projects.add(params['userProject'])
+        match = re.match(r'(/download)?/storage/v1/b/(?P<bucket>[^/]+)/o/?(?P<name>.*)', parsed.path)
+        return match.group('bucket'), unquote(match.group('name')), params
+
+    def _get_blob(self, request):
+        bucket, name, params = self._parse_request(request)
+        if bucket == FORBIDDEN_BUCKET:
+            return 403, {}, json.dumps({'error': {'code': 403, 'message': 'Access denied'}})
+        content = self.blobs.get(f'{bucket}/{name}')
+        if content is None:
+            return 404, {}, json.dumps({'error': {'code': 404, 'message': 'No such object'}})
+        if params.get('alt') == 'media':
+            start, end = re.match(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()
+            return 206, {}, content[int(start):int(end) + 1]
+        return 200, {}, json.dumps({'bucket': bucket, 'name': name, 'size': str(len(content))})
+
+    def _list_blobs(self, request):
+        bucket, _, params = self._parse_request(request)
+        if bucket == FORBIDDEN_BUCKET:
+            return 403, {}, json.dumps({'error': {'code': 403, 'message': 'Access denied'}})
+        prefix = params.get('prefix', '')
+        delimiter = params.get('delimiter')
+        items = []
+        prefixes = set()
+        for path in sorted(self.blobs):
+            blob_bucket, name = path.split('/', 1)
+            if blob_bucket != bucket or not name.startswith(prefix):
+                continue
+            if delimiter and delimiter in name[len(prefix):]:
+                prefixes.add(name[:name.index(delimiter, len(prefix)) + 1])
+            else:
+                items.append({'bucket': bucket, 'name': name})
+        return 200, {}, json.dumps({'items': items, 'prefixes': sorted(prefixes)})
+
+    def _upload_blob(self, request):
+        bucket = re.search(r'/b/([^/]+)/o', request.url).group(1)
+        metadata, content = re.search(rb'\r\n\r\n(\{.*?\})\r\n--.*?\r\n\r\n(.*)\r\n--', request.body, re.S).groups()
+        name = json.loads(metadata)['name']
+        self.uploaded[f'{bucket}/{name}'] = content
+        return 200, {}, json.dumps({'bucket': bucket, 'name': name})
+
+
+@mock.patch('seqr.utils.file_utils._gcs_storage_backend', None)
+@mock.patch('seqr.utils.file_utils.GCS_STORAGE_BACKEND', 'client')
+@mock.patch.dict(os.environ, {'STORAGE_EMULATOR_HOST': FAKE_STORAGE_HOST})
+class GcsClientStorageBackendTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('seqr.utils.file_utils.subprocess')
+        self.mock_subproc = patcher.start()
+        self.addCleanup(patcher.stop)
+        vcf_content = gzip.compress(b'##fileformat=VCFv4.2\n') + gzip.compress(b'#CHROM\tPOS\n1\t100\n')
+        self.server_blobs = {
+            'test-bucket/data/test.vcf.gz': vcf_content,
+            'test-bucket/data/sharded/test-1.vcf.gz': b'',
+            'test-bucket/data/sharded/test-2.vcf.gz': b'',
+            'test-bucket/data/sharded/notes.txt': b'',
+            'test-bucket/runs/GRCh38/SNV_INDEL/metadata.json': b'{"callsets": ["1.vcf"]}\n',
+            'test-bucket/runs/GRCh38/MITO/_SUCCESS': b'',
+            'test-bucket/runs/GRCh37/SNV_INDEL/metadata.json': b'{"callsets": ["2.vcf"]}\n',
+            'fc-secure-bucket/sample.bam': b'header\nread1\nread2\n',
+        }
+
+    @responses.activate
+    def test_does_file_exist(self):
+        FakeGcsBucketServer(self.server_blobs)
+        self.assertTrue(does_file_exist('gs://test-bucket/data/test.vcf.gz'))
+        self.assertFalse(does_file_exist('gs://test-bucket/data/missing.vcf.gz'))
+        self.assertDictEqual(do_files_exist([
+            'gs://test-bucket/data/test.vcf.gz', 'gs://fc-secure-bucket/sample.bam', 'gs://test-bucket/missing.bam',
+        ]), {
+            'gs://test-bucket/data/test.vcf.gz': True,
+            'gs://fc-secure-bucket/sample.bam': True,
+            'gs://test-bucket/missing.bam': False,
+        })
+
+        # folders with many files to check are listed once instead of checking each file
+        responses.calls.reset()
+        self.assertDictEqual(do_files_exist([
+            'gs://test-bucket/data/sharded/test-1.vcf.gz', 'gs://test-bucket/data/sharded/test-2.vcf.gz',
+            'gs://test-bucket/data/sharded/test-3.vcf.gz', 'gs://test-bucket/data/test.vcf.gz',
+        ], min_folder_listing_files=3), {
+            'gs://test-bucket/data/sharded/test-1.vcf.gz': True,
+            'gs://test-bucket/data/sharded/test-2.vcf.gz': True,
+            'gs://test-bucket/data/sharded/test-3.vcf.gz': False,
+            'gs://test-bucket/data/test.vcf.gz': True,
+        })
+        self.assertListEqual(sorted(urlparse(call.request.url).path for call in responses.calls), [
+            '/storage/v1/b/test-bucket/o', '/storage/v1/b/test-bucket/o/data%2Ftest.vcf.gz',
+        ])
+
+        # files which can not be accessed are not reported as missing
+        with self.assertRaises(StorageAccessError) as ee:
+            do_files_exist(['gs://test-bucket/data/test.vcf.gz', f'gs://{FORBIDDEN_BUCKET}/sample.bam'])
+        self.assertIn(f'Unable to access gs://{FORBIDDEN_BUCKET}/sample.bam', str(ee.exception))
+
+        # folders which can not be listed are not reported as empty
+        with self.assertRaises(StorageAccessError) as ee:
+            do_files_exist([f'gs://{FORBIDDEN_BUCKET}/sample-{i}.bam' for i in range(3)], min_folder_listing_files=3)
+        self.assertIn(f'Unable to list gs://{FORBIDDEN_BUCKET}', str(ee.exception))
+        self.mock_subproc.Popen.assert_not_called()
+
+    @responses.activate
+    def test_list_files(self):
+        FakeGcsBucketServer(self.server_blobs)
+        self.assertListEqual(list_files('gs://test-bucket/data/sharded/*.vcf.gz', user=None), [
+            'gs://test-bucket/data/sharded/test-1.vcf.gz', 'gs://test-bucket/data/sharded/test-2.vcf.gz',
+        ])
+        self.assertListEqual(list_files('gs://test-bucket/data', user=None, check_subfolders=True), [
+            'gs://test-bucket/data/sharded/notes.txt', 'gs://test-bucket/data/sharded/test-1.vcf.gz',
+            'gs://test-bucket/data/sharded/test-2.vcf.gz', 'gs://test-bucket/data/test.vcf.gz',
+        ])
+        self.assertListEqual(list_files('gs://test-bucket/runs/*/*/metadata.json', user=None), [
+            'gs://test-bucket/runs/GRCh37/SNV_INDEL/metadata.json', 'gs://test-bucket/runs/GRCh38/SNV_INDEL/metadata.json',
+        ])
+        self.assertListEqual(list_files('gs://test-bucket/runs/*/*/validation_errors.json', user=None), [])
+        self.assertListEqual(list_files('gs://test-bucket/missing', user=None, check_subfolders=True), [])
+
+        with self.assertRaises(Exception) as ee:
+            list_files('gs://test-bucket/data/*.bam', user=None, allow_missing=False)
+        self.assertEqual(
+            str(ee.exception), 'Run command failed: One or more URLs matched no objects: gs://test-bucket/data/*.bam')
+        self.mock_subproc.Popen.assert_not_called()
+
+    @responses.activate
+    def test_file_iter(self):
+        server = FakeGcsBucketServer(self.server_blobs)
+        self.assertListEqual(
+            list(file_iter('gs://test-bucket/runs/GRCh38/SNV_INDEL/metadata.json')), ['{"callsets": ["1.vcf"]}\n'])
+        self.assertListEqual(
+            list(file_iter('gs://test-bucket/data/test.vcf.gz')), ['##fileformat=VCFv4.2\n', '#CHROM\tPOS\n', '1\t100\n'])
+        self.assertListEqual(list(file_iter('gs://fc-secure-bucket/sample.bam', byte_range=(7, 17), raw_content=True)), [
+            b'read1\n', b'read2',
+        ])
+        self.assertSetEqual(server.user_projects, {'anvil-datastorage'})
+
+        # reading only part of a bgzipped file returns all the lines in the fully fetched blocks
+        first_block_size = len(gzip.compress(b'##fileformat=VCFv4.2\n'))
+        self.assertListEqual(
+            list(file_iter('gs://test-bucket/data/test.vcf.gz', byte_range=(0, first_block_size + 10))),
+            ['##fileformat=VCFv4.2\n'],
+        )
+
+        with self.assertRaises(FileNotFoundError) as ee:
+            list(file_iter('gs://test-bucket/data/missing.vcf.gz'))
+        self.assertEqual(str(ee.exception), 'Could not access file gs://test-bucket/data/missing.vcf.gz')
+        self.mock_subproc.Popen.assert_not_called()
+
+    @responses.activate
+    def test_mv_file_to_gs(self):
+        server = FakeGcsBucketServer(self.server_blobs)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for file_name in ['a.tsv', 'b.tsv']:
+                with open(os.path.join(temp_dir, file_name), 'w') as f:
+                    f.write(f'{file_name} content')
+            mv_file_to_gs(f'{temp_dir}/*', 'gs://test-bucket/export/', user=None)
+            self.assertListEqual(os.listdir(temp_dir), [])
+        self.assertDictEqual(server.uploaded, {
+            'test-bucket/export/a.tsv': b'a.tsv content', 'test-bucket/export/b.tsv': b'b.tsv content',
+        })
+        self.mock_subproc.Popen.assert_not_called()
+
+    @mock.patch('google.cloud.storage.Client')
+    @mock.patch('seqr.utils.file_utils.logger')
+    def test_client_fallback(self, mock_logger, mock_client):
+        mock_client.side_effect = Exception('Could not automatically determine credentials')
+        process = self.mock_subproc.Popen.return_value
+        process.wait.return_value = 0
+        self.assertTrue(does_file_exist('gs://test-bucket/data/test.vcf.gz'))
+        mock_logger.warning.assert_called_with(
+            'Unable to initialize the Google Storage client, falling back to gsutil: Could not automatically determine credentials',
+            user=None)
+        self.mock_subproc.Popen.assert_called_with(
+            'gsutil ls gs://test-bucket/data/test.vcf.gz', stdout=self.mock_subproc.PIPE, stderr=self.mock_subproc.STDOUT, shell=True)  # nosec
@@ -1,10 +1,9 @@
 import re
-from collections import defaultdict
-from django.db.models import Q, prefetch_related_objects, Prefetch
-from django.db.models.functions import Length
+from django.db.models import prefetch_related_objects, Prefetch
 
 from reference_data.models import GeneInfo, GeneConstraint, dbNSFPGene, Omim, MGI, PrimateAI, GeneCopyNumberSensitivity, \
     GenCC, ClinGen, GeneShet
+from reference_data.utils.gene_utils import get_gene_lookup_index
 from seqr.utils.xpos_utils import get_xpos
 from seqr.views.utils.orm_to_json_utils import _get_json_for_model, _get_json_for_models, _get_empty_json_for_model, \
     get_json_for_gene_notes_by_gene_id
@@ -46,14 +45,10 @@ def _add_genome_version_filter(gene_filter, genome_version):
         gene_filter[f'start_grch{genome_version}__isnull'] = False
 
 
-def get_gene_ids_for_gene_symbols(gene_symbols, genome_version=None):
-    gene_filter = {'gene_symbol__in': gene_symbols}
-    _add_genome_version_filter(gene_filter, genome_version)
-    genes = GeneInfo.objects.filter(**gene_filter).only('gene_symbol', 'gene_id').order_by('-gencode_release')
-    symbols_to_ids = defaultdict(list)
-    for gene in genes:
-        symbols_to_ids[gene.gene_symbol].append(gene.gene_id)
-    return symbols_to_ids
+def get_gene_ids_for_gene_symbols(gene_symbols, genome_version=None, case_sensitive=True, include_aliases=False):
+    return get_gene_lookup_index().get_gene_ids_for_symbols(
+        gene_symbols, genome_version=genome_version, case_sensitive=case_sensitive, include_aliases=include_aliases,
+    )
 
 
 def get_filtered_gene_ids(gene_filter):
@@ -61,10 +56,7 @@ def get_filtered_gene_ids(gene_filter):
 
 
 def get_queried_genes(query, max_results):
-    matching_genes = GeneInfo.objects.filter(
-        Q(gene_id__icontains=query) | Q(gene_symbol__icontains=query)
-    ).only('gene_id', 'gene_symbol').order_by(Length('gene_symbol').asc(), 'gene_symbol').distinct()
-    return [{'gene_id': gene.gene_id, 'gene_symbol': gene.gene_symbol} for gene in matching_genes[:max_results]]
+    return get_gene_lookup_index().search(query, max_results)
 
 
 def _get_gene_model(gene, field):
@@ -158,7 +150,7 @@ def _get_json_for_genes(genes, user=None, gene_fields=None, **kwargs):
     return _get_json_for_models(genes, process_result=_process_result, **kwargs)
 
 
-def parse_locus_list_items(request_json, genome_version=None, **kwargs):
+def parse_locus_list_items(request_json, genome_version=None, match_gene_aliases=False, **kwargs):
     raw_items = request_json.get('rawItems')
     if not raw_items:
         return None, None, None
@@ -193,7 +185,11 @@ def parse_locus_list_items(request_json, genome_version=None, **kwargs):
         else:
             gene_symbols.add(item.replace('<TAB>', ''))
 
-    gene_symbols_to_ids = get_gene_ids_for_gene_symbols(gene_symbols, genome_version=genome_version)
+    # gene lists entered by users fall back to case-insensitive and alias matches, other gene lists use exact symbols
+    gene_symbols_to_ids = get_gene_ids_for_gene_symbols(
+        gene_symbols, genome_version=genome_version, case_sensitive=not match_gene_aliases,
+        include_aliases=match_gene_aliases,
+    )
     invalid_items += [symbol for symbol in gene_symbols if not gene_symbols_to_ids.get(symbol)]
     gene_ids.update({gene_ids[0] for gene_ids in gene_symbols_to_ids.values() if len(gene_ids)})
     genes_by_id = get_genes(list(gene_ids), genome_version=genome_version, **kwargs) if gene_ids else {}
@@ -1,5 +1,11 @@
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.db import connections
 import json
 import logging
+import re
+import time
 
 from settings import DEPLOYMENT_TYPE
 from typing import Optional
@@ -33,6 +39,9 @@ class JsonLogFormatter(logging.Formatter):
         if getattr(record, 'detail', None):
             log_json['detail'] = record.detail
 
+        if getattr(record, 'request_stats', None):
+            log_json['requestStats'] = record.request_stats
+
         if record.levelname == 'ERROR' and DEPLOYMENT_TYPE != 'dev':
             # Allows GCP Error to detect that this is an error log
             log_json['@type'] = 'type.googleapis.com/google.devtools.clouderrorreporting.v1beta1.ReportedErrorEvent'
@@ -86,3 +95,131 @@ def log_model_bulk_update(logger, models, user, update_type, update_fields=None)
     logger.info(
         '{} {} {}s'.format(update_type, len(entity_ids), db_entity), user, db_update=db_update)
     return entity_ids
+
+
+class QueryStats(object):
+
+    def __init__(self):
+        """Context manager which counts the database queries run on any connection and the time spent running them"""
+        self.num_queries = 0
+        self.query_time = 0
+        self._exit_stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.num_queries += 1
+            self.query_time += time.perf_counter() - start
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        for connection in connections.all():
+            self._exit_stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *args):
+        self._exit_stack.close()
+
+
+SQL_IN_LIST_REGEX = re.compile(r'\(\s*%s(\s*,\s*%s)*\s*\)')
+
+_current_request_stats = ContextVar('request_stats', default=None)
+
+
+def _to_ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class RequestStats(object):
+
+    def __init__(self, repeated_query_threshold):
+        """Context manager which tracks the database queries run on each connection, as well as any other timed
+        operations (i.e. redis calls, response serialization), while handling a single request"""
+        self.repeated_query_threshold = repeated_query_threshold
+        self.total_time = 0
+        self.db_queries = defaultdict(int)
+        self.db_time = defaultdict(float)
+        self.op_calls = defaultdict(int)
+        self.op_time = defaultdict(float)
+        self._query_shapes = Counter()
+        self._start = None
+        self._exit_stack = None
+        self._context_token = None
+
+    def _db_execute_wrapper(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.db_queries[alias] += 1
+                self.db_time[alias] += time.perf_counter() - start
+                # Queries only differing in the length of an IN clause have the same shape
+                self._query_shapes[(alias, SQL_IN_LIST_REGEX.sub('(%s)', sql))] += 1
+        return wrapper
+
+    def record(self, operation, duration):
+        self.op_calls[operation] += 1
+        self.op_time[operation] += duration
+
+    def repeated_queries(self):
+        return [
+            {'db': alias, 'sql': sql, 'count': count} for (alias, sql), count in self._query_shapes.most_common()
+            if count >= self.repeated_query_threshold
+        ]
+
+    def to_json(self):
+        return {
+            'totalTime': _to_ms(self.total_time),
+            'db': {
+                alias: {'queries': self.db_queries[alias], 'time': _to_ms(self.db_time[alias])}
+                for alias in sorted(self.db_queries)
+            },
+            **{
+                operation: {'calls': self.op_calls[operation], 'time': _to_ms(self.op_time[operation])}
+                for operation in sorted(self.op_calls)
+            },
+            'repeatedQueries': self.repeated_queries(),
+        }
+
+    def server_timing_header(self):
+        """Formats the tracked timings according to https://www.w3.org/TR/server-timing"""
+        metrics = [
+            f'db-{alias};dur={_to_ms(self.db_time[alias])};desc="{self.db_queries[alias]} queries"'
+            for alias in sorted(self.db_queries)
+        ] + [
+            f'{operation};dur={_to_ms(self.op_time[operation])};desc="{self.op_calls[operation]} calls"'
+            for operation in sorted(self.op_calls)
+        ]
+        metrics.append(f'total;dur={_to_ms(self.total_time)}')
+        return ', '.join(metrics)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._exit_stack = ExitStack()
+        for connection in connections.all():
+            self._exit_stack.enter_context(connection.execute_wrapper(self._db_execute_wrapper(connection.alias)))
+        self._context_token = _current_request_stats.set(self)
+        return self
+
+    def __exit__(self, *args):
+        _current_request_stats.reset(self._context_token)
+        self._exit_stack.close()
+        self.total_time = time.perf_counter() - self._start
+
+
+@contextmanager
+def track_request_time(operation):
+    """Records the time spent in the wrapped block to the stats for the current request, if any"""
+    request_stats = _current_request_stats.get()
+    if request_stats is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_stats.record(operation, time.perf_counter() - start)
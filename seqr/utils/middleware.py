@@ -3,6 +3,7 @@ from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
 from django.core.handlers.exception import get_exception_response
 from django.http import Http404
 from django.http.request import RawPostDataException
+from django.middleware.gzip import GZipMiddleware
 from django.utils.cache import add_never_cache_headers
 from django.utils.deprecation import MiddlewareMixin
 from django.urls import get_resolver, get_urlconf
@@ -12,10 +13,10 @@ import json
 import traceback
 
 from seqr.utils.search.utils import ERROR_LOG_EXCEPTIONS, SEARCH_EXCEPTION_ERROR_MAP, SEARCH_EXCEPTION_MESSAGE_MAP
-from seqr.utils.logging_utils import SeqrLogger
+from seqr.utils.logging_utils import SeqrLogger, RequestStats
 from seqr.views.utils.json_utils import create_json_response
 from seqr.views.utils.terra_api_utils import TerraAPIException
-from settings import DEBUG, LOGIN_URL
+from settings import DEBUG, LOGIN_URL, JSON_RESPONSE_COMPRESSION_MIN_SIZE, REPEATED_QUERY_WARNING_THRESHOLD
 
 logger = SeqrLogger()
 
@@ -127,26 +128,28 @@ class LogRequestMiddleware(MiddlewareMixin):
         log_error = False
         traceback = None
         detail = None
-        try:
+        # Error details are only included in error responses, so avoid re-parsing large successful responses
+        if response.status_code >= 400:
             try:
-                response_json = json.loads(response.content)
-                is_json = True
-            except ValueError:
-                response_json = response.data
-                is_json = False
-
-            error = response_json.get('error')
-            if response_json.get('errors'):
-                error = '; '.join(response_json['errors'])
-            traceback = response_json.pop('traceback', None)
-            detail = response_json.get('detail')
-            log_error = response_json.get('log_error')
-            if is_json:
-                response.content = json.dumps(response_json)
-            else:
-                response.data = response_json
-        except (ValueError, AttributeError):
-            pass
+                try:
+                    response_json = json.loads(response.content)
+                    is_json = True
+                except ValueError:
+                    response_json = response.data
+                    is_json = False
+
+                error = response_json.get('error')
+                if response_json.get('errors'):
+                    error = '; '.join(response_json['errors'])
+                traceback = response_json.pop('traceback', None)
+                detail = response_json.get('detail')
+                log_error = response_json.get('log_error')
+                if not is_json:
+                    response.data = response_json
+                elif traceback:
+                    response.content = json.dumps(response_json)
+            except (ValueError, AttributeError):
+                pass
 
         message = ''
         if log_error or (response.status_code >= 500 and response.status_code != 504):
@@ -158,7 +161,34 @@ class LogRequestMiddleware(MiddlewareMixin):
         else:
             level = logger.info
         level(message, request.user, http_request_json=http_json, request_body=request_body, traceback=traceback,
-            detail=detail)
+            detail=detail, request_stats=getattr(request, 'request_stats', None))
+
+        return response
+
+
+class RequestStatsMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Only queries run in the request thread are tracked, as database connections are not shared across threads
+        with RequestStats(REPEATED_QUERY_WARNING_THRESHOLD) as request_stats:
+            response = self.get_response(request)
+
+        # LogRequestMiddleware will include these stats in the request log
+        request.request_stats = request_stats.to_json()
+        # Timings expose details of the backend, so they are only returned to internal users
+        user = getattr(request, 'user', None)
+        if DEBUG or (user and (user.is_superuser or user.is_staff)):
+            response['Server-Timing'] = request_stats.server_timing_header()
+
+        repeated_queries = request.request_stats['repeatedQueries']
+        if repeated_queries:
+            logger.warning(
+                'Possible N+1 queries: {} query shape(s) repeated at least {} times for {}'.format(
+                    len(repeated_queries), REPEATED_QUERY_WARNING_THRESHOLD, request.path),
+                request.user, detail=repeated_queries)
 
         return response
 
@@ -170,3 +200,14 @@ class CacheControlMiddleware(MiddlewareMixin):
         add_never_cache_headers(response)
         response['Pragma'] = 'no-cache'
         return response
+
+
+class JsonGZipMiddleware(GZipMiddleware):
+
+    def process_response(self, request, response):
+        # Only compress large json responses, as other responses are either already compressed (static files) or
+        # streamed (file downloads)
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json') or \
+                len(response.content) < JSON_RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,116 @@
+import gzip
+import json
+import mock
+import logging
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory
+
+from seqr.models import Family, Project
+from seqr.utils.logging_utils import JsonLogFormatter
+from seqr.utils.middleware import JsonGZipMiddleware, RequestStatsMiddleware
+from seqr.utils.redis_utils import safe_redis_get_json
+from seqr.views.utils.json_utils import create_json_response
+
+
+class JsonGZipMiddlewareTest(TestCase):
+
+    @mock.patch('seqr.utils.middleware.JSON_RESPONSE_COMPRESSION_MIN_SIZE', 1000)
+    def test_json_gzip_middleware(self):
+        large_json = {'variants': [{'variantId': f'1-{i}-A-G', 'pos': i} for i in range(100)]}
+        small_json = {'success': True}
+        request = RequestFactory().get('/api/test', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        response = JsonGZipMiddleware(lambda r: create_json_response(large_json))(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertDictEqual(json.loads(gzip.decompress(response.content)), large_json)
+
+        # Small responses are not compressed
+        response = JsonGZipMiddleware(lambda r: create_json_response(small_json))(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertDictEqual(json.loads(response.content), small_json)
+
+        # Non-json responses are not compressed
+        response = JsonGZipMiddleware(lambda r: HttpResponse('a' * 2000, content_type='text/plain'))(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        # Clients which do not accept gzip get the uncompressed response
+        request = RequestFactory().get('/api/test')
+        response = JsonGZipMiddleware(lambda r: create_json_response(large_json))(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertDictEqual(json.loads(response.content), large_json)
+
+    def test_create_json_response(self):
+        response = create_json_response({'b': {2, 1}, 'a': None})
+        self.assertEqual(response.content, b'{"b":[1,2],"a":null}')
+
+        response = create_json_response({'b': {2, 1}, 'a': None}, json_format='pretty')
+        self.assertEqual(response.content, b'{\n    "a": null,\n    "b": [\n        1,\n        2\n    ]\n}')
+
+
+class RequestStatsMiddlewareTest(TestCase):
+    databases = '__all__'
+    fixtures = ['users', '1kg_project']
+
+    @mock.patch('seqr.utils.middleware.REPEATED_QUERY_WARNING_THRESHOLD', 3)
+    @mock.patch('seqr.utils.middleware.logger')
+    @mock.patch('seqr.utils.redis_utils.redis.StrictRedis')
+    def test_request_stats_middleware(self, mock_redis, mock_logger):
+        mock_redis.return_value.get.return_value = '{"cached": true}'
+
+        def _view(request):
+            safe_redis_get_json('test_key')
+            for project in Project.objects.all().order_by('id'):
+                Family.objects.filter(project=project).count()
+            return create_json_response({'success': True})
+
+        request = RequestFactory().get('/api/test')
+        request.user = User.objects.get(username='test_data_manager')
+        response = RequestStatsMiddleware(_view)(request)
+        self.assertDictEqual(json.loads(response.content), {'success': True})
+
+        request_stats = request.request_stats
+        self.assertDictEqual(request_stats['db'], {'default': {'queries': 5, 'time': mock.ANY}})
+        self.assertEqual(request_stats['redis']['calls'], 1)
+        self.assertEqual(request_stats['serialization']['calls'], 1)
+        self.assertEqual(len(request_stats['repeatedQueries']), 1)
+        self.assertEqual(request_stats['repeatedQueries'][0]['db'], 'default')
+        self.assertEqual(request_stats['repeatedQueries'][0]['count'], 4)
+        self.assertIn('FROM "seqr_family"', request_stats['repeatedQueries'][0]['sql'])
+
+        server_timing = response['Server-Timing'].split(', ')
+        self.assertEqual(len(server_timing), 4)
+        self.assertRegex(server_timing[0], r'^db-default;dur=[\d.]+;desc="5 queries"$')
+        self.assertRegex(server_timing[1], r'^redis;dur=[\d.]+;desc="1 calls"$')
+        self.assertRegex(server_timing[2], r'^serialization;dur=[\d.]+;desc="1 calls"$')
+        self.assertRegex(server_timing[3], r'^total;dur=[\d.]+$')
+
+        mock_logger.warning.assert_called_once_with(
+            'Possible N+1 queries: 1 query shape(s) repeated at least 3 times for /api/test', request.user,
+            detail=request_stats['repeatedQueries'])
+
+        # Timings are only returned to internal users, unless in debug mode
+        mock_logger.reset_mock()
+        for username in ['test_user', 'test_superuser']:
+            request = RequestFactory().get('/api/test')
+            request.user = User.objects.get(username=username)
+            response = RequestStatsMiddleware(_view)(request)
+            self.assertEqual(response.has_header('Server-Timing'), username == 'test_superuser')
+            self.assertEqual(request.request_stats['db']['default']['queries'], 5)
+
+        request = RequestFactory().get('/api/test')
+        request.user = User.objects.get(username='test_user')
+        with mock.patch('seqr.utils.middleware.DEBUG', True):
+            response = RequestStatsMiddleware(_view)(request)
+        self.assertTrue(response.has_header('Server-Timing'))
+
+        # Stats are included in the structured request logs
+        record = logging.LogRecord('test', logging.INFO, '', 0, '', None, None)
+        record.request_stats = request_stats
+        log_json = json.loads(JsonLogFormatter().format(record))
+        self.assertDictEqual(log_json['requestStats'], request_stats)
+
+        # Timed operations outside of a request are not tracked
+        response = create_json_response({'success': True})
+        self.assertFalse(response.has_header('Server-Timing'))
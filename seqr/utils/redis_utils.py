@@ -2,6 +2,7 @@ import json
 import logging
 import redis
 
+from seqr.utils.logging_utils import track_request_time
 from seqr.views.utils.json_utils import DjangoJSONEncoderWithSets
 from settings import REDIS_SERVICE_HOSTNAME, REDIS_SERVICE_PORT
 
@@ -15,7 +16,8 @@ def _redis_get(redis_client, cache_key):
 def safe_redis_get_json(cache_key, redis_get=_redis_get):
     try:
         redis_client = redis.StrictRedis(host=REDIS_SERVICE_HOSTNAME, port=REDIS_SERVICE_PORT, socket_connect_timeout=3)
-        value = redis_get(redis_client, cache_key)
+        with track_request_time('redis'):
+            value = redis_get(redis_client, cache_key)
         if value:
             logger.info('Loaded {} from redis'.format(cache_key))
             return json.loads(value)
@@ -40,8 +42,26 @@ def safe_redis_get_wildcard_json(cache_key):
 def safe_redis_set_json(cache_key, value, expire=None):
     try:
         redis_client = redis.StrictRedis(host=REDIS_SERVICE_HOSTNAME, port=REDIS_SERVICE_PORT, socket_connect_timeout=3)
-        redis_client.set(cache_key, json.dumps(value, cls=DjangoJSONEncoderWithSets))
-        if expire:
-            redis_client.expire(cache_key, expire)
+        with track_request_time('redis'):
+            redis_client.set(cache_key, json.dumps(value, cls=DjangoJSONEncoderWithSets))
+            if expire:
+                redis_client.expire(cache_key, expire)
     except Exception as e:
         logger.error('Unable to write to redis host {}: {}'.format(REDIS_SERVICE_HOSTNAME, str(e)))
+
+
+def safe_redis_delete(cache_key):
+    try:
+        redis_client = redis.StrictRedis(host=REDIS_SERVICE_HOSTNAME, port=REDIS_SERVICE_PORT, socket_connect_timeout=3)
+        with track_request_time('redis'):
+            redis_client.delete(cache_key)
+    except Exception as e:
+        logger.error('Unable to delete from redis host {}: {}'.format(REDIS_SERVICE_HOSTNAME, str(e)))
+
+
+def get_redis_lock(lock_key, timeout, blocking_timeout=None):
+    """Returns a lock shared by all processes using the redis host, which expires after the timeout in seconds. If a
+    blocking_timeout is given, acquiring the lock gives up after waiting that many seconds. Unlike the other redis
+    utils, connection errors are raised as callers can not safely continue without the lock"""
+    redis_client = redis.StrictRedis(host=REDIS_SERVICE_HOSTNAME, port=REDIS_SERVICE_PORT, socket_connect_timeout=3)
+    return redis_client.lock(lock_key, timeout=timeout, blocking_timeout=blocking_timeout)
@@ -1,7 +1,7 @@
 import json
 import mock
 from unittest import TestCase
-from seqr.utils.redis_utils import safe_redis_set_json, safe_redis_get_json
+from seqr.utils.redis_utils import safe_redis_set_json, safe_redis_get_json, safe_redis_delete, get_redis_lock
 
 
 @mock.patch('seqr.utils.redis_utils.logger')
@@ -55,3 +55,30 @@ class RedisUtilsTest(TestCase):
         mock_redis.side_effect = Exception('invalid redis')
         safe_redis_set_json('test_key', {'a': 1})
         mock_logger.error.assert_called_with('Unable to write to redis host localhost: invalid redis')
+
+    def test_safe_redis_delete(self, mock_redis, mock_logger): # pylint: disable=no-self-use
+        safe_redis_delete('test_key')
+        mock_redis.return_value.delete.assert_called_with('test_key')
+        mock_logger.error.assert_not_called()
+
+        # test with redis connection error
+        mock_redis.side_effect = Exception('invalid redis')
+        safe_redis_delete('test_key')
+        mock_logger.error.assert_called_with('Unable to delete from redis host localhost: invalid redis')
+
+    def test_get_redis_lock(self, mock_redis, mock_logger):
+        with get_redis_lock('test_lock', timeout=60):
+            mock_redis.return_value.lock.assert_called_with('test_lock', timeout=60, blocking_timeout=None)
+            mock_redis.return_value.lock.return_value.__enter__.assert_called_once()
+        mock_redis.return_value.lock.return_value.__exit__.assert_called_once()
+
+        get_redis_lock('test_lock', timeout=60, blocking_timeout=10)
+        mock_redis.return_value.lock.assert_called_with('test_lock', timeout=60, blocking_timeout=10)
+
+        # test with redis connection error
+        mock_redis.return_value.lock.return_value.__enter__.side_effect = Exception('invalid redis')
+        with self.assertRaises(Exception) as cm:
+            with get_redis_lock('test_lock', timeout=60):
+                pass
+        self.assertEqual(str(cm.exception), 'invalid redis')
+        mock_logger.error.assert_not_called()
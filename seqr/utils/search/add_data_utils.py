@@ -69,7 +69,7 @@ def trigger_delete_families_search(project, family_guids, user=None):
     if search_samples:
         updated_families = search_samples.values_list("individual__family__family_id", flat=True).distinct()
         family_summary = ", ".join(sorted(updated_families))
-        num_updated = search_samples.update(is_active=False)
+        num_updated = len(Sample.bulk_update(user, {'is_active': False}, queryset=search_samples))
         message = f'Disabled search for {num_updated} samples in the following {len(updated_families)} families: {family_summary}'
         info.append(message)
         logger.info(message, user)
@@ -1,9 +1,11 @@
 from collections import defaultdict
+from contextlib import nullcontext
 from copy import deepcopy
 from datetime import timedelta
 from django.db.models import Count
 from pyliftover.liftover import LiftOver
 
+from clickhouse_search.query_profiling import search_query_tags
 from clickhouse_search.search import get_clickhouse_variants, format_clickhouse_results, \
     get_clickhouse_cache_results, clickhouse_variant_lookup, get_clickhouse_variant_by_id
 from reference_data.models import GENOME_VERSION_GRCh38, GENOME_VERSION_GRCh37
@@ -319,10 +321,11 @@ def _query_variants(search_model, user, previous_search_results, genome_version,
 
     _validate_search(parsed_search, samples, previous_search_results)
 
-    variant_results = backend_specific_call(get_es_variants, get_clickhouse_variants)(
-        samples, parsed_search, user, previous_search_results, genome_version,
-        sort=sort, num_results=num_results, **kwargs,
-    )
+    with backend_specific_call(lambda **kwargs: nullcontext(), search_query_tags)(searchHash=search_model.search_hash):
+        variant_results = backend_specific_call(get_es_variants, get_clickhouse_variants)(
+            samples, parsed_search, user, previous_search_results, genome_version,
+            sort=sort, num_results=num_results, **kwargs,
+        )
 
     cache_key = _get_search_cache_key(search_model, sort=sort)
     safe_redis_set_json(cache_key, previous_search_results, expire=timedelta(weeks=2))
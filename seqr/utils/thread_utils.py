@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+
+def map_in_threads(func, items, max_workers=1):
+    """Calls func on each item, in up to max_workers concurrent threads when there is more than one worker.
+    Returns an iterator of the results in the same order as the items"""
+    if max_workers <= 1:
+        yield from map(func, items)
+        return
+
+    def _call(item):
+        try:
+            return func(item)
+        finally:
+            # Each worker thread opens its own database connections, which are not otherwise closed
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(_call, items)
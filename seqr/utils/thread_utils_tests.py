@@ -0,0 +1,34 @@
+import mock
+from threading import get_ident
+from unittest import TestCase
+
+from seqr.utils.thread_utils import map_in_threads
+
+
+@mock.patch('seqr.utils.thread_utils.connections')
+class ThreadUtilsTest(TestCase):
+
+    def test_map_in_threads(self, mock_connections):
+        thread_ids = set()
+
+        def _square(value):
+            thread_ids.add(get_ident())
+            if value < 0:
+                raise ValueError('Negative value')
+            return value * value
+
+        self.assertListEqual(list(map_in_threads(_square, [1, 2, 3])), [1, 4, 9])
+        self.assertSetEqual(thread_ids, {get_ident()})
+        mock_connections.close_all.assert_not_called()
+
+        thread_ids.clear()
+        self.assertListEqual(list(map_in_threads(_square, range(10), max_workers=3)), [i * i for i in range(10)])
+        self.assertNotIn(get_ident(), thread_ids)
+        self.assertEqual(mock_connections.close_all.call_count, 10)
+
+        # connections are closed even when the function fails, and the error is raised to the caller
+        mock_connections.reset_mock()
+        with self.assertRaises(ValueError) as cm:
+            list(map_in_threads(_square, [1, -1, 2], max_workers=2))
+        self.assertEqual(str(cm.exception), 'Negative value')
+        self.assertEqual(mock_connections.close_all.call_count, 3)
@@ -329,16 +329,22 @@ class AnvilWorkspaceAPITest(AnvilAuthenticationTestCase):
 
         # Test bad sharded data path
         mock_file_logger.reset_mock()
-        mock_subprocess.return_value.communicate.return_value = b'', b'File not found'
+        mock_subprocess.return_value.communicate.return_value = b'', b'CommandException: One or more URLs matched no objects.'
         response = self.client.post(url, content_type='application/json', data=json.dumps(REQUEST_BODY_SHARDED_DATA_PATH))
         self.assertEqual(response.status_code, 400)
         self.assertListEqual(response.json()['errors'], ['Data file or path /test_path-*.vcf.gz is not found.'])
         mock_subprocess.assert_called_with('gsutil ls gs://test_bucket/test_path-*.vcf.gz', stdout=-1, stderr=-2, shell=True)  # nosec
         mock_file_logger.info.assert_has_calls([
             mock.call('==> gsutil ls gs://test_bucket/test_path-*.vcf.gz', self.manager_user),
-            mock.call('File not found', self.manager_user),
+            mock.call('CommandException: One or more URLs matched no objects.', self.manager_user),
         ])
 
+        # Test sharded data path which can not be accessed
+        mock_subprocess.return_value.communicate.return_value = b'', b'AccessDeniedException: 403 Forbidden'
+        response = self.client.post(url, content_type='application/json', data=json.dumps(REQUEST_BODY_SHARDED_DATA_PATH))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['error'], 'Run command failed: AccessDeniedException: 403 Forbidden')
+
         # Test empty sharded data path
         mock_file_logger.reset_mock()
         mock_subprocess.return_value.communicate.return_value = b'\n', b''
@@ -1,4 +1,9 @@
 """API that generates auto-complete suggestions for the search bar in the header of seqr pages"""
+from collections import OrderedDict
+import hashlib
+from threading import Lock
+import time
+
 from django.db.models import F, Q, Case, When, Value, ExpressionWrapper, BooleanField, CharField
 from django.db.models.functions import Cast, Coalesce, Concat, Left, Length, NullIf, Replace
 from django.views.decorators.http import require_GET
@@ -7,24 +12,29 @@ from reference_data.models import Omim, HumanPhenotypeOntology
 from seqr.utils.gene_utils import get_queried_genes
 from seqr.views.utils.json_utils import create_json_response, _to_title_case
 from seqr.views.utils.permissions_utils import get_project_guids_user_can_view, login_and_policies_required
-from seqr.models import Project, Family, Individual, AnalysisGroup, ProjectCategory
+from seqr.models import Project, Family, Individual, AnalysisGroup, ProjectCategory, SearchToken
 
 
 MAX_RESULTS_PER_CATEGORY = 8
 MAX_STRING_LENGTH = 100
 
-FUZZY_MATCH_CHARS = ['-', '_', '.']
+FUZZY_MATCH_CHARS = SearchToken.FUZZY_MATCH_CHARS
+
+SEARCH_CACHE_SIZE = 1000
+SEARCH_CACHE_EXPIRE = 60
+
+_search_cache = OrderedDict()
+_search_cache_lock = Lock()
 
 
-def _get_matching_objects(query, project_guids, object_cls, core_fields, href_expression, description_content=None,
-                          project_field=None, select_related_project=True):
-    if project_field:
-        matching_objects = getattr(object_cls, 'objects')
-        matching_objects = matching_objects.filter(Q(**{'{}__guid__in'.format(project_field): project_guids}))
-        if select_related_project:
-            matching_objects = matching_objects.select_related(project_field)
+def _get_matching_objects(query, project_ids, object_cls, core_fields, href_expression, description_content=None,
+                          project_id_field=None):
+    if object_cls.SEARCH_FIELDS and SearchToken.normalize(query):
+        matching_objects = object_cls.objects.filter(
+            id__in=SearchToken.get_matching_object_ids(object_cls, query, project_ids))
     else:
-        matching_objects = object_cls.objects.filter(guid__in=project_guids)
+        project_id_field = project_id_field or object_cls.SEARCH_PROJECT_ID_FIELD
+        matching_objects = object_cls.objects.filter(**{'{}__in'.format(project_id_field): project_ids})
 
     object_filter = Q()
     for field in core_fields:
@@ -69,52 +79,48 @@ def _get_matching_objects(query, project_guids, object_cls, core_fields, href_ex
     return list(results)
 
 
-def _get_matching_projects(query, project_guids):
+def _get_matching_projects(query, project_ids):
     return _get_matching_objects(
-        query, project_guids, Project,
+        query, project_ids, Project,
         core_fields=['name'],
         href_expression=Concat(Value('/project/'), 'guid', Value('/project_page')),
     )
 
 
-def _get_matching_families(query, project_guids):
+def _get_matching_families(query, project_ids):
     return _get_matching_objects(
-        query, project_guids, Family,
+        query, project_ids, Family,
         core_fields=['display_name', 'family_id'],
         href_expression=Concat(Value('/project/'), 'project__guid', Value('/family_page/'), 'guid'),
-        description_content=[Cast('project__name', output_field=CharField())],
-        project_field='project')
+        description_content=[Cast('project__name', output_field=CharField())])
 
 
-def _get_matching_analysis_groups(query, project_guids):
+def _get_matching_analysis_groups(query, project_ids):
     return _get_matching_objects(
-        query, project_guids, AnalysisGroup,
+        query, project_ids, AnalysisGroup,
         core_fields=['name'],
         href_expression=Concat(Value('/project/'), 'project__guid', Value('/analysis_group/'), 'guid'),
-        description_content=[Cast('project__name', output_field=CharField())],
-        project_field='project')
+        description_content=[Cast('project__name', output_field=CharField())])
 
 
-def _get_matching_individuals(query, project_guids):
+def _get_matching_individuals(query, project_ids):
     return _get_matching_objects(
-        query, project_guids, Individual,
+        query, project_ids, Individual,
         core_fields=['display_name', 'individual_id'],
         href_expression=Concat(Value('/project/'), 'family__project__guid', Value('/family_page/'), 'family__guid'),
         description_content=[
             Cast('family__project__name', output_field=CharField()),
             Value(': family '),
             Coalesce(NullIf('family__display_name', Value('')), NullIf('family__family_id', Value(''))),
-        ],
-        project_field='family__project')
+        ])
 
 
-def _get_matching_project_groups(query, project_guids):
+def _get_matching_project_groups(query, project_ids):
     return _get_matching_objects(
-        query, project_guids, ProjectCategory,
+        query, project_ids, ProjectCategory,
         core_fields=['name'],
         href_expression=F('guid'),
-        project_field='projects',
-        select_related_project=False,
+        project_id_field='projects__id',
     )
 
 
@@ -216,10 +222,39 @@ def awesomebar_autocomplete_handler(request):
 
     project_guids = get_project_guids_user_can_view(request.user, limit_data_manager=False) if any(
         category for category in categories if category in PROJECT_SPECIFIC_CATEGORY_MAP) else None
-
-    results = {
-        category: {'name': _to_title_case(category), 'results': CATEGORY_MAP[category](query, project_guids)}
-        for category in categories
-    }
+    projects_key = hashlib.md5(','.join(sorted(project_guids)).encode('utf-8')).hexdigest() if project_guids else None  # nosec
+
+    project_ids = None
+    results = {}
+    for category in categories:
+        cache_key = (category, query, projects_key if category in PROJECT_SPECIFIC_CATEGORY_MAP else None)
+        matches = _get_cached_matches(cache_key)
+        if matches is None:
+            if category in PROJECT_SPECIFIC_CATEGORY_MAP and project_ids is None:
+                project_ids = list(Project.objects.filter(guid__in=project_guids).values_list('id', flat=True))
+            matches = CATEGORY_MAP[category](query, project_ids)
+            _set_cached_matches(cache_key, matches)
+        results[category] = {'name': _to_title_case(category), 'results': matches}
 
     return create_json_response({'matches': {k: v for k, v in results.items() if v['results']}})
+
+
+def _get_cached_matches(cache_key):
+    with _search_cache_lock:
+        cached = _search_cache.get(cache_key)
+        if cached is None:
+            return None
+        expire_time, matches = cached
+        if expire_time < time.monotonic():
+            del _search_cache[cache_key]
+            return None
+        _search_cache.move_to_end(cache_key)
+        return matches
+
+
+def _set_cached_matches(cache_key, matches):
+    with _search_cache_lock:
+        _search_cache[cache_key] = (time.monotonic() + SEARCH_CACHE_EXPIRE, matches)
+        _search_cache.move_to_end(cache_key)
+        while len(_search_cache) > SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
@@ -1,5 +1,7 @@
 import mock
 from django.urls.base import reverse
+from seqr.models import Project, Family, Individual, AnalysisGroup, SearchToken
+from seqr.views.apis import awesomebar_api
 from seqr.views.apis.awesomebar_api import awesomebar_autocomplete_handler
 from seqr.views.utils.test_utils import AuthenticationTestCase, AnvilAuthenticationTestCase
 
@@ -10,6 +12,11 @@ class AwesomebarAPITest(object):
     @mock.patch('seqr.views.apis.awesomebar_api.MAX_STRING_LENGTH', 20)
     @mock.patch('seqr.views.apis.awesomebar_api.MAX_RESULTS_PER_CATEGORY', 5)
     def test_awesomebar_autocomplete_handler(self):
+        # fixture data is loaded without the model helpers, so is not yet indexed
+        for model_cls in [Project, Family, Individual, AnalysisGroup]:
+            SearchToken.update_tokens(model_cls, model_cls.objects.values_list('id', flat=True))
+        awesomebar_api._search_cache.clear()
+
         url = reverse(awesomebar_autocomplete_handler)
         self.check_require_login(url)
 
@@ -142,6 +149,55 @@ class AwesomebarAPITest(object):
         self.assertEqual(len(families), 3)
         self.assertListEqual([f['title'] for f in families], ['12-a', '2_1', '42'])
 
+        # Test search tokens are updated with the model, and results are cached
+        response = self.client.get(url + "?q=zebra.fish&categories=families")
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json(), {'matches': {}})
+
+        Family.bulk_update(self.collaborator_user, {'display_name': 'Zebra_Fish 2'}, guid='F000002_2')
+        response = self.client.get(url + "?q=zebra.fish&categories=families")
+        self.assertDictEqual(response.json(), {'matches': {}})
+
+        awesomebar_api._search_cache.clear()
+        response = self.client.get(url + "?q=zebra.fish&categories=families")
+        self.assertEqual(response.status_code, 200)
+        families = response.json()['matches']['families']['results']
+        self.assertListEqual([f['key'] for f in families], ['F000002_2'])
+        self.assertEqual(families[0]['title'], 'Zebra_Fish 2')
+
+        analysis_group = AnalysisGroup.objects.get(guid='AG0000183_test_group')
+        analysis_group_tokens = SearchToken.objects.filter(model_name='analysisgroup', object_id=analysis_group.id)
+        self.assertTrue(analysis_group_tokens.exists())
+        analysis_group.delete()
+        self.assertFalse(analysis_group_tokens.exists())
+
+        # Tokens are only rebuilt on save when a name or the project changes
+        family = Family.objects.get(guid='F000002_2')
+        family_tokens = SearchToken.objects.filter(model_name='family', object_id=family.id)
+        token_ids = set(family_tokens.values_list('id', flat=True))
+        family.description = 'Updated description'
+        family.save()
+        self.assertSetEqual(set(family_tokens.values_list('id', flat=True)), token_ids)
+
+        family.display_name = 'Zebra_Fish 3'
+        family.save()
+        self.assertFalse(family_tokens.filter(id__in=token_ids).exists())
+        self.assertTrue(family_tokens.filter(token='ZEBRAFISH3').exists())
+
+        family.project = Project.objects.get(guid='R0003_test')
+        family.save()
+        self.assertSetEqual(set(family_tokens.values_list('project__guid', flat=True)), {'R0003_test'})
+
+        # Tokens for models deleted by cascade are also deleted
+        project = Project.objects.get(guid='R0002_empty')
+        analysis_group = AnalysisGroup.objects.create(project=project, name='Cascade Group')
+        self.assertDictEqual(
+            dict(Project._get_deleted_search_object_ids(Project.objects.filter(id=project.id))),
+            {Project: [project.id], AnalysisGroup: [analysis_group.id]},
+        )
+        project.delete()
+        self.assertFalse(SearchToken.objects.filter(model_name='analysisgroup', object_id=analysis_group.id).exists())
+
 
 # Tests for AnVIL access disabled
 class LocalAwesomebarAPITest(AuthenticationTestCase, AwesomebarAPITest):
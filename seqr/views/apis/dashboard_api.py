@@ -1,10 +1,8 @@
 """
 APIs used by the main seqr dashboard page
 """
-from django.db import models
-
-from seqr.models import ProjectCategory, Sample, RnaSample, Family, Project
-from seqr.views.utils.individual_utils import check_project_individuals_deletable
+from seqr.models import ProjectCategory, Project, ProjectStats
+from seqr.views.utils.individual_utils import get_project_guids_with_undeletable_individuals
 from seqr.views.utils.json_utils import create_json_response
 from seqr.views.utils.orm_to_json_utils import get_json_for_projects
 from seqr.views.utils.permissions_utils import get_project_guids_user_can_view, login_and_policies_required
@@ -38,46 +36,31 @@ def _get_projects_json(user):
         return {}
 
     projects = Project.objects.filter(guid__in=project_guids)
-    projects_with_counts = projects.annotate(
-        models.Count('family', distinct=True), models.Count('family__individual', distinct=True),
-        models.Count('family__savedvariant', distinct=True))
+    stats_by_project_id = {stats.project_id: stats for stats in ProjectStats.objects.filter(project__in=projects)}
 
     projects_by_guid = {p['projectGuid']: p for p in get_json_for_projects(projects, user=user)}
-    for project in projects_with_counts:
-        projects_by_guid[project.guid]['numFamilies'] = project.family__count
-        projects_by_guid[project.guid]['numIndividuals'] = project.family__individual__count
-        projects_by_guid[project.guid]['numVariantTags'] = project.family__savedvariant__count
-        if projects_by_guid[project.guid]['userIsCreator']:
-            errors, _ = check_project_individuals_deletable(project)
-            projects_by_guid[project.guid]['userCanDelete'] = not errors
-
-    analysis_status_counts = Family.objects.filter(project__in=projects).values(
-        'project__guid', 'analysis_status').annotate(count=models.Count('*'))
-    for agg in analysis_status_counts:
-        project_guid = agg['project__guid']
-        if 'analysisStatusCounts' not in projects_by_guid[project_guid]:
-            projects_by_guid[project_guid]['analysisStatusCounts'] = {}
-        projects_by_guid[project_guid]['analysisStatusCounts'][agg['analysis_status']] = agg['count']
-
-    sample_type_status_counts = _sample_type_counts(
-        Sample.objects.filter(individual__family__project__in=projects, dataset_type=Sample.DATASET_TYPE_VARIANT_CALLS)
-    ) + _sample_type_counts(
-        RnaSample.objects.filter(individual__family__project__in=projects).annotate(sample_type=models.Value('RNA'))
-    )
-    for agg in sample_type_status_counts:
-        project_guid = agg['individual__family__project__guid']
-        if 'sampleTypeCounts' not in projects_by_guid[project_guid]:
-            projects_by_guid[project_guid]['sampleTypeCounts'] = {}
-        projects_by_guid[project_guid]['sampleTypeCounts'][agg['sample_type']] = agg['count']
+    creator_projects = [project for project in projects if projects_by_guid[project.guid]['userIsCreator']]
+    undeletable_project_guids = get_project_guids_with_undeletable_individuals(creator_projects) if creator_projects else set()
+    for project in projects:
+        project_json = projects_by_guid[project.guid]
+        # stats are computed by the model helpers and reconcile_project_stats, and are never written on page load
+        stats = stats_by_project_id.get(project.id)
+        if stats:
+            project_json.update({
+                'numFamilies': stats.num_families,
+                'numIndividuals': stats.num_individuals,
+                'numVariantTags': stats.num_variant_tags,
+            })
+            if stats.analysis_status_counts:
+                project_json['analysisStatusCounts'] = stats.analysis_status_counts
+            if stats.sample_type_counts:
+                project_json['sampleTypeCounts'] = stats.sample_type_counts
+        if project_json['userIsCreator']:
+            project_json['userCanDelete'] = project.guid not in undeletable_project_guids
 
     return projects_by_guid
 
 
-def _sample_type_counts(sample_q):
-    return list(sample_q.values(
-        'individual__family__project__guid', 'sample_type',
-    ).annotate(count=models.Count('individual_id', distinct=True)))
-
 def _retrieve_project_categories_by_guid(project_guids):
     """Retrieves project categories from the database, and returns a 'project_categories_by_guid' dictionary,
     while also adding a 'projectCategoryGuids' attribute to each project dict in 'projects_by_guid'.
@@ -5,7 +5,7 @@ from django.urls.base import reverse
 from seqr.views.apis.dashboard_api import dashboard_page_data
 from seqr.views.utils.terra_api_utils import TerraAPIException
 from seqr.views.utils.test_utils import AuthenticationTestCase, AnvilAuthenticationTestCase, PROJECT_FIELDS
-from seqr.models import Project
+from seqr.models import Project, ProjectStats
 
 DASHBOARD_PROJECT_FIELDS = {
     'numIndividuals', 'numFamilies', 'sampleTypeCounts', 'numVariantTags', 'analysisStatusCounts',
@@ -28,6 +28,8 @@ class DashboardPageTest(object):
 
     @mock.patch('seqr.views.utils.permissions_utils.safe_redis_set_json')
     def test_dashboard_page_data(self, mock_set_redis, mock_get_redis):
+        # fixture data is loaded without the model helpers, so stats are computed as they would be by the migration
+        ProjectStats.update_stats(Project.objects.values_list('id', flat=True))
         mock_get_redis.return_value = None
         url = reverse(dashboard_page_data)
         self.check_require_login(url)
@@ -57,6 +59,7 @@ class DashboardPageTest(object):
         mock_set_redis.assert_called_with(
             'projects__test_user_collaborator', list(response_json['projectsByGuid'].keys()), expire=300)
 
+        ProjectStats.objects.filter(project__guid='R0002_empty').delete()
         self.login_manager()
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
@@ -68,6 +71,9 @@ class DashboardPageTest(object):
         self.assertTrue(response_json['projectsByGuid']['R0003_test']['userIsCreator'])
         self.assertTrue(response_json['projectsByGuid']['R0002_empty']['userCanDelete'])
         self.assertFalse(response_json['projectsByGuid']['R0004_non_analyst_project']['userCanDelete'])
+        # Projects without stats are returned without counts, and stats are not computed on page load
+        self.assertNotIn('numFamilies', response_json['projectsByGuid']['R0002_empty'])
+        self.assertFalse(ProjectStats.objects.filter(project__guid='R0002_empty').exists())
 
         self.login_analyst_user()
         response = self.client.get(url)
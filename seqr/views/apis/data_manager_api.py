@@ -11,6 +11,7 @@ from django.http.response import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from requests.exceptions import ConnectionError as RequestConnectionError
 
+from clickhouse_search.query_profiling import get_search_query_profiles
 from clickhouse_search.search import delete_clickhouse_project
 from seqr.utils.communication_utils import send_project_notification
 from seqr.utils.search.add_data_utils import trigger_data_loading, get_missing_family_samples, get_loaded_individual_ids, trigger_delete_families_search
@@ -426,6 +427,17 @@ def trigger_delete_family(request):
     return create_json_response({'info': info})
 
 
+@data_manager_required
+@clickhouse_only
+def search_query_profiles(request):
+    profiles = get_search_query_profiles(
+        search_hash=request.GET.get('searchHash'),
+        lookback_hours=int(request.GET.get('hours', 24)),
+        limit=int(request.GET.get('limit', 20)),
+    )
+    return create_json_response({'queries': profiles})
+
+
 # Hop-by-hop HTTP response headers shouldn't be forwarded.
 # More info at: http://www.w3.org/Protocols/rfc2616/rfc2616-sec13.html#sec13.5.1
 EXCLUDE_HTTP_RESPONSE_HEADERS = {
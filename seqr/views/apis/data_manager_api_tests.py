@@ -1,6 +1,8 @@
 from collections import defaultdict
 from datetime import datetime
 from django.urls.base import reverse
+import gzip
+import io
 import json
 import mock
 from requests import HTTPError
@@ -9,11 +11,12 @@ import responses
 from seqr.utils.communication_utils import _set_bulk_notification_stream
 from seqr.views.apis.data_manager_api import elasticsearch_status, delete_index, \
     update_rna_seq, load_phenotype_prioritization_data, validate_callset, loading_vcfs, \
-    get_loaded_projects, load_data, trigger_delete_family
+    get_loaded_projects, load_data, trigger_delete_family, search_query_profiles
 from seqr.views.utils.orm_to_json_utils import _get_json_for_models
 from seqr.views.utils.test_utils import AuthenticationTestCase, AnvilAuthenticationTestCase, AirtableTest
 from seqr.utils.search.elasticsearch.es_utils_tests import urllib3_responses
-from seqr.models import Individual, Sample, RnaSeqOutlier, RnaSeqTpm, RnaSeqSpliceOutlier, RnaSample, Project, PhenotypePrioritization
+from seqr.models import Individual, Sample, RnaSeqOutlier, RnaSeqTpm, RnaSeqSpliceOutlier, RnaSample, Project, PhenotypePrioritization, \
+    ProjectStats
 from settings import SEQR_SLACK_LOADING_NOTIFICATION_CHANNEL
 
 PROJECT_GUID = 'R0001_1kg'
@@ -893,7 +896,9 @@ class DataManagerAPITest(AirtableTest):
             'Attempted data loading for 0 RNA-seq samples in the following 0 projects: ',
         ]
         warnings = ['Skipped loading for 1 samples already loaded from this file']
-        self.assertDictEqual(response.json(), {'info': info, 'warnings': warnings, 'sampleGuids': [], 'fileName': mock.ANY})
+        self.assertDictEqual(response.json(), {
+            'info': info, 'warnings': warnings, 'sampleGuids': [], 'sampleGuidBatches': [], 'fileName': mock.ANY,
+        })
         self._has_expected_file_loading_logs('gs://rna_data/muscle_samples.tsv.gz', info=info, warnings=warnings, user=self.data_manager_user, include_airtable_logs=True)
         self.assertEqual(model_cls.objects.count(), params['initial_model_count'])
         mock_send_slack.assert_not_called()
@@ -920,7 +925,7 @@ class DataManagerAPITest(AirtableTest):
             file_name = RNA_FILENAME_TEMPLATE.format(data_type)
             response_json = response.json()
             self.assertDictEqual(response_json, {'info': info, 'warnings': warnings or [], 'sampleGuids': mock.ANY,
-                                                 'fileName': file_name})
+                                                 'sampleGuidBatches': [response_json['sampleGuids']], 'fileName': file_name})
             new_sample_guid = self._check_rna_sample_model(
                 individual_id=new_sample_individual_id, data_source='new_muscle_samples.tsv.gz', data_type=data_type,
                 tissue_type='M', is_active_sample=False,
@@ -1505,13 +1510,23 @@ class DataManagerAPITest(AirtableTest):
         self.check_data_manager_login(url)
 
         Project.objects.filter(guid=PROJECT_GUID).update(genome_version='38')
-        response = self.client.post(url, content_type='application/json', data=json.dumps({'family': 'F000002_2'}))
+        ProjectStats.update_stats([1])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, content_type='application/json', data=json.dumps({'family': 'F000002_2'}))
         self._assert_expected_delete_family(response)
 
     def _assert_expected_delete_family(self, response):
         self.assertEqual(response.status_code, 500)
         self.assertDictEqual(response.json(), {'error': 'trigger_delete_family is disabled without the clickhouse backend'})
 
+    def test_search_query_profiles(self):
+        url = reverse(search_query_profiles)
+        self.check_data_manager_login(url)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 500)
+        self.assertDictEqual(response.json(), {'error': 'search_query_profiles is disabled without the clickhouse backend'})
+
 
 class LocalDataManagerAPITest(AuthenticationTestCase, DataManagerAPITest):
     fixtures = ['users', '1kg_project', 'reference_data']
@@ -1542,16 +1557,15 @@ class LocalDataManagerAPITest(AuthenticationTestCase, DataManagerAPITest):
         self.mock_open = patcher.start()
         self.mock_file_iter = self.mock_open.return_value.__enter__.return_value.__iter__
         self.mock_file_iter.return_value = []
-        self.mock_file_iter.stdout = []
         self.addCleanup(patcher.stop)
         patcher = mock.patch('seqr.utils.file_utils.open')
         self.mock_unzipped_open = patcher.start()
         self.mock_unzipped_file_iter = self.mock_unzipped_open.return_value.__enter__.return_value.__iter__
         self.mock_unzipped_file_iter.return_value = []
+        self.mock_file_read = self.mock_unzipped_open.return_value.__enter__.return_value.read
         self.addCleanup(patcher.stop)
         patcher = mock.patch('seqr.utils.file_utils.subprocess.Popen')
         self.mock_subprocess = patcher.start()
-        self.mock_subprocess.side_effect = [self.mock_file_iter]
         self.addCleanup(patcher.stop)
         patcher = mock.patch('seqr.utils.search.add_data_utils.LOADING_DATASETS_DIR', self.TRIGGER_CALLSET_DIR)
         patcher.start()
@@ -1570,7 +1584,8 @@ class LocalDataManagerAPITest(AuthenticationTestCase, DataManagerAPITest):
         self.mock_does_file_exist.return_value = True
         file_iter = self.mock_file_iter if is_gz else self.mock_unzipped_file_iter
         file_iter.return_value += stdout
-        file_iter.stdout += stdout
+        if is_gz:
+            self.mock_file_read.side_effect = io.BytesIO(gzip.compress(''.join(stdout).encode())).read
 
     def _add_file_list_iter(self, file_list, stdout):
         self.mock_does_file_exist.return_value = True
@@ -1620,9 +1635,9 @@ class LocalDataManagerAPITest(AuthenticationTestCase, DataManagerAPITest):
         ])
 
     def _assert_expected_read_vcf_header_subprocess_calls(self, body):
-        self.mock_subprocess.assert_has_calls([
-            mock.call(f'dd skip=0 count=65537 bs=1 if={self.TRIGGER_CALLSET_DIR}{body["filePath"]} status="none" | gunzip -c - ', stdout=-1, stderr=-2, shell=True) # nosec
-        ])
+        self.mock_unzipped_open.assert_called_with(f'{self.TRIGGER_CALLSET_DIR}{body["filePath"]}', 'rb')
+        self.mock_unzipped_open.return_value.__enter__.return_value.seek.assert_called_with(0)
+        self.mock_subprocess.assert_not_called()
 
     def _assert_write_pedigree_error(self, response):
         self.assertEqual(response.status_code, 500)
@@ -1973,6 +1988,8 @@ Loading pipeline should be triggered with:
 
         family_samples = Sample.objects.filter(individual__family_id=2, is_active=True)
         self.assertEqual(family_samples.count(),0)
+        # Cached project context is invalidated
+        self.assertEqual(ProjectStats.objects.get(project__guid='R0001_1kg').context_version, 1)
 
         self.assertEqual(len(responses.calls), 1)
         self.assertDictEqual(json.loads(responses.calls[-1].request.body), {
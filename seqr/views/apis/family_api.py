@@ -21,7 +21,7 @@ from seqr.views.utils.note_utils import create_note_handler, update_note_handler
 from seqr.views.utils.orm_to_json_utils import _get_json_for_model,  get_json_for_family_note, get_json_for_samples, \
     get_json_for_matchmaker_submissions, get_json_for_analysis_groups, _get_json_for_families, get_json_for_queryset
 from seqr.views.utils.project_context_utils import add_families_context, families_discovery_tags, add_project_tag_types, \
-    MME_TAG_NAME
+    get_cached_project_context, remove_restricted_context_fields, MME_TAG_NAME
 from seqr.models import Family, FamilyAnalysedBy, Individual, FamilyNote, Sample, VariantTag, AnalysisGroup, RnaSeqTpm, \
     PhenotypePrioritization, Project, RnaSample
 from seqr.views.utils.permissions_utils import check_project_permissions, get_project_and_check_pm_permissions, \
@@ -39,23 +39,34 @@ PREVIOUS_FAMILY_ID_FIELD = 'previousFamilyId'
 
 @login_and_policies_required
 def family_page_data(request, family_guid):
-    families = Family.objects.filter(guid=family_guid)
-    family = families.get(guid=family_guid)
+    family = Family.objects.get(guid=family_guid)
     project = family.project
     check_project_permissions(project, request.user)
-    is_analyst = user_is_analyst(request.user)
-    has_case_review_perm = has_case_review_permissions(project, request.user)
 
+    response = get_cached_project_context(
+        project, f'family_page_data__{family_guid}', lambda: _get_family_page_context(family, project),
+    )
+    remove_restricted_context_fields(
+        response, is_analyst=user_is_analyst(request.user),
+        has_case_review_perm=has_case_review_permissions(project, request.user),
+    )
+
+    return create_json_response(response)
+
+
+def _get_family_page_context(family, project):
     sample_models = Sample.objects.filter(individual__family=family)
     samples = get_json_for_samples(
-        sample_models, project_guid=project.guid, family_guid=family_guid, skip_nested=True, is_analyst=is_analyst
+        sample_models, project_guid=project.guid, family_guid=family.guid, skip_nested=True, is_analyst=True,
     )
     response = {
         'samplesByGuid': {s['sampleGuid']: s for s in samples}
     }
 
-    add_families_context(response, families, project.guid, request.user, is_analyst, has_case_review_perm)
-    family_response = response['familiesByGuid'][family_guid]
+    add_families_context(
+        response, Family.objects.filter(id=family.id), project.guid, user=None, is_analyst=True, has_case_review_perm=True,
+    )
+    family_response = response['familiesByGuid'][family.guid]
 
     additional_fields = backend_specific_call([],['key', 'dataset_type'])
     discovery_variants = family.savedvariant_set.filter(varianttag__variant_tag_type__category=DISCOVERY_CATEGORY).values(
@@ -102,7 +113,7 @@ def family_page_data(request, family_guid):
         individual['rnaSample'] = rna_samples_by_individual.get(individual['individualGuid'])
     response['mmeSubmissionsByGuid'] = {s['submissionGuid']: s for s in submissions}
 
-    return create_json_response(response)
+    return response
 
 
 def _intervals_overlap(interval1, interval2):
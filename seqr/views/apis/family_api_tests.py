@@ -4,9 +4,11 @@ import mock
 from copy import deepcopy
 from datetime import datetime
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import connections
 from django.urls.base import reverse
 
+from reference_data.models import DataVersions
 from matchmaker.models import MatchmakerSubmission
 from seqr.views.apis.family_api import update_family_pedigree_image, update_family_assigned_analyst, \
     update_family_fields_handler, update_family_analysed_by, edit_families_handler, delete_families_handler, \
@@ -16,7 +18,8 @@ from seqr.views.utils.test_utils import AuthenticationTestCase, AnvilAuthenticat
     FAMILY_NOTE_FIELDS, FAMILY_FIELDS, IGV_SAMPLE_FIELDS, \
     SAMPLE_FIELDS, INDIVIDUAL_FIELDS, INTERNAL_INDIVIDUAL_FIELDS, INTERNAL_FAMILY_FIELDS, CASE_REVIEW_FAMILY_FIELDS, \
     MATCHMAKER_SUBMISSION_FIELDS, TAG_TYPE_FIELDS, CASE_REVIEW_INDIVIDUAL_FIELDS
-from seqr.models import FamilyAnalysedBy, AnalysisGroup
+from seqr.models import FamilyAnalysedBy, AnalysisGroup, ProjectStats
+from seqr.views.utils import project_context_utils
 
 FAMILY_GUID = 'F000001_1'
 FAMILY_GUID2 = 'F000002_2'
@@ -462,6 +465,82 @@ class FamilyAPITest(object):
         self.check_no_analyst_no_access(url, get_response=lambda: self.client.post(
             url, content_type='application/json', data=json.dumps({'successStoryTypes': []})))
 
+    @mock.patch('seqr.views.utils.project_context_utils.safe_redis_set_json')
+    @mock.patch('seqr.views.utils.project_context_utils.safe_redis_get_json')
+    def test_family_page_data_cache(self, mock_get_redis, mock_set_redis):
+        project_context_utils._reference_data_version_cache.clear()
+        url = reverse(family_page_data, args=[FAMILY_GUID])
+        self.check_collaborator_login(url)
+
+        # Context is not cached for projects without stats
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        mock_get_redis.assert_not_called()
+        mock_set_redis.assert_not_called()
+
+        ProjectStats.update_stats([1])
+
+        cached = {}
+        mock_set_redis.side_effect = lambda key, value, **kwargs: cached.update(
+            {key: json.loads(json.dumps(value, cls=DjangoJSONEncoder))})
+        mock_get_redis.return_value = None
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        cache_key = 'project_context__R0001_1kg__v0__cad560e09c__family_page_data__F000001_1'
+        mock_get_redis.assert_called_with(cache_key)
+        mock_set_redis.assert_called_once_with(cache_key, mock.ANY, expire=604800)
+
+        # Context is cached with all fields, and restricted fields are removed per-user
+        cached_context = cached[cache_key]
+        family_fields = {'individualGuids', 'detailsLoaded', 'postDiscoveryOmimOptions'}
+        self.assertSetEqual(
+            set(cached_context['familiesByGuid'][FAMILY_GUID].keys()),
+            family_fields | INTERNAL_FAMILY_FIELDS | CASE_REVIEW_FAMILY_FIELDS,
+        )
+        self.assertSetEqual(set(response_json['familiesByGuid'][FAMILY_GUID].keys()), family_fields | FAMILY_FIELDS)
+
+        mock_get_redis.return_value = deepcopy(cached_context)
+        mock_set_redis.reset_mock()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json(), response_json)
+        mock_set_redis.assert_not_called()
+
+        self.login_analyst_user()
+        mock_get_redis.return_value = deepcopy(cached_context)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertSetEqual(
+            set(response.json()['familiesByGuid'][FAMILY_GUID].keys()),
+            family_fields | INTERNAL_FAMILY_FIELDS | CASE_REVIEW_FAMILY_FIELDS,
+        )
+
+        # Updating project data invalidates the cache
+        update_url = reverse(update_family_fields_handler, args=[FAMILY_GUID])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                update_url, content_type='application/json', data=json.dumps({'description': 'New'}))
+        self.assertEqual(response.status_code, 200)
+        mock_get_redis.return_value = None
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['familiesByGuid'][FAMILY_GUID]['description'], 'New')
+        mock_get_redis.assert_called_with('project_context__R0001_1kg__v1__cad560e09c__family_page_data__F000001_1')
+
+        # Updating reference data invalidates the cache
+        DataVersions.objects.filter(data_model_name='Omim').update(version='Thu, 20 Mar 2026 20:52:24 GMT')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        mock_get_redis.assert_called_with('project_context__R0001_1kg__v1__cad560e09c__family_page_data__F000001_1')
+
+        # The reference data version is cached in memory until it expires
+        project_context_utils._reference_data_version_cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(mock_get_redis.call_args.args[0], 'project_context__R0001_1kg__v1__cad560e09c__family_page_data__F000001_1')
+        self.assertRegex(mock_get_redis.call_args.args[0], r'^project_context__R0001_1kg__v1__\w{10}__family_page_data__F000001_1$')
+
     @mock.patch('seqr.views.utils.json_to_orm_utils.timezone.now', lambda: datetime.strptime('2020-01-01', '%Y-%m-%d'))
     def test_update_family_fields(self):
         url = reverse(update_family_fields_handler, args=[FAMILY_GUID])
@@ -1,13 +1,20 @@
 from collections import defaultdict
 import json
+import os
 import re
 import requests
+from requests.adapters import HTTPAdapter
+from threading import Lock
+import time
+import uuid
 
 from django.core.exceptions import PermissionDenied
-from django.http import StreamingHttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 
 from seqr.models import Individual, IgvSample
-from seqr.utils.file_utils import file_iter, does_file_exist, is_google_bucket_file_path, run_command, get_google_project
+from seqr.utils.block_cache_utils import DiskBlockCache
+from seqr.utils.file_utils import does_file_exist, is_google_bucket_file_path, run_command, get_google_project, \
+    local_file_range_iter
 from seqr.utils.redis_utils import safe_redis_get_json, safe_redis_set_json
 from seqr.views.utils.file_utils import save_uploaded_file, load_uploaded_file
 from seqr.views.utils.json_to_orm_utils import get_or_create_model_from_json
@@ -16,10 +23,20 @@ from seqr.views.utils.orm_to_json_utils import get_json_for_sample
 from seqr.views.utils.permissions_utils import get_project_and_check_permissions, external_anvil_project_can_edit, \
     login_and_policies_required, pm_or_data_manager_required, get_project_guids_user_can_view, user_is_data_manager, \
     user_is_pm
+from settings import IGV_BLOCK_CACHE_DIR, IGV_BLOCK_CACHE_MAX_SIZE_MB
 
 GS_STORAGE_ACCESS_CACHE_KEY = 'gs_storage_access_cache_entry'
 GS_STORAGE_URL = 'https://storage.googleapis.com'
 TIMEOUT = 300
+STREAM_CONTENT_TYPE = 'application/octet-stream'
+TOKEN_EXPIRY_BUFFER = 5
+MAX_GS_CONNECTIONS = 20
+INDEX_FILE_EXTENSIONS = ('.bai', '.crai', '.tbi', '.csi')
+IGV_BLOCK_CACHE_BLOCK_SIZE = 1024 * 1024
+GS_GENERATION_CACHE_TTL = 60
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=MAX_GS_CONNECTIONS, pool_maxsize=MAX_GS_CONNECTIONS))
 
 
 def _process_alignment_records(rows, num_id_cols=1, **kwargs):
@@ -197,15 +214,124 @@ def fetch_igv_track(request, project_guid, igv_track_path):
 
 
 def _stream_gs(request, gs_path):
-    headers = _get_gs_rest_api_headers(request.META.get('HTTP_RANGE'), gs_path, user=request.user)
+    range_header = request.META.get('HTTP_RANGE')
+    block_cache = _get_block_cache()
+    if block_cache:
+        byte_range = _parse_simple_byte_range(range_header)
+        if byte_range or (not range_header and gs_path.endswith(INDEX_FILE_EXTENSIONS)):
+            return _stream_cached_gs(request, gs_path, block_cache, byte_range)
+
+    headers = _get_gs_rest_api_headers(range_header, gs_path, user=request.user)
 
-    response = requests.get(
-        f"{GS_STORAGE_URL}/{gs_path.replace('gs://', '', 1)}",
+    response = _session.get(
+        _get_gs_url(gs_path),
         headers=headers,
         stream=True, timeout=TIMEOUT)
 
     return StreamingHttpResponse(response.iter_content(chunk_size=65536), status=response.status_code,
-                                 content_type='application/octet-stream')
+                                 content_type=STREAM_CONTENT_TYPE)
+
+
+def _get_gs_url(gs_path):
+    return f"{GS_STORAGE_URL}/{gs_path.replace('gs://', '', 1)}"
+
+
+def _parse_simple_byte_range(range_header):
+    range_match = re.fullmatch(r'\s*bytes\s*=\s*(\d+)\s*-\s*(\d*)\s*', range_header or '', re.I)
+    if not range_match:
+        return None
+    first_byte, last_byte = range_match.groups()
+    return int(first_byte), int(last_byte) if last_byte else None
+
+
+def _stream_cached_gs(request, gs_path, block_cache, byte_range):
+    def _fetch_range(first_byte, last_byte):
+        headers = _get_gs_rest_api_headers(f'bytes={first_byte}-{last_byte}', gs_path, user=request.user)
+        # only read the cached generation, so a file overwritten mid-request is not cached with the old generation
+        headers['x-goog-if-generation-match'] = generation
+        response = _session.get(_get_gs_url(gs_path), headers=headers, timeout=TIMEOUT)
+        if response.status_code == 412:
+            # the file has been overwritten since its generation was cached
+            _clear_gs_generation(gs_path)
+        response.raise_for_status()
+        content_range = response.headers.get('Content-Range')
+        file_size = int(content_range.rsplit('/', 1)[1]) if content_range else len(response.content)
+        return response.content, file_size
+
+    first_byte, last_byte = byte_range or (0, None)
+    try:
+        # the cached blocks are keyed on the object generation, which changes whenever the file is overwritten
+        generation = _get_gs_generation(gs_path, request.user)
+        try:
+            file_size, last_byte, content = block_cache.get_range(
+                gs_path, generation, first_byte, last_byte, _fetch_range)
+        except requests.HTTPError as e:
+            if e.response.status_code != 412:
+                raise
+            generation = _get_gs_generation(gs_path, request.user)
+            file_size, last_byte, content = block_cache.get_range(
+                gs_path, generation, first_byte, last_byte, _fetch_range)
+    except requests.HTTPError as e:
+        return HttpResponse(e.response.content, status=e.response.status_code, content_type=STREAM_CONTENT_TYPE)
+
+    if first_byte > last_byte:
+        resp = HttpResponse(status=416)
+        resp['Content-Range'] = f'bytes */{file_size}'
+        return resp
+
+    resp = StreamingHttpResponse(content, status=206 if byte_range else 200, content_type=STREAM_CONTENT_TYPE)
+    resp['Content-Length'] = str(last_byte - first_byte + 1)
+    if byte_range:
+        resp['Content-Range'] = f'bytes {first_byte}-{last_byte}/{file_size}'
+    resp['Accept-Ranges'] = 'bytes'
+    return resp
+
+
+_gs_generation_cache = {}
+_gs_generation_lock = Lock()
+
+
+def _get_gs_generation(gs_path, user):
+    # Generations are cached in memory for a short time, so range requests for blocks which are already cached do not
+    # each need a HEAD request. A file overwritten within that time may be served from its previous generation's blocks
+    with _gs_generation_lock:
+        cached = _gs_generation_cache.get(gs_path)
+        if cached and cached['expiresAt'] > time.time():
+            return cached['generation']
+
+    response = _session.head(
+        _get_gs_url(gs_path), headers=_get_gs_rest_api_headers(None, gs_path, user=user), timeout=TIMEOUT)
+    response.raise_for_status()
+    generation = response.headers['x-goog-generation']
+
+    now = time.time()
+    with _gs_generation_lock:
+        for path in [path for path, cached in _gs_generation_cache.items() if cached['expiresAt'] <= now]:
+            del _gs_generation_cache[path]
+        _gs_generation_cache[gs_path] = {'generation': generation, 'expiresAt': now + GS_GENERATION_CACHE_TTL}
+    return generation
+
+
+def _clear_gs_generation(gs_path):
+    with _gs_generation_lock:
+        _gs_generation_cache.pop(gs_path, None)
+
+
+_block_cache = None
+_block_cache_lock = Lock()
+
+
+def _get_block_cache():
+    global _block_cache
+    if not IGV_BLOCK_CACHE_DIR:
+        return None
+    with _block_cache_lock:
+        if _block_cache is None:
+            _block_cache = DiskBlockCache(
+                IGV_BLOCK_CACHE_DIR, max_size=IGV_BLOCK_CACHE_MAX_SIZE_MB * 1024 * 1024,
+                block_size=IGV_BLOCK_CACHE_BLOCK_SIZE,
+            )
+        return _block_cache
 
 
 def _get_gs_rest_api_headers(range_header, gs_path, user=None):
@@ -220,7 +346,7 @@ def _get_gs_rest_api_headers(range_header, gs_path, user=None):
 
 
 def _get_token_expiry(token):
-    response = requests.post('https://www.googleapis.com/oauth2/v1/tokeninfo',
+    response = _session.post('https://www.googleapis.com/oauth2/v1/tokeninfo',
                              headers={'Content-Type': 'application/x-www-form-urlencoded'},
                              data='access_token={}'.format(token), timeout=30)
     if response.status_code == 200:
@@ -230,32 +356,118 @@ def _get_token_expiry(token):
         return 0
 
 
+_access_token_cache = {}
+_access_token_lock = Lock()
+
+
+def _is_valid_access_token(cached_token):
+    return isinstance(cached_token, dict) and cached_token.get('expiresAt', 0) - TOKEN_EXPIRY_BUFFER > time.time()
+
+
 def _get_access_token(user):
-    access_token = safe_redis_get_json(GS_STORAGE_ACCESS_CACHE_KEY)
-    if not access_token:
-        process = run_command('gcloud auth print-access-token', user=user)
-        if process.wait() == 0:
-            access_token = next(process.stdout).decode('utf-8').strip()
-            expires_in = _get_token_expiry(access_token)
-            safe_redis_set_json(GS_STORAGE_ACCESS_CACHE_KEY, access_token, expire=expires_in-5)
-    return access_token
+    # The token is cached in memory until it expires, so most requests do not need to check redis or refresh it. The
+    # lock only guards the in-memory cache, so requests with a valid token are never blocked on a slow refresh
+    with _access_token_lock:
+        if _is_valid_access_token(_access_token_cache):
+            return _access_token_cache['accessToken']
+
+    cached_token = safe_redis_get_json(GS_STORAGE_ACCESS_CACHE_KEY)
+    if not _is_valid_access_token(cached_token):
+        cached_token = _refresh_access_token(user)
+
+    with _access_token_lock:
+        _access_token_cache.clear()
+        if cached_token:
+            _access_token_cache.update(cached_token)
+    return cached_token and cached_token['accessToken']
+
+
+def _refresh_access_token(user):
+    process = run_command('gcloud auth print-access-token', user=user)
+    if process.wait() != 0:
+        return None
+
+    access_token = next(process.stdout).decode('utf-8').strip()
+    expires_in = _get_token_expiry(access_token)
+    cached_token = {'accessToken': access_token, 'expiresAt': time.time() + expires_in}
+    if expires_in > TOKEN_EXPIRY_BUFFER:
+        safe_redis_set_json(GS_STORAGE_ACCESS_CACHE_KEY, cached_token, expire=expires_in - TOKEN_EXPIRY_BUFFER)
+    return cached_token
 
 
 def _stream_file(request, path):
-    # based on https://gist.github.com/dcwatson/cb5d8157a8fa5a4a046e
-    content_type = 'application/octet-stream'
-    range_header = request.META.get('HTTP_RANGE', None)
-    if range_header:
-        range_match = re.compile(r'bytes\s*=\s*(\d+)\s*-\s*(\d*)', re.I).match(range_header)
-        first_byte, last_byte = range_match.groups()
-        first_byte = int(first_byte) if first_byte else 0
-        last_byte = int(last_byte)
-        length = last_byte - first_byte + 1
+    if not does_file_exist(path, user=request.user):
+        error = f'Could not access file {path}'
+        return create_json_response({'error': error}, status=404, reason=error)
+
+    file_size = os.path.getsize(path)
+    byte_ranges = _parse_byte_ranges(request.META.get('HTTP_RANGE'), file_size)
+    if byte_ranges == []:
+        resp = HttpResponse(status=416)
+        resp['Content-Range'] = f'bytes */{file_size}'
+    elif not byte_ranges:
+        resp = StreamingHttpResponse(local_file_range_iter(path, 0, file_size - 1), content_type=STREAM_CONTENT_TYPE)
+        resp['Content-Length'] = str(file_size)
+    elif len(byte_ranges) == 1:
+        first_byte, last_byte = byte_ranges[0]
         resp = StreamingHttpResponse(
-            file_iter(path, byte_range=(first_byte, last_byte), raw_content=True, user=request.user), status=206, content_type=content_type)
-        resp['Content-Length'] = str(length)
-        resp['Content-Range'] = 'bytes %s-%s' % (first_byte, last_byte)
+            local_file_range_iter(path, first_byte, last_byte), status=206, content_type=STREAM_CONTENT_TYPE)
+        resp['Content-Length'] = str(last_byte - first_byte + 1)
+        resp['Content-Range'] = f'bytes {first_byte}-{last_byte}/{file_size}'
     else:
-        resp = StreamingHttpResponse(file_iter(path, raw_content=True, user=request.user), content_type=content_type)
+        boundary = uuid.uuid4().hex
+        part_headers = [
+            f'--{boundary}\r\nContent-Type: {STREAM_CONTENT_TYPE}\r\n'
+            f'Content-Range: bytes {first_byte}-{last_byte}/{file_size}\r\n\r\n'.encode()
+            for first_byte, last_byte in byte_ranges
+        ]
+        end_boundary = f'--{boundary}--\r\n'.encode()
+        resp = StreamingHttpResponse(
+            _multipart_byte_ranges_iter(path, byte_ranges, part_headers, end_boundary), status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}')
+        resp['Content-Length'] = str(sum(
+            len(header) + last_byte - first_byte + 1 + 2 for header, (first_byte, last_byte) in zip(part_headers, byte_ranges)
+        ) + len(end_boundary))
     resp['Accept-Ranges'] = 'bytes'
     return resp
+
+
+def _parse_byte_ranges(range_header, file_size):
+    """
+    Parses the requested byte ranges, bounded by the file size
+    Returns:
+        A list of inclusive (first byte, last byte) tuples, an empty list if no requested range is satisfiable, or None
+        if there is no valid range header and the whole file should be returned
+    """
+    range_match = re.fullmatch(r'\s*bytes\s*=(.*)', range_header or '', re.I)
+    if not range_match:
+        return None
+    byte_ranges = []
+    for range_spec in range_match.group(1).split(','):
+        spec_match = re.fullmatch(r'\s*(\d*)\s*-\s*(\d*)\s*', range_spec)
+        if not spec_match:
+            return None
+        first_byte, last_byte = spec_match.groups()
+        if first_byte:
+            first_byte = int(first_byte)
+            last_byte = min(int(last_byte), file_size - 1) if last_byte else file_size - 1
+        elif last_byte:
+            # suffix ranges request the last N bytes of the file
+            first_byte = max(file_size - int(last_byte), 0)
+            last_byte = file_size - 1
+        else:
+            return None
+        if first_byte > last_byte and first_byte >= file_size:
+            continue
+        if first_byte > last_byte:
+            return None
+        byte_ranges.append((first_byte, last_byte))
+    return byte_ranges
+
+
+def _multipart_byte_ranges_iter(path, byte_ranges, part_headers, end_boundary):
+    for header, (first_byte, last_byte) in zip(part_headers, byte_ranges):
+        yield header
+        yield from local_file_range_iter(path, first_byte, last_byte)
+        yield b'\r\n'
+    yield end_boundary
@@ -1,13 +1,17 @@
 import json
 import mock
+import os
+import re
 import responses
 import subprocess # nosec
+import tempfile
+import time
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls.base import reverse
 from seqr.views.apis.igv_api import fetch_igv_track, receive_igv_table_handler, update_individual_igv_sample, \
     receive_bulk_igv_table_handler
-from seqr.views.apis.igv_api import GS_STORAGE_ACCESS_CACHE_KEY
+from seqr.views.apis.igv_api import GS_STORAGE_ACCESS_CACHE_KEY, _access_token_cache
 from seqr.views.utils.test_utils import AnvilAuthenticationTestCase
 
 STREAMING_READS_CONTENT = [b'CRAM\x03\x83', b'\\\t\xfb\xa3\xf7%\x01', b'[\xfc\xc9\t\xae']
@@ -20,6 +24,7 @@ class IgvAPITest(AnvilAuthenticationTestCase):
     fixtures = ['users', 'social_auth', '1kg_project']
 
     @responses.activate
+    @mock.patch.dict('seqr.views.apis.igv_api._access_token_cache', clear=True)
     @mock.patch('seqr.utils.file_utils.logger')
     @mock.patch('seqr.views.apis.igv_api.safe_redis_get_json')
     @mock.patch('seqr.views.apis.igv_api.safe_redis_set_json')
@@ -48,7 +53,8 @@ class IgvAPITest(AnvilAuthenticationTestCase):
         self.assertEqual(responses.calls[1].request.headers.get('Authorization'), 'Bearer token1')
         self.assertEqual(responses.calls[1].request.headers.get('x-goog-user-project'), 'anvil-datastorage')
         mock_get_redis.assert_called_with(GS_STORAGE_ACCESS_CACHE_KEY)
-        mock_set_redis.assert_called_with(GS_STORAGE_ACCESS_CACHE_KEY, 'token1', expire=3594)
+        mock_set_redis.assert_called_with(
+            GS_STORAGE_ACCESS_CACHE_KEY, {'accessToken': 'token1', 'expiresAt': mock.ANY}, expire=3594)
         mock_subprocess.assert_has_calls([
             mock.call('gsutil -u anvil-datastorage ls gs://fc-secure-project_A/sample_1.bam.bai', stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True),  # nosec
             mock.call('gcloud auth print-access-token', stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True),  # nosec
@@ -58,8 +64,8 @@ class IgvAPITest(AnvilAuthenticationTestCase):
         mock_file_logger.warning.assert_any_call(
             'CommandException: One or more URLs matched no objects.', self.collaborator_user)
 
+        # the token is cached in memory until it expires
         mock_get_redis.reset_mock()
-        mock_get_redis.return_value = 'token3'
         mock_set_redis.reset_mock()
         mock_subprocess.reset_mock()
         responses.add(responses.GET, 'https://storage.googleapis.com/project_A/sample_1.bed.gz',
@@ -69,34 +75,196 @@ class IgvAPITest(AnvilAuthenticationTestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertIsNone(responses.calls[2].request.headers.get('Range'))
-        self.assertEqual(responses.calls[2].request.headers.get('Authorization'), 'Bearer token3')
+        self.assertEqual(responses.calls[2].request.headers.get('Authorization'), 'Bearer token1')
         self.assertIsNone(responses.calls[2].request.headers.get('x-goog-user-project'))
+        mock_get_redis.assert_not_called()
+        mock_set_redis.assert_not_called()
+        mock_subprocess.assert_not_called()
+
+        # once the in-memory token expires, a token cached in redis by another process is used
+        _access_token_cache['expiresAt'] = time.time()
+        mock_get_redis.return_value = {'accessToken': 'token3', 'expiresAt': time.time() + 100}
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(responses.calls[3].request.headers.get('Authorization'), 'Bearer token3')
         mock_get_redis.assert_called_with(GS_STORAGE_ACCESS_CACHE_KEY)
         mock_set_redis.assert_not_called()
         mock_subprocess.assert_not_called()
 
-    @mock.patch('seqr.utils.file_utils.os.path.isfile')
-    @mock.patch('seqr.utils.file_utils.open')
-    def test_proxy_local_to_igv(self, mock_open, mock_isfile, mock_subprocess):
-        mock_isfile.side_effect = [False, True, False, True]
-        mock_subprocess.return_value.stdout = STREAMING_READS_CONTENT
-        mock_open.return_value.__enter__.return_value.__iter__.return_value = STREAMING_READS_CONTENT
+    @responses.activate
+    @mock.patch('seqr.views.apis.igv_api._block_cache', None)
+    @mock.patch.dict('seqr.views.apis.igv_api._gs_generation_cache', clear=True)
+    @mock.patch('seqr.views.apis.igv_api.IGV_BLOCK_CACHE_BLOCK_SIZE', 100)
+    @mock.patch('seqr.views.apis.igv_api._get_access_token', lambda user: 'token1')
+    def test_proxy_google_to_igv_block_cache(self, mock_subprocess):
+        file_content = b''.join(STREAMING_READS_CONTENT) * 20
+        current_generation = {'generation': '1'}
+
+        def _serve_range(request):
+            if request.headers['x-goog-if-generation-match'] != current_generation['generation']:
+                return 412, {}, b'Precondition Failed'
+            first_byte, last_byte = re.fullmatch(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()
+            if int(first_byte) >= len(file_content):
+                return 416, {}, b''
+            last_byte = min(int(last_byte), len(file_content) - 1)
+            headers = {'Content-Range': f'bytes {first_byte}-{last_byte}/{len(file_content)}'}
+            return 206, headers, file_content[int(first_byte):last_byte + 1]
+
+        responses.add_callback(
+            responses.GET, 'https://storage.googleapis.com/fc-secure-project_A/sample_1.bam', callback=_serve_range)
+        responses.add_callback(
+            responses.GET, 'https://storage.googleapis.com/fc-secure-project_A/sample_1.bai', callback=_serve_range)
+        for file_name in ['sample_1.bam', 'sample_1.bai']:
+            responses.add(
+                responses.HEAD, f'https://storage.googleapis.com/fc-secure-project_A/{file_name}',
+                headers={'x-goog-generation': '1'})
+        responses.add(
+            responses.HEAD, 'https://storage.googleapis.com/fc-secure-project_A/sample_2.bam', status=403,
+            body=b'Forbidden')
+
+        def _get_calls():
+            return [call for call in responses.calls if call.request.method == 'GET']
+
+        def _head_calls():
+            return [call.request.url for call in responses.calls if call.request.method == 'HEAD']
+
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch('seqr.views.apis.igv_api.IGV_BLOCK_CACHE_DIR', temp_dir):
+            url = reverse(fetch_igv_track, args=[PROJECT_GUID, 'gs://fc-secure-project_A/sample_1.bam'])
+            self.check_collaborator_login(url)
+            response = self.client.get(url, HTTP_RANGE='bytes=150-250')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), file_content[150:251])
+            self.assertEqual(response['Content-Length'], '101')
+            self.assertEqual(response['Content-Range'], 'bytes 150-250/360')
+            self.assertListEqual([call.request.headers['Range'] for call in _get_calls()], [
+                'bytes=100-199', 'bytes=200-299',
+            ])
+            self.assertEqual(_get_calls()[0].request.headers['Authorization'], 'Bearer token1')
+            self.assertEqual(_get_calls()[0].request.headers['x-goog-user-project'], 'anvil-datastorage')
+            self.assertEqual(_get_calls()[0].request.headers['x-goog-if-generation-match'], '1')
+            self.assertEqual(responses.calls[0].request.method, 'HEAD')
+            self.assertEqual(responses.calls[0].request.headers['Authorization'], 'Bearer token1')
+
+            # cached blocks are not re-fetched, and open-ended ranges are bounded by the file size
+            response = self.client.get(url, HTTP_RANGE='bytes=120-')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), file_content[120:])
+            self.assertEqual(response['Content-Range'], 'bytes 120-359/360')
+            self.assertEqual(len(_get_calls()), 3)
+            self.assertEqual(_get_calls()[2].request.headers['Range'], 'bytes=300-399')
+            # the file generation is cached, so is only looked up once
+            self.assertListEqual(_head_calls(), ['https://storage.googleapis.com/fc-secure-project_A/sample_1.bam'])
+
+            # index files are cached even when requested without a range
+            url = reverse(fetch_igv_track, args=[PROJECT_GUID, 'gs://fc-secure-project_A/sample_1.bai'])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), file_content)
+            self.assertEqual(response['Content-Length'], '360')
+            self.assertEqual(len(_get_calls()), 7)
+            response = self.client.get(url)
+            self.assertEqual(b''.join(response.streaming_content), file_content)
+            self.assertEqual(len(_get_calls()), 7)
+
+            self.assertEqual(len(_head_calls()), 2)
+
+            # overwritten files have a new generation, so their blocks are re-fetched once the cached generation expires
+            current_generation['generation'] = '2'
+            for file_name in ['sample_1.bam', 'sample_1.bai']:
+                responses.replace(
+                    responses.HEAD, f'https://storage.googleapis.com/fc-secure-project_A/{file_name}',
+                    headers={'x-goog-generation': '2'})
+            response = self.client.get(url, HTTP_RANGE='bytes=0-10')
+            self.assertEqual(b''.join(response.streaming_content), file_content[:11])
+            self.assertEqual(len(_get_calls()), 7)
+            self.assertEqual(len(_head_calls()), 2)
+            with mock.patch('seqr.views.apis.igv_api.time.time', return_value=time.time() + 61):
+                response = self.client.get(url, HTTP_RANGE='bytes=0-10')
+            self.assertEqual(b''.join(response.streaming_content), file_content[:11])
+            self.assertEqual(len(_get_calls()), 8)
+            self.assertEqual(_get_calls()[7].request.headers['x-goog-if-generation-match'], '2')
+            self.assertEqual(len(_head_calls()), 3)
+
+            # blocks fetched with an outdated cached generation are re-fetched with the current generation
+            bam_url = reverse(fetch_igv_track, args=[PROJECT_GUID, 'gs://fc-secure-project_A/sample_1.bam'])
+            response = self.client.get(bam_url, HTTP_RANGE='bytes=0-10')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), file_content[:11])
+            self.assertListEqual(
+                [call.request.headers['x-goog-if-generation-match'] for call in _get_calls()[8:]], ['1', '2'],
+            )
+            self.assertListEqual(
+                _head_calls()[3:], ['https://storage.googleapis.com/fc-secure-project_A/sample_1.bam'],
+            )
+
+            # unsatisfiable ranges and upstream errors are returned as is
+            response = self.client.get(url, HTTP_RANGE='bytes=400-500')
+            self.assertEqual(response.status_code, 416)
+            url = reverse(fetch_igv_track, args=[PROJECT_GUID, 'gs://fc-secure-project_A/sample_2.bam'])
+            response = self.client.get(url, HTTP_RANGE='bytes=0-100')
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.content, b'Forbidden')
 
-        url = reverse(fetch_igv_track, args=[PROJECT_GUID, '/project_A/sample_1.bam.bai'])
-        self.check_collaborator_login(url)
-        response = self.client.get(url, HTTP_RANGE='bytes=100-250')
-        self.assertEqual(response.status_code, 206)
-        self.assertListEqual([val for val in response.streaming_content], STREAMING_READS_CONTENT)
-        mock_subprocess.assert_called_with(
-            'dd skip=100 count=151 bs=1 if=/project_A/sample_1.bai status="none"',
-            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True)  # nosec
-        mock_open.assert_not_called()
+        mock_subprocess.assert_not_called()
 
-        # test no byte range
-        response = self.client.get(url)
-        self.assertEqual(response.status_code, 200)
-        self.assertListEqual([val for val in response.streaming_content], STREAMING_READS_CONTENT)
-        mock_open.assert_called_with('/project_A/sample_1.bai', 'rb')
+    def test_proxy_local_to_igv(self, mock_subprocess):
+        file_content = b''.join(STREAMING_READS_CONTENT) * 20
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, 'sample_1.bai'), 'wb') as f:
+                f.write(file_content)
+
+            url = reverse(fetch_igv_track, args=[PROJECT_GUID, f'{temp_dir}/sample_1.bam.bai'])
+            self.check_collaborator_login(url)
+            response = self.client.get(url, HTTP_RANGE='bytes=100-250')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), file_content[100:251])
+            self.assertEqual(response['Content-Length'], '151')
+            self.assertEqual(response['Content-Range'], 'bytes 100-250/360')
+            self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+            # test open ended and suffix byte ranges
+            response = self.client.get(url, HTTP_RANGE='bytes=300-')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), file_content[300:])
+            self.assertEqual(response['Content-Range'], 'bytes 300-359/360')
+
+            response = self.client.get(url, HTTP_RANGE='bytes=-10')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), file_content[-10:])
+            self.assertEqual(response['Content-Range'], 'bytes 350-359/360')
+
+            # test multiple byte ranges
+            response = self.client.get(url, HTTP_RANGE='bytes=0-9, 350-400, 500-600')
+            self.assertEqual(response.status_code, 206)
+            content_type, boundary = response['Content-Type'].split('; boundary=')
+            self.assertEqual(content_type, 'multipart/byteranges')
+            content = b''.join(response.streaming_content)
+            self.assertEqual(response['Content-Length'], str(len(content)))
+            self.assertEqual(content, (
+                f'--{boundary}\r\nContent-Type: application/octet-stream\r\nContent-Range: bytes 0-9/360\r\n\r\n'.encode()
+                + file_content[:10] +
+                f'\r\n--{boundary}\r\nContent-Type: application/octet-stream\r\nContent-Range: bytes 350-359/360\r\n\r\n'.encode()
+                + file_content[350:] + f'\r\n--{boundary}--\r\n'.encode()
+            ))
+
+            # test unsatisfiable byte range
+            response = self.client.get(url, HTTP_RANGE='bytes=500-600')
+            self.assertEqual(response.status_code, 416)
+            self.assertEqual(response['Content-Range'], 'bytes */360')
+
+            # test no or invalid byte range
+            for range_header in [{}, {'HTTP_RANGE': 'bytes=abc'}]:
+                response = self.client.get(url, **range_header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b''.join(response.streaming_content), file_content)
+                self.assertEqual(response['Content-Length'], '360')
+
+            mock_subprocess.assert_not_called()
+
+            url = reverse(fetch_igv_track, args=[PROJECT_GUID, f'{temp_dir}/sample_2.bam'])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json()['error'], f'Could not access file {temp_dir}/sample_2.bam')
 
     def test_receive_alignment_table_handler(self, mock_subprocess):
         mock_subprocess.return_value.wait.return_value = 0
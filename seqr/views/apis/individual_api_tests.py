@@ -570,6 +570,7 @@ class IndividualAPITest(object):
         self.assertTrue('F000004_4' in response_json['familiesByGuid'])
         new_family_guid = next(guid for guid in response_json['familiesByGuid'].keys() if guid != 'F000001_1' and guid != 'F000004_4')
         self.assertEqual(response_json['familiesByGuid'][new_family_guid]['familyId'], '21')
+        self.assertRegex(new_family_guid, r'^F\d+_21$')
         self.assertIsNone(response_json['familiesByGuid']['F000001_1']['pedigreeImage'])
 
         self.assertEqual(len(response_json['familyNotesByGuid']), 1)
@@ -590,6 +591,8 @@ class IndividualAPITest(object):
             response_json['individualsByGuid']['I000001_na19675']['notes'], 'A affected individual, test1-zsf')
         self.assertEqual(response_json['individualsByGuid']['I000002_na19678']['sex'], 'XXY')
         self.assertEqual(response_json['individualsByGuid'][new_indiv_guid]['individualId'], 'HG00735')
+        self.assertRegex(new_indiv_guid, r'^I\d+_hg00735$')
+        self.assertEqual(int(new_indiv_guid[1:].split('_')[0]), Individual.objects.get(guid=new_indiv_guid).id)
         self.assertEqual(response_json['individualsByGuid'][new_indiv_guid]['sex'], 'F')
         self.assertEqual(response_json['individualsByGuid']['I000008_na20872']['individualId'], 'NA20872_update')
 
@@ -85,7 +85,7 @@ def create_locus_list_handler(request):
     if not request_json.get('name'):
         return create_json_response({}, status=400, reason='"Name" is required')
 
-    genes_by_id, intervals, invalid_items = parse_locus_list_items(request_json)
+    genes_by_id, intervals, invalid_items = parse_locus_list_items(request_json, match_gene_aliases=True)
     if invalid_items and not request_json.get('ignoreInvalidItems'):
         return create_json_response({'invalidLocusListItems': invalid_items}, status=400, reason=INVALID_ITEMS_ERROR)
 
@@ -112,7 +112,7 @@ def update_locus_list_handler(request, locus_list_guid):
 
     request_json = json.loads(request.body)
 
-    genes_by_id, intervals, invalid_items = parse_locus_list_items(request_json)
+    genes_by_id, intervals, invalid_items = parse_locus_list_items(request_json, match_gene_aliases=True)
     if invalid_items and not request_json.get('ignoreInvalidItems'):
         return create_json_response({'invalidLocusListItems': invalid_items}, status=400, reason=INVALID_ITEMS_ERROR)
 
@@ -13,11 +13,9 @@ from notifications.models import Notification
 
 from matchmaker.models import MatchmakerSubmission
 from seqr.models import Project, Family, Individual, Sample, RnaSample, FamilyNote, PhenotypePrioritization, CAN_EDIT
-from seqr.utils.file_utils import file_iter
 from seqr.utils.logging_utils import SeqrLogger
 from seqr.views.utils.airtable_utils import AirtableSession, ANVIL_REQUEST_TRACKING_TABLE
-from seqr.views.utils.dataset_utils import post_process_rna_data, load_rna_seq, RNA_DATA_TYPE_CONFIGS
-from seqr.views.utils.file_utils import get_temp_file_path
+from seqr.views.utils.dataset_utils import load_rna_seq, load_rna_seq_samples
 from seqr.views.utils.individual_utils import delete_individuals
 from seqr.views.utils.json_utils import create_json_response, _to_snake_case, _to_camel_case
 from seqr.views.utils.json_to_orm_utils import update_project_from_json, create_model_from_json, update_model_from_json
@@ -29,7 +27,7 @@ from seqr.views.utils.permissions_utils import get_project_and_check_permissions
     check_user_created_object_permissions, pm_required, user_is_pm, login_and_policies_required, \
     has_workspace_perm, has_case_review_permissions, is_internal_anvil_project, get_project_and_check_pm_permissions, \
     check_project_pm_permission, user_is_data_manager, external_anvil_project_can_edit
-from seqr.views.utils.project_context_utils import families_discovery_tags, \
+from seqr.views.utils.project_context_utils import families_discovery_tags, get_cached_project_context, \
     add_project_tag_type_counts, get_project_analysis_groups, get_project_locus_lists
 from seqr.views.utils.terra_api_utils import is_anvil_authenticated, anvil_enabled
 from settings import BASE_URL
@@ -220,7 +218,12 @@ def _get_formatted_value(value, config, *args):
 @login_and_policies_required
 def project_families(request, project_guid):
     project = get_project_and_check_permissions(project_guid, request.user)
+    response = get_cached_project_context(project, 'project_families', lambda: _get_project_families_context(project))
+    return create_json_response(response)
+
 
+def _get_project_families_context(project):
+    project_guid = project.guid
     family_models = Family.objects.filter(project=project)
     families = family_models.values(
         'id', 'description',
@@ -257,8 +260,7 @@ def project_families(request, project_guid):
             **{key: family_id in data_families for key, data_families in has_data_families.items()},
         })
 
-    response = families_discovery_tags(families, genome_version=project.genome_version, project=project)
-    return create_json_response(response)
+    return families_discovery_tags(families, genome_version=project.genome_version, project=project)
 
 
 @login_and_policies_required
@@ -491,22 +493,37 @@ def load_rna_seq_sample_data(request, sample_guid):
     logger.info(f'Loading outlier data for {sample.individual.individual_id}', request.user)
 
     request_json = json.loads(request.body)
-    file_name = request_json['fileName']
-    data_type = request_json['dataType']
-    config = RNA_DATA_TYPE_CONFIGS[data_type]
-
-    file_path = get_temp_file_path(f'{file_name}/{sample_guid}.json.gz')
-    try:
-        data_rows = [json.loads(line) for line in file_iter(file_path, user=request.user)]
-        data_rows, error = post_process_rna_data(sample_guid, data_rows, **config.get('post_process_kwargs', {}))
-    except FileNotFoundError:
-        logger.error(f'No saved temp data found for {sample_guid} with file prefix {file_name}', request.user)
-        error = 'Data for this sample was not properly parsed. Please re-upload the data'
-    if error:
-        return create_json_response({'error': error}, status=400)
-
-    model_cls = config['model_class']
-    model_cls.bulk_create(request.user, [model_cls(sample=sample, **data) for data in data_rows], batch_size=1000)
-    update_model_from_json(sample, {'is_active': True}, user=request.user)
-
-    return create_json_response({'success': True})
\ No newline at end of file
+    errors = load_rna_seq_samples([sample], request_json['fileName'], request_json['dataType'], request.user)
+    if errors:
+        return create_json_response({'error': errors[sample_guid]}, status=400)
+
+    return create_json_response({'success': True})
+
+
+@login_and_policies_required
+def load_rna_seq_samples_data(request):
+    request_json = json.loads(request.body)
+    sample_guids = set(request_json['sampleGuids'])
+    samples = RnaSample.objects.filter(guid__in=sample_guids).select_related('individual__family__project').order_by('guid')
+    missing_guids = sample_guids - {sample.guid for sample in samples}
+    if missing_guids:
+        return create_json_response(
+            {'error': f'Invalid RNA sample guids: {", ".join(sorted(missing_guids))}'}, status=400,
+        )
+
+    for project in {sample.individual.family.project for sample in samples}:
+        check_project_pm_permission(
+            project, request.user, override_permission_func=is_data_manager_or_external_anvil_edit,
+        )
+
+    for sample in samples:
+        logger.info(f'Loading outlier data for {sample.individual.individual_id}', request.user)
+
+    errors = load_rna_seq_samples(samples, request_json['fileName'], request_json['dataType'], request.user)
+    num_loaded = len(samples) - len(errors)
+    logger.info(f'Loaded data for {num_loaded} of {len(samples)} RNA-seq samples', request.user)
+
+    return create_json_response({
+        'numLoaded': num_loaded,
+        'warnings': [f'Error loading {sample_guid}: {error}' for sample_guid, error in sorted(errors.items())],
+    })
@@ -7,13 +7,13 @@ from django.db import connections
 from django.urls.base import reverse
 import responses
 
-from seqr.models import Project, RnaSeqTpm, RnaSeqSpliceOutlier, RnaSeqOutlier, RnaSample, Family
+from seqr.models import Project, ProjectStats, RnaSeqTpm, RnaSeqSpliceOutlier, RnaSeqOutlier, RnaSample, Family
 from seqr.utils.communication_utils import _set_bulk_notification_stream
 from seqr.views.apis.project_api import create_project_handler, delete_project_handler, update_project_handler, \
     project_page_data, project_families, project_overview, project_mme_submisssions, project_individuals, \
     project_analysis_groups, update_project_workspace, project_family_notes, project_collaborators, project_locus_lists, \
     project_samples, project_notifications, mark_read_project_notifications, subscribe_project_notifications, \
-    update_project_rna_seq, load_rna_seq_sample_data
+    update_project_rna_seq, load_rna_seq_sample_data, load_rna_seq_samples_data
 from seqr.views.apis.data_manager_api_tests import RNA_OUTLIER_SAMPLE_DATA, RNA_OUTLIER_MUSCLE_SAMPLE_GUID, RNA_TPM_SAMPLE_DATA, \
     RNA_TPM_MUSCLE_SAMPLE_GUID, RNA_SPLICE_SAMPLE_DATA, RNA_SPLICE_SAMPLE_GUID, PLACEHOLDER_GUID, \
     RNA_SPLICE_OUTLIER_REQUIRED_COLUMNS,RNA_OUTLIER_REQUIRED_COLUMNS, RNA_TPM_REQUIRED_COLUMNS
@@ -156,6 +156,9 @@ class ProjectAPITest(object):
             'vlm_contact_email': 'vlm@broadinstitute.org',
         })
         self._check_created_project_groups(new_project)
+        stats = ProjectStats.objects.get(project=new_project)
+        self.assertEqual(stats.num_families, 0)
+        self.assertDictEqual(stats.sample_type_counts, {})
 
         project_guid = new_project.guid
         self.assertSetEqual(set(response.json()['projectsByGuid'].keys()), {project_guid})
@@ -813,6 +816,7 @@ class ProjectAPITest(object):
         response_json = response.json()
         self.assertDictEqual(response_json, {
             'info': info, 'warnings': warnings or [], 'sampleGuids': mock.ANY, 'fileName': file_path,
+            'sampleGuidBatches': [response_json['sampleGuids']],
         })
 
         # test database models are correct
@@ -931,6 +935,69 @@ class ProjectAPITest(object):
             'counts', 'rare_disease_samples_with_this_junction', 'rare_disease_samples_total',
         )))
 
+    @mock.patch('seqr.views.utils.dataset_utils.file_iter')
+    def test_load_rna_seq_samples_data(self, mock_file_iter):
+        url = reverse(load_rna_seq_samples_data)
+        self.check_require_login(url)
+
+        tpm_sample_guid = 'RS000161_T_na19675_1'
+        parsed_file_data = {
+            RNA_TPM_MUSCLE_SAMPLE_GUID: RNA_TPM_SAMPLE_DATA[RNA_TPM_MUSCLE_SAMPLE_GUID],
+            tpm_sample_guid: RNA_TPM_SAMPLE_DATA[RNA_TPM_MUSCLE_SAMPLE_GUID] + json.dumps(
+                {'gene_id': 'ENSG00000240361', 'tpm': '0.5'}) + '\n',
+        }
+        mock_file_iter.side_effect = lambda file_path, **kwargs: parsed_file_data[
+            file_path.split('/')[-1].replace('.json.gz', '')].strip().split('\n')
+
+        RnaSeqTpm.objects.all().delete()
+        RnaSample.objects.filter(guid__in=parsed_file_data.keys()).update(is_active=False)
+
+        body = {
+            'fileName': 'rna_sample_data__T__2020-04-15T00:00:00', 'dataType': 'T',
+            'sampleGuids': [RNA_TPM_MUSCLE_SAMPLE_GUID, tpm_sample_guid],
+        }
+        self.login_collaborator()
+        response = self.client.post(url, content_type='application/json', data=json.dumps(body))
+        self.assertEqual(response.status_code, 403)
+
+        self.login_manager()
+        response = self.client.post(url, content_type='application/json', data=json.dumps({
+            **body, 'sampleGuids': [RNA_TPM_MUSCLE_SAMPLE_GUID, 'RS000000_invalid'],
+        }))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid RNA sample guids: RS000000_invalid')
+
+        self.reset_logs()
+        response = self.client.post(url, content_type='application/json', data=json.dumps(body))
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json(), {
+            'numLoaded': 1,
+            'warnings': [f'Error loading {tpm_sample_guid}: Error in T_NA19675_1: mismatched entries for ENSG00000240361'],
+        })
+
+        models = RnaSeqTpm.objects.all()
+        self.assertListEqual(
+            list(models.values_list('sample__guid', 'gene_id', 'tpm')),
+            [(RNA_TPM_MUSCLE_SAMPLE_GUID, 'ENSG00000240361', 7.8), (RNA_TPM_MUSCLE_SAMPLE_GUID, 'ENSG00000233750', 0.0)],
+        )
+        self.assertListEqual(
+            list(RnaSample.objects.filter(guid__in=parsed_file_data.keys()).order_by('guid').values_list('guid', 'is_active')),
+            [(tpm_sample_guid, False), (RNA_TPM_MUSCLE_SAMPLE_GUID, True)],
+        )
+        self.assert_json_logs(self.manager_user, [
+            ('Loading outlier data for NA19675_1', None),
+            ('Loading outlier data for NA19675_1', None),
+            ('create RnaSeqTpms', {'dbUpdate': {
+                'dbEntity': 'RnaSeqTpm', 'numEntities': 2, 'parentEntityIds': [RNA_TPM_MUSCLE_SAMPLE_GUID],
+                'updateType': 'bulk_create',
+            }}),
+            (f'update RnaSample {RNA_TPM_MUSCLE_SAMPLE_GUID}', {'dbUpdate': {
+                'dbEntity': 'RnaSample', 'entityId': RNA_TPM_MUSCLE_SAMPLE_GUID, 'updateFields': ['is_active'],
+                'updateType': 'update',
+            }}),
+            ('Loaded data for 1 of 2 RNA-seq samples', None),
+        ])
+
     @mock.patch('seqr.views.utils.permissions_utils.PM_USER_GROUP')
     @mock.patch('seqr.utils.file_utils.gzip.open')
     @mock.patch('seqr.utils.file_utils.os.path.isfile')
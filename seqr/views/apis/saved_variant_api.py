@@ -310,6 +310,7 @@ def _update_tags(saved_variants, tags_json, user, tag_key='tags', model_cls=Vari
             })
             model = create_model_from_json(model_cls, create_data, user)
             model.saved_variants.set(saved_variants)
+            model_cls.update_project_context_version([model])
 
 
 @login_and_policies_required
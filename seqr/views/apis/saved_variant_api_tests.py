@@ -152,13 +152,20 @@ CREATE_VARIANT_JSON = {
 
 class SavedVariantAPITest(object):
 
+    @mock.patch('seqr.views.utils.variant_utils.logger')
     @mock.patch('seqr.views.utils.variant_utils.OMIM_GENOME_VERSION', '37')
-    def test_saved_variant_data(self):
+    def test_saved_variant_data(self, mock_logger):
         url = reverse(saved_variant_data, args=[PROJECT_GUID])
         self.check_collaborator_login(url)
 
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+        mock_logger.debug.assert_called_once()
+        self.assertRegex(mock_logger.debug.call_args.args[0], r'^Loaded context for 2 variants in \d+ queries \(\d+\.\dms\)$')
+        self.assertSetEqual(set(mock_logger.debug.call_args.kwargs['extra']['detail'].keys()), {
+            'savedVariantsByGuid', 'projects', 'genesById', 'transcriptsById', 'omimIntervals', 'locusListsByGuid',
+            'mmeSubmissionsByGuid', 'geneScores', *self.CONTEXT_DATASETS,
+        })
 
         response_json = response.json()
         self.assertSetEqual(set(response_json.keys()), self.SAVED_VARIANT_RESPONSE_KEYS)
@@ -1050,6 +1057,7 @@ class LocalSavedVariantAPITest(AuthenticationTestCase, SavedVariantAPITest):
 
     SAVED_VARIANT_RESPONSE_KEYS = SAVED_VARIANT_RESPONSE_KEYS
     SAVED_VARIANT_DETAIL_FIELDS = SAVED_VARIANT_DETAIL_FIELDS
+    CONTEXT_DATASETS = set()
 
     def _assert_created_variant(self, saved_variant, variant_json, **kwargs):
         super()._assert_created_variant(saved_variant, variant_json, **kwargs)
@@ -1070,6 +1078,7 @@ class AnvilSavedVariantAPITest(AnvilAuthenticationTestCase, SavedVariantAPITest)
 
     SAVED_VARIANT_RESPONSE_KEYS = {*SAVED_VARIANT_RESPONSE_KEYS, 'totalSampleCounts'}
     SAVED_VARIANT_DETAIL_FIELDS = {*SAVED_VARIANT_DETAIL_FIELDS, 'key', 'mainTranscriptId'}
+    CONTEXT_DATASETS = {'totalSampleCounts'}
 
     def test_saved_variant_data(self, *args):
         super(AnvilSavedVariantAPITest, self).test_saved_variant_data(*args)
@@ -3,15 +3,16 @@ from datetime import datetime
 from django.core.exceptions import PermissionDenied
 from django.core.mail.message import EmailMessage
 from django.contrib.auth.models import User
-from django.db.models import CharField, F, Value
+from django.db.models import CharField, F, Q, Value
 from django.db.models.functions import Coalesce, Concat, JSONObject, NullIf
+import base64
 import json
 
 from matchmaker.matchmaker_utils import get_mme_gene_phenotype_ids_for_submissions, parse_mme_features, \
     get_mme_metrics, get_hpo_terms_by_id
 from matchmaker.models import MatchmakerSubmission
 from reference_data.models import HumanPhenotypeOntology
-from seqr.models import Project, Family, Individual, VariantTagType, SavedVariant, FamilyAnalysedBy, Sample
+from seqr.models import Project, Family, Individual, IndividualHpoTerm, VariantTagType, SavedVariant, FamilyAnalysedBy, Sample
 from seqr.views.utils.airtable_utils import AirtableSession
 from seqr.views.utils.file_utils import load_uploaded_file
 from seqr.utils.communication_utils import safe_post_to_slack, set_email_message_stream
@@ -31,6 +32,16 @@ from settings import SEQR_SLACK_DATA_ALERTS_NOTIFICATION_CHANNEL, VLM_SEND_EMAIL
 logger = SeqrLogger(__name__)
 
 MAX_SAVED_VARIANTS = 10000
+SAVED_VARIANTS_PAGE_SIZE = 100
+MAX_SAVED_VARIANTS_PAGE_SIZE = 1000
+# sort fields must be non-null and end with the id, so they can be used for cursor pagination
+SAVED_VARIANTS_SORTS = {
+    'xpos': ['xpos', 'id'],
+    'family': ['family__guid', 'xpos', 'id'],
+    'recent': ['-id'],
+}
+DEFAULT_SAVED_VARIANTS_SORT = 'xpos'
+SAVED_VARIANTS_PAGE_PARAMS = ['pageSize', 'cursor', 'sort']
 
 
 @login_and_policies_required
@@ -97,6 +108,7 @@ def success_story(request, success_story_types):
 @login_and_policies_required
 def saved_variants_page(request, tag):
     gene = request.GET.get('gene')
+    project_guid = request.GET.get('projectGuid')
     is_all_tags = tag == 'ALL'
     if is_all_tags:
         saved_variant_models = SavedVariant.objects.exclude(varianttag=None)
@@ -110,10 +122,16 @@ def saved_variants_page(request, tag):
             saved_variant_models = saved_variant_models.filter(varianttag__variant_tag_type=tt).distinct()
 
     saved_variant_models = saved_variant_models.filter(family__project__guid__in=get_project_guids_user_can_view(request.user))
+    if project_guid:
+        saved_variant_models = saved_variant_models.filter(family__project__guid=project_guid)
 
     if gene:
         saved_variant_models = saved_variant_models.filter(gene_ids__overlap=[gene])
-    elif saved_variant_models.count() > MAX_SAVED_VARIANTS:
+
+    if any(param in request.GET for param in SAVED_VARIANTS_PAGE_PARAMS):
+        return _get_saved_variants_page_response(request, saved_variant_models)
+
+    if not gene and saved_variant_models.count() > MAX_SAVED_VARIANTS:
         return create_json_response({'error': 'Select a gene to filter variants'}, status=400)
 
     response_json = get_variants_response(
@@ -124,11 +142,73 @@ def saved_variants_page(request, tag):
     return create_json_response(response_json)
 
 
+def _get_saved_variants_page_response(request, saved_variant_models):
+    sort = request.GET.get('sort', DEFAULT_SAVED_VARIANTS_SORT)
+    if sort not in SAVED_VARIANTS_SORTS:
+        return create_json_response({'error': f'Invalid sort: {sort}'}, status=400)
+    try:
+        page_size = int(request.GET.get('pageSize', SAVED_VARIANTS_PAGE_SIZE))
+    except ValueError:
+        page_size = 0
+    if not 0 < page_size <= MAX_SAVED_VARIANTS_PAGE_SIZE:
+        return create_json_response(
+            {'error': f'Page size must be between 1 and {MAX_SAVED_VARIANTS_PAGE_SIZE}'}, status=400)
+
+    sort_fields = SAVED_VARIANTS_SORTS[sort]
+    total_count = saved_variant_models.count()
+    page_models = saved_variant_models.order_by(*sort_fields)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            page_models = page_models.filter(_get_cursor_filter(sort_fields, _decode_cursor(cursor)))
+        except (ValueError, TypeError):
+            return create_json_response({'error': 'Invalid cursor'}, status=400)
+
+    # all sorts end with the id, so the last sort value is the variant id
+    page_values = list(page_models.values_list('guid', *[field.lstrip('-') for field in sort_fields])[:page_size + 1])
+    has_next_page = len(page_values) > page_size
+    page_values = page_values[:page_size]
+
+    response_json = get_variants_response(
+        request, SavedVariant.objects.filter(id__in=[values[-1] for values in page_values]), add_all_context=True,
+        include_igv=False, add_locus_list_detail=True, include_individual_gene_scores=False, include_project_name=True,
+    )
+    response_json['savedVariantsPage'] = {
+        'variantGuids': [values[0] for values in page_values],
+        'totalCount': total_count,
+        'nextCursor': _encode_cursor(page_values[-1][1:]) if has_next_page else None,
+    }
+
+    return create_json_response(response_json)
+
+
+def _encode_cursor(sort_values):
+    return base64.urlsafe_b64encode(json.dumps(list(sort_values)).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+def _get_cursor_filter(sort_fields, sort_values):
+    """Returns a filter for rows after the given sort values, i.e. a lexicographic comparison across the sort fields"""
+    if len(sort_values) != len(sort_fields):
+        raise ValueError('Cursor does not match sort')
+    cursor_filter = Q()
+    prior_fields_equal = {}
+    for field, value in zip(sort_fields, sort_values):
+        field_name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        cursor_filter |= Q(**prior_fields_equal, **{f'{field_name}__{lookup}': value})
+        prior_fields_equal[field_name] = value
+    return cursor_filter
+
+
 @login_and_policies_required
 def hpo_summary_data(request, hpo_id):
     data = Individual.objects.filter(
         family__project__guid__in=get_project_guids_user_can_view(request.user),
-        features__contains=[{'id': hpo_id}],
+        id__in=IndividualHpoTerm.objects.filter(ancestor_hpo_id=hpo_id, observed=True).values('individual_id'),
     ).order_by('id').values(
         'features', individualGuid=F('guid'), displayName=INDIVIDUAL_DISPLAY_NAME_EXPR, familyId=F('family__family_id'),
          familyData=JSONObject(
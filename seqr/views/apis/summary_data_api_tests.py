@@ -8,7 +8,7 @@ import responses
 from seqr.views.apis.summary_data_api import mme_details, success_story, saved_variants_page, hpo_summary_data, \
     bulk_update_family_external_analysis, individual_metadata, send_vlm_email
 from seqr.views.utils.test_utils import AuthenticationTestCase, AnvilAuthenticationTestCase, AirtableTest, PARSED_VARIANTS, SAVED_VARIANT_FIELDS
-from seqr.models import FamilyAnalysedBy, SavedVariant, VariantTag
+from seqr.models import FamilyAnalysedBy, SavedVariant, VariantTag, Individual, IndividualHpoTerm
 from settings import AIRTABLE_URL
 
 
@@ -317,8 +317,8 @@ AIRTABLE_COLLABORATOR_RECORDS = {
 @mock.patch('seqr.views.utils.permissions_utils.safe_redis_get_json', lambda *args: None)
 class SummaryDataAPITest(AirtableTest):
 
-    @mock.patch('matchmaker.matchmaker_utils.datetime')
-    def test_mme_details(self, mock_datetime):
+    @mock.patch('matchmaker.matchmaker_utils.timezone')
+    def test_mme_details(self, mock_timezone):
         url = reverse(mme_details)
         self.check_require_login(url)
         response = self.client.get(url)
@@ -341,7 +341,7 @@ class SummaryDataAPITest(AirtableTest):
 
         # Test analyst behavior
         self.login_analyst_user()
-        mock_datetime.now.return_value = datetime(2020, 4, 27, 20, 16, 1)
+        mock_timezone.now.return_value = datetime(2020, 4, 27, 20, 16, 1)
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         response_json = response.json()
@@ -445,7 +445,69 @@ class SummaryDataAPITest(AirtableTest):
         self.assertEqual(response.status_code, 200)
         self.assertSetEqual(set(response.json()['savedVariantsByGuid'].keys()), {'SV0000001_2103343353_r0390_100'})
 
+        # Test pagination
+        response = self.client.get(f'{all_tag_url}?pageSize=2')
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertIn('projectsByGuid', response_json)
+        self.assertDictEqual(response_json['savedVariantsPage'], {
+            'variantGuids': ['SV0000002_1248367227_r0390_100', 'SV0000006_1248367227_r0003_tes'],
+            'totalCount': 7,
+            'nextCursor': 'WzEyNDgzNjcyMjcsIDZd',
+        })
+        self.assertSetEqual(set(response_json['savedVariantsByGuid'].keys()), {
+            'SV0000002_1248367227_r0390_100', 'SV0000006_1248367227_r0003_tes',
+        })
+
+        response = self.client.get(f'{all_tag_url}?pageSize=2&cursor=WzEyNDgzNjcyMjcsIDZd')
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertDictEqual(response_json['savedVariantsPage'], {
+            'variantGuids': ['SV0000007_prefix_19107_DEL_r00', 'SV0027168_191912632_r0384_rare'],
+            'totalCount': 7,
+            'nextCursor': 'WzE5MDAxOTEyNjMyLCAxMV0=',
+        })
+        self.assertSetEqual(set(response_json['savedVariantsByGuid'].keys()), {
+            'SV0000007_prefix_19107_DEL_r00', 'SV0027168_191912632_r0384_rare',
+        })
+
+        response = self.client.get(
+            f'{all_tag_url}?pageSize=3&sort=family&projectGuid={PROJECT_GUID}&gene=ENSG00000135953')
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json()['savedVariantsPage'], {
+            'variantGuids': [
+                'SV0000001_2103343353_r0390_100', 'SV0000002_1248367227_r0390_100', 'SV0027168_191912632_r0384_rare',
+            ],
+            'totalCount': 4,
+            'nextCursor': 'WyJGMDAwMDAyXzIiLCAxOTAwMTkxMjYzMiwgMTFd',
+        })
+
+        response = self.client.get(f'{all_tag_url}?sort=family&cursor=WyJGMDAwMDAyXzIiLCAxOTAwMTkxMjYzMiwgMTFd')
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json()['savedVariantsPage'], {
+            'variantGuids': [
+                'SV0027167_191912633_r0384_rare', 'SV0027166_191912634_r0384_rare', 'SV0000006_1248367227_r0003_tes',
+                'SV0000007_prefix_19107_DEL_r00',
+            ],
+            'totalCount': 7,
+            'nextCursor': None,
+        })
+
+        response = self.client.get(f'{all_tag_url}?sort=recent&cursor=WyJGMDAwMDAyXzIiLCAxOTAwMTkxMjYzMiwgMTFd')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+        response = self.client.get(f'{all_tag_url}?sort=gene')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid sort: gene')
+
+        response = self.client.get(f'{all_tag_url}?pageSize=5000')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Page size must be between 1 and 1000')
+
     def test_hpo_summary_data(self):
+        IndividualHpoTerm.update_terms(Individual.objects.values_list('id', flat=True))
+
         url = reverse(hpo_summary_data, args=['HP:0002011'])
         self.check_require_login(url)
 
@@ -499,6 +561,27 @@ class SummaryDataAPITest(AirtableTest):
             },
         ])
 
+        # Searching a term returns individuals with any of its descendant terms
+        response = self.client.get(reverse(hpo_summary_data, args=['HP:0008800']))
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual([individual['individualGuid'] for individual in response.json()['data']], [
+            'I000001_na19675', 'I000004_hg00731', 'I000015_na20885', 'I000017_na20889', 'I000020_na20870',
+        ])
+
+        # Absent features are not returned
+        response = self.client.get(reverse(hpo_summary_data, args=['HP:0002017']))
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json(), {'data': []})
+
+        # Index is updated when individual features change
+        individual = Individual.objects.get(guid='I000004_hg00731')
+        individual.features = [{'id': 'HP:0001252'}]
+        individual.save()
+        response = self.client.get(url)
+        self.assertListEqual([individual['individualGuid'] for individual in response.json()['data']], ['I000001_na19675'])
+        response = self.client.get(reverse(hpo_summary_data, args=['HP:0011458']))
+        self.assertListEqual([individual['individualGuid'] for individual in response.json()['data']], ['I000004_hg00731'])
+
     @mock.patch('seqr.views.apis.summary_data_api.datetime')
     @mock.patch('seqr.views.apis.summary_data_api.load_uploaded_file')
     def test_bulk_update_family_external_analysis(self, mock_load_uploaded_file, mock_datetime):
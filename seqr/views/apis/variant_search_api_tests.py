@@ -415,7 +415,7 @@ class VariantSearchAPITest(object):
         self.assertEqual(response.json()['error'], 'Invalid index')
         self.assertFalse('traceback' in response.json())
         mock_error_logger.assert_called_with(
-            'Invalid index', self.collaborator_user, http_request_json=mock.ANY, traceback=mock.ANY, request_body=mock.ANY, detail=None)
+            'Invalid index', self.collaborator_user, http_request_json=mock.ANY, traceback=mock.ANY, request_body=mock.ANY, detail=None, request_stats=mock.ANY)
 
         mock_get_variants.side_effect = InvalidSearchException('Invalid search')
         mock_error_logger.reset_mock()
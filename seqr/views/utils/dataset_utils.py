@@ -1,6 +1,8 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import transaction
 from django.db.models import F, Q
 from django.utils import timezone
 import gzip
@@ -15,6 +17,7 @@ from seqr.utils.middleware import ErrorsWarningsException
 from seqr.utils.search.add_data_utils import basic_notify_search_data_loaded
 from seqr.utils.xpos_utils import format_chrom
 from seqr.views.utils.file_utils import parse_file, get_temp_file_path, persist_temp_file
+from seqr.views.utils.json_to_orm_utils import update_model_from_json
 from seqr.views.utils.json_utils import _to_snake_case, _to_camel_case
 from seqr.views.utils.permissions_utils import is_internal_anvil_project, project_has_anvil
 from reference_data.models import GeneInfo
@@ -320,6 +323,12 @@ RNA_DATA_TYPE_CONFIGS = {
 }
 
 
+MAX_RNA_LOAD_WORKERS = 10
+# Parsed samples are loaded in batches small enough for each load request to finish well within the request timeout
+MAX_RNA_LOAD_BATCH_ROWS = 500000
+MAX_RNA_LOAD_BATCH_SAMPLES = 50
+
+
 def _validate_rna_header(header, allowed_column_map, optional_columns, sample_id_header_col_config):
     expected_cols = set(allowed_column_map.values()) - set(optional_columns or [])
     column_map = {allowed_column_map[col]: col for col in header if col in allowed_column_map}
@@ -346,8 +355,8 @@ def _validate_rna_header(header, allowed_column_map, optional_columns, sample_id
 
 
 def _load_rna_seq_file(
-        file_path, data_source, user, data_type, model_cls, potential_samples, sample_files, file_dir, individual_data_by_id,
-        allowed_column_map, allow_missing_gene=False, ignore_extra_samples=False, optional_columns=None, sample_id_header_col_config=None,
+        file_path, data_source, user, data_type, model_cls, potential_samples, sample_files, sample_row_counts, file_dir,
+        individual_data_by_id, allowed_column_map, allow_missing_gene=False, ignore_extra_samples=False, optional_columns=None, sample_id_header_col_config=None,
 ):
     f = file_iter(file_path, user=user)
     parsed_f = parse_file(file_path.replace('.gz', ''), f, iter_file=True)
@@ -371,7 +380,7 @@ def _load_rna_seq_file(
 
         _parse_rna_row(
             sample_id, row_dict, potential_samples, loaded_samples, gene_ids, sample_guid_ids_to_load,
-            samples_to_create, unmatched_samples, individual_data_by_id, sample_files, file_dir,
+            samples_to_create, unmatched_samples, individual_data_by_id, sample_files, sample_row_counts, file_dir,
             has_errors=missing_required_fields or (unmatched_samples and not ignore_extra_samples),
         )
 
@@ -391,7 +400,7 @@ def _load_rna_seq_file(
 
 
 def _parse_rna_row(sample_id, row_dict, potential_samples, loaded_samples, gene_ids, sample_guid_ids_to_load, samples_to_create,
-                   unmatched_samples, individual_data_by_id, sample_files, file_dir, has_errors):
+                   unmatched_samples, individual_data_by_id, sample_files, sample_row_counts, file_dir, has_errors):
 
     row_gene_ids = row_dict[GENE_ID_COL].split(';')
     if any(row_gene_ids):
@@ -424,6 +433,7 @@ def _parse_rna_row(sample_id, row_dict, potential_samples, loaded_samples, gene_
             file_name = _get_sample_file_path(file_dir, individual_id)
             sample_files[individual_id] = gzip.open(file_name, 'at')
         sample_files[individual_id].write(f'{json.dumps(row_dict)}\n')
+        sample_row_counts[individual_id] += 1
 
 
 def _get_sample_file_path(file_dir, sample_guid):
@@ -485,7 +495,7 @@ def load_rna_seq(request_json, user, **kwargs):
     file_path = request_json['file']
 
     try:
-        sample_guids, file_name_prefix, info, warnings = _load_rna_seq(
+        sample_guids, sample_guid_batches, file_name_prefix, info, warnings = _load_rna_seq(
             data_type, file_path, user, **kwargs,
             tissue=request_json.get('tissue'), ignore_extra_samples=request_json.get('ignoreExtraSamples'),
         )
@@ -499,6 +509,7 @@ def load_rna_seq(request_json, user, **kwargs):
         'warnings': warnings,
         'fileName': file_name_prefix,
         'sampleGuids': sample_guids,
+        'sampleGuidBatches': sample_guid_batches,
     }, 200
 
 
@@ -524,13 +535,14 @@ def _load_rna_seq(data_type, file_path, user, sample_metadata_mapping=None, proj
     )
 
     sample_files = {}
+    sample_row_counts = defaultdict(int)
     file_name_prefix = f'rna_sample_data__{data_type}__{datetime.now().isoformat()}'
     file_dir = get_temp_file_path(file_name_prefix, is_local=True)
     os.mkdir(file_dir)
 
     warnings, not_loaded_count, sample_guid_ids_to_load, prev_loaded_individual_ids = _load_rna_seq_file(
-        file_path, data_source, user, data_type, model_cls, potential_samples, sample_files, file_dir, individual_data_by_id,
-        config['columns'], **config['additional_kwargs'], **kwargs)
+        file_path, data_source, user, data_type, model_cls, potential_samples, sample_files, sample_row_counts, file_dir,
+        individual_data_by_id, config['columns'], **config['additional_kwargs'], **kwargs)
     message = f'Parsed {len(sample_guid_ids_to_load) + not_loaded_count} RNA-seq samples'
     info = [message]
     logger.info(message, user)
@@ -561,7 +573,24 @@ def _load_rna_seq(data_type, file_path, user, sample_metadata_mapping=None, proj
     if sample_guid_ids_to_load:
         persist_temp_file(file_name_prefix, user)
 
-    return sorted(sample_guid_ids_to_load.keys()), file_name_prefix, info, warnings
+    sample_guids = sorted(sample_guid_ids_to_load.keys())
+    sample_guid_batches = _get_rna_load_batches(
+        sample_guids, {sample_guid: sample_row_counts[sample_id] for sample_guid, sample_id in sample_guid_ids_to_load.items()},
+    )
+    return sample_guids, sample_guid_batches, file_name_prefix, info, warnings
+
+
+def _get_rna_load_batches(sample_guids, sample_row_counts):
+    batches = []
+    batch_rows = 0
+    for sample_guid in sample_guids:
+        num_rows = sample_row_counts[sample_guid]
+        if not batches or len(batches[-1]) >= MAX_RNA_LOAD_BATCH_SAMPLES or batch_rows + num_rows > MAX_RNA_LOAD_BATCH_ROWS:
+            batches.append([])
+            batch_rows = 0
+        batches[-1].append(sample_guid)
+        batch_rows += num_rows
+    return batches
 
 
 def _get_individual_metadata_mapping(sample_metadata_mapping, individuals):
@@ -612,6 +641,44 @@ def post_process_rna_data(sample_guid, data, get_unique_key=None, format_fields=
     return data_by_key.values(), '; '.join(errors)
 
 
+def load_rna_seq_samples(samples, file_name, data_type, user):
+    """
+    Loads the data parsed by load_rna_seq for the given RNA samples.
+
+    Parsed sample files are read and validated by parallel workers, and each valid sample is then loaded with a single
+    postgres COPY and activated in its own transaction
+    Returns:
+        A dictionary of sample guid to error message for any samples which failed to load
+    """
+    config = RNA_DATA_TYPE_CONFIGS[data_type]
+    model_cls = config['model_class']
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(len(samples), MAX_RNA_LOAD_WORKERS) or 1) as executor:
+        futures = {
+            executor.submit(_read_rna_sample_data, sample.guid, file_name, user, config): sample for sample in samples
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), unit=' samples'):
+            sample = futures[future]
+            data_rows, error = future.result()
+            if error:
+                errors[sample.guid] = error
+                continue
+            with transaction.atomic():
+                model_cls.bulk_copy(user, sample, data_rows)
+                update_model_from_json(sample, {'is_active': True}, user=user)
+    return errors
+
+
+def _read_rna_sample_data(sample_guid, file_name, user, config):
+    file_path = get_temp_file_path(f'{file_name}/{sample_guid}.json.gz')
+    try:
+        data_rows = [json.loads(line) for line in file_iter(file_path, user=user)]
+    except FileNotFoundError:
+        logger.error(f'No saved temp data found for {sample_guid} with file prefix {file_name}', user)
+        return None, 'Data for this sample was not properly parsed. Please re-upload the data'
+    return post_process_rna_data(sample_guid, data_rows, **config.get('post_process_kwargs', {}))
+
+
 RNA_MODEL_DISPLAY_NAME = {
   RnaSeqOutlier: 'Expression Outlier',
   RnaSeqSpliceOutlier: 'Splice Outlier',
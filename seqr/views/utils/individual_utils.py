@@ -9,8 +9,8 @@ from seqr.models import Sample, IgvSample, RnaSample, Individual, Family, Family
 from seqr.utils.middleware import ErrorsWarningsException
 from seqr.utils.search.add_data_utils import trigger_rebuild_gt_stats
 from seqr.utils.search.utils import backend_specific_call
-from seqr.views.utils.json_to_orm_utils import update_individual_from_json, update_individual_parents, create_model_from_json, \
-    update_family_from_json
+from seqr.views.utils.json_to_orm_utils import update_individual_from_json, update_individual_parents, \
+    bulk_create_models_from_json, update_family_from_json
 from seqr.views.utils.orm_to_json_utils import _get_json_for_individuals, _get_json_for_families, get_json_for_family_notes
 from seqr.views.utils.pedigree_info_utils import JsonConstants
 
@@ -42,7 +42,6 @@ def add_or_update_individuals_and_families(project, individual_records, user, ge
     updated_individuals = set()
     updated_affected = set()
     updated_sex = set()
-    updated_note_ids = []
     parent_updates = []
     num_created_families = 0
     num_created_individuals = 0
@@ -51,10 +50,10 @@ def add_or_update_individuals_and_families(project, individual_records, user, ge
     families_by_id = {f.family_id: f for f in Family.objects.filter(project=project, family_id__in=family_ids)}
 
     missing_family_ids = family_ids - set(families_by_id.keys())
-    for family_id in sorted(missing_family_ids):
-        family = create_model_from_json(Family, {'project': project, 'family_id': family_id}, user)
+    for family in bulk_create_models_from_json(
+            Family, [{'project': project, 'family_id': family_id} for family_id in sorted(missing_family_ids)], user):
         num_created_families += 1
-        families_by_id[family_id] = family
+        families_by_id[family.family_id] = family
         updated_family_ids.add(family.id)
 
     individual_models = Individual.objects.filter(family__project=project).prefetch_related(
@@ -71,11 +70,30 @@ def add_or_update_individuals_and_families(project, individual_records, user, ge
                 individual_id__in=[_get_record_individual_id(record) for record in individual_records]):
             individual_lookup[i.individual_id][i.family] = i
 
-    for record in individual_records:
-        created_individual = _update_from_record(
-            record, user, families_by_id, individual_lookup, updated_family_ids, updated_individuals, updated_affected, updated_sex, parent_updates, updated_note_ids, allow_features_update)
-        if created_individual:
+        # uploaded files do not have unique guid's, so new individuals are those whose individualId is not in the project
+        new_individual_records = {}
+        for record in individual_records:
+            individual_id = _get_record_individual_id(record)
+            if not individual_lookup[individual_id] and individual_id not in new_individual_records:
+                new_individual_records[individual_id] = record
+        for individual in bulk_create_models_from_json(Individual, [
+            {
+                'family': families_by_id[_get_record_family_id(record)], 'individual_id': individual_id,
+                'case_review_status': 'I', 'affected': record['affected'],
+            } for individual_id, record in new_individual_records.items()
+        ], user):
             num_created_individuals += 1
+            updated_family_ids.add(individual.family_id)
+            updated_individuals.add(individual)
+            individual_lookup[individual.individual_id][individual.family] = individual
+
+    family_notes = []
+    for record in individual_records:
+        _update_from_record(
+            record, user, families_by_id, individual_lookup, updated_family_ids, updated_individuals, updated_affected,
+            updated_sex, parent_updates, family_notes, allow_features_update)
+
+    updated_note_ids = [note.id for note in bulk_create_models_from_json(FamilyNote, family_notes, user)]
 
     for update in parent_updates:
         individual = update.pop('individual')
@@ -105,10 +123,9 @@ def add_or_update_individuals_and_families(project, individual_records, user, ge
     return pedigree_json
 
 
-def _update_from_record(record, user, families_by_id, individual_lookup, updated_family_ids, updated_individuals, updated_affected, updated_sex, parent_updates, updated_note_ids, allow_features_update):
+def _update_from_record(record, user, families_by_id, individual_lookup, updated_family_ids, updated_individuals, updated_affected, updated_sex, parent_updates, family_notes, allow_features_update):
     family_id = _get_record_family_id(record)
     family = families_by_id.get(family_id)
-    created_individual = False
 
     if record.get('individualGuid'):
         individual = individual_lookup[record.pop('individualGuid')]
@@ -118,14 +135,7 @@ def _update_from_record(record, user, families_by_id, individual_lookup, updated
         individual = individual_lookup[individual_id].get(family)
         if not individual:
             # Individual is being moved to a different family
-            individual = next((iter(individual_lookup[individual_id].values())), None)
-        if not individual:
-            individual = create_model_from_json(
-                Individual, {'family': family, 'individual_id': individual_id, 'case_review_status': 'I', 'affected': record['affected']}, user)
-            updated_family_ids.add(family.id)
-            updated_individuals.add(individual)
-            individual_lookup[individual_id][family] = individual
-            created_individual = True
+            individual = next((iter(individual_lookup[individual_id].values())))
 
     record['family'] = family
     record.pop('familyId', None)
@@ -154,10 +164,9 @@ def _update_from_record(record, user, families_by_id, individual_lookup, updated
             'paternalId': record.pop('paternalId', None),
         })
 
-    family_notes = record.pop(JsonConstants.FAMILY_NOTES_COLUMN, None)
-    if family_notes:
-        note = create_model_from_json(FamilyNote, {'note': family_notes, 'note_type': 'C', 'family': family}, user)
-        updated_note_ids.append(note.id)
+    family_note = record.pop(JsonConstants.FAMILY_NOTES_COLUMN, None)
+    if family_note:
+        family_notes.append({'note': family_note, 'note_type': 'C', 'family': family})
 
     family_record = {
         k: record.pop(k) for k in [JsonConstants.CODED_PHENOTYPE_COLUMN, JsonConstants.MONDO_ID_COLUMN] if k in record
@@ -177,8 +186,6 @@ def _update_from_record(record, user, families_by_id, individual_lookup, updated
         if family.pedigree_image:
             updated_family_ids.add(family.id)
 
-    return created_individual
-
 
 def delete_individuals(project, individual_guids, user):
     """Delete one or more individuals
@@ -219,6 +226,21 @@ def check_project_individuals_deletable(project, individual_guids=None):
     return errors, individuals_to_delete
 
 
+ACTIVE_SUBMISSION_QUERY = dict(matchmakersubmission__isnull=False, matchmakersubmission__deleted_date__isnull=True)
+ACTIVE_SEARCH_SAMPLE_QUERY = dict(sample__is_active=True)
+
+
+def get_project_guids_with_undeletable_individuals(projects):
+    undeletable_queries = backend_specific_call(
+        lambda: [ACTIVE_SUBMISSION_QUERY], lambda: [ACTIVE_SUBMISSION_QUERY, ACTIVE_SEARCH_SAMPLE_QUERY],
+    )()
+    project_guids = set()
+    for query in undeletable_queries:
+        project_guids.update(Individual.objects.filter(family__project__in=projects, **query).exclude(
+            family__project__guid__in=project_guids).values_list('family__project__guid', flat=True).distinct())
+    return project_guids
+
+
 def _validate_delete_individuals(individuals_to_delete, error_type, query):
     errors = []
     invalid_individuals = individuals_to_delete.filter(**query).distinct().values_list('individual_id', flat=True)
@@ -228,15 +250,12 @@ def _validate_delete_individuals(individuals_to_delete, error_type, query):
 
 
 def _validate_no_submissions(individuals_to_delete):
-    return _validate_delete_individuals(
-        individuals_to_delete, 'MME submission',
-        dict(matchmakersubmission__isnull=False, matchmakersubmission__deleted_date__isnull=True)
-    )
+    return _validate_delete_individuals(individuals_to_delete, 'MME submission', ACTIVE_SUBMISSION_QUERY)
 
 
 def _validate_no_sumissions_no_search_samples(individuals_to_delete):
     return _validate_no_submissions(individuals_to_delete) + _validate_delete_individuals(
-        individuals_to_delete, 'search sample', dict(sample__is_active=True)
+        individuals_to_delete, 'search sample', ACTIVE_SEARCH_SAMPLE_QUERY,
     )
 
 
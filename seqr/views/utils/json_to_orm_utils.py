@@ -108,6 +108,14 @@ def create_model_from_json(model_class, json, user):
     return model
 
 
+def bulk_create_models_from_json(model_class, jsons, user):
+    """Creates a model for each json in a single insert, with the same GUIDs and logs as calling create_model_from_json
+    for each one"""
+    return model_class.bulk_create_with_guids(
+        user, [model_class(**json) for json in jsons], update_fields=set().union(*jsons),
+    )
+
+
 def get_or_create_model_from_json(model_class, create_json, update_json, user, update_on_create_only=False):
     model, created = model_class.objects.get_or_create(**create_json)
     updated_fields = set()
@@ -4,6 +4,9 @@ import re
 from django.http import JsonResponse
 from django.core.serializers.json import DjangoJSONEncoder
 
+from seqr.utils.logging_utils import track_request_time
+from settings import JSON_RESPONSE_FORMAT
+
 
 class DjangoJSONEncoderWithSets(DjangoJSONEncoder):
 
@@ -16,24 +19,32 @@ class DjangoJSONEncoderWithSets(DjangoJSONEncoder):
         return super(DjangoJSONEncoderWithSets, self).default(o)
 
 
-def create_json_response(obj, **kwargs):
+JSON_RESPONSE_DUMPS_PARAMS = {
+    'pretty': {'sort_keys': True, 'indent': 4},
+    # Without indentation the C-accelerated encoder is used, which is significantly faster for large responses
+    'compact': {'separators': (',', ':')},
+}
+
+
+def create_json_response(obj, json_format=None, **kwargs):
     """Encodes the give object into json and create a django JsonResponse object with it.
 
     Args:
         obj (object): json response object
+        json_format (string): optional key in JSON_RESPONSE_DUMPS_PARAMS, defaults to the JSON_RESPONSE_FORMAT setting
         **kwargs: any addition args to pass to the JsonResponse constructor
     Returns:
         JsonResponse
     """
 
     dumps_params = {
-        'sort_keys': True,
-        'indent': 4,
+        **JSON_RESPONSE_DUMPS_PARAMS[json_format or JSON_RESPONSE_FORMAT],
         'default': DjangoJSONEncoderWithSets().default
     }
 
-    return JsonResponse(
-        obj, json_dumps_params=dumps_params, encoder=DjangoJSONEncoderWithSets, **kwargs)
+    with track_request_time('serialization'):
+        return JsonResponse(
+            obj, json_dumps_params=dumps_params, encoder=DjangoJSONEncoderWithSets, **kwargs)
 
 
 CAMEL_CASE_MAP = {}
@@ -3,6 +3,7 @@ Utility functions for converting Django ORM object to JSON
 """
 
 from collections import defaultdict
+from functools import lru_cache
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.db.models import prefetch_related_objects, Count, Value, F, Q, CharField, Case, When
 from django.db.models.functions import Concat, Coalesce, NullIf, Lower, Trim, JSONObject
@@ -116,28 +117,66 @@ def _user_expr(field):
     return Coalesce(NullIf(_full_name_expr(field), Value('')), f'{field}__email', output_field=CharField())
 
 
-def get_json_for_queryset(models, nested_fields=None, user=None, is_analyst=None, additional_values=None, guid_key=None, additional_model_fields=None):
-    model_class = models.model
-    fields = _get_model_json_fields(model_class, user, is_analyst, additional_model_fields)
+def _is_analyst_for_model(model_class, user, is_analyst):
+    if not getattr(model_class._meta, 'internal_json_fields', None):
+        return False
+    if is_analyst is None:
+        is_analyst = user and user_is_analyst(user)
+    return bool(is_analyst)
+
+
+@lru_cache(maxsize=None)
+def _get_queryset_values_spec(model_class, is_analyst, additional_model_fields, guid_key):
+    """Compiles the .values() arguments needed to serialize the given model, so the field set and camel case key mapping
+    are only computed once per model/ field configuration rather than on every request"""
+    fields = _get_model_json_fields(model_class, None, is_analyst, additional_model_fields)
 
     field_key_map = {_to_camel_case(field): field for field in fields}
     if 'guid' in field_key_map:
         guid_key = guid_key or '{}{}Guid'.format(model_class.__name__[0].lower(), model_class.__name__[1:])
         field_key_map[guid_key] = field_key_map.pop('guid')
 
-    no_modify_fields = [field for key, field in field_key_map.items() if key == field]
+    no_modify_fields = tuple(field for key, field in field_key_map.items() if key == field)
     value_fields = {key: F(field) for key, field in field_key_map.items() if key != field}
     value_fields.update({
         key: _user_expr(field) for key, field in field_key_map.items()
         if field.endswith('last_modified_by') or field == 'created_by'
     })
-    value_fields.update(additional_values or {})
+    return no_modify_fields, value_fields
+
+
+def get_json_for_queryset(models, nested_fields=None, user=None, is_analyst=None, additional_values=None, guid_key=None,
+                          additional_model_fields=None, process_results=None):
+    """Returns JSON representations of the given queryset, computed in a single .values() query
+
+    Args:
+        models (queryset): Django queryset for the models
+        user (object): Django User object for determining whether to include restricted/internal-only fields
+        nested_fields (array): Optional array of fields to get from the model that are nested on related objects
+        additional_values (dict): Optional mapping of json key to expression for additional annotated values
+        guid_key (string): Optional key to use for the model's guid
+        additional_model_fields (array): Optional array of additional model fields to include
+        process_results (lambda): Optional function to post-process all the resulting json in a single pass. If provided,
+            the queryset is evaluated and a list is returned
+    Returns:
+        queryset or array: json objects
+    """
+    model_class = models.model
+    no_modify_fields, value_fields = _get_queryset_values_spec(
+        model_class, _is_analyst_for_model(model_class, user, is_analyst),
+        tuple(sorted(set(additional_model_fields))) if additional_model_fields else None, guid_key,
+    )
+    value_fields = {**value_fields, **(additional_values or {})}
 
     for nested_field in (nested_fields or []):
         key = nested_field.get('key', _to_camel_case('_'.join(nested_field['fields'])))
         value_fields[key] = Value(nested_field['value']) if nested_field.get('value') else F('__'.join(nested_field['fields']))
 
-    return models.values(*no_modify_fields, **value_fields)
+    results = models.values(*no_modify_fields, **value_fields)
+    if process_results:
+        results = list(results)
+        process_results(results)
+    return results
 
 
 MODEL_USER_FIELDS = [
@@ -215,6 +254,15 @@ def _get_case_review_fields(model_cls, has_case_review_perm):
     return [field.name for field in model_cls._meta.fields if field.name.startswith('case_review')]
 
 
+def get_restricted_json_keys(model_class, is_analyst, has_case_review_perm):
+    """Returns the json keys for the given model which are only included for analysts and/ or case reviewers and
+    should not be returned to a user with the given permissions"""
+    all_fields = _get_model_json_fields(model_class, None, True, _get_case_review_fields(model_class, True))
+    user_fields = _get_model_json_fields(
+        model_class, None, is_analyst, _get_case_review_fields(model_class, has_case_review_perm))
+    return {_to_camel_case(field) for field in all_fields - user_fields}
+
+
 FAMILY_DISPLAY_NAME_EXPR = Coalesce(NullIf('display_name', Value('')), 'family_id')
 FAMILY_ADDITIONAL_VALUES = {
     'analysedBy': ArrayAgg(JSONObject(
@@ -229,6 +277,7 @@ FAMILY_ADDITIONAL_VALUES = {
     ),
     'displayName': FAMILY_DISPLAY_NAME_EXPR,
 }
+FAMILY_PEDIGREE_IMAGE_EXPR = NullIf(Concat(Value(MEDIA_URL), 'pedigree_image', output_field=CharField()), Value(MEDIA_URL))
 INDIVIDUAL_GUIDS_VALUES = {
     'individualGuids': ArrayAgg('individual__guid', filter=Q(individual__isnull=False), distinct=True),
 }
@@ -237,10 +286,7 @@ INDIVIDUAL_GUIDS_VALUES = {
 def _get_json_for_families(families, user=None, add_individual_guids_field=False, project_guid=None, is_analyst=None,
                            has_case_review_perm=False, additional_values=None):
 
-    family_additional_values = {
-        **FAMILY_ADDITIONAL_VALUES,
-        'pedigreeImage': NullIf(Concat(Value(MEDIA_URL), 'pedigree_image', output_field=CharField()), Value(MEDIA_URL)),
-    }
+    family_additional_values = {**FAMILY_ADDITIONAL_VALUES, 'pedigreeImage': FAMILY_PEDIGREE_IMAGE_EXPR}
     if additional_values:
         family_additional_values.update(additional_values)
     if add_individual_guids_field:
@@ -265,6 +311,18 @@ def get_json_for_family_note(note):
 
 
 INDIVIDUAL_DISPLAY_NAME_EXPR = Coalesce(NullIf('display_name', Value('')), 'individual_id', output_field=CharField())
+INDIVIDUAL_ADDITIONAL_VALUES = {
+    'maternalGuid': F('mother__guid'),
+    'paternalGuid': F('father__guid'),
+    'maternalId': F('mother__individual_id'),
+    'paternalId': F('father__individual_id'),
+    'displayName': INDIVIDUAL_DISPLAY_NAME_EXPR,
+}
+SAMPLE_GUIDS_VALUES = {
+    f'{field}Guids': ArrayAgg(f'{field.lower()}__guid', filter=Q(**{f'{field.lower()}__isnull': False}))
+    for field in ['sample', 'igvSample']
+}
+INDIVIDUAL_HPO_FIELDS = ['features', 'absent_features', 'nonstandard_features', 'absent_nonstandard_features']
 
 
 def _get_json_for_individuals(individuals, user=None, project_guid=None, family_guid=None, add_sample_guids_field=False,
@@ -291,48 +349,32 @@ def _get_json_for_individuals(individuals, user=None, project_guid=None, family_
             nested_fields.append({'fields': ('family', field), 'key': _to_camel_case(field)})
 
     if add_hpo_details:
-        additional_model_fields += [
-            'features', 'absent_features', 'nonstandard_features', 'absent_nonstandard_features']
-
-    additional_values = {
-        'maternalGuid': F('mother__guid'),
-        'paternalGuid': F('father__guid'),
-        'maternalId': F('mother__individual_id'),
-        'paternalId': F('father__individual_id'),
-        'displayName': INDIVIDUAL_DISPLAY_NAME_EXPR,
-    }
-    if add_sample_guids_field:
-        additional_values.update({
-            f'{field}Guids': ArrayAgg(f'{field.lower()}__guid', filter=Q(**{f'{field.lower()}__isnull': False}))
-            for field in ['sample', 'igvSample']
-        })
+        additional_model_fields += INDIVIDUAL_HPO_FIELDS
 
-    parsed_individuals = get_json_for_queryset(
+    additional_values = {**INDIVIDUAL_ADDITIONAL_VALUES, **SAMPLE_GUIDS_VALUES} if add_sample_guids_field \
+        else INDIVIDUAL_ADDITIONAL_VALUES
+
+    return get_json_for_queryset(
         individuals, user=user, is_analyst=is_analyst, additional_values=additional_values,
         additional_model_fields=additional_model_fields, nested_fields=nested_fields,
+        process_results=add_individual_hpo_details if add_hpo_details else None,
     )
 
-    if add_hpo_details:
-        add_individual_hpo_details(parsed_individuals)
-
-    return parsed_individuals
-
 
 def add_individual_hpo_details(parsed_individuals):
     all_hpo_ids = set()
     for i in parsed_individuals:
         all_hpo_ids.update([feature['id'] for feature in i.get('features') or []])
         all_hpo_ids.update([feature['id'] for feature in i.get('absentFeatures') or []])
-    hpo_terms_by_id = {hpo.hpo_id: hpo for hpo in HumanPhenotypeOntology.objects.filter(hpo_id__in=all_hpo_ids)}
+    hpo_terms_by_id = {
+        hpo_id: {'category': category, 'label': name} for hpo_id, category, name in
+        HumanPhenotypeOntology.objects.filter(hpo_id__in=all_hpo_ids).values_list('hpo_id', 'category_id', 'name')
+    }
     for i in parsed_individuals:
-        for feature in i.get('features') or []:
-            hpo = hpo_terms_by_id.get(feature['id'])
-            if hpo:
-                feature.update({'category': hpo.category_id, 'label': hpo.name})
-        for feature in i.get('absentFeatures') or []:
+        for feature in (i.get('features') or []) + (i.get('absentFeatures') or []):
             hpo = hpo_terms_by_id.get(feature['id'])
             if hpo:
-                feature.update({'category': hpo.category_id, 'label': hpo.name})
+                feature.update(hpo)
 
 
 def _get_sample_json_kwargs(project_guid=None, family_guid=None, individual_guid=None, skip_nested=False, **kwargs):
@@ -428,18 +470,18 @@ def get_json_for_saved_variants(saved_variants, add_details=False, additional_mo
             lambda gv: ['key', 'genotypes', 'dataset_type'] + ([] if gv else ['family__project__genome_version']),
         )(genome_version)
 
-    results = get_json_for_queryset(
+    return get_json_for_queryset(
         saved_variants, guid_key='variantGuid', additional_values=sv_additional_values,
         additional_model_fields=additional_fields,
+        process_results=(lambda results: _add_saved_variant_details(results, genome_version)) if add_details else None,
     )
 
-    if add_details:
-        from seqr.utils.search.utils import backend_specific_call
-        backend_specific_call(lambda *args: None, _add_clickhouse_annotations)(results, genome_version)
-        for result in results:
-            result.update({k: v for k, v in result.pop('savedVariantJson').items() if k not in result})
 
-    return results
+def _add_saved_variant_details(results, genome_version):
+    from seqr.utils.search.utils import backend_specific_call
+    backend_specific_call(lambda *args: None, _add_clickhouse_annotations)(results, genome_version)
+    for result in results:
+        result.update({k: v for k, v in result.pop('savedVariantJson').items() if k not in result})
 
 
 def _add_clickhouse_annotations(results, genome_version):
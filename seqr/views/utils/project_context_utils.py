@@ -1,20 +1,73 @@
 from collections import defaultdict
+import hashlib
+import json
+import time
 from django.db.models import Count, Q, F, prefetch_related_objects
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.db.models.functions import JSONObject
 
 from clickhouse_search.search import get_transcripts_by_key, get_annotations_queryset
-from seqr.models import Individual, IgvSample, AnalysisGroup, DynamicAnalysisGroup, LocusList, VariantTagType,\
-    VariantFunctionalData, FamilyNote, SavedVariant, VariantTag, VariantNote, Sample
+from reference_data.models import DataVersions
+from seqr.models import Family, Individual, IgvSample, AnalysisGroup, DynamicAnalysisGroup, LocusList, VariantTagType,\
+    VariantFunctionalData, FamilyNote, SavedVariant, VariantTag, VariantNote, Sample, ProjectStats
 from seqr.utils.gene_utils import get_genes
 from seqr.utils.logging_utils import SeqrLogger
+from seqr.utils.redis_utils import safe_redis_get_json, safe_redis_set_json
 from seqr.utils.search.utils import backend_specific_call
 from seqr.views.utils.orm_to_json_utils import _get_json_for_families, _get_json_for_individuals, get_json_for_queryset, \
     get_json_for_analysis_groups, get_json_for_samples, get_json_for_locus_lists, \
-    get_json_for_family_notes
+    get_json_for_family_notes, get_restricted_json_keys
 
 logger = SeqrLogger(__name__)
 
+PROJECT_CONTEXT_CACHE_EXPIRE = 60 * 60 * 24 * 7
+REFERENCE_DATA_VERSION_CACHE_EXPIRE = 60
+RESTRICTED_CONTEXT_MODELS = {'familiesByGuid': Family, 'individualsByGuid': Individual}
+
+_reference_data_version_cache = {}
+
+
+def get_cached_project_context(project, context_key, get_context):
+    """Returns page context for the given project, computing and caching it on first access.
+
+    Cached context is keyed on the project's context_version, which is incremented once the model helpers commit any
+    update to the project's data, and on the loaded reference data versions, as context includes gene and OMIM
+    annotations. Stale project data is therefore never returned, and stale context is left to expire. The reference
+    data version is cached in memory for a minute, so newly loaded reference data is used within a minute. Context is
+    computed with full permissions, and restricted fields are removed per-user with remove_restricted_context_fields
+    """
+    context_version = ProjectStats.objects.filter(project=project).values_list('context_version', flat=True).first()
+    if context_version is None:
+        # projects are only versioned once they have stats, which are added by the migration and on project creation
+        return get_context()
+
+    cache_key = f'project_context__{project.guid}__v{context_version}__{_get_reference_data_version()}__{context_key}'
+    context = safe_redis_get_json(cache_key)
+    if context is None:
+        context = get_context()
+        safe_redis_set_json(cache_key, context, expire=PROJECT_CONTEXT_CACHE_EXPIRE)
+    return context
+
+
+def _get_reference_data_version():
+    expires, version = _reference_data_version_cache.get('version', (0, None))
+    if time.monotonic() < expires:
+        return version
+    versions = sorted(DataVersions.objects.values_list('data_model_name', 'version'))
+    version = hashlib.md5(json.dumps(versions).encode()).hexdigest()[:10]  # nosec
+    _reference_data_version_cache['version'] = (time.monotonic() + REFERENCE_DATA_VERSION_CACHE_EXPIRE, version)
+    return version
+
+
+def remove_restricted_context_fields(response, is_analyst, has_case_review_perm):
+    for key, model_cls in RESTRICTED_CONTEXT_MODELS.items():
+        restricted_keys = get_restricted_json_keys(model_cls, is_analyst, has_case_review_perm)
+        if not restricted_keys:
+            continue
+        for model_json in response.get(key, {}).values():
+            for restricted_key in restricted_keys:
+                model_json.pop(restricted_key, None)
+
 
 def get_projects_child_entities(projects, project_guid, user):
     projects_by_guid = {p.guid: {'projectGuid': p.guid, 'name': p.name} for p in projects}
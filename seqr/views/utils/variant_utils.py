@@ -18,9 +18,11 @@ from seqr.models import SavedVariant, VariantSearchResults, Family, LocusList, L
 from seqr.utils.search.elasticsearch.es_utils import get_es_variants_for_variant_ids
 from seqr.utils.search.utils import backend_specific_call, variant_dataset_type
 from seqr.utils.gene_utils import get_genes_for_variants
+from seqr.utils.logging_utils import QueryStats
 from seqr.utils.middleware import ErrorsWarningsException
+from seqr.utils.thread_utils import map_in_threads
 from seqr.utils.xpos_utils import get_xpos
-from seqr.views.utils.json_to_orm_utils import create_model_from_json
+from seqr.views.utils.json_to_orm_utils import bulk_create_models_from_json
 from seqr.views.utils.orm_to_json_utils import get_json_for_discovery_tags, get_json_for_locus_lists, \
     get_json_for_queryset, get_json_for_rna_seq_outliers, get_json_for_saved_variants_with_tags, \
     get_json_for_matchmaker_submissions
@@ -35,12 +37,14 @@ DISCOVERY_CATEGORY = 'CMG Discovery Tags'
 OMIM_GENOME_VERSION = GENOME_VERSION_GRCh38
 
 
-def update_projects_saved_variant_json(projects, update_function, **kwargs):
+def update_projects_saved_variant_json(projects, update_function, max_workers=1, **kwargs):
     success = {}
     skipped = {}
     error = {}
     logger.info(f'Reloading saved variants in {len(projects)} projects')
-    for project_id, project_guid, project_name, genome_version, family_guids in tqdm(projects, unit=' project'):
+
+    def _update_project(project):
+        project_id, project_guid, project_name, genome_version, family_guids = project
         try:
             updated_saved_variants = update_function(
                 project_id, genome_version, family_guids=family_guids, project_guid=project_guid, **kwargs)
@@ -56,6 +60,9 @@ def update_projects_saved_variant_json(projects, update_function, **kwargs):
             logger.error(f'Error reloading variants in {project_name}: {e}')
             error[project_name] = e
 
+    for _ in tqdm(map_in_threads(_update_project, projects, max_workers=max_workers), total=len(projects), unit=' project'):
+        pass
+
     logger.info('Reload Summary: ')
     for k, v in success.items():
         if v > 0:
@@ -157,20 +164,22 @@ def bulk_create_tagged_variants(family_variant_data, tag_name, get_metadata, use
     }
 
     update_tags = []
+    new_tags = []
     new_tag_keys = set()
     skipped = 0
     for key, variant in sorted(family_variant_data.items()):
         metadata = get_metadata(variant)
         comp_het_metadata = get_comp_het_metadata(variant) if get_comp_het_metadata else None
         updated_tag = _set_updated_tags(
-            key, metadata, comp_het_metadata, variant.get('support_vars', []), saved_variant_map, existing_tags, tag_type, user,
-            new_tag_keys, remove_missing_metadata,
+            key, metadata, comp_het_metadata, variant.get('support_vars', []), saved_variant_map, existing_tags, tag_type,
+            new_tags, new_tag_keys, remove_missing_metadata,
         )
         if updated_tag:
             update_tags.append(updated_tag)
         elif key not in new_tag_keys:
             skipped += 1
 
+    _bulk_create_tags(new_tags, tag_type, user)
     VariantTag.bulk_update_models(user, update_tags, ['metadata'])
 
     return new_tag_keys, len(update_tags), skipped
@@ -178,7 +187,8 @@ def bulk_create_tagged_variants(family_variant_data, tag_name, get_metadata, use
 
 def _set_updated_tags(key: tuple[int, str], metadata: dict[str, dict], comp_het_metadata: dict[str, dict], support_var_ids: list[str],
                       saved_variant_map: dict[tuple[int, str], SavedVariant], existing_tags: dict[tuple[int, ...], VariantTag],
-                      tag_type: VariantTagType, user: User, new_tag_keys: set[tuple], remove_missing_metadata: bool):
+                      tag_type: VariantTagType, new_tags: list[tuple[str, list[SavedVariant]]], new_tag_keys: set[tuple],
+                      remove_missing_metadata: bool):
     variant = saved_variant_map[key]
     existing_tag = existing_tags.get(tuple([variant.id]))
     updated_tag = None
@@ -194,9 +204,7 @@ def _set_updated_tags(key: tuple[int, str], metadata: dict[str, dict], comp_het_
                 existing_tag.metadata = new_metadata
                 updated_tag = existing_tag
     elif metadata is not None:
-        tag = create_model_from_json(
-            VariantTag, {'variant_tag_type': tag_type, 'metadata': json.dumps(metadata)}, user)
-        tag.saved_variants.add(variant)
+        new_tags.append((json.dumps(metadata), [variant]))
         new_tag_keys.add(key)
 
     variant_genes = set(variant.gene_ids or [])
@@ -209,11 +217,7 @@ def _set_updated_tags(key: tuple[int, str], metadata: dict[str, dict], comp_het_
         variants = [variant, support_var]
         variant_id_key = tuple(sorted([v.id for v in variants]))
         if variant_id_key not in existing_tags:
-            tag = create_model_from_json(VariantTag, {
-                'variant_tag_type': tag_type,
-                'metadata': json.dumps(comp_het_metadata) if comp_het_metadata else None,
-            }, user)
-            tag.saved_variants.set(variants)
+            new_tags.append((json.dumps(comp_het_metadata) if comp_het_metadata else None, variants))
             existing_tags[variant_id_key] = True
             new_tag_keys.add((key[0], support_var.variant_id))
             new_tag_keys.add(key)
@@ -221,6 +225,17 @@ def _set_updated_tags(key: tuple[int, str], metadata: dict[str, dict], comp_het_
     return updated_tag
 
 
+def _bulk_create_tags(new_tags: list[tuple[str, list[SavedVariant]]], tag_type: VariantTagType, user: User):
+    tags = bulk_create_models_from_json(VariantTag, [
+        {'variant_tag_type': tag_type, 'metadata': metadata} for metadata, _ in new_tags
+    ], user)
+    VariantTag.saved_variants.through.objects.bulk_create([
+        VariantTag.saved_variants.through(varianttag_id=tag.id, savedvariant_id=variant.id)
+        for tag, (_, variants) in zip(tags, new_tags) for variant in variants
+    ])
+    VariantTag.update_project_context_version(tags)
+
+
 def _search_new_saved_variants(family_variant_ids: set[tuple[int, str]], user: User, genome_version: str) -> dict[tuple[int, str], dict]:
     family_ids = set()
     variant_families = defaultdict(list)
@@ -339,7 +354,8 @@ def _requires_transcript_metadata(variant):
     return variant.get('genomeVersion') != GENOME_VERSION_GRCh38 or variant.get('chrom', '').startswith('M')
 
 
-def get_variants_reference_data_response(variants, genome_versions, get_family_genes=False):
+def get_variants_reference_data_response(variants, genome_versions, get_family_genes=False, context_loader=None):
+    context_loader = context_loader or VariantContextLoader()
     response = {}
     if get_family_genes:
         response['family_genes'] = defaultdict(set)
@@ -358,29 +374,35 @@ def get_variants_reference_data_response(variants, genome_versions, get_family_g
                     response['family_genes'][family_guid].update(var.get('transcripts', {}).keys())
 
     genome_version = list(genome_versions)[0] if len(genome_versions) == 1 else None
-    genes = get_genes_for_variants(gene_ids, genome_version=genome_version)
+    genes = context_loader.load('genesById', get_genes_for_variants, gene_ids, genome_version=genome_version)
     for gene in genes.values():
         if gene:
             gene['locusListGuids'] = []
     response['genesById'] = genes
 
-    transcripts = {
-        t['transcriptId']: t for t in get_json_for_queryset(
-            TranscriptInfo.objects.filter(transcript_id__in=transcript_ids),
-            nested_fields=[{'fields': ('refseqtranscript', 'refseq_id'), 'key': 'refseqId'}]
-        )
-    } if transcript_ids else None
+    transcripts = context_loader.load(
+        'transcriptsById', _get_transcripts, transcript_ids, cache_key=frozenset(transcript_ids),
+    ) if transcript_ids else None
     if transcripts:
         response['transcriptsById'] = transcripts
 
     if any(genome_version == OMIM_GENOME_VERSION for genome_version in genome_versions):
-        response['omimIntervals'] = _get_omim_intervals(variants)
+        response['omimIntervals'] = context_loader.load('omimIntervals', _get_omim_intervals, variants)
 
-    backend_specific_call(lambda response: response, _add_sample_count_stats)(response)
+    backend_specific_call(lambda *args: None, _add_sample_count_stats)(response, context_loader)
 
     return response
 
 
+def _get_transcripts(transcript_ids):
+    return {
+        t['transcriptId']: t for t in get_json_for_queryset(
+            TranscriptInfo.objects.filter(transcript_id__in=transcript_ids),
+            nested_fields=[{'fields': ('refseqtranscript', 'refseq_id'), 'key': 'refseqId'}]
+        )
+    }
+
+
 def get_omim_intervals_query(variants):
     chroms = {v['chrom'] for v in variants if v.get('svType') or v.get('hasSvType')}
     return Q(phenotype_mim_number__isnull=False, gene__isnull=True, chrom__in=chroms)
@@ -474,53 +496,122 @@ LOAD_PROJECT_TAG_TYPES_CONTEXT_PARAM = 'loadProjectTagTypes'
 LOAD_FAMILY_CONTEXT_PARAM = 'loadFamilyContext'
 
 
+class VariantContextLoader(object):
+
+    def __init__(self, request=None, datasets=None):
+        """Loads the context datasets for a variants response. Optional datasets are declared up front, datasets loaded
+        with a cache key are reused by any later variant responses in the same request, and the queries run to load each
+        dataset are tracked so they can be reported in the debug logs"""
+        self.datasets = set(datasets or [])
+        self._cache = {}
+        if request is not None:
+            if not hasattr(request, '_variant_context_cache'):
+                request._variant_context_cache = {}
+            self._cache = request._variant_context_cache
+        self._stats = {}
+
+    def should_load(self, dataset):
+        return dataset in self.datasets
+
+    def load(self, dataset, load_func, *args, cache_key=None, **kwargs):
+        if cache_key is not None and (dataset, cache_key) in self._cache:
+            self._stats[dataset] = {'cached': True}
+            return self._cache[(dataset, cache_key)]
+
+        with QueryStats() as query_stats:
+            result = load_func(*args, **kwargs)
+
+        dataset_stats = self._stats.get(dataset, {'queries': 0, 'time': 0})
+        dataset_stats['queries'] += query_stats.num_queries
+        dataset_stats['time'] += query_stats.query_time
+        self._stats[dataset] = dataset_stats
+        if cache_key is not None:
+            self._cache[(dataset, cache_key)] = result
+        return result
+
+    def log_stats(self, num_variants):
+        num_queries = sum(stats.get('queries', 0) for stats in self._stats.values())
+        query_time = sum(stats.get('time', 0) for stats in self._stats.values())
+        logger.debug(
+            f'Loaded context for {num_variants} variants in {num_queries} queries ({query_time * 1000:.1f}ms)',
+            extra={'detail': {
+                dataset: stats if stats.get('cached') else {'queries': stats['queries'], 'ms': round(stats['time'] * 1000, 1)}
+                for dataset, stats in self._stats.items()
+            }},
+        )
+
+
 def get_variants_response(request, saved_variants, response_variants=None, add_all_context=False, include_igv=True,
                           add_locus_list_detail=False, include_individual_gene_scores=True, include_project_name=False, genome_version=None):
-    response = get_json_for_saved_variants_with_tags(saved_variants, add_details=True, genome_version=genome_version) \
-        if saved_variants is not None else {'savedVariantsByGuid': {}}
+    is_analyst = user_is_analyst(request.user)
+    datasets = set()
+    if is_analyst:
+        datasets.add('discoveryTags')
+    if include_individual_gene_scores:
+        datasets.add('geneScores')
+    if add_all_context or request.GET.get(LOAD_PROJECT_TAG_TYPES_CONTEXT_PARAM) == 'true':
+        datasets.add('projectsByGuid')
+    if add_all_context or request.GET.get(LOAD_FAMILY_CONTEXT_PARAM) == 'true':
+        datasets.add('familiesByGuid')
+    context_loader = VariantContextLoader(request, datasets)
+
+    response = context_loader.load(
+        'savedVariantsByGuid', get_json_for_saved_variants_with_tags, saved_variants, add_details=True,
+        genome_version=genome_version,
+    ) if saved_variants is not None else {'savedVariantsByGuid': {}}
 
     variants = list(response['savedVariantsByGuid'].values()) if response_variants is None else response_variants
     if not variants:
         return response
 
     family_guids = {family_guid for variant in variants for family_guid in variant['familyGuids']}
-    projects = Project.objects.filter(family__guid__in=family_guids).distinct()
-    project = list(projects)[0] if len(projects) == 1 else None
+    projects = context_loader.load(
+        'projects', lambda: list(Project.objects.filter(family__guid__in=family_guids).distinct()),
+        cache_key=frozenset(family_guids),
+    )
+    project = projects[0] if len(projects) == 1 else None
 
     response.update(get_variants_reference_data_response(
         variants, genome_versions={p.genome_version for p in projects}, get_family_genes=include_individual_gene_scores,
+        context_loader=context_loader,
     ))
 
     discovery_tags = None
-    is_analyst = user_is_analyst(request.user)
-    if is_analyst:
-        discovery_tags, discovery_response = get_json_for_discovery_tags(response['savedVariantsByGuid'].values(), request.user)
+    if context_loader.should_load('discoveryTags'):
+        discovery_tags, discovery_response = context_loader.load(
+            'discoveryTags', get_json_for_discovery_tags, response['savedVariantsByGuid'].values(), request.user)
         response.update(discovery_response)
 
-    response['locusListsByGuid'] = _add_locus_lists(
-        projects, response['genesById'], add_list_detail=add_locus_list_detail, user=request.user)
+    response['locusListsByGuid'] = context_loader.load(
+        'locusListsByGuid', _add_locus_lists, projects, response['genesById'], add_list_detail=add_locus_list_detail,
+        user=request.user,
+    )
 
     if discovery_tags:
         _add_discovery_tags(variants, discovery_tags)
 
-    response['mmeSubmissionsByGuid'] = _mme_response_context(response['savedVariantsByGuid'])
+    response['mmeSubmissionsByGuid'] = context_loader.load(
+        'mmeSubmissionsByGuid', _mme_response_context, response['savedVariantsByGuid'])
 
-    rna_tpm = _set_response_gene_scores(response, response.pop('family_genes'), response['genesById'].keys()) if include_individual_gene_scores else None
+    rna_tpm = context_loader.load(
+        'geneScores', _set_response_gene_scores, response, response.pop('family_genes'), response['genesById'].keys(),
+    ) if context_loader.should_load('geneScores') else None
 
-    if add_all_context or request.GET.get(LOAD_PROJECT_TAG_TYPES_CONTEXT_PARAM) == 'true':
+    if context_loader.should_load('projectsByGuid'):
         project_fields = {'projectGuid': 'guid'}
         if include_project_name:
             project_fields['name'] = 'name'
         if include_igv:
             project_fields['genomeVersion'] = 'genome_version'
         response['projectsByGuid'] = {project.guid: {k: getattr(project, field) for k, field in project_fields.items()} for project in projects}
-        add_project_tag_types(response['projectsByGuid'])
+        context_loader.load('projectsByGuid', add_project_tag_types, response['projectsByGuid'])
 
-    if add_all_context or request.GET.get(LOAD_FAMILY_CONTEXT_PARAM) == 'true':
+    if context_loader.should_load('familiesByGuid'):
         families = Family.objects.filter(guid__in=family_guids)
-        add_families_context(
-            response, families, project_guid=project.guid if project else None, user=request.user, is_analyst=is_analyst,
-            has_case_review_perm=bool(project) and has_case_review_permissions(project, request.user), include_igv=include_igv,
+        context_loader.load(
+            'familiesByGuid', add_families_context, response, families, project_guid=project.guid if project else None,
+            user=request.user, is_analyst=is_analyst, include_igv=include_igv,
+            has_case_review_perm=bool(project) and has_case_review_permissions(project, request.user),
         )
 
     if rna_tpm:
@@ -531,37 +622,50 @@ def get_variants_response(request, saved_variants, response_variants=None, add_a
                 response['familiesByGuid'][family_guid] = {}
             response['familiesByGuid'][family_guid].update(data)
 
+    context_loader.log_stats(len(variants))
+
     return response
 
 def _mme_response_context(saved_variants_by_guid):
     mme_submission_genes = MatchmakerSubmissionGenes.objects.filter(
         saved_variant__guid__in=saved_variants_by_guid.keys()).values(
         geneId=F('gene_id'), variantGuid=F('saved_variant__guid'), submissionGuid=F('matchmaker_submission__guid'))
+    submission_guids = set()
     for s in mme_submission_genes:
         response_variant = saved_variants_by_guid[s['variantGuid']]
         if 'mmeSubmissions' not in response_variant:
             response_variant['mmeSubmissions'] = []
         response_variant['mmeSubmissions'].append(s)
+        submission_guids.add(s['submissionGuid'])
 
-    submissions = get_json_for_matchmaker_submissions(MatchmakerSubmission.objects.filter(
-        matchmakersubmissiongenes__saved_variant__guid__in=saved_variants_by_guid.keys()))
+    if not submission_guids:
+        return {}
+    submissions = get_json_for_matchmaker_submissions(MatchmakerSubmission.objects.filter(guid__in=submission_guids))
     return {s['submissionGuid']: s for s in submissions}
 
 def _set_response_gene_scores(response, family_genes, gene_ids):
     present_family_genes = {k: v for k, v in family_genes.items() if v}
+    if not present_family_genes:
+        response.update({'rnaSeqData': {}, 'phenotypeGeneScores': {}})
+        return {}
     rna_sample_family_map = dict(RnaSample.objects.filter(
         individual__family__guid__in=present_family_genes.keys(), is_active=True,
     ).values_list('id', 'individual__family__guid'))
-    response['rnaSeqData'] = _get_rna_seq_outliers(gene_ids, rna_sample_family_map.keys())
+    response['rnaSeqData'] = _get_rna_seq_outliers(gene_ids, rna_sample_family_map.keys()) if rna_sample_family_map else {}
     response['phenotypeGeneScores'] = get_phenotype_prioritization(present_family_genes.keys(), gene_ids=gene_ids)
-    return _get_family_has_rna_tpm(present_family_genes, gene_ids, rna_sample_family_map)
+    return _get_family_has_rna_tpm(present_family_genes, gene_ids, rna_sample_family_map) if rna_sample_family_map else {}
+
+
+def _add_sample_count_stats(response, context_loader):
+    # sample counts are the same for every variant, so are only loaded once per request
+    response['totalSampleCounts'] = context_loader.load('totalSampleCounts', _get_sample_count_stats, cache_key=True)
 
 
-def _add_sample_count_stats(response):
+def _get_sample_count_stats():
     sample_counts = Sample.objects.filter(
         is_active=True, individual__family__project__is_demo=False,
     ).values('sample_type', 'dataset_type').annotate(count=Count('*'))
     counts_by_dataset_type = defaultdict(dict)
     for sample_type, dataset_type, count in sample_counts.values_list('sample_type', 'dataset_type', 'count'):
         counts_by_dataset_type[dataset_type][sample_type] = count
-    response['totalSampleCounts'] = counts_by_dataset_type
+    return counts_by_dataset_type
@@ -0,0 +1,49 @@
+from unittest import TestCase
+from threading import get_ident
+import mock
+
+from seqr.views.utils.variant_utils import update_projects_saved_variant_json
+
+PROJECTS = [
+    (1, 'R0001_1kg', '1kg project', 'GRCh37', None),
+    (2, 'R0002_empty', 'Empty Project', 'GRCh37', None),
+    (3, 'R0003_test', 'Test Reprocessed Project', 'GRCh38', ['F000012_12']),
+]
+
+
+@mock.patch('seqr.utils.thread_utils.connections')
+@mock.patch('seqr.views.utils.variant_utils.logger')
+class VariantUtilsTest(TestCase):
+
+    def test_update_projects_saved_variant_json(self, mock_logger, mock_connections):
+        thread_ids = set()
+
+        def _update_function(project_id, genome_version, family_guids=None, project_guid=None, **kwargs):
+            thread_ids.add(get_ident())
+            if project_guid == 'R0002_empty':
+                return None
+            if project_guid == 'R0003_test':
+                raise ValueError('Invalid genome version')
+            return {1: {}, 2: {}}
+
+        update_projects_saved_variant_json(PROJECTS, _update_function, max_workers=2)
+
+        self.assertNotIn(get_ident(), thread_ids)
+        self.assertEqual(mock_connections.close_all.call_count, 3)
+        mock_logger.info.assert_has_calls([
+            mock.call('Reloading saved variants in 3 projects'),
+            mock.call('Updated 2 variants for project 1kg project'),
+            mock.call('Reload Summary: '),
+            mock.call('  1kg project: Updated 2 variants'),
+            mock.call('Skipped the following 1 project with no saved variants: Empty Project'),
+            mock.call('1 failed projects'),
+            mock.call('  Test Reprocessed Project: Invalid genome version'),
+        ])
+        mock_logger.error.assert_called_with('Error reloading variants in Test Reprocessed Project: Invalid genome version')
+
+        # projects are reloaded in the calling thread by default
+        thread_ids.clear()
+        mock_connections.reset_mock()
+        update_projects_saved_variant_json(PROJECTS[:1], _update_function)
+        self.assertSetEqual(thread_ids, {get_ident()})
+        mock_connections.close_all.assert_not_called()
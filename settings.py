@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'seqr.utils.middleware.JsonGZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,8 +65,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'seqr.utils.middleware.CacheControlMiddleware',
     'seqr.utils.middleware.LogRequestMiddleware',
+    'seqr.utils.middleware.RequestStatsMiddleware',
     'seqr.utils.middleware.JsonErrorMiddleware',
 ]
+# Number of times a query with the same shape can run in a single request before it is flagged as a possible N+1 query
+REPEATED_QUERY_WARNING_THRESHOLD = int(os.environ.get('REPEATED_QUERY_WARNING_THRESHOLD', 20))
+
+# Encoding for json API responses, either "compact" or "pretty" (sorted and indented, for debugging)
+JSON_RESPONSE_FORMAT = os.environ.get('JSON_RESPONSE_FORMAT', 'compact')
+# Minimum size in bytes for a json API response to be gzipped, smaller responses are not worth the compression time
+JSON_RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('JSON_RESPONSE_COMPRESSION_MIN_SIZE', 10 * 1024))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -160,6 +169,11 @@ else:
 
 LOADING_DATASETS_DIR = os.environ.get('LOADING_DATASETS_DIR')
 PIPELINE_DATA_DIR = os.environ.get('PIPELINE_DATA_DIR')
+# Access gs:// files with the gsutil CLI ('gsutil') or the in-process Google Storage client ('client')
+GCS_STORAGE_BACKEND = os.environ.get('GCS_STORAGE_BACKEND', 'gsutil')
+# If specified, cache blocks of gs:// IGV tracks on local disk, up to the given max size
+IGV_BLOCK_CACHE_DIR = os.environ.get('IGV_BLOCK_CACHE_DIR')
+IGV_BLOCK_CACHE_MAX_SIZE_MB = int(os.environ.get('IGV_BLOCK_CACHE_MAX_SIZE_MB', '1024'))
 
 LOGGING = {
     'version': 1,
@@ -51,12 +51,12 @@ export const deleteEsIndex = index => submitRequest('delete_index', RECEIVE_ELAS
 
 export const uploadRnaSeq = loadMultipleData(
   '/api/data_management/update_rna_seq',
-  ({ sampleGuids, fileName }, { dataType }) => sampleGuids.map(sampleGuid => ([
-    `/api/load_rna_seq_sample/${sampleGuid}`, sampleGuid, { fileName, dataType },
+  ({ sampleGuidBatches, fileName }, { dataType }) => sampleGuidBatches.map(batchGuids => ([
+    '/api/load_rna_seq_samples', batchGuids.join(', '), { fileName, dataType, sampleGuids: batchGuids },
   ])),
   RECEIVE_RNA_SEQ_UPLOAD_STATS,
   numLoaded => `Successfully loaded data for ${numLoaded} RNA-seq samples`,
-  10,
+  2,
 )
 
 export const addIgv = loadMultipleData(
@@ -226,12 +226,12 @@ export const addIGVDataset = ({ mappingFile, ...values }) => (dispatch) => {
 
 export const uploadRnaSeq = values => (dispatch, getState) => loadMultipleData(
   `/api/project/${getState().currentProjectGuid}/update_rna_seq`,
-  ({ sampleGuids, fileName }, { dataType }) => sampleGuids.map(sampleGuid => ([
-    `/api/load_rna_seq_sample/${sampleGuid}`, sampleGuid, { fileName, dataType },
+  ({ sampleGuidBatches, fileName }, { dataType }) => sampleGuidBatches.map(batchGuids => ([
+    '/api/load_rna_seq_samples', batchGuids.join(', '), { fileName, dataType, sampleGuids: batchGuids },
   ])),
   RECEIVE_RNA_SEQ_UPLOAD_STATS,
   numLoaded => `Successfully loaded data for ${numLoaded} RNA-seq samples`,
-  10,
+  2,
 )(values)(dispatch)
 
 export const updateLocusLists = values => (dispatch, getState) => {
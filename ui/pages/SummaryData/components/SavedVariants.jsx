@@ -3,7 +3,7 @@ import PropTypes from 'prop-types'
 import { connect } from 'react-redux'
 import { Route, Switch, NavLink } from 'react-router-dom'
 
-import { Form, Button } from 'semantic-ui-react'
+import { Form, Button, Label } from 'semantic-ui-react'
 
 import { getGenesById } from 'redux/selectors'
 import {
@@ -21,7 +21,8 @@ import AwesomeBar from 'shared/components/page/AwesomeBar'
 import SavedVariants from 'shared/components/panel/variants/SavedVariants'
 import { HorizontalSpacer } from 'shared/components/Spacers'
 
-import { loadSavedVariants, updateAllProjectSavedVariantTable } from '../reducers'
+import { loadSavedVariants, updateAllProjectSavedVariantTable, getSavedVariantsPageKey } from '../reducers'
+import { getSavedVariantPages, getMoreSavedVariantsLoading, getMoreSavedVariantsLoadingError } from '../selectors'
 
 const GENE_SEARCH_CATEGORIES = ['genes']
 
@@ -71,7 +72,28 @@ const getUpdateTagUrl =
 
 const getGeneHref = tag => selectedGene => `${PAGE_URL}/${tag || SHOW_ALL}/${selectedGene.key}`
 
-const BaseSavedVariants = React.memo(({ loadVariants, geneDetail, ...props }) => {
+const SavedVariantsPageSummary = React.memo(({ savedVariantsPage, loadMoreVariants, loading, error }) => (
+  <span>
+    {`${savedVariantsPage.loadedCount} of ${savedVariantsPage.totalCount} saved variants loaded`}
+    {savedVariantsPage.nextCursor && <HorizontalSpacer width={10} />}
+    {savedVariantsPage.nextCursor && (
+      <Button content="Load more" size="tiny" compact loading={loading} disabled={loading} onClick={loadMoreVariants} />
+    )}
+    {error && <HorizontalSpacer width={10} />}
+    {error && <Label color="red" basic pointing="left" content={error} />}
+  </span>
+))
+
+SavedVariantsPageSummary.propTypes = {
+  savedVariantsPage: PropTypes.object,
+  loadMoreVariants: PropTypes.func,
+  loading: PropTypes.bool,
+  error: PropTypes.string,
+}
+
+const BaseSavedVariants = React.memo(({
+  loadVariants, loadMoreVariants, geneDetail, savedVariantsPage, moreVariantsLoading, moreVariantsError, ...props
+}) => {
   const { params } = props.match
   const { tag, gene } = params
 
@@ -108,6 +130,15 @@ const BaseSavedVariants = React.memo(({ loadVariants, geneDetail, ...props }) =>
             />
           )}
           <HorizontalSpacer width={10} />
+          {savedVariantsPage && (
+            <SavedVariantsPageSummary
+              savedVariantsPage={savedVariantsPage}
+              loadMoreVariants={loadMoreVariants}
+              loading={moreVariantsLoading}
+              error={moreVariantsError}
+            />
+          )}
+          {savedVariantsPage && <HorizontalSpacer width={10} />}
         </StyledForm>
       }
       {...props}
@@ -117,6 +148,9 @@ const BaseSavedVariants = React.memo(({ loadVariants, geneDetail, ...props }) =>
 
 const mapStateToProps = (state, ownProps) => ({
   geneDetail: getGenesById(state)[ownProps.match.params.gene],
+  savedVariantsPage: getSavedVariantPages(state)[getSavedVariantsPageKey(ownProps.match.params)],
+  moreVariantsLoading: getMoreSavedVariantsLoading(state),
+  moreVariantsError: getMoreSavedVariantsLoadingError(state),
 })
 
 const mapDispatchToProps = (dispatch, ownProps) => ({
@@ -136,14 +170,21 @@ const mapDispatchToProps = (dispatch, ownProps) => ({
       dispatch(loadSavedVariants(newParams))
     }
   },
+  loadMoreVariants: () => {
+    dispatch(loadSavedVariants(ownProps.match.params, true))
+  },
 })
 
 BaseSavedVariants.propTypes = {
   match: PropTypes.object,
   history: PropTypes.object,
   geneDetail: PropTypes.object,
+  savedVariantsPage: PropTypes.object,
+  moreVariantsLoading: PropTypes.bool,
+  moreVariantsError: PropTypes.string,
   updateTableField: PropTypes.func,
   loadVariants: PropTypes.func,
+  loadMoreVariants: PropTypes.func,
 }
 
 const ConnectedSavedVariants = connect(mapStateToProps, mapDispatchToProps)(BaseSavedVariants)
@@ -10,12 +10,17 @@ const REQUEST_SUCCESS_STORY = 'REQUEST_SUCCESS_STORY'
 const RECEIVE_SUCCESS_STORY = 'RECEIVE_SUCCESS_STORY'
 const REQUEST_MME = 'REQUEST_MME'
 const RECEIVE_MME = 'RECEIVE_MME'
-const RECEIVE_SAVED_VARIANT_TAGS = 'RECEIVE_SAVED_VARIANT_TAGS'
+const REQUEST_MORE_SAVED_VARIANTS = 'REQUEST_MORE_SAVED_VARIANTS'
+const RECEIVE_SAVED_VARIANT_PAGES = 'RECEIVE_SAVED_VARIANT_PAGES'
 const UPDATE_ALL_PROJECT_SAVED_VARIANT_TABLE_STATE = 'UPDATE_ALL_PROJECT_VARIANT_STATE'
 const RECEIVE_EXTERNAL_ANALYSIS_UPLOAD_STATS = 'RECEIVE_EXTERNAL_ANALYSIS_UPLOAD_STATS'
 const REQUEST_GENE_VARIANT_LOOKUP = 'REQUEST_GENE_VARIANT_LOOKUP'
 const RECEIVE_GENE_VARIANT_LOOKUP = 'RECEIVE_GENE_VARIANT_LOOKUP'
 
+const SAVED_VARIANTS_PAGE_SIZE = 500
+
+export const getSavedVariantsPageKey = ({ tag, gene }) => `${tag}${gene ? `/${gene}` : ''}`
+
 // Data actions
 
 export const loadMme = () => (dispatch) => {
@@ -43,31 +48,45 @@ export const loadSuccessStory = successStoryTypes => (dispatch) => {
   }
 }
 
-export const loadSavedVariants = ({ tag, gene = '' }) => (dispatch, getState) => {
-  // Do not load if already loaded
-  if (tag && tag !== SHOW_ALL) {
-    const loadedTags = getState().savedVariantTags
-    if (loadedTags[tag] || tag.split(';').some(t => loadedTags[t])) {
+export const loadSavedVariants = ({ tag, gene = '' }, loadMore = false) => (dispatch, getState) => {
+  const pageKey = getSavedVariantsPageKey({ tag, gene })
+  const loadedPage = getState().savedVariantPages[pageKey]
+  const cursor = loadMore && loadedPage?.nextCursor
+  if (loadMore) {
+    if (!cursor) {
+      return
+    }
+  } else if (tag && tag !== SHOW_ALL) {
+    // Do not load if already loaded
+    if (loadedPage) {
       return
     }
   } else if (!gene) {
     return
   }
 
-  dispatch({ type: REQUEST_SAVED_VARIANTS })
+  dispatch({ type: cursor ? REQUEST_MORE_SAVED_VARIANTS : REQUEST_SAVED_VARIANTS })
   new HttpRequestHelper(`/api/summary_data/saved_variants/${tag}`,
-    (responseJson) => {
-      if (tag && !gene) {
-        dispatch({
-          type: RECEIVE_SAVED_VARIANT_TAGS,
-          updates: { [tag]: true },
-        })
-      }
+    ({ savedVariantsPage, ...responseJson }) => {
+      dispatch({
+        type: RECEIVE_SAVED_VARIANT_PAGES,
+        updates: {
+          [pageKey]: {
+            totalCount: savedVariantsPage.totalCount,
+            nextCursor: savedVariantsPage.nextCursor,
+            loadedCount: (cursor ? loadedPage.loadedCount : 0) + savedVariantsPage.variantGuids.length,
+          },
+        },
+      })
       dispatch({ type: RECEIVE_DATA, updatesById: responseJson })
     },
     (e) => {
-      dispatch({ type: RECEIVE_DATA, error: e.message, updatesById: {} })
-    }).get({ gene })
+      if (cursor) {
+        dispatch({ type: RECEIVE_SAVED_VARIANT_PAGES, error: e.message, updates: {} })
+      } else {
+        dispatch({ type: RECEIVE_DATA, error: e.message, updatesById: {} })
+      }
+    }).get({ gene, pageSize: SAVED_VARIANTS_PAGE_SIZE, ...(cursor ? { cursor } : {}) })
 }
 
 export const updateAllProjectSavedVariantTable = updates => (
@@ -103,7 +122,8 @@ export const reducers = {
   mmeLoading: loadingReducer(REQUEST_MME, RECEIVE_MME),
   mmeMetrics: createSingleValueReducer(RECEIVE_MME, {}, 'metrics'),
   mmeSubmissions: createSingleValueReducer(RECEIVE_MME, [], 'submissions'),
-  savedVariantTags: createSingleObjectReducer(RECEIVE_SAVED_VARIANT_TAGS),
+  savedVariantPages: createSingleObjectReducer(RECEIVE_SAVED_VARIANT_PAGES),
+  moreSavedVariantsLoading: loadingReducer(REQUEST_MORE_SAVED_VARIANTS, RECEIVE_SAVED_VARIANT_PAGES),
   externalAnalysisUploadStats: createSingleValueReducer(RECEIVE_EXTERNAL_ANALYSIS_UPLOAD_STATS, {}),
   geneVariantLookupLoading: loadingReducer(REQUEST_GENE_VARIANT_LOOKUP, RECEIVE_GENE_VARIANT_LOOKUP),
   geneVariantLookupResults: createSingleValueReducer(RECEIVE_GENE_VARIANT_LOOKUP, null),
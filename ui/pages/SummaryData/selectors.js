@@ -13,6 +13,9 @@ export const getMmeSubmissions = state => state.mmeSubmissions
 export const getExternalAnalysisUploadStats = state => state.externalAnalysisUploadStats
 export const getGeneVariantLookupLoading = state => state.geneVariantLookupLoading.isLoading
 export const getGeneVariantLookupResults = state => state.geneVariantLookupResults
+export const getSavedVariantPages = state => state.savedVariantPages
+export const getMoreSavedVariantsLoading = state => state.moreSavedVariantsLoading.isLoading
+export const getMoreSavedVariantsLoadingError = state => state.moreSavedVariantsLoading.errorMessage
 
 export const getVlmFamiliesByContactEmail = createSelector(
   getSortedIndividualsByFamily,
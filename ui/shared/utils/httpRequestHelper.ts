@@ -174,8 +174,13 @@ export const loadMultipleData = (
       if (index % maxConcurrentRequests === 0) {
         return prevPromise.then(() => executeMultipleRequests(
           updateData.slice(index, index + maxConcurrentRequests),
-          () => {
-            numLoaded += 1
+          (responseJson: unknown) => {
+            // Requests which load data for multiple entities return the number loaded and any per-entity warnings
+            const {
+              numLoaded: numEntitiesLoaded = 1, warnings: entityWarnings = [],
+            } = responseJson as { numLoaded?: number, warnings?: string[] }
+            numLoaded += numEntitiesLoaded
+            warnings.push(...entityWarnings)
           },
           warnings,
         ))